@@ -4,6 +4,10 @@
 
 Based on the JCSP PlugNPlay package.
 
+These processes call channel operations directly, so they cannot be
+run by csp.os_cooperative or csp.os_hybrid, where each operation is a
+generator which must be run with yield from.
+
 Copyright (C) Sarah Mount, 2009.
 
 This program is free software; you can redistribute it and/or
@@ -169,8 +173,11 @@ def Clock(cout, resolution=1):
     writeset = cout
     """
     timer = Timer()
+    tick = timer.read()
     while True:
-        timer.sleep(resolution)
+        # Ticks are counted from the start, so they do not drift.
+        tick += resolution
+        timer.sleep_until(tick)
         cout.write(None)
         yield
 
@@ -1,83 +1,247 @@
-import Channel as chnl
-import cPickle
+#!/usr/bin/env python
+
+"""Channels implemented in C, in POSIX shared memory.
+
+Build the C extension by running make in this directory. L{CChannel}
+can then be used wherever a Channel of L{csp.os_process} can, and
+L{csp.csp} uses it in place of that Channel if the environment variable
+C{CSP_CCHANNELS} is set.
+
+Each channel keeps its state in a shared memory segment, and copies
+items through a second segment which grows to fit the largest item
+written. Readers and writers meet on process-shared semaphores, so a
+read and a write which do not have to wait for each other make no
+system calls at all.
+
+Copyright (C) python-csp developers, 2026.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have rceeived a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from __future__ import absolute_import
+
+import os
+import struct
 import uuid
-from csp.guards import Guard 
 
-class CChannel(Guard):
+import multiprocessing.reduction
+
+from . import Channel as chnl
+from .. import os_process as _os_process
+from ..os_process import ChannelPoison, _is_batch, _new_channel_id, _spawning
+from ..serializers import get_default_serializer
+
+
+__author__ = 'python-csp developers'
+__date__ = 'October 2026'
+
+
+### Names exported by this module
+__all__ = ['CChannel']
+
+
+_COUNT = struct.Struct('q')
+"""Header of the data of each item: the number of items if it is a
+batch written by write_many, or 0."""
+
+
+class CChannel(_os_process.Channel):
+    """Channel implemented in C, for processes of L{csp.os_process}.
+
+    A C{CChannel} can be used wherever a Channel can, including in an
+    L{Alt}: a writer also writes a byte to a pipe of the channel while
+    a process is waiting in an Alt, which the Alt waits on.
+    """
 
-    def __init__(self):
-        p = uuid.uuid4().int & 0xffffff
-        av = uuid.uuid4().int & 0xffffff
-        tak = uuid.uuid4().int & 0xffffff
-        shm = uuid.uuid4().int & 0xffffff
+    # ProcessPool slots hold the state of os_process channels.
+    _poolable = False
 
-        self.channel = chnl.getChannel(p,av,tak,shm)
-        self.name = uuid.uuid1()
-        return
+    # Attributes created by _setup(), when they are first needed.
+    _LAZY = frozenset(['_handle', '_itemr', '_itemw'])
+
+    def __init__(self, serializer=None):
+        self.name = _new_channel_id()
+        self._shm_name = '/csp-{0}-{1}-{2}'.format(os.getpid(), self.name,
+                                                   uuid.uuid4().hex[:8])
+        self._serializer = serializer or get_default_serializer()
+        self._defer_setup()
+
+    def _setup(self):
+        """Create the shared state of the channel, and its wake-up
+        pipe.
+        """
+        _os_process._unready_channels.discard(self)
+        _os_process._live_channels[self.name] = self
+        self._handle = chnl.getChannel(self._shm_name.encode())
+        self._open()
+
+    def _open(self):
+        """Create the pipe through which writers wake an L{Alt}.
+        """
+        self._itemr, self._itemw = os.pipe()
+        os.set_blocking(self._itemr, False)
+        os.set_blocking(self._itemw, False)
+
+    def __getstate__(self):
+        if not _spawning():
+            return self.__dict__
+        if '_handle' not in self.__dict__:
+            self._setup()
+        state = dict((key, value) for key, value in self.__dict__.items()
+                     if key not in ('_handle', '_unread'))
+        for key in ('_itemr', '_itemw'):
+            state[key] = multiprocessing.reduction.DupFd(state[key])
+        state['_spawned'] = True
+        return state
+
+    def __setstate__(self, state):
+        spawned = state.pop('_spawned', False)
+        self.__dict__.update(state)
+        if spawned:
+            for key in ('_itemr', '_itemw'):
+                self.__dict__[key] = self.__dict__[key].detach()
+            self._handle = chnl.openChannel(self._shm_name.encode())
+            _os_process._live_channels[self.name] = self
 
     def __del__(self):
-        chnl.removeChannel(self.channel)
-        self.channel = None
-        return
+        handle = self.__dict__.get('_handle')
+        if handle is None:
+            return # Never set up.
+        chnl.removeChannel(handle)
+        self._handle = None
+        for fd in (self._itemr, self._itemw):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
 
-    def put(self,item):
-        a = cPickle.dumps(item)
-        chnl.put(self.channel,a);
-        return
+    def _recycle(self):
+        # The C channel does not say whether an item is waiting, so
+        # only a channel which has never been used is reused.
+        if '_handle' in self.__dict__:
+            return False
+        return super(CChannel, self)._recycle()
+
+    def put(self, item):
+        """Put C{item} in the shared memory of this channel.
+
+        The C channel makes an item available and waits for a reader
+        in a single call, so this returns once a reader has taken
+        C{item}.
+        """
+        count, data = self._dumps(item)
+        data = b''.join([_COUNT.pack(count), data])
+        if chnl._write(self._handle, data, self._itemw) == -1:
+            raise ChannelPoison()
 
     def get(self):
-        chnl.get(self.channel,ret)
-        item = cPickle.loads(ret)
-        print(item)
-        return item
+        """Get the next item from the shared memory of this channel,
+        waiting for a writer if there is none.
+        """
+        data = chnl._read(self._handle)
+        if data is None:
+            raise ChannelPoison()
+        return self._unpack(data)
+
+    def _drain(self):
+        """Discard any wake-up bytes left on the pipe."""
+        try:
+            while os.read(self._itemr, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def write(self, obj):
+        """Write a Python object to this channel.
+        """
+        self.put(obj)
+
+    def _read(self):
+        """Read (and return) the next item written to this channel.
+        """
+        return self.get()
+
+    def _unpack(self, data):
+        """Return the object in C{data}, the bytes read from the C
+        channel.
+        """
+        count, = _COUNT.unpack_from(data)
+        return self._loads(count, memoryview(data)[_COUNT.size:])
+
+    def fileno(self):
+        """Return the read end of the pipe through which writers wake
+        an L{Alt}.
+        """
+        return self._itemr
+
+    def _arm(self):
+        """Ask writers to wake an L{Alt} through the pipe, and return
+        C{True} if an item may already be available.
+        """
+        self._drain()
+        return bool(chnl.arm(self._handle))
 
     def is_selectable(self):
-        #print ( "is_selectable has been called" )
-        a = chnl.is_selectable(self.channel)
-        #print ( "is_selectable got ", a )
-        if a == 1:
+        """Test whether Alt can select this channel.
+        """
+        self.checkpoison()
+        if self._unread_items():
             return True
-        else:
-            return False;
-
-    def write(self,item):
-        a = cPickle.dumps(item)
-        chnl._write(self.channel,a,len(a));
-        return
-
-    def read(self):
-        print("invoked read")
-        ret = chnl._read(self.channel)
-        print(ret)
-        item = cPickle.loads(ret)
-        print(item)
-        return item
+        return bool(chnl.is_selectable(self._handle))
 
     def enable(self):
-        #print("ENABLED CALLED")
-        chnl.enable(self.channel)
-        #print("returning from enable")
-        return
+        """Enable a read for an Alt select.
+
+        The item on the channel, if any, is claimed for this process.
+        """
+        self.checkpoison()
+        if not self._unread_items():
+            chnl.enable(self._handle)
 
     def disable(self):
-        chnl.disable(self.channel)
-        return
+        """Disable this channel for Alt selection, giving back an item
+        claimed by L{enable}.
+        """
+        chnl.disable(self._handle)
 
     def select(self):
-        #print("calling _select")
-        ret = chnl._select(self.channel)
-        item = cPickle.loads(ret)
-        print(item)
-        return item
+        """Complete a Channel read for an Alt select.
+        """
+        unread = self._unread_items()
+        if unread:
+            return unread.popleft()
+        data = chnl._select(self._handle)
+        if data is None:
+            raise ChannelPoison()
+        obj = self._unpack(data)
+        if _is_batch(obj):
+            return self._keep_unread(obj, 1)[0]
+        return obj
 
-    def poison(self):
-        chnl.poison(self.channel);
-        return
+    def checkpoison(self):
+        if chnl.checkpoison(self._handle):
+            raise ChannelPoison()
 
-    def getStatus(self):
-        chnl.getStatus(self.channel)
-        return
+    def poison(self):
+        """Poison this channel, waking every process which is waiting
+        on it.
+        """
+        chnl.poison(self._handle)
+        try:
+            os.write(self._itemw, b'\0')
+        except OSError:
+            pass
 
-    def checkpoison(self):
-        chnl.checkpoison()
-        return
+    def __str__(self):
+        return 'Channel implemented in C, using shared memory for IPC.'
@@ -1,333 +1,350 @@
-#include "Channel.h"
+#include <errno.h>
+#include <fcntl.h>
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
 
-#define false 0
-#define true (!false)
-#define SHMSZ     1024
-#define printf(x...) ;
+#include "Channel.h"
 
-int semflg = IPC_CREAT | 0666 | IPC_EXCL; 
-int nsems = 1; 
-int sq(int i ){
-	return i*i;
+/*
+ * Channels shared by OS processes, in POSIX shared memory.
+ *
+ * The state of each channel is kept in a segment of its own, which
+ * forked processes inherit and spawned processes open by name. Items
+ * are copied through a second segment, which is replaced by a larger
+ * one whenever an item does not fit. Each replacement has the next
+ * generation number in its name, so that readers know to map it.
+ *
+ * Writers and readers rendezvous on two process-shared semaphores,
+ * which do not enter the kernel unless a process has to wait. A
+ * process waiting in an Alt is counted in state->alting, and writers
+ * then also write a byte to the channel's wake-up pipe, which the Alt
+ * waits on.
+ */
+
+/* Longest name of a data segment: the state's, and its generation. */
+#define DATA_NAME_MAX (CSP_NAME_MAX + 12)
+
+static void data_name(ChannelState *st, unsigned int generation,
+		      char *name){
+	snprintf(name, DATA_NAME_MAX, "%s-%u", st->name, generation);
 }
 
-Channel getChannel(long int p,long int av,long int tak,long int shm){
-	Channel c;
-	int pshared = 0;
-	int OldPrio = 0;
-
-	pthread_mutexattr_t mutexattr;
-	pthread_mutexattr_settype(&mutexattr, 0);
-	pthread_mutexattr_init(&mutexattr);
-	
-
-	pthread_mutex_init(&c.r_lock, &mutexattr);
-	pthread_mutex_init(&c.w_lock, &mutexattr);
-	//printf("%d\n", pthread_mutex_init(&c.r_lock, &mutexattr));
-	//printf("%d\n", pthread_mutex_init(&c.w_lock, &mutexattr));
-	pthread_mutex_setprioceiling(&c.r_lock, 0, &OldPrio);
-	pthread_mutex_setprioceiling(&c.w_lock, 0, &OldPrio);
-	
-	key_t p_lock_key = p; // GENERATE UUID
-	c.p_lock = semget(p_lock_key, nsems, semflg);
-	key_t available_key = av; //GENERATE UUID
-	c.available = semget(available_key, nsems, semflg);
-	key_t taken_key = tak; //GENERATE UUID
-	c.taken = semget(taken_key, nsems, semflg);
+static void *map_segment(const char *name, size_t size, int create){
+	int fd = shm_open(name, create ? O_CREAT | O_EXCL | O_RDWR : O_RDWR,
+			  0600);
+	if(fd < 0){
+		return NULL;
+	}
+	if(create && ftruncate(fd, size) < 0){
+		int err = errno;
+		close(fd);
+		shm_unlink(name);
+		errno = err;
+		return NULL;
+	}
+	void *addr = mmap(NULL, size, PROT_READ | PROT_WRITE, MAP_SHARED, fd, 0);
+	int err = errno;
+	close(fd);
+	if(addr == MAP_FAILED){
+		if(create){
+			shm_unlink(name);
+		}
+		errno = err;
+		return NULL;
+	}
+	return addr;
+}
 
-	union semun ss;
+static void wait_for(sem_t *sem){
+	while(sem_wait(sem) < 0 && errno == EINTR){
+		;
+	}
+}
 
-	ss.val = 0;
-	//printf("SEMVALUE: %d\n",semctl(c.taken, 0,GETVAL));
-	semctl(c.taken, 0,SETVAL,ss);
-	semctl(c.p_lock, 0,SETVAL,ss);
-	semctl(c.available, 0,SETVAL,ss);
-	
-	//printf("SEMVALUE: %d\n",semctl(c.taken, 0,GETVAL));
+static int is_poisoned(ChannelState *st){
+	return __atomic_load_n(&st->poisoned, __ATOMIC_SEQ_CST);
+}
 
-	printf("p_lock: %d available: %d taken: %d\n", c.p_lock,c.available,c.taken);
-	c.is_alting = 0;
-	c.is_selectable = 0;
-	c.has_selected = 0;
-	c.poisoned = 0;
-	c.sh_mem_name = shm; //GENERATE UUID
-	c.shmid = shmget(c.sh_mem_name, SHMSZ, IPC_CREAT | 0666);
-	
-	
+static Channel *new_handle(ChannelState *st){
+	Channel *c = calloc(1, sizeof(Channel));
+	if(c == NULL){
+		munmap(st, sizeof(ChannelState));
+		errno = ENOMEM;
+		return NULL;
+	}
+	c->state = st;
 	return c;
-
 }
 
-void removeChannel(Channel *c){
-	fprintf(stdout,"RUNNING CHANNEL CLEANUP: ");
-	pthread_mutex_destroy(&(*c).r_lock);
-	pthread_mutex_destroy(&(*c).w_lock);
-
-	semctl((*c).p_lock, 0, IPC_RMID);
-	semctl((*c).available, 0, IPC_RMID);
-	semctl((*c).taken, 0, IPC_RMID);
-	shmctl((*c).shmid, IPC_RMID,NULL);
-	free(c);
+Channel *getChannel(const char *name){
+	if(strlen(name) >= CSP_NAME_MAX){
+		errno = ENAMETOOLONG;
+		return NULL;
+	}
+	ChannelState *st = map_segment(name, sizeof(ChannelState), true);
+	if(st == NULL){
+		return NULL;
+	}
+	pthread_mutexattr_t mutexattr;
+	pthread_mutexattr_init(&mutexattr);
+	pthread_mutexattr_setpshared(&mutexattr, PTHREAD_PROCESS_SHARED);
+	pthread_mutex_init(&st->r_lock, &mutexattr);
+	pthread_mutex_init(&st->w_lock, &mutexattr);
+	pthread_mutexattr_destroy(&mutexattr);
+	sem_init(&st->available, 1, 0);
+	sem_init(&st->taken, 1, 0);
+	st->owner = getpid();
+	strcpy(st->name, name);
+	return new_handle(st);
 }
 
-void semWait(int semid){
-	printf("SEMWAIT\n");
-	struct sembuf *sops = (struct sembuf *) malloc(2*sizeof(struct sembuf)); 
-	//semid = semget(semid, nsems, 0);
-
-	int nsops = 1;
-       
-       			/* wait for semaphore to reach zero */
-       
-       	//sops[0].sem_num = 0; /* We only use one track */
-      	//sops[0].sem_op = 0; /* wait for semaphore flag to become zero */
-       	//sops[0].sem_flg = SEM_UNDO; /* take off semaphore asynchronous  */
-       
-       
-       	sops[0].sem_num = 0;
-       	sops[0].sem_op = -1; /* increment semaphore -- take control of track */
-       	//sops[0].sem_flg = SEM_UNDO; /* take off semaphore */
-       
-      
-	semop(semid, sops, nsops);
-				
-		
-      	
+Channel *openChannel(const char *name){
+	ChannelState *st = map_segment(name, sizeof(ChannelState), false);
+	if(st == NULL){
+		return NULL;
+	}
+	return new_handle(st);
 }
 
-int semTryWait(int semid){
-	struct sembuf *sops = (struct sembuf *) malloc(1*sizeof(struct sembuf)); 
-	//semid = semget(semid, nsems, 0);
-	printf("try wait\n");
-	int nsops = 1;
-       
-       			/* wait for semaphore to reach zero */
-       
-       	//sops[0].sem_num = 0; /* We only use one track */
-      	//sops[0].sem_op = 0; /* wait for semaphore flag to become zero */
-       	//sops[0].sem_flg = SEM_UNDO; /* take off semaphore asynchronous  */
-       
-       
-       	sops[0].sem_num = 0;
-       	sops[0].sem_op = -1; /* increment semaphore -- take control of track */
-       	sops[0].sem_flg =  IPC_NOWAIT; /* take off semaphore */
-       
-        int err;
-	if ((err = semop(semid, sops, nsops)) == -1) {
-					
-					if(errno == 11){
-					printf("Could not acquire semaphore RETURNING 0\n");
-					return 0;
-					}
-					perror("semop: semop failed:");
-					printf("ERROR CODE: %d\n",errno);
-					return 0;
-		} 
-	printf("return from semop: %d\n", err);
-	return 1;
-				
-		
-      	
+static void disarm(Channel *c){
+	if(c->armed){
+		__atomic_sub_fetch(&c->state->alting, 1, __ATOMIC_SEQ_CST);
+		c->armed = false;
+	}
 }
 
-void semPost(int semid){
-	printf("SEMPOST\n");
-	struct sembuf *sops = (struct sembuf *) malloc(2*sizeof(struct sembuf)); 
-	//semid = semget(semid, nsems, 0);
-
-	int nsops = 1;
-       
-       	/* wait for semaphore to reach zero */
-       	sops[0].sem_num = 0;
-        sops[0].sem_op = 1; /* Give UP COntrol of track */
-       	sops[0].sem_flg =  IPC_NOWAIT; /* take off semaphore, asynchronous  */
-
-	semop(semid, sops, nsops);
+void removeChannel(Channel *c){
+	ChannelState *st = c->state;
+	char name[DATA_NAME_MAX];
+	disarm(c);
+	if(st->owner == getpid()){
+		/* Processes which have mapped the segments keep them. */
+		if(st->generation){
+			data_name(st, st->generation, name);
+			shm_unlink(name);
+		}
+		shm_unlink(st->name);
+	}
+	if(c->data != NULL){
+		munmap(c->data, c->capacity);
+	}
+	munmap(st, sizeof(ChannelState));
+	free(c);
 }
 
-void getStatus(Channel *c){
-	int rlock;
-	int wlock;
-	int plock  = semctl((*c).p_lock, 0,GETVAL);
-	int available = semctl((*c).available, 0,GETVAL);
-	int taken = semctl((*c).taken, 0,GETVAL); 
-	//sem_getvalue(&(*c).p_lock, &plock); 
-	//sem_getvalue(&(*c).available, &available); 
-	//sem_getvalue(&(*c).taken, &taken); 
-	printf(" r_lock:  w_lock:  p_lock: %d available: %d taken: %d is_alting: %d is_selectable: %d has_selected: %d poisoned: %d\n Item: %s\n", plock, available, taken, (*c).is_alting, (*c).is_selectable, (*c).has_selected,(*c).poisoned, (*c).item);
+/* Map the current data segment, if this process has not already.
+ * Called with a lock held. */
+static int remap(Channel *c){
+	ChannelState *st = c->state;
+	char name[DATA_NAME_MAX];
+	if(c->generation == st->generation){
+		return 0;
+	}
+	data_name(st, st->generation, name);
+	char *data = map_segment(name, st->capacity, false);
+	if(data == NULL){
+		return -1;
+	}
+	if(c->data != NULL){
+		munmap(c->data, c->capacity);
+	}
+	c->data = data;
+	c->generation = st->generation;
+	c->capacity = st->capacity;
+	return 0;
 }
 
-void checkpoison(Channel *c){
-
-	semWait((*c).p_lock);
-	if((*c).poisoned){
-		printf("%s\n", "This channel has been poisoned");
+/* Replace the data segment by one of at least len bytes. Called with
+ * w_lock held, once the last item written has been taken. */
+static int grow(Channel *c, size_t len){
+	ChannelState *st = c->state;
+	char name[DATA_NAME_MAX];
+	size_t capacity = st->capacity * 2;
+	if(capacity < SHMSZ){
+		capacity = SHMSZ;
+	}
+	if(capacity < len){
+		capacity = len;
 	}
-	semPost((*c).p_lock);
-	return;
+	data_name(st, st->generation + 1, name);
+	char *data = map_segment(name, capacity, true);
+	if(data == NULL){
+		return -1;
+	}
+	if(st->generation){
+		/* Every reader is done with the old segment. */
+		data_name(st, st->generation, name);
+		shm_unlink(name);
+	}
+	if(c->data != NULL){
+		munmap(c->data, c->capacity);
+	}
+	c->data = data;
+	c->generation = st->generation = st->generation + 1;
+	c->capacity = st->capacity = capacity;
+	return 0;
 }
 
-void put(Channel *c, char *ptr, int len){
-	(*c).len =len;
-	int i = 0;	
-	printf("Pickle str: %s\n", ptr);
-	char* s = shmat((*c).shmid, NULL, 0);
-	//char* start_address = (*c).item;
-	for(;i<len; i++){
-		*s = *ptr;
-		ptr++;
-		s++;
-	}
-	//(*c).item = start_address;
-	printf("FINISHED PUT CHAR Length: %d\n",len);
+static int put(Channel *c, char *ptr, size_t len){
+	if(len > c->state->capacity ? grow(c, len) : remap(c)){
+		return -1;
+	}
+	memcpy(c->data, ptr, len);
+	c->state->len = len;
+	return 0;
 }
 
-char *get(Channel *c){
-	char* s = shmat((*c).shmid, NULL, 0);
-	int count = 0;
-	while(*s != '.'){
-		count++;
-		s++;
-	}
-	s = s-count;
-	count++;
-
-	
-	char* ret = (char*)malloc(count * sizeof (char*));
-
-	int i = 0;
-	//char* start_address = (*c).item;
-	
-	
-	printf("ABOUT TO GET: %s   :  %d\n",s,count); 
-	
-	ret = strdup(s);
-
-	//ptr = ptr-(count-1);
-	//ptr = ret;
+/* Copy the item out of the data segment. Called with r_lock held. */
+static int get(Channel *c, char **s, size_t *slen){
+	size_t len = c->state->len;
+	if(remap(c)){
+		return -1;
+	}
+	*s = malloc(len ? len : 1);
+	if(*s == NULL){
+		errno = ENOMEM;
+		return -1;
+	}
+	memcpy(*s, c->data, len);
+	*slen = len;
+	return 0;
+}
 
-	printf("Have got: %s\n",ret); 
-	return ret;
-	//(*c).item = start_address;
+int checkpoison(Channel *c){
+	return is_poisoned(c->state);
 }
 
 int is_selectable(Channel *c){
-	//checkpoison(c);
-	printf("%s\n"," c is_selectable called");
-	return (*c).is_selectable;
+	return c->is_selectable;
 }
 
-void _write(Channel *c, char *ptr, int len){
-	//checkpoison(c);
-	printf("%s\n", "+++ WRITE ON CHANNEL STARTED +++");
-	pthread_mutex_lock(&(*c).w_lock);
-	printf("%s\n", "+++ ACQUIRED w_lock +++");
-	(*c).has_selected = false;
-
-	// ########## DO PUT ###########
-	put(c,ptr, len);
-	printf("%s\n", "+++ STORED ITEM +++");
-	printf("+++ ABOUT TO POST TO : %d +++\n",(*c).available);
-	semPost((*c).available);
-	printf("%s\n", "+++ RELEASED AVAILABLE +++");
-	getStatus(c);
-	semWait((*c).taken);
-	printf("%s\n", "+++ ACQUIRED TAKEN +++");
-	pthread_mutex_unlock(&(*c).w_lock);
-	printf("%s\n", "+++ WRITE ON CHANNEL FINISHED+++");
+/* Write an item and wait until it has been read. Return 0, or -1 if
+ * the channel is poisoned, or -2 with errno set on failure. */
+int _write(Channel *c, char *ptr, size_t len, int wake_fd){
+	ChannelState *st = c->state;
+	if(is_poisoned(st)){
+		return -1;
+	}
+	pthread_mutex_lock(&st->w_lock);
+	if(put(c, ptr, len)){
+		pthread_mutex_unlock(&st->w_lock);
+		return -2;
+	}
+	sem_post(&st->available);
+	__atomic_thread_fence(__ATOMIC_SEQ_CST);
+	if(wake_fd >= 0 && __atomic_load_n(&st->alting, __ATOMIC_SEQ_CST) > 0){
+		/* The pipe is non-blocking: a full pipe is awake already. */
+		if(write(wake_fd, "", 1) < 0){
+			;
+		}
+	}
+	wait_for(&st->taken);
+	if(is_poisoned(st)){
+		sem_post(&st->taken); /* Wake the next waiting writer. */
+		pthread_mutex_unlock(&st->w_lock);
+		return -1;
+	}
+	pthread_mutex_unlock(&st->w_lock);
+	return 0;
 }
 
+/* Take the item claimed from the semaphore, and release the writer.
+ * Called with r_lock held. */
+static int take(Channel *c, char **s, size_t *slen){
+	ChannelState *st = c->state;
+	if(is_poisoned(st)){
+		sem_post(&st->available); /* Wake the next waiting reader. */
+		return -1;
+	}
+	if(get(c, s, slen)){
+		sem_post(&st->available); /* Leave the item for a retry. */
+		return -2;
+	}
+	sem_post(&st->taken);
+	return 0;
+}
 
+/* Read an item. Return 0, or -1 if the channel is poisoned, or -2
+ * with errno set on failure. */
+int _read(Channel *c, char **s, size_t *slen){
+	ChannelState *st = c->state;
+	int ret;
+	*s = NULL;
+	if(is_poisoned(st)){
+		return -1;
+	}
+	pthread_mutex_lock(&st->r_lock);
+	wait_for(&st->available);
+	ret = take(c, s, slen);
+	pthread_mutex_unlock(&st->r_lock);
+	disarm(c);
+	return ret;
+}
 
-char *_read(Channel *c){
-	//checkpoison(c);
-	printf("%s\n", "+++ READ ON CHANNEL STARTED +++");
-	pthread_mutex_lock(&(*c).r_lock);
-	printf("%s\n", "+++ ACQUIRED r_lock +++");
-	getStatus(c);
-	printf("%s\n", "+++ WAITING TO ACQUIRE AVAILABLE +++");
-	getStatus(c);
-	semWait((*c).available);
-	printf("%s\n", "+++ ACQUIRED AVAILABLE +++");
-	getStatus(c);
-	// ########## DO GET ##############
-	char *retval;
-	printf("BEFORE: %s\n",retval);
-	retval = get(c);
-	printf("AFTER: %s\n",retval);
-	printf("%s\n", "+++ RETRIEVED ITEM +++");
-	semPost((*c).taken);
-	getStatus(c);
-	printf("%s\n", "+++ RELEASED TAKEN +++");
-	pthread_mutex_unlock(&(*c).r_lock);	
-	printf("%s\n", "+++ READ ON CHANNEL FINISHED+++");
-	printf("WHAT READ RETURNED: %s\n",retval);
-	return retval;	
+/* Ask writers to wake the Alt of this process through the pipe, and
+ * return true if an item may already be available. */
+int arm(Channel *c){
+	ChannelState *st = c->state;
+	int value = 0;
+	if(!c->armed){
+		__atomic_add_fetch(&st->alting, 1, __ATOMIC_SEQ_CST);
+		c->armed = true;
+	}
+	__atomic_thread_fence(__ATOMIC_SEQ_CST);
+	sem_getvalue(&st->available, &value);
+	return value > 0 || c->is_selectable || is_poisoned(st);
 }
 
+/* Claim the item on the channel, if there is one, without waiting. */
 void enable(Channel *c){
-	
-	//checkpoison(c);
-	printf("%s\n", "++++ ABOUT TO CHECKED has_selected || is_selectabled +++++");
-	if((*c).has_selected || is_selectable(c)){
+	ChannelState *st = c->state;
+	if(c->is_selectable){
 		return;
-	} 
-	(*c).is_alting = true;
-	printf("%s\n", "++++ ABOUT TO GET r_lock+++++");
-	pthread_mutex_lock(&(*c).r_lock);
-	printf("%s\n", "++++ GOT  r_lock+++++");
-	
-	if(semTryWait((*c).available)){
-		(*c).is_selectable = true;
-	} else {
-		(*c).is_selectable = false;
-	}
-	printf("%s %d\n", "++++ is_selectable ++++", (*c).is_selectable);
-	pthread_mutex_unlock(&(*c).r_lock);
-	printf("%s\n", "+++++ RELEASED r_lock ++++++");
-	return;
-
+	}
+	/* A reader which holds the read lock is waiting for the next
+	 * item, which is then not ours to take. */
+	if(pthread_mutex_trylock(&st->r_lock)){
+		return;
+	}
+	c->is_selectable = sem_trywait(&st->available) == 0;
+	pthread_mutex_unlock(&st->r_lock);
 }
 
+/* Give back an item claimed by enable(). */
 void disable(Channel *c){
-	//checkpoison(c);
-	(*c).is_alting = false;
-	if((*c).is_selectable == true){
-		pthread_mutex_lock(&(*c).r_lock);
-		semPost((*c).available);
-		pthread_mutex_unlock(&(*c).r_lock);
-		(*c).is_selectable = false;
-	}
-	return;
-
+	if(c->is_selectable){
+		sem_post(&c->state->available);
+		c->is_selectable = false;
+	}
+	disarm(c);
 }
 
-char *_select(Channel *c){
-	//checkpoison(c);
-		
-	// ASSERT STATEMENT?
-
-	pthread_mutex_lock(&(*c).r_lock);
-		printf("%s\n", "GOT READ LOCK ON CHANNEL");
-		char *retval = get(c);
-		printf("%s\n", "GOT OBJECT");
-		semPost((*c).taken);
-		printf("%s\n", "RELEASE TAKEN");
-		(*c).is_selectable = false;
-		(*c).is_alting = false;
-		(*c).has_selected = true;
-	pthread_mutex_unlock(&(*c).r_lock);
-	return retval;
+/* Read the item claimed by enable(). Returns as _read(). */
+int _select(Channel *c, char **s, size_t *slen){
+	ChannelState *st = c->state;
+	int ret;
+	*s = NULL;
+	pthread_mutex_lock(&st->r_lock);
+	if(!c->is_selectable){
+		wait_for(&st->available);
+	}
+	c->is_selectable = false;
+	ret = take(c, s, slen);
+	pthread_mutex_unlock(&st->r_lock);
+	disarm(c);
+	return ret;
 }
 
 void poison(Channel *c){
-	sem_wait((*c).p_lock);
-		(*c).poisoned = true;
-		
-		sem_post((*c).available);
-		sem_post((*c).taken);
-	sem_post((*c).p_lock);
-	return;	
+	ChannelState *st = c->state;
+	if(__atomic_exchange_n(&st->poisoned, true, __ATOMIC_SEQ_CST)){
+		return;
+	}
+	/* Wake a waiting reader and writer, which wake the others. */
+	sem_post(&st->available);
+	sem_post(&st->taken);
 }
-
-
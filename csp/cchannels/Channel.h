@@ -1,39 +1,52 @@
+#include <pthread.h>
+#include <semaphore.h>
+#include <stddef.h>
+#include <sys/types.h>
 
-#include </usr/include/pthread.h>
- #include <stdio.h>
- #include <sys/types.h>
- #include <sys/ipc.h>
- #include <sys/sem.h>
- #include <stdlib.h>
-#include <sys/shm.h> 
-#include <string.h>
-#include <errno.h>
 #define false 0
 #define true (!false)
 
+/* Longest name of a shared memory segment, including the NUL. */
+#define CSP_NAME_MAX 128
+
+/* Smallest data segment. Segments grow to fit larger items. */
+#define SHMSZ 65536
+
+/* State of a channel shared by every process which uses it, kept in a
+ * POSIX shared memory segment of its own. */
 typedef struct{
-	pthread_mutex_t r_lock;
-	pthread_mutex_t w_lock;
-	key_t p_lock_key;
-	int p_lock;
-	key_t available_key;
-	int available;
-	key_t taken_key;
-	int taken;
-	unsigned int is_alting;
-	unsigned int is_selectable;
-	unsigned int has_selected;
-	unsigned int poisoned;
-	char* item;
-	key_t sh_mem_name;
-	//char *shm;
-	int shmid;
-	int len;
+	sem_t available;         /* Posted once an item is in the segment. */
+	sem_t taken;             /* Posted once the item has been read. */
+	pthread_mutex_t r_lock;  /* Protects from races between readers. */
+	pthread_mutex_t w_lock;  /* Protects from races between writers. */
+	int alting;              /* Number of processes waiting in an Alt. */
+	int poisoned;
+	unsigned int generation; /* Of the data segment, 0 before the first. */
+	size_t capacity;         /* Size of the data segment. */
+	size_t len;              /* Of the item in the data segment. */
+	pid_t owner;             /* Process which created the channel. */
+	char name[CSP_NAME_MAX]; /* Of this segment. */
+}ChannelState;
 
+/* A channel as seen by one process. */
+typedef struct{
+	ChannelState *state;
+	char *data;              /* This process's map of the data segment, */
+	unsigned int generation; /* and its generation, */
+	size_t capacity;         /* and size. */
+	int armed;               /* Counted in state->alting. */
+	int is_selectable;       /* An item has been claimed by enable(). */
 }Channel;
 
-union semun {
-    int val;
-    struct semid_ds *buf;
-    ushort *array;
-};
+extern Channel *getChannel(const char *name);
+extern Channel *openChannel(const char *name);
+extern void removeChannel(Channel *c);
+extern int checkpoison(Channel *c);
+extern int is_selectable(Channel *c);
+extern int _write(Channel *c, char *ptr, size_t len, int wake_fd);
+extern int _read(Channel *c, char **s, size_t *slen);
+extern int arm(Channel *c);
+extern void enable(Channel *c);
+extern void disable(Channel *c);
+extern int _select(Channel *c, char **s, size_t *slen);
+extern void poison(Channel *c);
@@ -1,39 +1,73 @@
 /* Channel.i */
  %module Channel
+
+ %begin %{
+/* Pass items as bytes, not str. */
+#define SWIG_PYTHON_STRICT_BYTE_CHAR
+ %}
+
  %{
-#include </usr/include/semaphore.h>
-#include <stdio.h>
 #include "Channel.h"
+ %}
 
- extern int sq(int i);
- extern void getStatus(Channel *c);
- extern Channel getChannel(long int p,long int av,long int tak,long int shm);
- extern void removeChannel(Channel *c);
- extern void checkpoison(Channel *c);
- extern void put(Channel *c, char *ptr, int len);
- extern void get(Channel *c, char *ptr);
- extern int is_selectable(Channel *c);
- extern void _write(Channel *c, char *ptr,int len);
- extern char *_read(Channel *c);
- extern void enable(Channel *c);
- extern void disable(Channel *c);
- extern char *_select(Channel *c);
- extern void poison(Channel *c);
+/* Items are passed in as bytes. */
+ %apply (char *STRING, size_t LENGTH) { (char *ptr, size_t len) };
 
- %}
+/* Items read are returned as bytes, or None if the channel is
+ * poisoned. */
+ %typemap(in, numinputs=0) (char **s, size_t *slen) (char *data = NULL, size_t size = 0) {
+	$1 = &data;
+	$2 = &size;
+ }
+ %typemap(argout) (char **s, size_t *slen) {
+	Py_DECREF($result);
+	if(result == 0){
+		$result = PyBytes_FromStringAndSize(*$1, *$2);
+	} else if(result == -1){
+		Py_INCREF(Py_None);
+		$result = Py_None;
+	} else {
+		$result = NULL;
+		PyErr_SetFromErrno(PyExc_OSError);
+	}
+	free(*$1);
+	if($result == NULL){
+		SWIG_fail;
+	}
+ }
 
+/* Failures set errno. */
+ %exception getChannel {
+	$action
+	if(result == NULL){
+		PyErr_SetFromErrno(PyExc_OSError);
+		SWIG_fail;
+	}
+ }
+ %exception openChannel {
+	$action
+	if(result == NULL){
+		PyErr_SetFromErrno(PyExc_OSError);
+		SWIG_fail;
+	}
+ }
+ %exception _write {
+	$action
+	if(result == -2){
+		PyErr_SetFromErrno(PyExc_OSError);
+		SWIG_fail;
+	}
+ }
 
- extern int sq(int i);
- extern void getStatus(Channel *c);
- extern Channel getChannel(long int p,long int av,long int tak,long int shm);
+ extern Channel *getChannel(const char *name);
+ extern Channel *openChannel(const char *name);
  extern void removeChannel(Channel *c);
- extern void checkpoison(Channel *c);
- extern void put(Channel *c, char *ptr, int len);
- extern void get(Channel *c, char *ptr);
+ extern int checkpoison(Channel *c);
  extern int is_selectable(Channel *c);
- extern void _write(Channel *c, char *ptr,int len);
- extern char *_read(Channel *c);
+ extern int _write(Channel *c, char *ptr, size_t len, int wake_fd);
+ extern int _read(Channel *c, char **s, size_t *slen);
+ extern int arm(Channel *c);
  extern void enable(Channel *c);
  extern void disable(Channel *c);
- extern char *_select(Channel *c);
+ extern int _select(Channel *c, char **s, size_t *slen);
  extern void poison(Channel *c);
@@ -1,126 +1,87 @@
-# This file was automatically generated by SWIG (http://www.swig.org).
-# Version 1.3.40
+# This file was automatically generated by SWIG (https://www.swig.org).
+# Version 4.5.1
 #
-# Do not make changes to this file unless you know what you are doing--modify
+# Do not make changes to this file unless you know what you are doing - modify
 # the SWIG interface file instead.
-# This file is compatible with both classic and new-style classes.
-
-from sys import version_info
-if version_info >= (2,6,0):
-    def swig_import_helper():
-        from os.path import dirname
-        import imp
-        fp = None
-        try:
-            fp, pathname, description = imp.find_module('_Channel', [dirname(__file__)])
-        except ImportError:
-            import _Channel
-            return _Channel
-        if fp is not None:
-            try:
-                _mod = imp.load_module('_Channel', fp, pathname, description)
-            finally:
-                fp.close()
-            return _mod
-    _Channel = swig_import_helper()
-    del swig_import_helper
+
+import typing
+# Import the low-level C/C++ module
+if getattr(globals().get("__spec__"), "parent", None) or __package__ or "." in __name__:
+    from . import _Channel
 else:
     import _Channel
-del version_info
-try:
-    _swig_property = property
-except NameError:
-    pass # Python < 2.2 doesn't have 'property'.
-def _swig_setattr_nondynamic(self,class_type,name,value,static=1):
-    if (name == "thisown"): return self.this.own(value)
-    if (name == "this"):
-        if type(value).__name__ == 'SwigPyObject':
-            self.__dict__[name] = value
-            return
-    method = class_type.__swig_setmethods__.get(name,None)
-    if method: return method(self,value)
-    if (not static) or hasattr(self,name):
-        self.__dict__[name] = value
-    else:
-        raise AttributeError("You cannot add attributes to {0}".format(self))
-
-def _swig_setattr(self,class_type,name,value):
-    return _swig_setattr_nondynamic(self,class_type,name,value,0)
-
-def _swig_getattr(self,class_type,name):
-    if (name == "thisown"): return self.this.own()
-    method = class_type.__swig_getmethods__.get(name,None)
-    if method: return method(self)
-    raise AttributeError(name)
+
+import builtins as __builtin__
 
 def _swig_repr(self):
-    try: strthis = "proxy of " + self.this.__repr__()
-    except: strthis = ""
-    return "<{0}.{1}; {2} >".format(self.__class__.__module__, self.__class__.__name__, strthis)
+    try:
+        strthis = "proxy of " + self.this.__repr__()
+    except __builtin__.Exception:
+        strthis = ""
+    return "<%s.%s; %s >" % (self.__class__.__module__, self.__class__.__name__, strthis,)
+
+
+def _swig_setattr_nondynamic_instance_variable(set):
+    def set_instance_attr(self, name, value):
+        if name == "this":
+            set(self, name, value)
+        elif name == "thisown":
+            self.this.own(value)
+        elif hasattr(self, name) and isinstance(getattr(type(self), name), property):
+            set(self, name, value)
+        else:
+            raise AttributeError("You cannot add instance attributes to %s" % self)
+    return set_instance_attr
 
-try:
-    _object = object
-    _newclass = 1
-except AttributeError:
-    class _object : pass
-    _newclass = 0
 
+def _swig_setattr_nondynamic_class_variable(set):
+    def set_class_attr(cls, name, value):
+        if hasattr(cls, name) and not isinstance(getattr(cls, name), property):
+            set(cls, name, value)
+        else:
+            raise AttributeError("You cannot add class attributes to %s" % cls)
+    return set_class_attr
 
 
-def sq(*args):
-  return _Channel.sq(*args)
-sq = _Channel.sq
+class _SwigNonDynamicMeta(type):
+    """Meta class to enforce nondynamic attributes (no new attributes) for a class"""
+    __setattr__ = _swig_setattr_nondynamic_class_variable(type.__setattr__)
 
-def getStatus(*args):
-  return _Channel.getStatus(*args)
-getStatus = _Channel.getStatus
 
-def getChannel(*args):
-  return _Channel.getChannel(*args)
-getChannel = _Channel.getChannel
 
-def removeChannel(*args):
-  return _Channel.removeChannel(*args)
-removeChannel = _Channel.removeChannel
+def getChannel(name):
+    return _Channel.getChannel(name)
 
-def checkpoison(*args):
-  return _Channel.checkpoison(*args)
-checkpoison = _Channel.checkpoison
+def openChannel(name):
+    return _Channel.openChannel(name)
 
-def put(*args):
-  return _Channel.put(*args)
-put = _Channel.put
+def removeChannel(c):
+    return _Channel.removeChannel(c)
 
-def get(*args):
-  return _Channel.get(*args)
-get = _Channel.get
+def checkpoison(c):
+    return _Channel.checkpoison(c)
 
-def is_selectable(*args):
-  return _Channel.is_selectable(*args)
-is_selectable = _Channel.is_selectable
+def is_selectable(c):
+    return _Channel.is_selectable(c)
 
-def _write(*args):
-  return _Channel._write(*args)
-_write = _Channel._write
+def _write(c, ptr, wake_fd):
+    return _Channel._write(c, ptr, wake_fd)
 
-def _read(*args):
-  return _Channel._read(*args)
-_read = _Channel._read
+def _read(c):
+    return _Channel._read(c)
 
-def enable(*args):
-  return _Channel.enable(*args)
-enable = _Channel.enable
+def arm(c):
+    return _Channel.arm(c)
 
-def disable(*args):
-  return _Channel.disable(*args)
-disable = _Channel.disable
+def enable(c):
+    return _Channel.enable(c)
 
-def _select(*args):
-  return _Channel._select(*args)
-_select = _Channel._select
+def disable(c):
+    return _Channel.disable(c)
 
-def poison(*args):
-  return _Channel.poison(*args)
-poison = _Channel.poison
+def _select(c):
+    return _Channel._select(c)
 
+def poison(c):
+    return _Channel.poison(c)
 
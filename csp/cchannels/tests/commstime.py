@@ -16,10 +16,7 @@ Systems Engineering Series (ISSN 1383-7575).
 from csp.csp import Par, process #, Channel
 from csp.builtins import Prefix, Delta2, Succ
 
-import sys
-sys.path.append('../')
-from CChannel import CChannel as Channel
-del sys
+from csp.cchannels.CChannel import CChannel as Channel
 
 import time
 
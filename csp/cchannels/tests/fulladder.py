@@ -30,10 +30,7 @@ __date__ = 'December 2008'
 
 from csp.csp import Par, process
 
-import sys
-sys.path.append('../')
-from CChannel import CChannel as Channel
-del sys
+from csp.cchannels.CChannel import CChannel as Channel
 
 from csp.builtins import *
 
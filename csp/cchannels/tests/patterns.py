@@ -26,7 +26,7 @@ __date__ = 'May 2010'
 
 from csp.csp import Par
 
-from CChannel import CChannel as Channel
+from csp.cchannels.CChannel import CChannel as Channel
 
 __all__ = ['TokenRing']
 
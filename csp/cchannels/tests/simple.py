@@ -1,9 +1,6 @@
 from csp.csp import Par, process
 
-import sys
-sys.path.append('../')
-from CChannel import CChannel as Channel
-del sys
+from csp.cchannels.CChannel import CChannel as Channel
 
 
 @process
@@ -38,10 +38,7 @@ __date__ = 'November 2009'
 from csp.csp import process, Par
 from patterns import TokenRing
 
-import sys
-sys.path.append('../')
-from CChannel import CChannel as Channel
-del sys
+from csp.cchannels.CChannel import CChannel as Channel
 
 import time
 
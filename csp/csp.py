@@ -10,6 +10,19 @@ version of the libraries explicitly then set an environment variable
 in your opertaing system called "CSP". This should be either set to
 "PROCESSES" or "THREADS" depending on what you want to use.
 
+Setting "CSP" to "COOPERATIVE" runs every process as a coroutine on a
+single thread (see csp.os_cooperative). Processes must then be
+generators which block with "yield from", but communication is much
+cheaper and a program can run hundreds of thousands of processes.
+Setting it to "ASYNCIO" runs every process as a task on an asyncio
+event loop (see csp.os_asyncio), where channel operations are
+awaited. Setting it to "HYBRID" runs cooperative processes on every
+core, in one worker process per core (see csp.os_hybrid).
+
+Setting "CSP_CCHANNELS" to any value uses the channels implemented in
+C by csp.cchannels as Channel, for the multiprocess version. They
+must have been built first (run make in csp/cchannels).
+
 
 Copyright (C) Sarah Mount, 2010.
 
@@ -39,6 +52,7 @@ import sys
 ### Names exported by this module
 __all__ = ['set_debug', 'CSPProcess', 'CSPServer', 'Alt',
            'Par', 'Seq', 'Guard', 'Channel', 'FileChannel',
+           'BufferedChannel', 'ChannelFactory',
            'process', 'forever', 'Skip', 'CSP_IMPLEMENTATION']
 
 
@@ -62,6 +76,12 @@ if (major, minor) < (2, 6):
 elif 'CSP' in os.environ:
     if os.environ['CSP'].upper() == 'THREADS':
         from .os_thread import *
+    elif os.environ['CSP'].upper() == 'COOPERATIVE':
+        from .os_cooperative import *
+    elif os.environ['CSP'].upper() == 'ASYNCIO':
+        from .os_asyncio import *
+    elif os.environ['CSP'].upper() == 'HYBRID':
+        from .os_hybrid import *
     else:
         from .os_process import *
 
@@ -74,6 +94,11 @@ else:
     except:
         from .os_thread import *
 
+# Only use the channels implemented in C by csp.cchannels if asked
+# to, so that the features of Channel do not depend on what has been
+# built.
+if os.environ.get('CSP_CCHANNELS') and CSP_IMPLEMENTATION == 'os_process':
+    from .cchannels.CChannel import CChannel as Channel
 
 
 class CSP(object):
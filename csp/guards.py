@@ -27,6 +27,7 @@ import threading
 import time
 
 from .csp import *
+from .timers import get_timer_service, now
 
 
 __author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
@@ -54,20 +55,35 @@ class Timer(Guard):
 >>> timer.set_alarm(3) # become selectable 3 seconds from now
 >>> alt.select() # will wait 3 seconds
 >>> 
+
+    Times are read from a monotonic clock (see L{csp.timers.now}),
+    so they are only meaningful within one program. Alarms are kept
+    by the L{csp.timers.TimerService} of the process, and an L{Alt}
+    over timers blocks until the earliest alarm is due rather than
+    polling each timer.
     """
 
+    # Alarms are kept by the timer service, see Alt.
+    _timed = True
+
     def __init__(self):
         super(Timer, self).__init__()
-        self.now = time.time()
+        self.now = now()
         self.name = 'Timer guard created at:' + str(self.now)
         self.alarm = None
+        get_timer_service().schedule(self, None)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        get_timer_service().schedule(self, self.alarm)
 
     def set_alarm(self, timeout):
-        self.now = time.time()
+        self.now = now()
         self.alarm = self.now + timeout
-    
+        get_timer_service().schedule(self, self.alarm)
+
     def is_selectable(self):
-        self.now = time.time()
+        self.now = now()
         if self.alarm is None:
             return True
         elif self.now < self.alarm:
@@ -77,13 +93,21 @@ class Timer(Guard):
     def read(self):
         """Return current time.
         """
-        self.now = time.time()
+        self.now = now()
         return self.now
 
     def sleep(self, timeout):
         """Put this process to sleep for a number of seconds.
         """
         time.sleep(timeout)
+
+    def sleep_until(self, deadline):
+        """Put this process to sleep until the time C{deadline}, as
+        returned by L{read}. Returns straight away if it has passed.
+        """
+        delay = deadline - now()
+        if delay > 0:
+            time.sleep(delay)
     
     def enable(self):
         pass
@@ -95,72 +119,427 @@ class Timer(Guard):
         pass
 
     
+### Barriers
+
+_BARRIER_CAPACITY = 1024
+"""Default largest number of participants a Barrier can have."""
+
+_BARRIER_FANIN = 4
+"""Participants or subtrees which arrive at each node of a Barrier."""
+
+_BARRIER_SPIN = 0.0002
+"""Seconds a process waiting on a Barrier spins before it blocks."""
+
+_BARRIER_STATS = 64
+"""Number of recent phases whose timings a Barrier keeps."""
+
+# Words of the shared state of a Barrier. _SLEEPERS and _TO_WAKE
+# are each followed by a second word, one for each sense.
+(_SENSE, _PHASES, _PARTICIPANTS, _SLEEPERS, _TO_WAKE, _FREE_TOP,
+ _QUEUE_HEAD, _QUEUE_TAIL, _PENDING) = (0, 1, 2, 3, 5, 7, 8, 9, 10)
+_STATE_WORDS = 11
+
+# States of a participant's slot in a Barrier.
+_FREE, _ACTIVE, _LEAVING = range(3)
+
+
 class AbstractBarrier(object):
+    """Barrier on which a changing set of participants synchronise
+    in lock step.
+
+    Each call to L{synchronise} blocks until every participant has
+    called it, which completes one phase of the barrier:
+
+>>> barrier = Barrier(2)
+>>> @process
+... def step(barrier):
+...     for i in range(10):
+...         # ... compute ...
+...         barrier.synchronise()
+...
+>>> Par(step(barrier), step(barrier)).start()
+>>>
+
+    Participants can join with L{enrol} and leave with L{retire}
+    while other participants are synchronising. The current phase
+    waits for a participant which enrols part way through it, unless
+    it is already being released. A participant which retires counts
+    as having arrived in the current phase, and is not waited for
+    after that.
+
+    Each participant is given a slot when it first uses the barrier.
+    Slots are the leaves of a combining tree of C{fanin}-way nodes,
+    each with a lock and a count of arrivals. Only the last
+    participant to arrive at a node goes on to its parent, so at most
+    C{fanin} participants contend for any one lock, and the last to
+    arrive at the root releases the phase after O(log n) steps. The
+    phase is released by flipping a sense word, which waiting
+    participants first spin on for C{spin} seconds. Those which
+    block instead are woken in a tree, each waking up to C{fanin}
+    others. L{statistics} returns the timing of recent phases.
+
+    Subclasses provide the shared arrays, locks and semaphores.
+    """
 
-    def __init__(self, participants=0):
-        self.participants = participants
-        self.not_ready = participants
-        self.lock = None # MUST be overridden in subclass
+    spin = 0.0
+    """Seconds a participant spins before it blocks."""
+
+    def __init__(self, participants=0, capacity=_BARRIER_CAPACITY,
+                 fanin=_BARRIER_FANIN):
+        assert fanin > 1
+        self.capacity = capacity
+        self.fanin = fanin
+        # The combining tree, level by level from the leaves. The
+        # leaf of slot s is node s // fanin and the root is last.
+        parents, width, start = [], max(1, -(-capacity // fanin)), 0
+        while width > 1:
+            above = -(-width // fanin)
+            parents.extend(start + width + i // fanin for i in range(width))
+            start, width = start + width, above
+        parents.append(-1)
+        self._parents = tuple(parents)
+        self._expected = self._array('q', len(parents))
+        self._count = self._array('q', len(parents))
+        self._done = self._array('q', len(parents)) # Last phase completed.
+        self._locks = [self._lock() for node in parents]
+        self._state = self._array('q', _STATE_WORDS)
+        self._slots = self._array('q', capacity)
+        self._free = self._array('q', capacity)    # Stack of free slots.
+        self._queue = self._array('q', capacity)   # Slots not yet claimed.
+        self._pending = self._array('q', capacity) # Slots leaving.
+        self._entry = self._array('q', capacity)   # Node to arrive at.
+        # Time of the last release, then (period, latency) by phase.
+        self._times = self._array('d', 1 + 2 * _BARRIER_STATS)
+        self._members = self._condition() # Protects membership.
+        self._wake = self._lock()         # Protects sleepers.
+        self._gates = [self._semaphore(), self._semaphore()] # By sense.
+        self._claimed = {} # Slots of participants in this process.
         self.reset(participants)
 
+    def _array(self, typecode, size):
+        """Return a new shared array of C{size} zeros.
+        """
+        raise NotImplementedError('Must be implemented in subclass')
+
+    def _lock(self):
+        raise NotImplementedError('Must be implemented in subclass')
+
+    def _semaphore(self):
+        raise NotImplementedError('Must be implemented in subclass')
+
+    def _condition(self):
+        raise NotImplementedError('Must be implemented in subclass')
+
+    @property
+    def participants(self):
+        """Number of participants enrolled on this barrier."""
+        return self._state[_PARTICIPANTS]
+
     def reset(self, participants):
-        assert participants >= 0
-        with self.lock:
-            self.participants = participants
-            self.not_ready = participants
+        """Forget every participant and enrol C{participants} new
+        ones. No participant may be waiting on the barrier.
+        """
+        assert 0 <= participants <= self.capacity
+        with self._members:
+            for node in range(len(self._parents)):
+                self._expected[node] = self._count[node] = 0
+                self._done[node] = 0
+            for word in range(_STATE_WORDS):
+                self._state[word] = 0
+            for slot in range(self.capacity):
+                self._slots[slot] = _FREE
+                self._free[slot] = self.capacity - 1 - slot
+            self._state[_FREE_TOP] = self.capacity
+            self._times[0] = now()
+            self._claimed.clear()
+            for i in range(participants):
+                self._activate(self._new_slot())
+            self._state[_PARTICIPANTS] = participants
+            self._members.notify_all()
+
+    def _new_slot(self):
+        """Take a free slot and queue it to be claimed by the next
+        participant which uses the barrier.
+        """
+        state = self._state
+        if state[_FREE_TOP] == 0:
+            raise ValueError('Barrier has {0} participants '
+                             'already.'.format(self.capacity))
+        state[_FREE_TOP] -= 1
+        slot = self._free[state[_FREE_TOP]]
+        self._slots[slot] = _ACTIVE
+        self._entry[slot] = slot // self.fanin
+        self._queue[state[_QUEUE_TAIL] % self.capacity] = slot
+        state[_QUEUE_TAIL] += 1
+        return slot
+
+    def _claim(self):
+        """Return the slot of the calling participant, claiming one
+        the first time it uses the barrier.
+        """
+        key = (os.getpid(), threading.current_thread().ident)
+        slot = self._claimed.get(key)
+        if slot is None:
+            state = self._state
+            with self._members:
+                assert state[_QUEUE_HEAD] < state[_QUEUE_TAIL], \
+                    'More participants than have enrolled.'
+                slot = self._queue[state[_QUEUE_HEAD] % self.capacity]
+                state[_QUEUE_HEAD] += 1
+            self._claimed[key] = slot
+        return slot
+
+    def _adjust(self, slot, delta):
+        """Add C{delta} to the arrivals expected at the leaf of
+        C{slot}, and at each node above which gains its first, or
+        loses its last, expected arrival. The tree must be idle.
+        """
+        node = slot // self.fanin
+        while node >= 0:
+            self._expected[node] += delta
+            self._count[node] += delta
+            if self._expected[node] != (delta > 0):
+                break
+            node = self._parents[node]
+
+    def _activate(self, slot):
+        self._adjust(slot, 1)
+
+    def _apply_pending(self):
+        """Free the slots which have left during the phase which has
+        just finished. Called with the membership lock held.
+        """
+        state = self._state
+        for i in range(state[_PENDING]):
+            slot = self._pending[i]
+            self._slots[slot] = _FREE
+            self._adjust(slot, -1)
+            self._free[state[_FREE_TOP]] = slot
+            state[_FREE_TOP] += 1
+        state[_PENDING] = 0
 
     def enrol(self):
-        with self.lock:
-            self.participants += 1
-            self.not_ready += 1
+        """Add a participant to this barrier. The first participant
+        which is not yet using the barrier to call L{synchronise}
+        takes its place.
+
+        The new slot is counted at its leaf for the phases to come.
+        If its leaf has already completed the current phase, or only
+        becomes active now, the participant's arrival in this phase
+        is counted at the lowest node above which has not, and its
+        entry is set to that node. If even the root has completed,
+        the phase is being released, and the participant's entry is
+        minus the number of that phase, which it waits for instead.
+        """
+        state = self._state
+        with self._members:
+            # A phase cannot be released while this lock is held.
+            phase = state[_PHASES] + 1
+            slot = self._new_slot()
+            state[_PARTICIPANTS] += 1
+            node, added, activated = slot // self.fanin, True, []
+            entry = -phase
+            while node >= 0:
+                with self._locks[node]:
+                    active = self._expected[node] > 0
+                    if added:
+                        self._expected[node] += 1
+                    if active and self._done[node] != phase:
+                        self._count[node] += 1
+                        entry = node
+                        break
+                    if added:
+                        self._count[node] += 1 # For the next phase.
+                    if not active:
+                        activated.append(node)
+                    added = not active
+                node = self._parents[node]
+            else:
+                if added:
+                    # The barrier was empty, so no phase had started.
+                    entry, activated = slot // self.fanin, []
+            # Nodes which have just become active only count arrivals
+            # for the next phase, so enrolment treats them as done.
+            for node in activated:
+                self._done[node] = phase
+            self._entry[slot] = entry
+            self._members.notify_all()
 
     def retire(self):
-        with self.lock:
-            self.participants -= 1
-            self.not_ready -= 1
-            if self.not_ready == 0:
-                self.not_ready = self.participants
-                self.lock.notifyAll()
-            assert self.not_ready >= 0
+        """Remove the calling participant from this barrier.
+        """
+        start = now()
+        slot = self._claim()
+        del self._claimed[(os.getpid(), threading.current_thread().ident)]
+        state = self._state
+        with self._members:
+            state[_PARTICIPANTS] -= 1
+            self._slots[slot] = _LEAVING
+            self._pending[state[_PENDING]] = slot
+            state[_PENDING] += 1
+            self._members.notify_all()
+            if self._entry[slot] == -1 - state[_PHASES]:
+                # Enrolled as the phase was released, and freed at the
+                # end of it, so no phase waits for this participant.
+                return
+            if self._entry[slot] < 0:
+                self._entry[slot] = slot // self.fanin
+        if self._arrive(slot):
+            self._release(start)
 
     def synchronise(self):
-        with self.lock:
-            self.not_ready -= 1
-            if self.not_ready > 0:
-                self.lock.wait()
-            else:
-                self.not_ready = self.participants
-                self.lock.notifyAll()
+        """Block until every participant has called this method.
+        """
+        start = now()
+        slot = self._claim()
+        state = self._state
+        if self._entry[slot] < 0:
+            # Enrolled as a phase was released, so wait for it. The
+            # sense of phase p is (p - 1) % 2 until it is released.
+            self._wait((-1 - self._entry[slot]) % 2)
+            self._entry[slot] = slot // self.fanin
+        sense = state[_SENSE]
+        if self._arrive(slot):
+            self._release(start)
+        else:
+            self._wait(sense)
 
     def synchronise_withN(self, n):
-        """Only syncrhonise when N participants are enrolled.
-        """
-        with self.lock:
-            if self.participants != n:
-                self.lock.wait()
-            self.not_ready -= 1
-            if self.not_ready > 0:
-                self.lock.wait()
-            else:
-                self.not_ready = self.participants
-                self.lock.notifyAll()
+        """Only synchronise when N participants are enrolled.
+        """
+        with self._members:
+            self._members.wait_for(lambda: self._state[_PARTICIPANTS] == n)
+        self.synchronise()
+
+    def _arrive(self, slot):
+        """Count an arrival at the entry node of C{slot}, normally its
+        leaf, and at each node above for which it is the last arrival.
+        Return C{True} if it is the last arrival of the phase.
+        """
+        phase = self._state[_PHASES] + 1
+        node = self._entry[slot]
+        self._entry[slot] = slot // self.fanin
+        while True:
+            with self._locks[node]:
+                self._count[node] -= 1
+                if self._count[node] > 0:
+                    return False
+                self._count[node] = self._expected[node]
+                self._done[node] = phase
+            node = self._parents[node]
+            if node < 0:
+                return True
+
+    def _release(self, start):
+        """Finish the current phase, which the caller was the last to
+        arrive at after calling the barrier at time C{start}: free
+        the slots which have left, flip the sense of the barrier and
+        wake the participants which are blocked on it.
+        """
+        state, times = self._state, self._times
+        # Enrolment waits until the sense has flipped.
+        with self._members:
+            if state[_PENDING]:
+                self._apply_pending()
+            with self._wake:
+                sense = state[_SENSE]
+                sleepers = state[_SLEEPERS + sense]
+                first = min(self.fanin, sleepers)
+                state[_SLEEPERS + sense] = 0
+                state[_TO_WAKE + sense] = sleepers - first
+                state[_PHASES] += 1
+                released = now()
+                row = 1 + 2 * (state[_PHASES] % _BARRIER_STATS)
+                times[row], times[row + 1] = (released - times[0],
+                                              released - start)
+                times[0] = released
+                state[_SENSE] = 1 - sense
+        for i in range(first):
+            self._gates[sense].release()
+
+    def _wait(self, sense):
+        """Block until the phase whose sense is C{sense} is released.
+        """
+        state = self._state
+        if self.spin:
+            end = now() + self.spin
+            while now() < end:
+                if state[_SENSE] != sense:
+                    return
+        with self._wake:
+            if state[_SENSE] != sense:
+                return
+            state[_SLEEPERS + sense] += 1
+        gate = self._gates[sense]
+        gate.acquire()
+        # Wake the next few sleepers, so wake-ups take O(log n) steps.
+        with self._wake:
+            more = min(self.fanin, state[_TO_WAKE + sense])
+            state[_TO_WAKE + sense] -= more
+        for i in range(more):
+            gate.release()
+
+    def statistics(self):
+        """Return a list of (phase, period, latency) tuples for
+        recent phases, oldest first. The period of a phase is the
+        number of seconds since the previous phase was released, and
+        its latency is the number of seconds the last participant to
+        arrive spent in the barrier.
+        """
+        with self._wake:
+            phases = self._state[_PHASES]
+            rows = []
+            for phase in range(max(1, phases - _BARRIER_STATS + 1), phases + 1):
+                row = 1 + 2 * (phase % _BARRIER_STATS)
+                rows.append((phase, self._times[row], self._times[row + 1]))
+        return rows
+
+
+# Timers on an event loop must read its clock and wake Alts through it.
+if CSP_IMPLEMENTATION == 'os_asyncio':
+    from .os_asyncio import Timer
 
 
 # TODO: Move these two classes to the modules corresponding to
 # their CSP process implementation (i. e. os_process/os_thread).
 
 class BarrierThreading(AbstractBarrier):
+    """L{AbstractBarrier} for participants which are threads.
+    Waiting threads block straight away, as spinning would hold the
+    interpreter lock.
+    """
 
-    def __init__(self):
-        super(BarrierThreading, self).__init__()
-        self.lock = threading.Condition()
+    def _array(self, typecode, size):
+        return [0.0 if typecode == 'd' else 0] * size
+
+    def _lock(self):
+        return threading.Lock()
+
+    def _semaphore(self):
+        return threading.Semaphore(0)
+
+    def _condition(self):
+        return threading.Condition()
 
 
 class BarrierProcessing(AbstractBarrier):
+    """L{AbstractBarrier} for participants which are OS processes.
+    The state of the barrier is kept in shared memory.
+    """
 
-    def __init__(self):
-        super(BarrierProcessing, self).__init__()
-        self.lock = multiprocessing.Condition()
+    spin = _BARRIER_SPIN
+
+    def _array(self, typecode, size):
+        return multiprocessing.RawArray(typecode, size)
+
+    def _lock(self):
+        return multiprocessing.Lock()
+
+    def _semaphore(self):
+        return multiprocessing.Semaphore(0)
+
+    def _condition(self):
+        return multiprocessing.Condition()
 
 
 # Use os processes unless requested otherwise.
@@ -0,0 +1,442 @@
+#!/usr/bin/env python
+
+"""Many channels between two OS processes, over one socket.
+
+Each L{Channel} of csp.os_process holds an OS pipe, so a program can
+only create as many channels as it may open files. A L{ChannelLink}
+carries any number of channels between two OS processes over a
+single socketpair instead:
+
+>>> link = ChannelLink()
+>>> cells = [link.channel() for i in range(10000)]
+>>> producer(cells) // (consumer(cells),)
+>>>
+
+Every frame on the socket is tagged with the name of the channel it
+belongs to, and is dispatched to the rendezvous state of that channel
+in the receiving process. An item written in one process is read in
+the other. The first two OS processes to use a link each take one
+end of it, and no other process may use it.
+
+Copyright (C) python-csp developers, 2026.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have rceeived a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from __future__ import absolute_import
+
+import collections
+import logging
+import os
+import select
+import socket
+import struct
+import threading
+
+import multiprocessing as processing
+import multiprocessing.reduction
+
+from . import os_process as _os_process
+from .os_process import Channel, ChannelPoison, _new_channel_id, _spawning
+from .serializers import get_default_serializer
+
+
+__author__ = 'python-csp developers'
+__date__ = 'October 2026'
+
+
+### Names exported by this module
+__all__ = ['ChannelLink', 'LinkChannel']
+
+
+### CONSTANTS
+
+_LINK_FRAME = struct.Struct('qBq')
+"""Frame header on a link: channel name, kind of frame and length."""
+
+# Kinds of frame. An _ITEM frame is followed by an item of the given
+# length. A _TAKEN frame tells the writer its item has been read, and
+# a _POISON frame poisons the channel in the other process.
+_ITEM, _TAKEN, _POISON = range(3)
+
+_debug = logging.debug
+
+
+class _LinkState(object):
+    """Rendezvous state of one channel of a link, in one process.
+    """
+
+    def __init__(self):
+        self.items = collections.deque() # Items sent by the other process.
+        self.taken = 0                   # Our items it has read.
+        self.poisoned = False
+
+
+class ChannelLink(object):
+    """Socketpair between two OS processes which carries the channels
+    made by L{channel}.
+
+    The link must be created before the two processes are started,
+    so that both inherit it. Channels may be made at any time, in any
+    process, as their names are unique within the program.
+
+    In each process, threads take turns to read frames from the
+    socket, and dispatch them to the channels they belong to. A
+    writer which finds the socket full reads frames from it while it
+    waits, so two processes writing large items to each other do not
+    deadlock.
+    """
+
+    def __init__(self, serializer=None):
+        self._socks = socket.socketpair()
+        self._serializer = serializer or get_default_serializer()
+        # OS process which has taken each end of the link.
+        self._claims = processing.RawArray('q', 2)
+        self._claim_lock = _os_process._context.Lock()
+        self._forget()
+
+    def _forget(self):
+        """Forget the state of the link in another process.
+        """
+        self._pid = os.getpid()  # Process which owns the fields below.
+        self._sock = None        # End of the socketpair used here.
+        self._states = {}        # _LinkState of each channel, by name.
+        self._cond = threading.Condition() # Protects _states, _reading.
+        self._reading = False    # True while a thread reads a frame.
+        self._send_lock = threading.Lock()
+        self._header = bytearray(_LINK_FRAME.size)
+        self._frame = None       # (name, kind, payload) being received.
+        self._filled = 0         # Bytes received of _header or payload.
+        self._poll_in = None     # Waits for frames to arrive.
+        self._poll_out = None    # Waits for room to send, or frames.
+
+    def __getstate__(self):
+        state = dict((key, self.__dict__[key]) for key in
+                     ('_serializer', '_claims', '_claim_lock'))
+        if _spawning():
+            state['_socks'] = [processing.reduction.DupFd(sock.fileno())
+                               for sock in self._socks]
+        else:
+            state['_socks'] = self._socks
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if not isinstance(self._socks[0], socket.socket):
+            self._socks = tuple(socket.socket(fileno=fd.detach())
+                                for fd in self._socks)
+        self._forget()
+
+    def channel(self):
+        """Return a new channel carried by this link.
+        """
+        return LinkChannel(self)
+
+    def _end(self):
+        """Return the end of the socketpair used by this process,
+        taking one if this process has not used the link before.
+        """
+        if self._pid != os.getpid():
+            self._forget()
+        if self._sock is None:
+            pid = os.getpid()
+            with self._claim_lock:
+                for end in (0, 1):
+                    if self._claims[end] in (0, pid):
+                        self._claims[end] = pid
+                        break
+                else:
+                    raise ValueError('ChannelLink is already used by OS '
+                                     'processes {0} and {1}.'.format(
+                                         self._claims[0], self._claims[1]))
+            self._sock = self._socks[end]
+            self._poll_in = select.poll()
+            self._poll_in.register(self._sock, select.POLLIN)
+            self._poll_out = select.poll()
+            self._poll_out.register(self._sock, select.POLLIN | select.POLLOUT)
+        return self._sock
+
+    def _state(self, name):
+        """Return the L{_LinkState} of the channel C{name} in this
+        process. Called with C{_cond} held.
+        """
+        state = self._states.get(name)
+        if state is None:
+            state = self._states[name] = _LinkState()
+        return state
+
+    def _receive(self):
+        """Read whatever has arrived on the socket without blocking,
+        and dispatch every frame which is complete. Return C{True}
+        if any frame was dispatched. Called with C{_cond} held.
+
+        A frame which has only partly arrived is kept until the rest
+        arrives, so a process never blocks part way through a frame
+        while the other process waits for it to read.
+        """
+        dispatched = False
+        while True:
+            if self._frame is None:
+                buff, count = self._header, self._filled
+            else:
+                buff, count = self._frame[2], self._filled
+            try:
+                nbytes = self._sock.recv_into(memoryview(buff)[count:], 0,
+                                              socket.MSG_DONTWAIT)
+            except (BlockingIOError, InterruptedError):
+                return dispatched
+            if not nbytes:
+                raise ConnectionResetError('ChannelLink closed by peer.')
+            self._filled = count = count + nbytes
+            if count < len(buff):
+                continue
+            self._filled = 0
+            if self._frame is None:
+                name, kind, length = _LINK_FRAME.unpack(self._header)
+                if kind == _ITEM and length:
+                    self._frame = (name, kind, bytearray(length))
+                    continue
+                self._dispatch(name, kind, bytearray())
+            else:
+                frame, self._frame = self._frame, None
+                self._dispatch(*frame)
+            dispatched = True
+
+    def _dispatch(self, name, kind, payload):
+        state = self._state(name)
+        if kind == _ITEM:
+            state.items.append(payload)
+        elif kind == _TAKEN:
+            state.taken += 1
+        else:
+            state.poisoned = True
+
+    def _pump(self, block):
+        """Dispatch the frames which have arrived. If C{block} is true
+        wait until one does, or until the thread which is already
+        reading has read one. Called with C{_cond} held.
+        """
+        if self._reading:
+            if block:
+                self._cond.wait()
+            return
+        self._reading = True
+        try:
+            while not self._receive() and block:
+                self._cond.release()
+                try:
+                    self._poll_in.poll()
+                finally:
+                    self._cond.acquire()
+        finally:
+            self._reading = False
+            self._cond.notify_all()
+
+    def _wait_for(self, predicate):
+        """Read frames until C{predicate()} is true. Called with
+        C{_cond} held.
+        """
+        while not predicate():
+            self._pump(True)
+
+    def _send(self, name, kind, data=b''):
+        """Send a frame of C{kind} for the channel C{name}, followed
+        by C{data}.
+        """
+        sock = self._end()
+        view = memoryview(data).cast('B')
+        buffers = [_LINK_FRAME.pack(name, kind, view.nbytes), view]
+        with self._send_lock:
+            while buffers:
+                try:
+                    count = sock.sendmsg(buffers, [], socket.MSG_DONTWAIT)
+                except (BlockingIOError, InterruptedError):
+                    # The other process may be blocked writing to us.
+                    self._poll_out.poll()
+                    with self._cond:
+                        self._pump(False)
+                    continue
+                while buffers and count >= memoryview(buffers[0]).nbytes:
+                    count -= memoryview(buffers[0]).nbytes
+                    buffers.pop(0)
+                if buffers:
+                    buffers[0] = memoryview(buffers[0]).cast('B')[count:]
+
+    def fileno(self):
+        """Return the end of the socketpair used by this process, which
+        becomes readable when a frame arrives for any of its channels.
+        """
+        return self._end().fileno()
+
+
+class LinkChannel(Channel):
+    """Channel carried by a L{ChannelLink}, which holds no file
+    descriptors of its own.
+
+    Channels of a link can be selected by an L{Alt}, which waits on
+    the socket of the link. Poisoning a channel in one process also
+    poisons it in the other.
+    """
+
+    # Links are inherited by two processes, not by ProcessPool workers.
+    _poolable = False
+
+    # Nothing is set up lazily by Channel.
+    _LAZY = frozenset()
+
+    def __init__(self, link):
+        self.name = _new_channel_id()
+        self._link = link
+        self._serializer = link._serializer
+        self._wlock = threading.Lock()
+        _debug('Channel {0} created on a link'.format(self.name))
+
+    def __getstate__(self):
+        return self.__dict__
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._wlock = threading.Lock()
+
+    def __del__(self):
+        pass
+
+    def write(self, obj):
+        """Write a Python object to this channel, and block until it
+        has been read in the other process.
+        """
+        link = self._link
+        data = self._serializer.dumps(obj)
+        link._end()
+        with self._wlock:
+            with link._cond:
+                state = link._state(self.name)
+                if state.poisoned:
+                    raise ChannelPoison()
+            link._send(self.name, _ITEM, data)
+            with link._cond:
+                link._wait_for(lambda: state.taken or state.poisoned)
+                if state.poisoned:
+                    raise ChannelPoison()
+                state.taken -= 1
+
+    def write_many(self, items):
+        """Write every object in the iterable C{items} to this channel,
+        one rendezvous at a time.
+        """
+        for item in items:
+            self.write(item)
+
+    def read(self):
+        """Read (and return) a Python object from this channel.
+        """
+        link = self._link
+        link._end()
+        with link._cond:
+            state = link._state(self.name)
+            link._wait_for(lambda: state.items or state.poisoned)
+            if state.poisoned:
+                raise ChannelPoison()
+            data = state.items.popleft()
+        link._send(self.name, _TAKEN)
+        return self._serializer.loads(data)
+
+    def read_many(self, max_n):
+        """Read a list of one Python object from this channel.
+        """
+        assert max_n > 0
+        return [self.read()]
+
+    def __iter__(self):
+        """Iterate over the objects read from this channel, forever.
+        """
+        while True:
+            yield self.read()
+
+    def fileno(self):
+        return self._link.fileno()
+
+    def _arm(self):
+        link = self._link
+        link._end()
+        with link._cond:
+            return bool(link._state(self.name).items)
+
+    def is_selectable(self):
+        """Test whether Alt can select this channel.
+        """
+        link = self._link
+        link._end()
+        with link._cond:
+            state = link._state(self.name)
+            if state.poisoned:
+                raise ChannelPoison()
+            return bool(state.items)
+
+    def enable(self):
+        """Enable a read for an Alt select.
+
+        Frames which have arrived on the link are dispatched, but no
+        item is taken, so there is nothing to roll back.
+        """
+        link = self._link
+        link._end()
+        with link._cond:
+            link._pump(False)
+            if link._state(self.name).poisoned:
+                raise ChannelPoison()
+
+    def disable(self):
+        """Disable this channel for Alt selection.
+        """
+        pass
+
+    def select(self):
+        """Complete a channel read for an Alt select.
+        """
+        return self.read()
+
+    def checkpoison(self):
+        link = self._link
+        link._end()
+        with link._cond:
+            if link._state(self.name).poisoned:
+                raise ChannelPoison()
+
+    def poison(self):
+        """Poison this channel, in this process and in the other.
+
+        A process which does not hold an end of the link cannot tell
+        the others, so it only poisons its own copy of the channel.
+        """
+        link = self._link
+        try:
+            link._end()
+        except ValueError:
+            link = None
+        if link is None:
+            return
+        with link._cond:
+            state = link._state(self.name)
+            if state.poisoned:
+                return
+            state.poisoned = True
+            link._cond.notify_all()
+        try:
+            link._send(self.name, _POISON)
+        except OSError:
+            pass
+
+    def __str__(self):
+        return 'Channel carried by a ChannelLink.'
@@ -0,0 +1,913 @@
+#!/usr/bin/env python
+
+"""Channels between programs, over TCP and Unix domain sockets.
+
+A L{NetChannel} is named by the address of a socket: a (host, port)
+pair for TCP or a path for a Unix domain socket. One OS process reads
+from the channel, and listens on its address. Any number of processes
+write to it, on the same machine or on others, each over a persistent
+connection of its own:
+
+>>> @process
+... def recv(cin):
+...     print 'Got:', cin.read()
+...
+>>> c = NetChannel(('127.0.0.1', 9999))
+>>> recv(c).start()   # Elsewhere: NetChannel(('127.0.0.1', 9999)).write(100)
+Got: 100
+>>>
+
+A write completes when the reader has taken the item, as on a
+L{Channel}. A reader can wait on a C{NetChannel} in an L{Alt}, and
+poisoning either end poisons the channel for every process connected
+to it.
+
+Items are sent as frames, each with a kind and a length. Every
+connection has C{window} bytes of credit, which a writer spends as it
+sends an item, and which the reader grants back as it takes the item.
+Large items are split into chunks no bigger than the credit a writer
+has, so a writer can never queue more than C{window} bytes which the
+reader has not asked for. Both ends of a channel must use the same
+window and serializer.
+
+Programs which are started independently can find each other's
+channels through a L{NameServer}: a reader L{publish}es its channel
+under a name, and writers L{lookup} that name.
+
+C{NetChannel} works with the os_process and os_thread
+implementations, whose processes may block on a socket.
+
+Copyright (C) python-csp developers, 2026.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have rceeived a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+from __future__ import absolute_import
+
+import collections
+import importlib
+import json
+import logging
+import os
+import selectors
+import socket
+import socketserver
+import stat
+import struct
+import tempfile
+import threading
+import time
+
+from .csp import *
+from .serializers import MarshalSerializer
+
+
+__author__ = 'python-csp developers'
+__date__ = 'October 2026'
+
+
+### Names exported by this module
+__all__ = ['NetChannel', 'NameServer', 'publish', 'unpublish', 'lookup']
+
+
+ChannelPoison = importlib.import_module('.' + CSP_IMPLEMENTATION,
+                                        __package__).ChannelPoison
+
+
+### CONSTANTS
+
+_NET_FRAME = struct.Struct('!Bq')
+"""Frame header on a connection: the kind of frame and a length."""
+
+# Kinds of frame. Writers send _DATA, _LAST and _POISON frames,
+# readers send _CREDIT, _ACK and _POISON frames. The length of a
+# _DATA or _LAST frame is that of the chunk which follows it, and the
+# length of a _CREDIT or _ACK frame is the credit it grants.
+_DATA, _LAST, _CREDIT, _ACK, _POISON = range(5)
+
+_NET_WINDOW = 262144
+"""Default credit, in bytes, of each connection to a NetChannel."""
+
+_NET_BACKLOG = 128
+"""Connections a NetChannel may have waiting to be accepted."""
+
+_NET_CONNECT_TIMEOUT = 10.0
+"""Default seconds a writer retries while no reader is listening."""
+
+_NET_RETRY = 0.5
+"""Longest pause between attempts to connect to a NetChannel."""
+
+_debug = logging.debug
+
+
+def _address_name(address):
+    """Return a printable name for the socket address C{address}.
+    """
+    if isinstance(address, str):
+        return 'unix:' + address
+    return 'tcp://{0}:{1}'.format(address[0], address[1])
+
+
+def _listen(address):
+    """Return a non-blocking socket listening on C{address}.
+
+    A Unix domain socket left behind by a program which has exited
+    is replaced. One which another program is listening on is not.
+    """
+    if not isinstance(address, str):
+        sock = socket.create_server(address, backlog=_NET_BACKLOG,
+                                    family=_family(address))
+        sock.setblocking(False)
+        return sock
+    _unlink_stale(address)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.bind(address)
+    except:
+        sock.close()
+        raise
+    sock.listen(_NET_BACKLOG)
+    sock.setblocking(False)
+    return sock
+
+
+def _unlink_stale(path):
+    """Remove the Unix domain socket at C{path} if nothing is
+    listening on it.
+    """
+    try:
+        if not stat.S_ISSOCK(os.stat(path).st_mode):
+            return
+    except FileNotFoundError:
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    finally:
+        probe.close()
+
+
+def _family(address):
+    """Return the address family of a (host, port) pair."""
+    if ':' in address[0]:
+        return socket.AF_INET6
+    return socket.AF_INET
+
+
+def _connect(resolve, timeout):
+    """Return a socket connected to the address returned by
+    C{resolve()}, retrying for up to C{timeout} seconds while nothing
+    is listening there. The address is found again before each retry.
+    """
+    deadline, pause = time.monotonic() + timeout, 0.01
+    while True:
+        address = resolve()
+        try:
+            if isinstance(address, str):
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                try:
+                    sock.connect(address)
+                except:
+                    sock.close()
+                    raise
+            else:
+                sock = socket.create_connection(address)
+            break
+        except (ConnectionRefusedError, FileNotFoundError):
+            if time.monotonic() + pause > deadline:
+                raise
+            time.sleep(pause)
+            pause = min(2 * pause, _NET_RETRY)
+    _configure(sock)
+    return sock
+
+
+def _configure(sock):
+    """Make C{sock}, a new connection, blocking and send small frames
+    straight away.
+    """
+    sock.setblocking(True)
+    if sock.family != socket.AF_UNIX:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+
+def _sendv(sock, buffers):
+    """Send every buffer in C{buffers} on C{sock}, in order.
+    """
+    count = sock.sendmsg(buffers)
+    for buff in buffers:
+        view = memoryview(buff).cast('B')
+        if count >= view.nbytes:
+            count -= view.nbytes
+            continue
+        sock.sendall(view[count:])
+        count = 0
+
+
+def _recv_into(sock, buff):
+    """Fill C{buff} from C{sock}, or raise C{ConnectionResetError} if
+    the connection is closed first.
+    """
+    view, count = memoryview(buff), 0
+    while count < len(view):
+        nbytes = sock.recv_into(view[count:])
+        if not nbytes:
+            raise ConnectionResetError('Connection closed by peer.')
+        count += nbytes
+
+
+def _recv_frame(sock):
+    """Return the (kind, length) of the next frame on C{sock}.
+    """
+    header = bytearray(_NET_FRAME.size)
+    _recv_into(sock, header)
+    return _NET_FRAME.unpack(header)
+
+
+class _Connection(object):
+    """One end of a connection between a writer and a reader.
+    """
+
+    def __init__(self, sock, credit):
+        self.sock = sock
+        self.credit = credit  # Bytes the writer may still send.
+        self.frame = None     # Reader: header of the next item, if read.
+
+    def send(self, kind, length=0):
+        self.sock.sendall(_NET_FRAME.pack(kind, length))
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class NetChannel(Channel):
+    """Channel carried over a TCP or Unix domain socket.
+
+    C{address} is a (host, port) pair for TCP, or the path of a Unix
+    domain socket. The process which first reads from the channel,
+    or enables it in an L{Alt}, listens on the address; so does one
+    which calls L{listen}. Port 0 listens on a free port, and
+    L{listen} returns the address actually used. A child process
+    inherits the listening socket of its parent.
+
+    A writer connects the first time it writes, and keeps the
+    connection open. It retries for C{connect_timeout} seconds while
+    nothing listens on the address, and reconnects if the reader has
+    gone away between writes. If the reader goes away while an item
+    is being written, the write raises C{ConnectionResetError}.
+
+    Items are serialized by a L{MarshalSerializer} unless another
+    serializer is given, so only builtin values can be sent. Any
+    process which can connect to the address can write to the
+    channel, and unpickling an item can run arbitrary code, so only
+    give a L{PickleSerializer} (with C{out_of_band=False}, as a reader
+    may be on another host) to a channel whose address only trusted
+    programs can reach.
+
+    Once the reader has been poisoned it stops listening, so writers
+    which connect later are refused.
+    """
+
+    # Connections and sockets cannot be passed to ProcessPool workers.
+    _poolable = False
+
+    # Nothing is set up lazily by Channel.
+    _LAZY = frozenset()
+
+    def __init__(self, address, serializer=None, window=_NET_WINDOW,
+                 connect_timeout=_NET_CONNECT_TIMEOUT):
+        assert window > 0
+        self.address = address
+        self.name = _address_name(address)
+        self.window = window
+        self.connect_timeout = connect_timeout
+        self._serializer = serializer or MarshalSerializer()
+        self._poisoned = False
+        self._listener = None   # Listening socket, shared with children.
+        self._owner = None      # Process which created _listener.
+        self._forget()
+
+    def _forget(self):
+        """Forget the connections and locks of another process.
+        """
+        self._wlock = threading.RLock()
+        self._rlock = threading.RLock()
+        self._pid = os.getpid()  # Process which owns the fields below.
+        self._selector = None    # Waits on _listener and the readers.
+        self._readers = {}       # Reader ends, by file descriptor.
+        self._ready = collections.deque() # Readers whose frame is read.
+        self._chosen = None      # Reader chosen by enable().
+        self._writer = None      # Connection of this process's writes.
+
+    def _check_owner(self):
+        """Drop connections inherited from a parent process, which
+        still belong to the parent.
+        """
+        if self._pid == os.getpid():
+            return
+        for conn in list(self._readers.values()):
+            conn.close()
+        if self._writer is not None:
+            self._writer.close()
+        if self._selector is not None:
+            self._selector.close()
+        self._forget()
+
+    def __getstate__(self):
+        state = dict((key, self.__dict__[key]) for key in
+                     ('address', 'name', 'window', 'connect_timeout',
+                      '_serializer', '_poisoned'))
+        state['_listener'] = state['_owner'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._forget()
+
+    def listen(self):
+        """Listen for writers on the address of this channel, if this
+        process is not already doing so, and return the address.
+        """
+        self.checkpoison()
+        self._check_owner()
+        if self._selector is not None:
+            return self.address
+        if self._listener is None:
+            self._listener = _listen(self.address)
+            self._owner = os.getpid()
+            if not isinstance(self.address, str):
+                host, port = self._listener.getsockname()[:2]
+                self.address = (self.address[0], port)
+                self.name = _address_name(self.address)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._listener, selectors.EVENT_READ, None)
+        _debug('NetChannel listening on {0}'.format(self.name))
+        return self.address
+
+    def _accept(self):
+        """Accept every writer waiting to connect.
+        """
+        while True:
+            try:
+                sock, peer = self._listener.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            _configure(sock)
+            conn = _Connection(sock, self.window)
+            self._readers[sock.fileno()] = conn
+            self._selector.register(sock, selectors.EVENT_READ, conn)
+
+    def _drop(self, conn, kind=None):
+        """Close the reader end C{conn}, sending a frame of C{kind}
+        first if it is not C{None}.
+        """
+        if kind is not None:
+            try:
+                conn.send(kind)
+            except OSError:
+                pass
+        if self._readers.pop(conn.sock.fileno(), None) is not None:
+            self._selector.unregister(conn.sock)
+        if conn in self._ready:
+            self._ready.remove(conn)
+        conn.close()
+
+    def _next_frame(self, conn):
+        """Read the header of the next item written on C{conn}, and
+        queue C{conn} to be taken from. A frame which poisons the
+        channel raises L{ChannelPoison}.
+        """
+        try:
+            kind, length = _recv_frame(conn.sock)
+        except OSError:
+            self._drop(conn) # The writer has gone away.
+            return
+        if kind == _POISON:
+            self._drop(conn)
+            self.poison()
+            raise ChannelPoison()
+        conn.frame = (kind, length)
+        self._ready.append(conn)
+
+    def _poll(self, block):
+        """Return a reader end on which the first frame of an item has
+        been read, or C{None} if there is none and C{block} is false.
+        """
+        self.listen()
+        while not self._ready:
+            events = self._selector.select(None if block else 0)
+            for key, mask in events:
+                if key.data is None:
+                    self._accept()
+                elif key.data.frame is None:
+                    self._next_frame(key.data)
+            if not block:
+                break
+        return self._ready[0] if self._ready else None
+
+    def _take(self, conn):
+        """Read the item whose first frame has been read from C{conn},
+        granting credit back to the writer for each chunk, and return
+        it once the writer has been told that it has been taken.
+        """
+        self._ready.remove(conn)
+        (kind, length), conn.frame = conn.frame, None
+        chunks = []
+        try:
+            while True:
+                chunk = bytearray(length)
+                _recv_into(conn.sock, chunk)
+                chunks.append(chunk)
+                if kind == _LAST:
+                    conn.send(_ACK, length)
+                    break
+                conn.send(_CREDIT, length)
+                kind, length = _recv_frame(conn.sock)
+                if kind == _POISON:
+                    self._drop(conn)
+                    self.poison()
+                    raise ChannelPoison()
+        except OSError:
+            self._drop(conn)
+            raise
+        data = chunks[0] if len(chunks) == 1 else b''.join(chunks)
+        _debug('Read item of {0} bytes from {1}'.format(len(data), self.name))
+        return self._serializer.loads(data)
+
+    def read(self):
+        """Read (and return) a Python object from this channel.
+        """
+        self.checkpoison()
+        with self._rlock:
+            return self._take(self._poll(True))
+
+    def read_many(self, max_n):
+        """Read a list of one Python object from this channel. Each
+        object takes a rendezvous of its own.
+        """
+        assert max_n > 0
+        return [self.read()]
+
+    def __iter__(self):
+        """Iterate over the objects read from this channel, forever.
+        """
+        while True:
+            yield self.read()
+
+    def _connection(self):
+        """Return the connection of this process to the reader,
+        connecting if there is none or if the reader has closed it.
+        An unread frame on an idle connection can only poison the
+        channel.
+        """
+        self._check_owner()
+        conn = self._writer
+        if conn is not None:
+            try:
+                waiting = conn.sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT)
+            except (BlockingIOError, InterruptedError):
+                return conn
+            except OSError:
+                waiting = b''
+            if waiting:
+                self._expect(conn)
+            conn.close()
+            self._writer = None
+        sock = _connect(self._resolve, self.connect_timeout)
+        self._writer = _Connection(sock, self.window)
+        return self._writer
+
+    def _resolve(self):
+        """Return the address a writer should connect to.
+        """
+        return self.address
+
+    def _expect(self, conn):
+        """Read a frame sent by the reader on C{conn}, adding any credit
+        it grants. Return C{True} if the reader has taken an item.
+        """
+        kind, length = _recv_frame(conn.sock)
+        if kind == _POISON:
+            conn.close()
+            self._writer = None
+            self._poisoned = True
+            raise ChannelPoison()
+        conn.credit += length
+        return kind == _ACK
+
+    def write(self, obj):
+        """Write a Python object to this channel, and block until it
+        has been read.
+        """
+        self.checkpoison()
+        data = memoryview(self._serializer.dumps(obj)).cast('B')
+        with self._wlock:
+            conn = self._connection()
+            try:
+                offset = 0
+                while True:
+                    while not conn.credit and offset < len(data):
+                        self._expect(conn)
+                    count = min(conn.credit, len(data) - offset)
+                    last = offset + count == len(data)
+                    _sendv(conn.sock, [_NET_FRAME.pack(_LAST if last else _DATA,
+                                                       count),
+                                       data[offset:offset + count]])
+                    conn.credit -= count
+                    offset += count
+                    if last:
+                        break
+                while not self._expect(conn):
+                    pass
+            except OSError:
+                conn.close()
+                self._writer = None
+                raise
+        _debug('Wrote item of {0} bytes to {1}'.format(len(data), self.name))
+
+    def write_many(self, items):
+        """Write every object in the iterable C{items} to this channel,
+        one rendezvous at a time.
+        """
+        for item in items:
+            self.write(item)
+
+    def fileno(self):
+        """Return a file descriptor which becomes readable when a
+        writer connects or sends an item, or C{None} if the selector
+        of this platform has none or the channel is poisoned.
+        """
+        if self._poisoned:
+            return None
+        self.listen()
+        try:
+            return self._selector.fileno()
+        except (AttributeError, NotImplementedError):
+            return None
+
+    def _arm(self):
+        return bool(self._ready)
+
+    def is_selectable(self):
+        """Test whether Alt can select this channel.
+        """
+        self.checkpoison()
+        return self._chosen is not None
+
+    def enable(self):
+        """Enable a read for an Alt select.
+
+        Nothing is taken from a writer until L{select} is called, so
+        there is nothing to roll back.
+        """
+        self.checkpoison()
+        with self._rlock:
+            if self._chosen is None:
+                self._chosen = self._poll(False)
+
+    def disable(self):
+        """Disable this channel for Alt selection.
+        """
+        self._chosen = None
+
+    def select(self):
+        """Complete a channel read for an Alt select.
+        """
+        self.checkpoison()
+        with self._rlock:
+            conn, self._chosen = self._chosen, None
+            assert conn is not None
+            return self._take(conn)
+
+    def checkpoison(self):
+        if self._poisoned:
+            _debug('{0} is poisoned. Raising ChannelPoison()'.format(self.name))
+            raise ChannelPoison()
+
+    def poison(self):
+        """Poison this channel in every process connected to it.
+
+        A writer which poisons the channel tells the reader, and a
+        reader which is poisoned tells every writer connected to it,
+        or waiting to connect, and then stops listening.
+        """
+        if self._poisoned:
+            return
+        self._poisoned = True
+        self._check_owner()
+        if self._writer is not None:
+            try:
+                self._writer.send(_POISON)
+            except OSError:
+                pass
+        if self._selector is not None:
+            self._accept()
+        for conn in list(self._readers.values()):
+            self._drop(conn, _POISON)
+        if self._listener is not None:
+            self.close()
+
+    def close(self):
+        """Close every socket this process holds for this channel, and
+        remove a Unix domain socket which this process created.
+        """
+        self._check_owner()
+        for conn in list(self._readers.values()):
+            self._drop(conn)
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._selector is not None:
+            self._selector.close()
+            self._selector = None
+        if self._listener is not None:
+            if self._owner == os.getpid() and isinstance(self.address, str):
+                try:
+                    os.unlink(self.address)
+                except OSError:
+                    pass
+            self._listener.close()
+            self._listener = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def __str__(self):
+        return 'Channel using a socket at {0}.'.format(self.name)
+
+
+### Name service
+
+_NAMESERVER_ENV = 'CSP_NAMESERVER'
+"""Environment variable naming the socket of the default name server."""
+
+
+def _default_server():
+    """Return the path of the Unix domain socket of the name server
+    used when none is given.
+    """
+    return os.environ.get(_NAMESERVER_ENV) or os.path.join(
+        tempfile.gettempdir(), 'csp-names-{0}'.format(os.getuid()))
+
+
+def _address(address):
+    """Return a socket address decoded from JSON."""
+    return address if isinstance(address, str) else tuple(address)
+
+
+class _NameHandler(socketserver.StreamRequestHandler):
+    """Answer the requests of one client of a L{NameServer}, each a
+    line of JSON.
+    """
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                reply = self.server.answer(json.loads(line.decode('utf-8')))
+            except (ValueError, KeyError, TypeError) as err:
+                reply = {'error': str(err)}
+            self.wfile.write(json.dumps(reply).encode('utf-8') + b'\n')
+
+
+class NameServer(socketserver.ThreadingUnixStreamServer):
+    """Registry of channels, reachable over a Unix domain socket.
+
+    A program publishes a L{NetChannel} it reads from under a name
+    with L{publish}, and other programs find it with L{lookup}:
+
+>>> server = NameServer().start()
+>>> c = NetChannel(('127.0.0.1', 0))
+>>> publish('results', c)
+('127.0.0.1', 40405)
+>>> lookup('results').write(42)   # In another program.
+>>>
+
+    The socket is at C{path}, or at the path in the environment
+    variable C{CSP_NAMESERVER}, or in the temporary directory. A name
+    server can also be run on its own with C{python -m csp.net}.
+    Names stay published until they are unpublished or published
+    again, so a reader which restarts simply publishes its channel
+    again.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path=None):
+        self.path = path or _default_server()
+        self._names = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        _unlink_stale(self.path)
+        socketserver.ThreadingUnixStreamServer.__init__(self, self.path,
+                                                        _NameHandler)
+
+    def start(self):
+        """Serve requests in a background thread, and return this
+        name server.
+        """
+        self._thread = threading.Thread(target=self.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving requests and remove the socket.
+        """
+        if self._thread is not None:
+            self.shutdown()
+            self._thread.join()
+            self._thread = None
+        self.server_close()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def answer(self, request):
+        """Return the reply to C{request}, a dict decoded from JSON.
+        """
+        op, name = request['op'], request.get('name')
+        with self._lock:
+            if op == 'publish':
+                self._names[name] = request['entry']
+                return {'ok': True}
+            elif op == 'unpublish':
+                self._names.pop(name, None)
+                return {'ok': True}
+            elif op == 'lookup':
+                return {'entry': self._names.get(name)}
+            elif op == 'names':
+                return {'names': sorted(self._names)}
+        raise ValueError('Unknown request: {0!r}'.format(op))
+
+
+class _NameClient(object):
+    """Connection of one process to a name server, kept open and
+    shared by the threads of the process.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._sock = None
+        self._rfile = None
+
+    def request(self, **request):
+        """Send C{request} and return the reply. The connection is
+        opened again once if the server has closed it.
+        """
+        data = json.dumps(request).encode('utf-8') + b'\n'
+        with self._lock:
+            for retry in (False, True):
+                try:
+                    if self._sock is None:
+                        self._sock = _connect(lambda: self.path, 0)
+                        self._rfile = self._sock.makefile('rb')
+                    self._sock.sendall(data)
+                    line = self._rfile.readline()
+                    if line:
+                        break
+                    raise ConnectionResetError('Name server has gone away.')
+                except OSError:
+                    self.close()
+                    if retry:
+                        raise
+        reply = json.loads(line.decode('utf-8'))
+        if 'error' in reply:
+            raise ValueError(reply['error'])
+        return reply
+
+    def close(self):
+        if self._sock is not None:
+            self._rfile.close()
+            self._sock.close()
+            self._sock = self._rfile = None
+
+
+_name_clients = {}    # Connections to name servers, by path.
+_lookups = {}         # Channels found by lookup(), by (path, name).
+_names_lock = threading.Lock()
+
+
+def _name_client(server):
+    """Return the connection of this process to the name server at
+    C{server}, or at the default path if C{server} is C{None}.
+    """
+    path = server or _default_server()
+    with _names_lock:
+        client = _name_clients.get(path)
+        if client is None or client.pid != os.getpid():
+            # Connections inherited from a parent belong to it.
+            client = _name_clients[path] = _NameClient(path)
+        return client
+
+
+def publish(name, channel, server=None):
+    """Publish the L{NetChannel} C{channel}, which this process reads
+    from, under C{name}, and return the address it listens on.
+    """
+    address = channel.listen()
+    _name_client(server).request(op='publish', name=name,
+                                 entry={'address': address,
+                                        'window': channel.window})
+    return address
+
+
+def unpublish(name, server=None):
+    """Remove C{name} from the name server.
+    """
+    _name_client(server).request(op='unpublish', name=name)
+
+
+def lookup(name, server=None, timeout=_NET_CONNECT_TIMEOUT,
+           serializer=None):
+    """Return a L{NetChannel} on which to write to the channel
+    published as C{name}, waiting up to C{timeout} seconds for it to
+    be published.
+
+    Lookups are cached, so every call for the same name in a program
+    returns the same channel, and the connection it has made to the
+    reader is used by every writer in the process. If the reader has
+    gone away when the channel next connects, its name is looked up
+    again, so writers follow a reader which restarts elsewhere.
+    C{serializer} is used when the channel is first looked up.
+    """
+    path = server or _default_server()
+    key = (path, name)
+    channel = _lookups.get(key)
+    if channel is not None:
+        return channel
+    deadline = time.monotonic() + timeout
+    while True:
+        entry = _name_client(path).request(op='lookup', name=name)['entry']
+        if entry is not None:
+            break
+        if time.monotonic() > deadline:
+            raise KeyError('No channel is published as {0!r}.'.format(name))
+        time.sleep(min(_NET_RETRY, max(0.01, deadline - time.monotonic())))
+    channel = _PublishedChannel(name, path, entry, serializer, timeout)
+    with _names_lock:
+        return _lookups.setdefault(key, channel)
+
+
+class _PublishedChannel(NetChannel):
+    """L{NetChannel} found by L{lookup}, whose address is looked up
+    again when a connection to it fails.
+    """
+
+    def __init__(self, published, server, entry, serializer, timeout):
+        NetChannel.__init__(self, _address(entry['address']),
+                            serializer=serializer, window=entry['window'],
+                            connect_timeout=timeout)
+        self.published = published
+        self.server = server
+        self._fresh = True  # The address has just been looked up.
+
+    def __getstate__(self):
+        state = NetChannel.__getstate__(self)
+        state.update(published=self.published, server=self.server,
+                     _fresh=False)
+        return state
+
+    def _resolve(self):
+        if self._fresh:
+            self._fresh = False
+            return self.address
+        entry = _name_client(self.server).request(
+            op='lookup', name=self.published)['entry']
+        if entry is not None:
+            self.address = _address(entry['address'])
+            self.name = _address_name(self.address)
+        return self.address
+
+
+if __name__ == '__main__':
+    import sys
+    server = NameServer(sys.argv[1] if len(sys.argv) > 1 else None)
+    _debug('Name server listening on {0}'.format(server.path))
+    try:
+        server.serve_forever()
+    finally:
+        server.stop()
@@ -0,0 +1,1299 @@
+#!/usr/bin/env python
+
+"""Communicating sequential processes, in Python.
+
+This version of python-csp runs every CSP process as an asyncio task,
+so CSP networks can run on the same event loop as other asyncio code.
+Channel operations and L{Alt} selections are coroutines, which
+processes written with C{async def} await:
+
+>>> @process
+... async def send(cout, data):
+...     await cout.write(data)
+...
+>>> @process
+... async def recv(cin):
+...     print('Got:', await cin.read())
+...
+>>> c = Channel()
+>>> Par(send(c, 100), recv(c)).start()
+Got: 100
+>>>
+
+L{Par} runs its processes as concurrent tasks and L{Seq} runs them
+one after the other. From a coroutine, any process can be run to
+completion with C{await}, or started in the background with
+L{spawn} and waited for with L{join}:
+
+>>> async def main(c):
+...     await Par(send(c, 100), recv(c))
+...
+>>> asyncio.run(main(Channel()))
+Got: 100
+>>>
+
+The start() method of a process runs a new event loop until the
+process has finished, so it cannot be called from a coroutine. Any
+call which blocks the thread, such as C{time.sleep}, stops every
+process on the loop.
+
+When using CSP Python as a DSL, this module will normally be imported
+via the statement 'from csp.csp import *' with the environment
+variable CSP set to "ASYNCIO", and should not be imported directly.
+
+Copyright (C) python-csp developers, 2026. The process, guard and
+channel classes are adapted from csp.os_thread, Copyright (C)
+Sarah Mount, 2009-10.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have rceeived a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+"""
+
+__author__ = 'python-csp developers'
+__date__ = 'October 2026'
+
+#DEBUG = True
+DEBUG = False
+
+from functools import wraps # Easy decorators
+
+import asyncio
+import collections
+import copy
+import inspect
+import itertools
+import logging
+import os
+import random
+import sys
+import time
+
+from .referents import find_channels
+
+CSP_IMPLEMENTATION = 'os_asyncio'
+
+### Names exported by this module
+__all__ = ['set_debug', 'CSPProcess', 'CSPServer', 'Alt',
+           'Par', 'Seq', 'Guard', 'Channel', 'FileChannel',
+           'BufferedChannel', 'ChannelFactory',
+           'process', 'forever', 'Skip', '_CSPTYPES', 'CSP_IMPLEMENTATION']
+
+### Seeded random number generator (16 bytes)
+
+_RANGEN = random.Random(os.urandom(16))
+
+
+### CONSTANTS
+
+_ITER_BATCH = 1024
+"""Most items read at once by L{Channel.read_many} by default."""
+
+_ALT_POLL = 0.01
+"""Seconds between polls of guards which cannot wake an Alt."""
+
+_channel_ids = itertools.count(1)
+"""Channel IDs."""
+
+_debug = logging.debug
+
+
+class NoGuardInAlt(Exception):
+    """Raised when an Alt has no guards to select.
+    """
+
+    def __str__(self):
+        return 'Every Alt must have at least one guard.'
+
+
+### Special constants / exceptions for termination and mobility
+
+_BATCH = ';;;__BATCH__;;;'
+"""Marks a list of items sent down a channel by write_many()."""
+
+_EMPTY = ';;;__EMPTY__;;;'
+"""Returned by L{Channel._take} when no item is waiting."""
+
+
+class ChannelPoison(Exception):
+    """Used to poison a processes and propagate to all known channels.
+    """
+
+    def __str__(self):
+        return 'Posioned channel exception.'
+
+
+### DEBUGGING
+
+def set_debug(status):
+    global DEBUG
+    DEBUG = status
+    logging.basicConfig(level=logging.NOTSET,
+                        stream=sys.stdout)
+    logging.info("Using asyncio version of python-csp.")
+
+
+def _now():
+    """Return the time on the clock of the running event loop, or on
+    the same clock if no loop is running.
+    """
+    try:
+        return asyncio.get_running_loop().time()
+    except RuntimeError:
+        return time.monotonic()
+
+
+### Poison propagation
+
+def _find_channels(referents):
+    """Return the channels in C{referents}, each once. See
+    L{csp.referents.find_channels}.
+    """
+    return find_channels(referents, Channel, Alt, (Par, Seq), CSPProcess)
+
+
+### Fundamental CSP concepts -- Processes, Channels, Guards
+
+class _CSPOpMixin(object):
+    """Mixin class used for operator overloading in CSP process types.
+
+    Subclasses provide a L{run} coroutine. Awaiting a process runs it
+    to completion on the running event loop.
+    """
+
+    def __init__(self):
+        self._task = None
+
+    def spawn(self):
+        """Start only if self is not running, as a task on the running
+        event loop. Return the task.
+        """
+        if self._task is None:
+            self._task = asyncio.ensure_future(self.run())
+        return self._task
+
+    def start(self):
+        """Run self to completion on a new event loop.
+
+        Must not be called from a coroutine. Await the process instead.
+        """
+        asyncio.run(self._wait())
+
+    async def join(self):
+        """Wait until self, which must have been spawned, has finished.
+        """
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    def _wait(self):
+        """Return an awaitable which runs self, or waits for self if it
+        has been spawned.
+        """
+        if self._task is not None:
+            return self.join()
+        return self.run()
+
+    def __await__(self):
+        return self._wait().__await__()
+
+    async def run(self):
+        """Coroutine which runs this process. Must be overridden in
+        subclasses.
+        """
+        raise NotImplementedError('Must be implemented in subclass')
+
+    # Channels given to this process, recorded when it is created.
+    _channels = ()
+
+    def referent_visitor(self, referents):
+        """Poison the channels found in C{referents} by
+        L{_find_channels}.
+        """
+        for channel in _find_channels(referents):
+            channel.poison()
+
+    def _poison_channels(self):
+        """Poison the channels this process was given, after it has
+        caught a L{ChannelPoison}.
+        """
+        for channel in self._channels:
+            channel.poison()
+
+    def terminate(self):
+        """Terminate only if self is running, by cancelling its task.
+        """
+        if self._task is not None and not self._task.done():
+            _debug('{0} terminating now...'.format(self.getName()))
+            self._task.cancel()
+
+    def getName(self):
+        return id(self)
+
+    def getPid(self):
+        """Return the ID of this process.
+
+        The name of this method ensures that the CSPProcess interface
+        in this module is identical to the one defined in
+        os_process.py.
+        """
+        return id(self)
+
+    def __gt__(self, other):
+        """Implementation of CSP Seq."""
+        assert _is_csp_type(other)
+        seq = Seq(self, other)
+        seq.start()
+        return seq
+
+    def __mul__(self, n):
+        assert n > 0
+        procs = [self]
+        for i in range(n-1):
+            procs.append(copy.copy(self))
+        Seq(*procs).start()
+
+    def __rmul__(self, n):
+        assert n > 0
+        procs = [self]
+        for i in range(n-1):
+            procs.append(copy.copy(self))
+        Seq(*procs).start()
+
+
+class CSPProcess(_CSPOpMixin):
+    """Implementation of CSP processes.
+
+    There are two ways to create a new CSP process. Firstly, you can
+    use the @process decorator to convert a function definition into a
+    CSP Process. Once the function has been defined, calling it will
+    return a new CSPProcess object which can be started manually, or
+    used in an expression:
+
+>>> @process
+... async def foo(n):
+...     print('n:', n)
+...
+>>> foo(100).start()
+n: 100
+>>> foo(10) // (foo(20),)
+n: 10
+n: 20
+>>>
+
+    Alternatively, you can create a CSPProcess object directly and
+    pass a function (and its arguments) to the CSPProcess constructor:
+
+>>> p = CSPProcess(foo, 100)
+>>> p.start()
+n: 100
+>>>
+
+    The function may be a coroutine function (C{async def}), or a
+    plain function which never blocks.
+    """
+
+    def __init__(self, func, *args, **kwargs):
+        assert inspect.isfunction(func) # Check we aren't using objects
+        assert not inspect.ismethod(func) # Check we aren't using objects
+        _CSPOpMixin.__init__(self)
+        self._target = func
+        self._args = args
+        self._kwargs = kwargs
+        for arg in args + tuple(kwargs.values()):
+            if _is_csp_type(arg):
+                arg.enclosing = self
+        self.enclosing = None
+        self._channels = _find_channels(args + tuple(kwargs.values()))
+
+    def __floordiv__(self, proclist):
+        """
+        Run this process in parallel with a list of others.
+        """
+        par = Par(self, *list(proclist))
+        par.start()
+
+    def __str__(self):
+        return 'CSPProcess running in task {0}'.format(self.getName())
+
+    async def _body(self):
+        """Call the target function, awaiting its result if need be.
+        """
+        result = self._target(*self._args, **self._kwargs)
+        if inspect.isawaitable(result):
+            await result
+
+    async def run(self):
+        """Coroutine which runs the target function of this process.
+        """
+        try:
+            await self._body()
+        except ChannelPoison:
+            _debug('{0} in {1} got ChannelPoison exception'.format(str(self), self.getPid()))
+            self._poison_channels()
+        except Exception:
+            typ, excn, tback = sys.exc_info()
+            sys.excepthook(typ, excn, tback)
+
+
+class CSPServer(CSPProcess):
+    """Implementation of CSP server processes.
+    Not intended to be used in client code. Use @forever instead.
+    """
+
+    def __init__(self, func, *args, **kwargs):
+        CSPProcess.__init__(self, func, *args, **kwargs)
+
+    def __str__(self):
+        return 'CSPServer running in task {0}'.format(self.getPid())
+
+    async def _body(self):
+        """Run the target. Asynchronous generators are run one
+        iteration per C{yield}, letting other tasks run in between.
+        """
+        generator = self._target(*self._args, **self._kwargs)
+        if not inspect.isasyncgen(generator):
+            if inspect.isawaitable(generator):
+                await generator
+            return
+        async for _ in generator:
+            if sys.gettrace() is not None:
+                # If the tracer is running execute the target only once.
+                logging.info('Server process detected a tracer running.')
+                return
+            await asyncio.sleep(0)
+
+
+class Alt(_CSPOpMixin):
+    """CSP select (OCCAM ALT) process.
+
+    python-csp process will often have access to several different
+    channels, or other guard types such as timer guards, and will have
+    to choose one of them to read from. Alt objects choose the first
+    guard in a list to become ready.
+
+    The select() methods are coroutines:
+
+>>> @process
+... async def send_msg(chan, msg):
+...     await chan.write(msg)
+...
+>>> @process
+... async def alt_example(chan1, chan2):
+...     alt = Alt(chan1, chan2)
+...     print(await alt.select())
+...     print(await alt.select())
+...
+>>> c1, c2 = Channel(), Channel()
+>>> Par(send_msg(c1, 'yes'), send_msg(c2, 'no'), alt_example(c1, c2)).start()
+yes
+no
+>>>
+
+    As in the other versions of python-csp, select() chooses a ready
+    guard at random, fair_select() avoids the previously selected
+    guard and pri_select() chooses the first ready guard in the order
+    they were passed to the Alt() constructor. The choice operator,
+    "|", also returns a coroutine:
+
+>>> @process
+... async def choice(chan1, chan2):
+...     print(await (chan1 | chan2))
+...
+>>>
+
+    Each select() method takes an optional C{timeout} in seconds,
+    after which it returns C{None} if no guard has become ready.
+
+    A waiting Alt blocks on a future, which channels complete as soon
+    as a writer arrives and L{Timer} guards complete when their alarm
+    is due. Other guards are polled every L{_ALT_POLL} seconds.
+    """
+
+    def __init__(self, *args):
+        super(Alt, self).__init__()
+        for arg in args:
+            assert isinstance(arg, Guard)
+        self.guards = list(args)
+        self.last_selected = None
+
+    def poison(self):
+        """Poison the last selected guard and unlink from the guard list.
+
+        Sets self.last_selected to None.
+        """
+        _debug(str(type(self.last_selected)))
+        self.last_selected.disable() # Just in case
+        try:
+            self.last_selected.poison()
+        except Exception:
+            pass
+        _debug('Poisoned last selected.')
+        self.guards.remove(self.last_selected)
+        _debug('{0} guards'.format(len(self.guards)))
+        self.last_selected = None
+
+    async def _ready(self, timeout=None):
+        """Enable every guard and return the list of selectable guards,
+        waiting until there is at least one, or until C{timeout}
+        seconds have passed, when the list is empty.
+        """
+        if len(self.guards) == 0:
+            raise NoGuardInAlt()
+        loop = asyncio.get_running_loop()
+        if timeout is not None:
+            deadline = loop.time() + timeout
+        while True:
+            for guard in self.guards:
+                guard.enable()
+            ready = [guard for guard in self.guards if guard.is_selectable()]
+            _debug('Alt got {0} items to choose from out of {1}'.format(len(ready), len(self.guards)))
+            if ready:
+                return ready
+            wait = None
+            if timeout is not None:
+                wait = deadline - loop.time()
+                if wait <= 0:
+                    return ready
+            wakeup = loop.create_future()
+            for guard in self.guards:
+                if not guard.add_waiter(wakeup):
+                    wait = _ALT_POLL if wait is None else min(wait, _ALT_POLL)
+            try:
+                await asyncio.wait([wakeup], timeout=wait)
+            finally:
+                for guard in self.guards:
+                    guard.remove_waiter(wakeup)
+                wakeup.cancel()
+
+    def _commit(self, selected):
+        self.last_selected = selected
+        for guard in self.guards:
+            if guard is not selected:
+                guard.disable()
+        return selected.select()
+
+    async def select(self, timeout=None):
+        """Randomly select from ready guards. Returns C{None} if none
+        is ready within C{timeout} seconds.
+        """
+        ready = await self._ready(timeout)
+        if not ready:
+            return None
+        return self._commit(_RANGEN.choice(ready))
+
+    async def fair_select(self, timeout=None):
+        """Select a guard to synchronise with. Do not select the
+        previously selected guard (unless it is the only guard
+        available). Returns C{None} if no guard is ready within
+        C{timeout} seconds.
+        """
+        ready = await self._ready(timeout)
+        if not ready:
+            return None
+        if self.last_selected in ready and len(ready) > 1:
+            ready.remove(self.last_selected)
+            _debug('Alt removed last selected from ready list')
+        return self._commit(_RANGEN.choice(ready))
+
+    async def pri_select(self, timeout=None):
+        """Select a guard to synchronise with, in order of
+        "priority". The guard with the lowest index in the L{guards}
+        list has the highest priority. Returns C{None} if no guard is
+        ready within C{timeout} seconds.
+        """
+        ready = await self._ready(timeout)
+        if not ready:
+            return None
+        return self._commit(ready[0])
+
+    def __mul__(self, n):
+        assert n > 0
+        for i in range(n):
+            yield self.select()
+
+    def __rmul__(self, n):
+        assert n > 0
+        for i in range(n):
+            yield self.select()
+
+
+class Par(_CSPOpMixin):
+    """Run CSP processes in parallel.
+
+    There are two ways to run processes in parallel.  Firstly, given
+    two (or more) processes you can parallelize them with the //
+    operator, like this:
+
+>>> @process
+... def foo(n):
+...     print('n:', n)
+...
+>>> foo(1) // (foo(2), foo(3))
+n: 1
+n: 2
+n: 3
+>>>
+
+    Notice that the // operator takes a CSPProcess on the left hand side
+    and a sequence of processes on the right hand side.
+
+    Alternatively, you can create a Par object which is a sort of CSP
+    process and start that process manually, or await it:
+
+>>> p = Par(foo(100), foo(200), foo(300))
+>>> p.start()
+n: 100
+n: 200
+n: 300
+>>>
+    """
+
+    def __init__(self, *procs, **kwargs):
+        super(Par, self).__init__()
+        self.procs = []
+        for proc in procs:
+            # FIXME: only catches shallow nesting.
+            if isinstance(proc, Par):
+                self.procs += proc.procs
+            else:
+                self.procs.append(proc)
+        for proc in self.procs:
+            proc.enclosing = self
+        _debug('{0} processes in Par:'.format(len(self.procs)))
+
+    def __ifloordiv__(self, proclist):
+        """
+        Run this Par in parallel with a list of others.
+        """
+        assert hasattr(proclist, '__iter__')
+        self.procs = []
+        for proc in proclist:
+            # FIXME: only catches shallow nesting.
+            if isinstance(proc, Par):
+                self.procs += proc.procs
+            else:
+                self.procs.append(proc)
+        for proc in self.procs:
+            proc.enclosing = self
+        _debug('{0} processes added to Par by //:'.format(len(self.procs)))
+        self.start()
+
+    def __str__(self):
+        return 'CSP Par running in task {0}.'.format(self.getPid())
+
+    def terminate(self):
+        """Terminate the execution of this process.
+        """
+        for proc in self.procs:
+            proc.terminate()
+        _CSPOpMixin.terminate(self)
+
+    async def run(self):
+        """Run the processes as concurrent tasks and return when all
+        of them have returned.
+        """
+        await asyncio.gather(*[proc.spawn() for proc in self.procs])
+
+    def __len__(self):
+        return len(self.procs)
+
+    def __getitem__(self, index):
+        """Can raise an IndexError if index is not a valid index of
+        self.procs.
+        """
+        return self.procs[index]
+
+    def __setitem__(self, index, value):
+        assert isinstance(value, CSPProcess)
+        self.procs[index] = value
+
+    def __contains__(self, proc):
+        return proc in self.procs
+
+
+class Seq(_CSPOpMixin):
+    """Run CSP processes sequentially.
+
+    There are two ways to run processes in sequence.  Firstly, given
+    two (or more) processes you can sequence them with the > operator,
+    like this:
+
+>>> @process
+... def foo(n):
+...     print('n:', n)
+...
+>>> foo(1) > foo(2) > foo(3)
+n: 1
+n: 2
+n: 3
+>>>
+
+    Secondly, you can create a Seq object which is a sort of CSP
+    process and start that process manually, or await it:
+
+>>> s = Seq(foo(100), foo(200), foo(300))
+>>> s.start()
+n: 100
+n: 200
+n: 300
+>>>
+    """
+
+    def __init__(self, *procs):
+        super(Seq, self).__init__()
+        self.procs = []
+        for proc in procs:
+            # FIXME: only catches shallow nesting.
+            if isinstance(proc, Seq):
+                self.procs += proc.procs
+            else:
+                self.procs.append(proc)
+        for proc in self.procs:
+            proc.enclosing = self
+
+    def __str__(self):
+        return 'CSP Seq running in task {0}.'.format(self.getPid())
+
+    async def run(self):
+        """Run each process in turn, in this task.
+        """
+        for proc in self.procs:
+            await proc._wait()
+
+
+### Guards and channels
+
+class Guard(object):
+    """Abstract class to represent CSP guards.
+
+    All methods must be overridden in subclasses. None of them may
+    block, since an L{Alt} only calls L{select} on a guard which is
+    selectable.
+    """
+
+    def is_selectable(self):
+        """Should return C{True} if this guard can be selected by an L{Alt}.
+        """
+        raise NotImplementedError('Must be implemented in subclass')
+
+    def enable(self):
+        """Prepare for, but do not commit to a synchronisation.
+        """
+        raise NotImplementedError('Must be implemented in subclass')
+
+    def disable(self):
+        """Roll back from an L{enable} call.
+        """
+        raise NotImplementedError('Must be implemented in subclass')
+
+    def select(self):
+        """Commit to a synchronisation started by L{enable}.
+        """
+        raise NotImplementedError('Must be implemented in subclass')
+
+    def poison(self):
+        """Terminate all processes attached to this guard.
+        """
+        pass
+
+    def add_waiter(self, future):
+        """Arrange for C{future} to be completed whenever this guard
+        may have become selectable. Return C{False} if this guard
+        cannot do so, in which case an L{Alt} will poll it instead.
+        """
+        return False
+
+    def remove_waiter(self, future):
+        """Roll back from an L{add_waiter} call.
+        """
+        pass
+
+    def __str__(self):
+        return 'CSP Guard: must be subclassed.'
+
+    def __or__(self, other):
+        assert isinstance(other, Guard)
+        return Alt(self, other).select()
+
+    def __ror__(self, other):
+        assert isinstance(other, Guard)
+        return Alt(self, other).select()
+
+
+def _wake(future, value=None):
+    """Complete C{future} with C{value} unless it is already done.
+    Return C{True} if it was completed.
+    """
+    if future.done():
+        return False
+    future.set_result(value)
+    return True
+
+
+class Channel(Guard):
+    """CSP Channel objects.
+
+    Channels between tasks pass references to objects, without
+    copying them, so the C{serializer} argument accepted by channels
+    in the multiprocessing version of python-csp is ignored here.
+    Processes block on futures, so channels hold no locks and no file
+    descriptors and are not tied to any one event loop.
+
+    A CSP channel can be created with the Channel class:
+
+>>> c = Channel()
+>>>
+
+    Each Channel object has a unique name within the program:
+
+>>> print(c.name)
+1
+>>>
+
+    The read() and write() methods of a channel are coroutines, which
+    wait until the rendezvous is complete. For example:
+
+>>> @process
+... async def send(cout, data):
+...     await cout.write(data)
+...
+>>> @process
+... async def recv(cin):
+...     print('Got:', await cin.read())
+...
+>>> c = Channel()
+>>> send(c, 100) // (recv(c),)
+Got: 100
+>>>
+
+    Reads and writes may be cancelled, for example by
+    C{asyncio.wait_for}. A cancelled write is withdrawn, and an item
+    handed to a read which is cancelled is kept to be read again.
+    """
+
+    TRUE = 1
+    FALSE = 0
+
+    def __init__(self, serializer=None):
+        self.name = next(_channel_ids)
+        self._readers = collections.deque() # Futures of waiting reads.
+        self._writers = collections.deque() # (future, item) of waiting writes.
+        self._waiters = set()  # Futures of Alts waiting for a writer.
+        self._unread = None    # Rest of a batch being read.
+        self._poisoned = False
+        super(Channel, self).__init__()
+        _debug('Channel created: {0}'.format(self.name))
+
+    def _notify(self):
+        """Wake every Alt waiting on this channel.
+        """
+        if self._waiters:
+            for future in self._waiters:
+                _wake(future)
+            self._waiters = set()
+
+    def add_waiter(self, future):
+        self._waiters.add(future)
+        return True
+
+    def remove_waiter(self, future):
+        self._waiters.discard(future)
+
+    def _give(self, obj):
+        """Hand C{obj} to a waiting read. Return C{True} on success.
+        """
+        while self._readers:
+            if _wake(self._readers.popleft(), obj):
+                return True
+        return False
+
+    def _take(self):
+        """Take (and return) an item from a waiting write, or return
+        L{_EMPTY} if there is none.
+        """
+        while self._writers:
+            future, obj = self._writers.popleft()
+            if _wake(future):
+                return obj
+        return _EMPTY
+
+    def _keep(self, obj):
+        """Keep C{obj}, taken by a read which was cancelled, to be
+        read next.
+        """
+        if self._unread is None:
+            self._unread = collections.deque()
+        self._unread.appendleft(obj)
+        self._notify()
+
+    def is_selectable(self):
+        """Test whether Alt can select this channel.
+        """
+        self.checkpoison()
+        return bool(self._writers or self._unread)
+
+    async def _wait_write(self, obj):
+        """Wait in line until a read takes C{obj}.
+        """
+        future = asyncio.get_running_loop().create_future()
+        entry = (future, obj)
+        self._writers.append(entry)
+        self._notify()
+        try:
+            await future
+        except asyncio.CancelledError:
+            try:
+                self._writers.remove(entry)
+            except ValueError:
+                pass
+            raise
+
+    async def write(self, obj):
+        """Write a Python object to this channel, waiting until a
+        reader has taken it.
+        """
+        self.checkpoison()
+        if not self._give(obj):
+            await self._wait_write(obj)
+
+    async def write_many(self, items):
+        """Write every object in the iterable C{items} to this channel.
+
+        The objects are sent as a single batch, with one rendezvous.
+        Readers receive the objects in order, from any of L{read},
+        L{read_many} or an L{Alt}.
+        """
+        items = list(items)
+        if items:
+            await self.write((_BATCH, items))
+
+    async def _read(self):
+        """Read (and return) the next item written to this channel.
+        """
+        self.checkpoison()
+        obj = self._take()
+        if obj is not _EMPTY:
+            return obj
+        future = asyncio.get_running_loop().create_future()
+        self._readers.append(future)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._keep(future.result())
+            raise
+
+    def _keep_unread(self, obj, count):
+        """Return a list of the first C{count} items of C{obj} if it is
+        a batch, keeping the rest to be read later, or else C{[obj]}.
+        """
+        if not (type(obj) is tuple and len(obj) == 2 and obj[0] is _BATCH):
+            return [obj]
+        items = obj[1]
+        if len(items) > count:
+            if self._unread is None:
+                self._unread = collections.deque()
+            self._unread.extend(items[count:])
+        return items[:count]
+
+    async def read(self):
+        """Read (and return) a Python object from this channel.
+        """
+        if self._unread:
+            return self._unread.popleft()
+        return self._keep_unread(await self._read(), 1)[0]
+
+    async def read_many(self, max_n=_ITER_BATCH):
+        """Read (and return) a list of at least one and at most
+        C{max_n} Python objects from this channel.
+
+        Waits only until one object is available. Reading a batch
+        sent by L{write_many} takes a single rendezvous.
+        """
+        assert max_n > 0
+        if self._unread:
+            return [self._unread.popleft()
+                    for i in range(min(max_n, len(self._unread)))]
+        return self._keep_unread(await self._read(), max_n)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        """Read the next object when iterating over this channel with
+        C{async for}. Iteration stops when the channel is poisoned.
+        """
+        try:
+            return await self.read()
+        except ChannelPoison:
+            raise StopAsyncIteration
+
+    def enable(self):
+        """Enable a read for an Alt select.
+
+        MUST be called before L{select()} or L{is_selectable()}.
+        """
+        self.checkpoison()
+
+    def disable(self):
+        """Disable this channel for Alt selection.
+
+        MUST be called after L{enable} if this channel is not selected.
+        """
+        pass
+
+    def select(self):
+        """Complete a Channel read for an Alt select.
+        """
+        self.checkpoison()
+        if self._unread:
+            return self._unread.popleft()
+        obj = self._take()
+        assert obj is not _EMPTY
+        return self._keep_unread(obj, 1)[0]
+
+    def __str__(self):
+        return 'Channel between asyncio tasks.'
+
+    def checkpoison(self):
+        if self._poisoned:
+            _debug('{0} is poisoned. Raising ChannelPoison()'.format(self.name))
+            raise ChannelPoison()
+
+    def poison(self):
+        """Poison a channel causing all processes using it to terminate.
+
+        Every process waiting on the channel is woken with a
+        L{ChannelPoison} exception, as is every process which uses the
+        channel afterwards.
+        """
+        if self._poisoned:
+            return
+        self._poisoned = True
+        futures = list(self._readers) + [future for future, obj in self._writers]
+        self._readers.clear()
+        self._writers.clear()
+        for future in futures:
+            if not future.done():
+                future.set_exception(ChannelPoison())
+        self._notify()
+
+
+class FileChannel(Channel):
+    """Channel objects which hold no file descriptors.
+
+    Tasks never need file descriptors to communicate, so this is the
+    same as a L{Channel}. It is provided so that programs written for
+    the multiprocessing version of python-csp run unchanged.
+    """
+
+    def __init__(self, serializer=None):
+        super(FileChannel, self).__init__()
+
+    def __str__(self):
+        return 'Channel using files for IPC.'
+
+
+class BufferedChannel(Channel):
+    """Asynchronous channel objects with a fixed capacity.
+
+    Writes on a C{BufferedChannel} only wait when C{capacity} items
+    are already waiting to be read, so a writer can run ahead of its
+    reader. Reads wait until an item is available, as on any other
+    channel, and C{BufferedChannel} objects can be used in an L{Alt}
+    and poisoned in the same way as L{Channel} objects.
+    """
+
+    def __init__(self, capacity, serializer=None):
+        assert capacity > 0
+        self.capacity = capacity
+        self._store = collections.deque()
+        super(BufferedChannel, self).__init__()
+
+    async def write(self, obj):
+        """Write a Python object to this channel.
+
+        Waits only if the buffer is full.
+        """
+        self.checkpoison()
+        if self._give(obj):
+            return
+        if len(self._store) < self.capacity:
+            self._store.append(obj)
+            self._notify()
+            return
+        # Wait in line; a reader moves obj into the buffer.
+        await self._wait_write(obj)
+
+    def _take(self):
+        """Remove and return the oldest item in the buffer, or
+        L{_EMPTY} if it is empty.
+        """
+        if not self._store:
+            return _EMPTY
+        obj = self._store.popleft()
+        while self._writers:
+            future, waiting = self._writers.popleft()
+            if _wake(future):
+                self._store.append(waiting)
+                break
+        return obj
+
+    def is_selectable(self):
+        """Test whether Alt can select this channel.
+        """
+        self.checkpoison()
+        return bool(self._store or self._unread)
+
+    def __str__(self):
+        return 'Buffered channel.'
+
+
+class ChannelFactory(object):
+    """Create channels of one type, reusing channels which have been
+    released.
+
+    Channels are cheap to create in the asyncio version of python-csp,
+    but this class is provided so that programs can use the same
+    interface as with the multiprocessing version:
+
+>>> factory = ChannelFactory()
+>>> channels = [factory.create() for i in range(10000)]
+>>> # ... run processes using the channels ...
+>>> factory.release(*channels)
+>>>
+    """
+
+    def __init__(self, channel_type=Channel, **kwargs):
+        assert issubclass(channel_type, Channel)
+        self.channel_type = channel_type
+        self.kwargs = kwargs
+        self._free = []
+
+    def create(self):
+        """Return a new channel, or a released one if there is one.
+        """
+        if self._free:
+            channel = self._free.pop()
+            channel.name = next(_channel_ids)
+            return channel
+        return self.channel_type(**self.kwargs)
+
+    def release(self, *channels):
+        """Hand C{channels} back to the factory to be reused.
+
+        No process may use a channel once it has been released.
+        Poisoned channels are never reused.
+        """
+        for channel in channels:
+            assert type(channel) is self.channel_type
+            if channel._poisoned:
+                continue
+            channel._readers.clear()
+            channel._writers.clear()
+            channel._unread = None
+            self._free.append(channel)
+
+    def __len__(self):
+        """Number of released channels waiting to be reused."""
+        return len(self._free)
+
+
+class Timer(Guard):
+    """Guard which only commits to synchronisation when a timer has
+    expired.
+
+    Times are read from the clock of the running event loop. Sleeping
+    lets other tasks run, and an L{Alt} waiting on a timer is woken by
+    the event loop when the alarm is due:
+
+>>> timer = Timer()
+>>> await timer.sleep(5) # sleep for 5 seconds
+>>>
+>>> alt = Alt(timer)
+>>> timer.set_alarm(3) # become selectable 3 seconds from now
+>>> await alt.select() # will wait 3 seconds
+>>>
+    """
+
+    def __init__(self):
+        super(Timer, self).__init__()
+        self.now = _now()
+        self.name = 'Timer guard created at:' + str(self.now)
+        self.alarm = None
+        self._handles = {} # Timer handles of waiting Alts.
+
+    def set_alarm(self, timeout):
+        self.now = _now()
+        self.alarm = self.now + timeout
+
+    def is_selectable(self):
+        self.now = _now()
+        if self.alarm is None:
+            return True
+        elif self.now < self.alarm:
+            return False
+        return True
+
+    def read(self):
+        """Return current time.
+        """
+        self.now = _now()
+        return self.now
+
+    async def sleep(self, timeout):
+        """Put this process to sleep for a number of seconds.
+        """
+        await asyncio.sleep(timeout)
+
+    async def sleep_until(self, deadline):
+        """Put this process to sleep until the time C{deadline}, as
+        returned by L{read}.
+        """
+        await asyncio.sleep(max(0.0, deadline - _now()))
+
+    def add_waiter(self, future):
+        if self.alarm is not None:
+            loop = asyncio.get_running_loop()
+            self._handles[future] = loop.call_at(self.alarm, _wake, future)
+        return True
+
+    def remove_waiter(self, future):
+        handle = self._handles.pop(future, None)
+        if handle is not None:
+            handle.cancel()
+
+    def enable(self):
+        pass
+
+    def disable(self):
+        pass
+
+    def select(self):
+        pass
+
+
+### Function decorators
+
+def process(func):
+    """Decorator to turn a function into a CSP process.
+
+    There are two ways to create a new CSP process. Firstly, you can
+    use the @process decorator to convert a function definition into a
+    CSP Process. Once the function has been defined, calling it will
+    return a new CSPProcess object which can be started manually, or
+    used in an expression:
+
+>>> @process
+... async def foo(n):
+...     print('n:', n)
+...
+>>> foo(100).start()
+n: 100
+>>>
+
+    Alternatively, you can create a CSPProcess object directly and pass a
+    function (and its arguments) to the CSPProcess constructor:
+
+>>> p = CSPProcess(foo, 100)
+>>> p.start()
+n: 100
+>>>
+    """
+    @wraps(func)
+    def _call(*args, **kwargs):
+        """Call the target function."""
+        return CSPProcess(func, *args, **kwargs)
+    return _call
+
+
+def forever(func):
+    """Decorator to turn a function into a CSP server process.
+
+    A server process is one which runs in an infinite loop. The
+    function should be an asynchronous generator which yields once
+    per iteration of the loop, as the generators of server processes
+    do in the other versions of python-csp:
+
+>>> @forever
+... async def integers(cout):
+...     n = 0
+...     while True:
+...             await cout.write(n)
+...             n += 1
+...             yield
+...
+>>>
+
+    Alternatively, you can create a CSPServer object directly and pass a
+    function (and its arguments) to the CSPServer constructor:
+
+>>> i = CSPServer(integers, Channel())
+>>>
+    """
+    @wraps(func)
+    def _call(*args, **kwargs):
+        """Call the target function."""
+        return CSPServer(func, *args, **kwargs)
+    return _call
+
+
+### List of CSP based types (class names). Used by _is_csp_type.
+_CSPTYPES = [CSPProcess, Par, Seq, Alt]
+
+
+def _is_csp_type(obj):
+    """Return True if obj is any type of CSP process."""
+    return isinstance(obj, tuple(_CSPTYPES))
+
+
+def _nop():
+    pass
+
+
+class Skip(CSPProcess, Guard):
+    """Guard which will always return C{True}. Useful in L{Alt}s where
+    the programmer wants to ensure that L{Alt.select} will always
+    synchronise with at least one guard.
+
+    Skip is a built in guard type that can be used with Alt
+    objects. Skip() is a default guard which is always ready and has
+    no effect. This is useful where you have a loop which calls
+    select(), pri_select() or fair_select() on an Alt object
+    repeatedly and you do not wish the select statement to block
+    waiting for a channel write, or other synchronisation.
+    """
+
+    def __init__(self):
+        Guard.__init__(self)
+        CSPProcess.__init__(self, _nop)
+        self.name = '__Skip__'
+
+    def is_selectable(self):
+        """Skip is always selectable."""
+        return True
+
+    def enable(self):
+        """Has no effect."""
+        pass
+
+    def disable(self):
+        """Has no effect."""
+        pass
+
+    def select(self):
+        """Has no effect."""
+        return 'Skip'
+
+    def __str__(self):
+        return 'Skip guard is always selectable / process does nothing.'
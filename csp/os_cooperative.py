@@ -0,0 +1,1419 @@
+#!/usr/bin/env python
+
+"""Communicating sequential processes, in Python.
+
+This version of python-csp runs every CSP process as a coroutine
+(a Python generator) on a single OS thread. Processes are switched by
+a scheduler in user space, so a channel rendezvous is a hand-off
+between two generators which needs no locks and no system calls, and
+a program can run hundreds of thousands of processes at once.
+
+Processes must give way to the scheduler wherever they may block.
+Channel reads and writes, L{Alt} selections and joins are therefore
+generators, which a process runs with C{yield from}:
+
+>>> @process
+... def send(cout, data):
+...     yield from cout.write(data)
+...
+>>> @process
+... def recv(cin):
+...     print('Got:', (yield from cin.read()))
+...
+>>> c = Channel()
+>>> Par(send(c, 100), recv(c)).start()
+Got: 100
+>>>
+
+A bare C{yield} lets other processes run, so the generators of
+@forever processes, which yield once per iteration, share the thread
+fairly. Functions which never block need not be generators at all.
+
+An operation which is called without C{yield from} would do nothing,
+so raises C{RuntimeError} in the process instead. Processes written
+for the other versions of python-csp, such as those in
+L{csp.builtins}, must be converted before they can run here.
+
+Any blocking call which is not made through the scheduler, such as
+C{time.sleep}, stops every process. When every process is blocked on
+a channel, L{Deadlock} is raised.
+
+When using CSP Python as a DSL, this module will normally be imported
+via the statement 'from csp.csp import *' with the environment
+variable CSP set to "COOPERATIVE", and should not be imported
+directly.
+
+Copyright (C) python-csp developers, 2026. The process, guard and
+channel classes are adapted from csp.os_thread, Copyright (C)
+Sarah Mount, 2009-10.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have rceeived a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+"""
+
+__author__ = 'python-csp developers'
+__date__ = 'October 2026'
+
+#DEBUG = True
+DEBUG = False
+
+from functools import wraps # Easy decorators
+
+import collections
+import copy
+import heapq
+import inspect
+import itertools
+import logging
+import os
+import random
+import sys
+import time
+
+from .referents import find_channels
+from .timers import get_timer_service, now
+
+CSP_IMPLEMENTATION = 'os_cooperative'
+
+### Names exported by this module
+__all__ = ['set_debug', 'CSPProcess', 'CSPServer', 'Alt',
+           'Par', 'Seq', 'Guard', 'Channel', 'FileChannel',
+           'BufferedChannel', 'ChannelFactory',
+           'process', 'forever', 'Skip', '_CSPTYPES', 'CSP_IMPLEMENTATION']
+
+### Seeded random number generator (16 bytes)
+
+_RANGEN = random.Random(os.urandom(16))
+
+
+### CONSTANTS
+
+_ITER_BATCH = 1024
+"""Most items read at once by L{Channel.read_many} by default."""
+
+_ALT_POLL = 0.01
+"""Seconds between polls of guards which cannot wake an Alt."""
+
+_channel_ids = itertools.count(1)
+"""Channel IDs."""
+
+_debug = logging.debug
+
+
+class NoGuardInAlt(Exception):
+    """Raised when an Alt has no guards to select.
+    """
+
+    def __str__(self):
+        return 'Every Alt must have at least one guard.'
+
+
+class Deadlock(Exception):
+    """Raised when a process is waited for but every process is
+    blocked.
+    """
+
+    def __str__(self):
+        return 'Every CSP process is blocked.'
+
+
+### Special constants / exceptions for termination and mobility
+
+_BATCH = ';;;__BATCH__;;;'
+"""Marks a list of items sent down a channel by write_many()."""
+
+_BLOCK = ';;;__BLOCK__;;;'
+"""Yielded to the scheduler by a process which must wait to be woken."""
+
+_POLL = ';;;__POLL__;;;'
+"""Yielded by a process which must wait, but also be woken regularly."""
+
+_EMPTY = ';;;__EMPTY__;;;'
+"""Returned by L{Channel._take} when no item is waiting."""
+
+
+class ChannelPoison(Exception):
+    """Used to poison a processes and propagate to all known channels.
+    """
+
+    def __str__(self):
+        return 'Posioned channel exception.'
+
+
+### DEBUGGING
+
+def set_debug(status):
+    global DEBUG
+    DEBUG = status
+    logging.basicConfig(level=logging.NOTSET,
+                        stream=sys.stdout)
+    logging.info("Using cooperative version of python-csp.")
+
+
+### The scheduler
+
+
+class _Task(object):
+    """A generator run by the L{_Scheduler}.
+    """
+
+    __slots__ = ('gen', 'owner', 'blocked', 'polling', 'alarm', 'done',
+                 'joiners')
+
+    def __init__(self, gen, owner=None):
+        self.gen = gen
+        self.owner = owner   # Process whose run() generator this is.
+        self.blocked = False # Waiting to be woken.
+        self.polling = False # Waiting, but woken every _ALT_POLL seconds.
+        self.alarm = None    # Entry in _Scheduler.sleeping, if any.
+        self.done = False
+        self.joiners = []    # Tasks waiting for this one to finish.
+
+
+class _Scheduler(object):
+    """Run tasks in turn until the one being waited for has finished.
+
+    Tasks which are ready to run are kept in a FIFO queue, with the
+    value (or exception) to resume them with. A task runs until it
+    yields:
+
+      - C{None} puts it at the back of the queue;
+      - L{_BLOCK} leaves it out of the queue until L{wake} is called;
+      - L{_POLL} also wakes it after L{_ALT_POLL} seconds.
+
+    A blocked task can also be woken at a deadline, see L{wake_at}.
+
+    A blocking operation which a task made but never ran raises
+    C{RuntimeError} in the task when it next makes one, or yields.
+    """
+
+    def __init__(self):
+        self.ready = collections.deque()
+        self.polling = []
+        self.current = None # Task which is running.
+        self.polled = 0.0   # Time polling tasks were last woken.
+        self.sleeping = []  # Heap of (deadline, sequence number, task).
+        self._seq = itertools.count()
+        self.op = None      # Blocking operation made but not yet run.
+
+    def check_op(self):
+        """Raise C{RuntimeError} if a blocking operation was made but
+        not run. A process runs each operation with C{yield from} as
+        soon as it is made, so one which has not started by the time
+        another is made, or the process yields, never will.
+        """
+        op, self.op = self.op, None
+        if op is not None:
+            op.close()
+            raise RuntimeError('{0}() was called without yield from, and '
+                               'so did nothing.'.format(op.__qualname__))
+
+    def spawn(self, gen, owner=None):
+        """Return a new task which runs C{gen}, ready to start.
+        """
+        task = _Task(gen, owner)
+        self.ready.append((task, None, None))
+        return task
+
+    def wake(self, task, value=None, exc=None):
+        """Resume the blocked C{task}, sending it C{value} or raising
+        C{exc} in it. Tasks which are not blocked are left alone, so
+        an Alt woken by several of its guards runs once.
+        """
+        if task.blocked:
+            task.blocked = False
+            task.polling = False
+            task.alarm = None
+            self.ready.append((task, value, exc))
+
+    def wake_at(self, task, deadline):
+        """Wake C{task} at C{deadline}, a time read from
+        L{csp.timers.now}, if it is still blocked then. The task must
+        block straight after calling this.
+        """
+        task.alarm = entry = (deadline, next(self._seq), task)
+        heapq.heappush(self.sleeping, entry)
+
+    def next_deadline(self):
+        """Return the earliest deadline of a task blocked by
+        L{wake_at}, or C{None} if there is none.
+        """
+        sleeping = self.sleeping
+        while sleeping:
+            entry = sleeping[0]
+            if entry[2].alarm is entry:
+                return entry[0]
+            heapq.heappop(sleeping) # Woken already.
+        return None
+
+    def _wake_sleepers(self):
+        """Wake every task whose deadline has passed, first waiting
+        for the earliest one if no other task can run.
+        """
+        deadline = self.next_deadline()
+        if deadline is None:
+            return
+        if not self.ready and not self.polling:
+            delay = deadline - now()
+            if delay > 0:
+                time.sleep(delay)
+        sleeping, current = self.sleeping, now()
+        while sleeping and sleeping[0][0] <= current:
+            entry = heapq.heappop(sleeping)
+            if entry[2].alarm is entry:
+                self.wake(entry[2])
+
+    def join(self, task):
+        """Block the running task until C{task} has finished.
+        """
+        while not task.done:
+            task.joiners.append(self.current)
+            yield _BLOCK
+
+    def par(self, procs):
+        """Run C{procs} in parallel, blocking the running task until
+        all of them have finished.
+        """
+        for proc in procs:
+            proc.spawn()
+        for proc in procs:
+            yield from proc.join()
+
+    def _finish(self, task):
+        task.done = True
+        for joiner in task.joiners:
+            self.wake(joiner)
+        task.joiners = None
+
+    def _poll(self):
+        """Wake every polling task, first waiting until L{_ALT_POLL}
+        seconds after the last poll if no other task is ready.
+        """
+        delay = self.polled + _ALT_POLL - time.time()
+        if delay > 0:
+            if self.ready:
+                return
+            deadline = self.next_deadline()
+            if deadline is not None and deadline - now() < delay:
+                # A sleeping task is due first.
+                time.sleep(max(0.0, deadline - now()))
+                return
+            time.sleep(delay)
+        self.polled = time.time()
+        polling, self.polling = self.polling, []
+        for task in polling:
+            if task.polling:
+                self.wake(task)
+
+    def run(self, task):
+        """Run tasks until C{task} has finished.
+
+        May be called from a running task, which then cannot be
+        resumed until C{task} has finished.
+        """
+        ready = self.ready
+        outer = self.current
+        try:
+            while not task.done:
+                if self.sleeping:
+                    self._wake_sleepers()
+                if self.polling:
+                    self._poll()
+                if not ready:
+                    raise Deadlock()
+                current, value, exc = ready.popleft()
+                self.current = current
+                try:
+                    if exc is None:
+                        signal = current.gen.send(value)
+                    else:
+                        signal = current.gen.throw(exc)
+                except StopIteration:
+                    self._finish(current)
+                    continue
+                except BaseException:
+                    self._finish(current)
+                    raise
+                if self.op is not None:
+                    try:
+                        self.check_op()
+                    except RuntimeError as error:
+                        ready.append((current, None, error))
+                        continue
+                if signal is None:
+                    ready.append((current, None, None))
+                else:
+                    current.blocked = True
+                    if signal is _POLL:
+                        current.polling = True
+                        self.polling.append(current)
+        finally:
+            self.current = outer
+
+_scheduler = _Scheduler()
+
+
+def _blocking(method):
+    """Decorator for generators of blocking operations, so that an
+    operation which a process never runs with C{yield from} raises an
+    error instead of doing nothing.
+
+    The generator must first set C{_scheduler.op} to C{None}, to show
+    that it has been run.
+    """
+    @wraps(method)
+    def _call(*args, **kwargs):
+        scheduler = _scheduler
+        if scheduler.op is not None:
+            scheduler.check_op()
+        scheduler.op = op = method(*args, **kwargs)
+        return op
+    return _call
+
+
+### Poison propagation
+
+def _find_channels(referents):
+    """Return the channels in C{referents}, each once. See
+    L{csp.referents.find_channels}.
+    """
+    return find_channels(referents, Channel, Alt, (Par, Seq), CSPProcess)
+
+
+### Fundamental CSP concepts -- Processes, Channels, Guards
+
+class _CSPOpMixin(object):
+    """Mixin class used for operator overloading in CSP process types.
+
+    Subclasses provide a L{run} generator, which runs the process
+    cooperatively. A process may call L{start} from anywhere, and
+    L{run} it to completion from another process with::
+
+        yield from proc.run()
+    """
+
+    def __init__(self):
+        self._task = None
+
+    def spawn(self):
+        """Start only if self is not running. Return immediately.
+        """
+        if self._task is None:
+            self._task = _scheduler.spawn(self.run(), self)
+        return self._task
+
+    def start(self):
+        """Start only if self is not running, then run processes until
+        self has finished.
+        """
+        _scheduler.run(self.spawn())
+
+    @_blocking
+    def join(self):
+        """Generator which blocks the running process until self has
+        finished.
+        """
+        _scheduler.op = None
+        if self._task is not None:
+            yield from _scheduler.join(self._task)
+
+    def run(self):
+        """Generator which runs this process. Must be overridden in
+        subclasses.
+        """
+        raise NotImplementedError('Must be implemented in subclass')
+
+    # Channels given to this process, recorded when it is created.
+    _channels = ()
+
+    def referent_visitor(self, referents):
+        """Poison the channels found in C{referents} by
+        L{_find_channels}.
+        """
+        for channel in _find_channels(referents):
+            channel.poison()
+
+    def _poison_channels(self):
+        """Poison the channels this process was given, after it has
+        caught a L{ChannelPoison}.
+        """
+        for channel in self._channels:
+            channel.poison()
+
+    def terminate(self):
+        """Terminate only if self is running.
+        """
+        task = self._task
+        if task is not None and not task.done:
+            _debug('{0} terminating now...'.format(self.getName()))
+            task.gen.close()
+            task.blocked = False
+            _scheduler._finish(task)
+
+    def getName(self):
+        return id(self)
+
+    def getPid(self):
+        """Return the ID of this process.
+
+        The name of this method ensures that the CSPProcess interface
+        in this module is identical to the one defined in
+        os_process.py.
+        """
+        return id(self)
+
+    def __gt__(self, other):
+        """Implementation of CSP Seq."""
+        assert _is_csp_type(other)
+        seq = Seq(self, other)
+        seq.start()
+        return seq
+
+    def __mul__(self, n):
+        assert n > 0
+        procs = [self]
+        for i in range(n-1):
+            procs.append(copy.copy(self))
+        Seq(*procs).start()
+
+    def __rmul__(self, n):
+        assert n > 0
+        procs = [self]
+        for i in range(n-1):
+            procs.append(copy.copy(self))
+        Seq(*procs).start()
+
+
+class CSPProcess(_CSPOpMixin):
+    """Implementation of CSP processes.
+
+    There are two ways to create a new CSP process. Firstly, you can
+    use the @process decorator to convert a function definition into a
+    CSP Process. Once the function has been defined, calling it will
+    return a new CSPProcess object which can be started manually, or
+    used in an expression:
+
+>>> @process
+... def foo(n):
+...     print('n:', n)
+...
+>>> foo(100).start()
+n: 100
+>>> foo(10) // (foo(20),)
+n: 10
+n: 20
+>>>
+
+    Alternatively, you can create a CSPProcess object directly and
+    pass a function (and its arguments) to the CSPProcess constructor:
+
+>>> def foo(n):
+...     print('n:', n)
+...
+>>> p = CSPProcess(foo, 100)
+>>> p.start()
+n: 100
+>>>
+
+    The function may be a generator, which uses C{yield from} to
+    block on channels and other processes, or a plain function which
+    never blocks.
+    """
+
+    def __init__(self, func, *args, **kwargs):
+        assert inspect.isfunction(func) # Check we aren't using objects
+        assert not inspect.ismethod(func) # Check we aren't using objects
+        _CSPOpMixin.__init__(self)
+        self._target = func
+        self._args = args
+        self._kwargs = kwargs
+        for arg in args + tuple(kwargs.values()):
+            if _is_csp_type(arg):
+                arg.enclosing = self
+        self.enclosing = None
+        self._channels = _find_channels(args + tuple(kwargs.values()))
+
+    def __floordiv__(self, proclist):
+        """
+        Run this process in parallel with a list of others.
+        """
+        par = Par(self, *list(proclist))
+        par.start()
+
+    def __str__(self):
+        return 'CSPProcess running in coroutine {0}'.format(self.getName())
+
+    def run(self):
+        """Generator which runs the target function of this process.
+        """
+        try:
+            body = self._target(*self._args, **self._kwargs)
+            if inspect.isgenerator(body):
+                yield from body
+            if _scheduler.op is not None:
+                _scheduler.check_op()
+        except ChannelPoison:
+            _debug('{0} in {1} got ChannelPoison exception'.format(str(self), self.getPid()))
+            self._poison_channels()
+        except Exception:
+            typ, excn, tback = sys.exc_info()
+            sys.excepthook(typ, excn, tback)
+
+
+class CSPServer(CSPProcess):
+    """Implementation of CSP server processes.
+    Not intended to be used in client code. Use @forever instead.
+
+    Each bare C{yield} in the generator of a server ends one iteration
+    and lets other processes run.
+    """
+
+    def __init__(self, func, *args, **kwargs):
+        CSPProcess.__init__(self, func, *args, **kwargs)
+
+    def __str__(self):
+        return 'CSPServer running in coroutine {0}'.format(self.getPid())
+
+
+class Alt(_CSPOpMixin):
+    """CSP select (OCCAM ALT) process.
+
+    python-csp process will often have access to several different
+    channels, or other guard types such as timer guards, and will have
+    to choose one of them to read from. Alt objects choose the first
+    guard in a list to become ready.
+
+    The select() methods are generators, which block the running
+    process until a guard is ready:
+
+>>> @process
+... def send_msg(chan, msg):
+...     yield from chan.write(msg)
+...
+>>> @process
+... def alt_example(chan1, chan2):
+...     alt = Alt(chan1, chan2)
+...     print((yield from alt.select()))
+...     print((yield from alt.select()))
+...
+>>> c1, c2 = Channel(), Channel()
+>>> Par(send_msg(c1, 'yes'), send_msg(c2, 'no'), alt_example(c1, c2)).start()
+yes
+no
+>>>
+
+    As in the other versions of python-csp, select() chooses a ready
+    guard at random, fair_select() avoids the previously selected
+    guard and pri_select() chooses the first ready guard in the order
+    they were passed to the Alt() constructor. The choice operator,
+    "|", also returns a generator:
+
+>>> @process
+... def choice(chan1, chan2):
+...     print((yield from chan1 | chan2))
+...
+>>>
+
+    Each select() method takes an optional C{timeout} in seconds,
+    after which it returns C{None} if no guard has become ready.
+
+    Channels wake a waiting Alt as soon as a writer arrives and timers
+    wake it when their alarm is due, through the timer service. Other
+    guards are polled every L{_ALT_POLL} seconds.
+    """
+
+    def __init__(self, *args):
+        super(Alt, self).__init__()
+        for arg in args:
+            assert isinstance(arg, Guard)
+        self.guards = list(args)
+        self.last_selected = None
+
+    def poison(self):
+        """Poison the last selected guard and unlink from the guard list.
+
+        Sets self.last_selected to None.
+        """
+        _debug(str(type(self.last_selected)))
+        self.last_selected.disable() # Just in case
+        try:
+            self.last_selected.poison()
+        except Exception:
+            pass
+        _debug('Poisoned last selected.')
+        self.guards.remove(self.last_selected)
+        _debug('{0} guards'.format(len(self.guards)))
+        self.last_selected = None
+
+    def _ready(self, timeout=None):
+        """Generator which enables every guard and returns the list of
+        selectable guards, blocking until there is at least one, or
+        until C{timeout} seconds have passed, when the list is empty.
+        """
+        if len(self.guards) == 0:
+            raise NoGuardInAlt()
+        if timeout is not None:
+            deadline = now() + timeout
+        timed = any(guard._timed for guard in self.guards)
+        while True:
+            for guard in self.guards:
+                guard.enable()
+            ready = [guard for guard in self.guards if guard.is_selectable()]
+            _debug('Alt got {0} items to choose from out of {1}'.format(len(ready), len(self.guards)))
+            if ready:
+                return ready
+            wait = None
+            if timeout is not None:
+                wait = deadline - now()
+                if wait <= 0:
+                    return ready
+            if timed:
+                wait = get_timer_service().timeout(wait)
+            task = _scheduler.current
+            signal = _BLOCK
+            for guard in self.guards:
+                if not guard._timed and not guard.add_waiter(task):
+                    signal = _POLL
+            if wait is not None:
+                _scheduler.wake_at(task, now() + wait)
+            try:
+                yield signal
+            finally:
+                for guard in self.guards:
+                    guard.remove_waiter(task)
+
+    def _commit(self, selected):
+        self.last_selected = selected
+        for guard in self.guards:
+            if guard is not selected:
+                guard.disable()
+        return selected.select()
+
+    @_blocking
+    def select(self, timeout=None):
+        """Generator which randomly selects from ready guards. Returns
+        C{None} if none is ready within C{timeout} seconds.
+        """
+        _scheduler.op = None
+        ready = yield from self._ready(timeout)
+        if not ready:
+            return None
+        return self._commit(_RANGEN.choice(ready))
+
+    @_blocking
+    def fair_select(self, timeout=None):
+        """Generator which selects a guard to synchronise with. Do not
+        select the previously selected guard (unless it is the only
+        guard available). Returns C{None} if no guard is ready within
+        C{timeout} seconds.
+        """
+        _scheduler.op = None
+        ready = yield from self._ready(timeout)
+        if not ready:
+            return None
+        if self.last_selected in ready and len(ready) > 1:
+            ready.remove(self.last_selected)
+            _debug('Alt removed last selected from ready list')
+        return self._commit(_RANGEN.choice(ready))
+
+    @_blocking
+    def pri_select(self, timeout=None):
+        """Generator which selects a guard to synchronise with, in
+        order of "priority". The guard with the lowest index in the
+        L{guards} list has the highest priority. Returns C{None} if no
+        guard is ready within C{timeout} seconds.
+        """
+        _scheduler.op = None
+        ready = yield from self._ready(timeout)
+        if not ready:
+            return None
+        return self._commit(ready[0])
+
+    def __mul__(self, n):
+        assert n > 0
+        for i in range(n):
+            yield self.select()
+
+    def __rmul__(self, n):
+        assert n > 0
+        for i in range(n):
+            yield self.select()
+
+
+class Par(_CSPOpMixin):
+    """Run CSP processes in parallel.
+
+    There are two ways to run processes in parallel.  Firstly, given
+    two (or more) processes you can parallelize them with the //
+    operator, like this:
+
+>>> @process
+... def foo(n):
+...     print('n:', n)
+...
+>>> foo(1) // (foo(2), foo(3))
+n: 1
+n: 2
+n: 3
+>>>
+
+    Notice that the // operator takes a CSPProcess on the left hand side
+    and a sequence of processes on the right hand side.
+
+    Alternatively, you can create a Par object which is a sort of CSP
+    process and start that process manually:
+
+>>> p = Par(foo(100), foo(200), foo(300))
+>>> p.start()
+n: 100
+n: 200
+n: 300
+>>>
+    """
+
+    def __init__(self, *procs, **kwargs):
+        super(Par, self).__init__()
+        self.procs = []
+        for proc in procs:
+            # FIXME: only catches shallow nesting.
+            if isinstance(proc, Par):
+                self.procs += proc.procs
+            else:
+                self.procs.append(proc)
+        for proc in self.procs:
+            proc.enclosing = self
+        _debug('{0} processes in Par:'.format(len(self.procs)))
+
+    def __ifloordiv__(self, proclist):
+        """
+        Run this Par in parallel with a list of others.
+        """
+        assert hasattr(proclist, '__iter__')
+        self.procs = []
+        for proc in proclist:
+            # FIXME: only catches shallow nesting.
+            if isinstance(proc, Par):
+                self.procs += proc.procs
+            else:
+                self.procs.append(proc)
+        for proc in self.procs:
+            proc.enclosing = self
+        _debug('{0} processes added to Par by //:'.format(len(self.procs)))
+        self.start()
+
+    def __str__(self):
+        return 'CSP Par running in coroutine {0}.'.format(self.getPid())
+
+    def terminate(self):
+        """Terminate the execution of this process.
+        """
+        for proc in self.procs:
+            proc.terminate()
+        _CSPOpMixin.terminate(self)
+
+    def run(self):
+        """Generator which runs the parallel processes and returns
+        when all of them have returned.
+        """
+        yield from _scheduler.par(self.procs)
+
+    def __len__(self):
+        return len(self.procs)
+
+    def __getitem__(self, index):
+        """Can raise an IndexError if index is not a valid index of
+        self.procs.
+        """
+        return self.procs[index]
+
+    def __setitem__(self, index, value):
+        assert isinstance(value, CSPProcess)
+        self.procs[index] = value
+
+    def __contains__(self, proc):
+        return proc in self.procs
+
+
+class Seq(_CSPOpMixin):
+    """Run CSP processes sequentially.
+
+    There are two ways to run processes in sequence.  Firstly, given
+    two (or more) processes you can sequence them with the > operator,
+    like this:
+
+>>> @process
+... def foo(n):
+...     print('n:', n)
+...
+>>> foo(1) > foo(2) > foo(3)
+n: 1
+n: 2
+n: 3
+>>>
+
+    Secondly, you can create a Seq object which is a sort of CSP
+    process and start that process manually:
+
+>>> s = Seq(foo(100), foo(200), foo(300))
+>>> s.start()
+n: 100
+n: 200
+n: 300
+>>>
+    """
+
+    def __init__(self, *procs):
+        super(Seq, self).__init__()
+        self.procs = []
+        for proc in procs:
+            # FIXME: only catches shallow nesting.
+            if isinstance(proc, Seq):
+                self.procs += proc.procs
+            else:
+                self.procs.append(proc)
+        for proc in self.procs:
+            proc.enclosing = self
+
+    def __str__(self):
+        return 'CSP Seq running in coroutine {0}.'.format(self.getPid())
+
+    def run(self):
+        """Generator which runs each process in turn, in this
+        coroutine.
+        """
+        for proc in self.procs:
+            yield from proc.run()
+
+
+### Guards and channels
+
+class Guard(object):
+    """Abstract class to represent CSP guards.
+
+    All methods must be overridden in subclasses. None of them may
+    block, since an L{Alt} only calls L{select} on a guard which is
+    selectable.
+    """
+
+    # True for guards, such as timers, whose alarms are kept by the
+    # timer service of the process rather than polled by an Alt.
+    _timed = False
+
+    def is_selectable(self):
+        """Should return C{True} if this guard can be selected by an L{Alt}.
+        """
+        raise NotImplementedError('Must be implemented in subclass')
+
+    def enable(self):
+        """Prepare for, but do not commit to a synchronisation.
+        """
+        raise NotImplementedError('Must be implemented in subclass')
+
+    def disable(self):
+        """Roll back from an L{enable} call.
+        """
+        raise NotImplementedError('Must be implemented in subclass')
+
+    def select(self):
+        """Commit to a synchronisation started by L{enable}.
+        """
+        raise NotImplementedError('Must be implemented in subclass')
+
+    def poison(self):
+        """Terminate all processes attached to this guard.
+        """
+        pass
+
+    def add_waiter(self, task):
+        """Arrange for the scheduler task C{task} to be woken whenever
+        this guard may have become selectable. Return C{False} if this
+        guard cannot do so, in which case an L{Alt} will poll it
+        instead.
+        """
+        return False
+
+    def remove_waiter(self, task):
+        """Roll back from an L{add_waiter} call.
+        """
+        pass
+
+    def __str__(self):
+        return 'CSP Guard: must be subclassed.'
+
+    def __or__(self, other):
+        assert isinstance(other, Guard)
+        return Alt(self, other).select()
+
+    def __ror__(self, other):
+        assert isinstance(other, Guard)
+        return Alt(self, other).select()
+
+
+class Channel(Guard):
+    """CSP Channel objects.
+
+    Channels between coroutines pass references to objects, without
+    copying them, so the C{serializer} argument accepted by channels
+    in the multiprocessing version of python-csp is ignored here. A
+    rendezvous hands the item, and control, from one coroutine to the
+    other, so channels hold no locks and no file descriptors and are
+    cheap enough to create by the hundred thousand.
+
+    A CSP channel can be created with the Channel class:
+
+>>> c = Channel()
+>>>
+
+    Each Channel object has a unique name within the program:
+
+>>> print(c.name)
+1
+>>>
+
+    The read() and write() methods of a channel are generators, which
+    block the process running them until the rendezvous is complete.
+    For example:
+
+>>> @process
+... def send(cout, data):
+...     yield from cout.write(data)
+...
+>>> @process
+... def recv(cin):
+...     print('Got:', (yield from cin.read()))
+...
+>>> c = Channel()
+>>> send(c, 100) // (recv(c),)
+Got: 100
+>>>
+    """
+
+    TRUE = 1
+    FALSE = 0
+
+    def __init__(self, serializer=None):
+        self.name = next(_channel_ids)
+        self._readers = []     # Tasks blocked in read().
+        self._writers = []     # (task, item) pairs blocked in write().
+        self._waiters = []     # Tasks of Alts waiting for a writer.
+        self._unread = None    # Rest of a batch being read.
+        self._poisoned = False
+        super(Channel, self).__init__()
+        _debug('Channel created: {0}'.format(self.name))
+
+    def _notify(self):
+        """Wake every Alt waiting on this channel.
+        """
+        if self._waiters:
+            for task in self._waiters:
+                _scheduler.wake(task)
+            self._waiters = []
+
+    def add_waiter(self, task):
+        self._waiters.append(task)
+        return True
+
+    def remove_waiter(self, task):
+        try:
+            self._waiters.remove(task)
+        except ValueError:
+            pass
+
+    def _take(self):
+        """Take (and return) an item from a blocked writer, or return
+        L{_EMPTY} if there is none.
+        """
+        if self._writers:
+            task, obj = self._writers.pop(0)
+            _scheduler.wake(task)
+            return obj
+        return _EMPTY
+
+    def is_selectable(self):
+        """Test whether Alt can select this channel.
+        """
+        self.checkpoison()
+        return bool(self._writers or self._unread)
+
+    @_blocking
+    def write(self, obj):
+        """Generator which writes a Python object to this channel,
+        blocking until a reader has taken it.
+        """
+        _scheduler.op = None
+        self.checkpoison()
+        if self._readers:
+            _scheduler.wake(self._readers.pop(0), obj)
+            return
+        self._writers.append((_scheduler.current, obj))
+        self._notify()
+        yield _BLOCK
+
+    @_blocking
+    def write_many(self, items):
+        """Generator which writes every object in the iterable
+        C{items} to this channel.
+
+        The objects are sent as a single batch, with one rendezvous.
+        Readers receive the objects in order, from any of L{read},
+        L{read_many} or an L{Alt}.
+        """
+        _scheduler.op = None
+        items = list(items)
+        if items:
+            yield from self.write((_BATCH, items))
+
+    def _read(self):
+        """Generator which reads (and returns) the next item written
+        to this channel.
+        """
+        self.checkpoison()
+        obj = self._take()
+        if obj is _EMPTY:
+            self._readers.append(_scheduler.current)
+            obj = yield _BLOCK
+        return obj
+
+    def _keep_unread(self, obj, count):
+        """Return a list of the first C{count} items of C{obj} if it is
+        a batch, keeping the rest to be read later, or else C{[obj]}.
+        """
+        if not (type(obj) is tuple and len(obj) == 2 and obj[0] is _BATCH):
+            return [obj]
+        items = obj[1]
+        if len(items) > count:
+            self._unread = collections.deque(items[count:])
+        return items[:count]
+
+    @_blocking
+    def read(self):
+        """Generator which reads (and returns) a Python object from
+        this channel.
+        """
+        _scheduler.op = None
+        if self._unread:
+            return self._unread.popleft()
+        self.checkpoison()
+        obj = self._take()
+        if obj is _EMPTY:
+            self._readers.append(_scheduler.current)
+            obj = yield _BLOCK
+        if type(obj) is tuple and len(obj) == 2 and obj[0] is _BATCH:
+            return self._keep_unread(obj, 1)[0]
+        return obj
+
+    @_blocking
+    def read_many(self, max_n=_ITER_BATCH):
+        """Generator which reads (and returns) a list of at least one
+        and at most C{max_n} Python objects from this channel.
+
+        Blocks only until one object is available. Reading a batch
+        sent by L{write_many} takes a single rendezvous.
+        """
+        _scheduler.op = None
+        assert max_n > 0
+        if self._unread:
+            return [self._unread.popleft()
+                    for i in range(min(max_n, len(self._unread)))]
+        obj = yield from self._read()
+        return self._keep_unread(obj, max_n)
+
+    def enable(self):
+        """Enable a read for an Alt select.
+
+        MUST be called before L{select()} or L{is_selectable()}.
+        """
+        self.checkpoison()
+
+    def disable(self):
+        """Disable this channel for Alt selection.
+
+        MUST be called after L{enable} if this channel is not selected.
+        """
+        pass
+
+    def select(self):
+        """Complete a Channel read for an Alt select.
+        """
+        self.checkpoison()
+        if self._unread:
+            return self._unread.popleft()
+        obj = self._take()
+        assert obj is not _EMPTY
+        return self._keep_unread(obj, 1)[0]
+
+    def __str__(self):
+        return 'Channel between coroutines.'
+
+    def checkpoison(self):
+        if self._poisoned:
+            _debug('{0} is poisoned. Raising ChannelPoison()'.format(self.name))
+            raise ChannelPoison()
+
+    def poison(self):
+        """Poison a channel causing all processes using it to terminate.
+
+        Every process blocked on the channel is woken with a
+        L{ChannelPoison} exception, as is every process which uses the
+        channel afterwards.
+        """
+        if self._poisoned:
+            return
+        self._poisoned = True
+        readers, self._readers = self._readers, []
+        writers, self._writers = self._writers, []
+        for task in readers:
+            _scheduler.wake(task, exc=ChannelPoison())
+        for task, obj in writers:
+            _scheduler.wake(task, exc=ChannelPoison())
+        self._notify()
+
+
+class FileChannel(Channel):
+    """Channel objects which hold no file descriptors.
+
+    Coroutines never need file descriptors to communicate, so this is
+    the same as a L{Channel}. It is provided so that programs written
+    for the multiprocessing version of python-csp run unchanged.
+    """
+
+    def __init__(self, serializer=None):
+        super(FileChannel, self).__init__()
+
+    def __str__(self):
+        return 'Channel using files for IPC.'
+
+
+class BufferedChannel(Channel):
+    """Asynchronous channel objects with a fixed capacity.
+
+    Writes on a C{BufferedChannel} only block when C{capacity} items
+    are already waiting to be read, so a writer can run ahead of its
+    reader. Reads block until an item is available, as on any other
+    channel, and C{BufferedChannel} objects can be used in an L{Alt}
+    and poisoned in the same way as L{Channel} objects.
+    """
+
+    def __init__(self, capacity, serializer=None):
+        assert capacity > 0
+        self.capacity = capacity
+        self._store = collections.deque()
+        super(BufferedChannel, self).__init__()
+
+    @_blocking
+    def write(self, obj):
+        """Generator which writes a Python object to this channel.
+
+        Blocks only if the buffer is full.
+        """
+        _scheduler.op = None
+        self.checkpoison()
+        if self._readers:
+            _scheduler.wake(self._readers.pop(0), obj)
+        elif len(self._store) < self.capacity:
+            self._store.append(obj)
+            self._notify()
+        else:
+            # Wait in line; a reader moves obj into the buffer.
+            self._writers.append((_scheduler.current, obj))
+            yield _BLOCK
+
+    def _take(self):
+        """Remove and return the oldest item in the buffer, or
+        L{_EMPTY} if it is empty.
+        """
+        if not self._store:
+            return _EMPTY
+        obj = self._store.popleft()
+        if self._writers:
+            task, waiting = self._writers.pop(0)
+            self._store.append(waiting)
+            _scheduler.wake(task)
+        return obj
+
+    def is_selectable(self):
+        """Test whether Alt can select this channel.
+        """
+        self.checkpoison()
+        return bool(self._store or self._unread)
+
+    def __str__(self):
+        return 'Buffered channel.'
+
+
+class ChannelFactory(object):
+    """Create channels of one type, reusing channels which have been
+    released.
+
+    Channels are cheap to create in the cooperative version of
+    python-csp, but this class is provided so that programs can use
+    the same interface as with the multiprocessing version:
+
+>>> factory = ChannelFactory()
+>>> channels = [factory.create() for i in range(10000)]
+>>> # ... run processes using the channels ...
+>>> factory.release(*channels)
+>>>
+    """
+
+    def __init__(self, channel_type=Channel, **kwargs):
+        assert issubclass(channel_type, Channel)
+        self.channel_type = channel_type
+        self.kwargs = kwargs
+        self._free = []
+
+    def create(self):
+        """Return a new channel, or a released one if there is one.
+        """
+        if self._free:
+            channel = self._free.pop()
+            channel.name = next(_channel_ids)
+            return channel
+        return self.channel_type(**self.kwargs)
+
+    def release(self, *channels):
+        """Hand C{channels} back to the factory to be reused.
+
+        No process may use a channel once it has been released.
+        Poisoned channels are never reused.
+        """
+        for channel in channels:
+            assert type(channel) is self.channel_type
+            if channel._poisoned:
+                continue
+            assert not (channel._readers or channel._writers)
+            channel._unread = None
+            self._free.append(channel)
+
+    def __len__(self):
+        """Number of released channels waiting to be reused."""
+        return len(self._free)
+
+
+### Function decorators
+
+def process(func):
+    """Decorator to turn a function into a CSP process.
+
+    There are two ways to create a new CSP process. Firstly, you can
+    use the @process decorator to convert a function definition into a
+    CSP Process. Once the function has been defined, calling it will
+    return a new CSPProcess object which can be started manually, or
+    used in an expression:
+
+>>> @process
+... def foo(n):
+...     print('n:', n)
+...
+>>> foo(100).start()
+n: 100
+>>>
+
+    Alternatively, you can create a CSPProcess object directly and pass a
+    function (and its arguments) to the CSPProcess constructor:
+
+>>> def foo(n):
+...     print('n:', n)
+...
+>>> p = CSPProcess(foo, 100)
+>>> p.start()
+n: 100
+>>>
+    """
+    @wraps(func)
+    def _call(*args, **kwargs):
+        """Call the target function."""
+        return CSPProcess(func, *args, **kwargs)
+    return _call
+
+
+def forever(func):
+    """Decorator to turn a function into a CSP server process.
+
+    A server process is one which runs in an infinite loop. The
+    function must be a generator which yields once per iteration of
+    the loop, giving other processes the chance to run:
+
+>>> @forever
+... def integers(cout):
+...     n = 0
+...     while True:
+...             yield from cout.write(n)
+...             n += 1
+...             yield
+...
+>>>
+
+    Alternatively, you can create a CSPServer object directly and pass a
+    function (and its arguments) to the CSPServer constructor:
+
+>>> i = CSPServer(integers, Channel())
+>>>
+    """
+    @wraps(func)
+    def _call(*args, **kwargs):
+        """Call the target function."""
+        return CSPServer(func, *args, **kwargs)
+    return _call
+
+
+### List of CSP based types (class names). Used by _is_csp_type.
+_CSPTYPES = [CSPProcess, Par, Seq, Alt]
+
+
+def _is_csp_type(obj):
+    """Return True if obj is any type of CSP process."""
+    return isinstance(obj, tuple(_CSPTYPES))
+
+
+def _nop():
+    pass
+
+
+class Skip(CSPProcess, Guard):
+    """Guard which will always return C{True}. Useful in L{Alt}s where
+    the programmer wants to ensure that L{Alt.select} will always
+    synchronise with at least one guard.
+
+    Skip is a built in guard type that can be used with Alt
+    objects. Skip() is a default guard which is always ready and has
+    no effect. This is useful where you have a loop which calls
+    select(), pri_select() or fair_select() on an Alt object
+    repeatedly and you do not wish the select statement to block
+    waiting for a channel write, or other synchronisation.
+    """
+
+    def __init__(self):
+        Guard.__init__(self)
+        CSPProcess.__init__(self, _nop)
+        self.name = '__Skip__'
+
+    def is_selectable(self):
+        """Skip is always selectable."""
+        return True
+
+    def enable(self):
+        """Has no effect."""
+        pass
+
+    def disable(self):
+        """Has no effect."""
+        pass
+
+    def select(self):
+        """Has no effect."""
+        return 'Skip'
+
+    def __str__(self):
+        return 'Skip guard is always selectable / process does nothing.'
@@ -0,0 +1,772 @@
+#!/usr/bin/env python
+
+"""Communicating sequential processes, in Python.
+
+This version of python-csp runs lightweight CSP processes on every
+core. A L{Runtime} starts one worker OS process per core, and each
+worker runs a cooperative scheduler, as in L{csp.os_cooperative}, so
+processes are generators which block with C{yield from}:
+
+>>> @process
+... def send(cout, data):
+...     yield from cout.write(data)
+...
+>>> @process
+... def recv(cin):
+...     print('Got:', (yield from cin.read()))
+...
+>>> c = Channel()
+>>> with Runtime():
+...     Par(send(c, 100), recv(c)).start()
+...
+Got: 100
+>>>
+
+The main process is worker 0. A L{Par} started there shares its
+processes out between the workers in contiguous blocks, the first
+block staying in the main process, and each channel used by the Par
+is kept by the worker which runs most of its users. Processes which
+must run in the main process, for example to update its variables,
+should therefore be passed first. Pars started inside workers run
+where they are started, and idle workers steal processes which have
+not yet started from busy ones, so work spreads out as it is created.
+
+A rendezvous between two processes in the same worker is a hand-off
+between generators, exactly as in the cooperative version. Processes
+in other workers reach a channel through its home worker: items are
+pickled (with large buffers passed through shared memory, see
+L{csp.serializers}) and sent down a pipe to the home worker, which
+performs the operation on their behalf. A remote write completes when
+a reader at home has taken the item. A remote read, or an L{Alt} on a
+remote channel, asks the home worker for the next item in advance, so
+an item fetched for an Alt which then selects another guard waits in
+the remote worker for its next read of that channel.
+
+Processes are pickled, as by L{csp.os_process.ProcessPool}, when they
+are sent to another worker. Processes which cannot be pickled always
+run where they were started. Every process which has started stays in
+its worker until it finishes. There is no deadlock detection across
+workers: a network in which every process is blocked waits forever.
+
+When using CSP Python as a DSL, this module will normally be imported
+via the statement 'from csp.csp import *' with the environment
+variable CSP set to "HYBRID", and should not be imported directly. A
+default L{Runtime} is then started by the first L{Par} to run.
+
+Copyright (C) python-csp developers, 2026.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have rceeived a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
+"""
+
+__author__ = 'python-csp developers'
+__date__ = 'October 2026'
+
+import atexit
+import collections
+import inspect
+import io
+import itertools
+import multiprocessing
+import os
+import pickle
+import threading
+import time
+import weakref
+
+from . import os_cooperative as _cooperative
+from .os_cooperative import (set_debug, CSPProcess, CSPServer, Alt, Seq,
+                             Guard, ChannelPoison, process, forever, Skip,
+                             _CSPTYPES, _BLOCK, _debug)
+from .os_process import _PoolPickler
+from .serializers import _share_buffer, _map_buffer, _BUFFERS, _ZEROCOPY_MIN
+
+CSP_IMPLEMENTATION = 'os_hybrid'
+
+### Names exported by this module
+__all__ = ['set_debug', 'CSPProcess', 'CSPServer', 'Alt',
+           'Par', 'Seq', 'Guard', 'Channel', 'FileChannel',
+           'BufferedChannel', 'ChannelFactory',
+           'process', 'forever', 'Skip', 'Runtime', '_CSPTYPES',
+           'CSP_IMPLEMENTATION']
+
+
+### CONSTANTS
+
+_STEAL_TIMEOUT = 0.1
+"""Seconds an idle worker waits for processes before asking another
+worker for them."""
+
+_STEAL_BATCH = 256
+"""Most processes given away in answer to one steal."""
+
+_runtime = None
+"""The running L{Runtime}, in the main process."""
+
+
+### Serialisation
+
+class _HybridPickler(_PoolPickler):
+    """Pickle messages between the workers of a L{Runtime}.
+
+    Functions are pickled by value where necessary, as for a
+    L{csp.os_process.ProcessPool}. Channels are pickled as references
+    to their home worker.
+    """
+
+    def persistent_id(self, obj):
+        if isinstance(obj, _Mobile):
+            return _cooperative._scheduler._channel_ref(obj)
+        return None
+
+
+class _HybridUnpickler(pickle.Unpickler):
+    """Unpickle messages pickled by L{_HybridPickler}.
+    """
+
+    def persistent_load(self, ref):
+        return _cooperative._scheduler._load_channel(ref)
+
+
+def _dumps(obj):
+    """Pickle C{obj}, passing large buffers through shared memory.
+    """
+    names = []
+    data = io.BytesIO()
+    _HybridPickler(data, pickle.HIGHEST_PROTOCOL,
+                   buffer_callback=lambda buf: _share_buffer(buf, names)).dump(obj)
+    if names:
+        return pickle.dumps((_BUFFERS, names, data.getvalue()),
+                            protocol=pickle.HIGHEST_PROTOCOL)
+    return data.getvalue()
+
+
+def _loads(data):
+    """Unpickle an object pickled by L{_dumps}.
+    """
+    obj = _HybridUnpickler(io.BytesIO(data)).load()
+    if type(obj) is tuple and len(obj) == 3 and obj[0] == _BUFFERS:
+        obj = _HybridUnpickler(io.BytesIO(obj[2]),
+                               buffers=[_map_buffer(name) for name in obj[1]]).load()
+    return obj
+
+
+def _out_of_band(obj):
+    """Mark C{obj} to be passed through shared memory if it is a large
+    buffer, as L{csp.serializers.PickleSerializer} does.
+    """
+    if (isinstance(obj, (bytes, bytearray, memoryview)) and
+        memoryview(obj).nbytes >= _ZEROCOPY_MIN):
+        return pickle.PickleBuffer(obj)
+    return obj
+
+
+### The scheduler
+
+class _HybridScheduler(_cooperative._Scheduler):
+    """Cooperative scheduler for one worker of a L{Runtime}.
+
+    A permanent I/O task handles the messages sent to this worker,
+    which a thread reads from its pipe. When no other task is ready,
+    the I/O task steals processes from other workers or waits for a
+    message. Messages are tuples whose first field names the handler:
+
+      - C{('spawn', origin, procs, stolen)} runs pickled processes,
+        reporting to C{origin} as each finishes;
+      - C{('done', token)} finishes a process run elsewhere;
+      - C{('write', channel, obj, origin, token)},
+        C{('read', channel, origin, token)},
+        C{('unread', channel, items)} and
+        C{('poison', channel)} operate on channels kept here;
+      - C{('reply', token, ok, value)} completes a remote operation;
+      - C{('steal', thief)} asks for processes, which are sent as soon
+        as there are any to spare;
+      - C{('exit',)} stops the worker.
+    """
+
+    def __init__(self, index, outboxes, locks):
+        super(_HybridScheduler, self).__init__()
+        self.index = index
+        self.workers = len(outboxes)
+        self.outboxes = outboxes # Pipes to each worker.
+        self.locks = locks       # Serialise writes to each pipe.
+        self.inbox = collections.deque()
+        self.arrived = threading.Event()
+        self.exported = {}       # Channels kept here, by key.
+        self.proxies = weakref.WeakValueDictionary() # Channels kept elsewhere.
+        self.waiting = {}        # Tasks and channels waiting for replies.
+        self.remote = {}         # Tasks of processes sent elsewhere.
+        self.tokens = itertools.count()
+        self.running = True
+        # Processes are never stolen from the main process.
+        victims = [i for i in range(1, self.workers) if i != index]
+        self.victims = itertools.cycle(victims) if victims else None
+        self.steal_at = 0.0      # Time to ask for processes again.
+        self.hungry = {}         # Workers waiting for processes, in order.
+        self.spawned = 0         # Processes spawned since they were shared.
+        self.io_task = self.spawn(self._serve())
+
+    def spawn(self, gen, owner=None):
+        if owner is not None:
+            self.spawned += 1
+        return super(_HybridScheduler, self).spawn(gen, owner)
+
+    def _send(self, worker, msg):
+        if worker == self.index:
+            self.inbox.append(_dumps(msg))
+            return
+        data = _dumps(msg)
+        with self.locks[worker]:
+            self.outboxes[worker].send_bytes(data)
+
+    def _receive(self, conn):
+        """Body of the thread which reads messages from C{conn}.
+        """
+        while True:
+            try:
+                data = conn.recv_bytes()
+            except (EOFError, OSError):
+                return
+            self.inbox.append(data)
+            self.arrived.set()
+
+    def _serve(self):
+        """Generator run by the I/O task.
+        """
+        inbox = self.inbox
+        while self.running:
+            while inbox and self.running:
+                msg = _loads(inbox.popleft())
+                getattr(self, '_on_' + msg[0])(*msg[1:])
+            if self.hungry and self.spawned:
+                self._share()
+            if not self.ready and self.running:
+                self._idle()
+            yield
+
+    def _idle(self):
+        """Ask another worker for processes if it is time to, then wait
+        for a message, or until the next task blocked by L{wake_at}
+        is due.
+        """
+        timeout = None
+        if self.victims is not None:
+            now = time.time()
+            if now >= self.steal_at:
+                self.steal_at = now + _STEAL_TIMEOUT
+                self._send(next(self.victims), ('steal', self.index))
+            timeout = self.steal_at - now
+        if self.polling:
+            timeout = _cooperative._ALT_POLL if timeout is None else min(timeout, _cooperative._ALT_POLL)
+        deadline = self.next_deadline()
+        if deadline is not None:
+            delay = max(0.0, deadline - _cooperative.now())
+            timeout = delay if timeout is None else min(timeout, delay)
+        self.arrived.clear()
+        if not self.inbox:
+            self.arrived.wait(timeout)
+
+    ### Processes
+
+    def par(self, procs):
+        """Run C{procs} in parallel. In the main process, share them out
+        between the workers.
+        """
+        if self.index != 0 or self.workers == 1 or len(procs) < 2:
+            yield from super(_HybridScheduler, self).par(procs)
+            return
+        places = [(i * self.workers) // len(procs) for i in range(len(procs))]
+        self._place_channels(procs, places)
+        batches = collections.defaultdict(list)
+        for proc, place in zip(procs, places):
+            if place == self.index or not self._export(proc, batches[place]):
+                proc.spawn()
+        for place, batch in batches.items():
+            if batch:
+                self._send(place, ('spawn', self.index, batch, False))
+        for proc in procs:
+            yield from proc.join()
+
+    def _place_channels(self, procs, places):
+        """Keep each channel which has not been used yet in the worker
+        which will run most of its users.
+        """
+        users = collections.defaultdict(collections.Counter)
+        for proc, place in zip(procs, places):
+            if isinstance(proc, CSPProcess):
+                for channel in proc._channels:
+                    if isinstance(channel, _Mobile):
+                        users[channel][place] += 1
+        for channel, counts in users.items():
+            home = counts.most_common(1)[0][0]
+            if home != self.index and channel._key is None and channel._is_idle():
+                channel._key = (self.index, channel.name)
+                channel._home = home
+                channel._remote = True
+                self.proxies[channel._key] = channel
+
+    def _export(self, proc, batch):
+        """Append C{proc}, pickled, to C{batch} and give it a task which
+        finishes when the worker running it says so. Return C{False}
+        if C{proc} cannot be sent to another worker.
+        """
+        if not isinstance(proc, CSPProcess) or proc._task is not None:
+            return False
+        try:
+            data = _dumps((type(proc), proc._target, proc._args, proc._kwargs))
+        except Exception:
+            return False
+        token = next(self.tokens)
+        proc._task = self.remote[token] = _cooperative._Task(None, proc)
+        batch.append((token, data))
+        return True
+
+    def _report(self, proc, origin, token):
+        yield from proc.join()
+        self._send(origin, ('done', token))
+
+    def _on_spawn(self, origin, procs, stolen):
+        for token, data in procs:
+            cls, target, args, kwargs = _loads(data)
+            proc = cls(target, *args, **kwargs)
+            proc.spawn()
+            self.spawn(self._report(proc, origin, token))
+        if stolen:
+            self.steal_at = 0.0
+
+    def _on_done(self, token):
+        self._finish(self.remote.pop(token))
+
+    def _on_steal(self, thief):
+        self.hungry[thief] = None
+        self._share()
+
+    def _share(self):
+        """Send processes to each hungry worker in turn while there are
+        any to spare.
+        """
+        self.spawned = 0
+        for thief in list(self.hungry):
+            batch = self._give()
+            if not batch:
+                break
+            del self.hungry[thief]
+            _debug('Worker {0} gave {1} processes to worker {2}'.format(self.index, len(batch), thief))
+            self._send(thief, ('spawn', self.index, batch, True))
+
+    def _give(self):
+        """Remove up to half of the ready processes, choosing ones which
+        have not started, and return them pickled. Tasks are left in
+        their place which finish when the processes do.
+        """
+        ready = self.ready
+        count = sum(1 for entry in ready if entry[0].owner is not None)
+        count = min(count // 2, _STEAL_BATCH)
+        batch, stolen = [], set()
+        for entry in reversed(ready):
+            if len(batch) >= count:
+                break
+            task, value, exc = entry
+            if (task.gen is None or
+                not isinstance(task.owner, CSPProcess) or
+                inspect.getgeneratorstate(task.gen) != inspect.GEN_CREATED):
+                continue
+            task.owner._task = None
+            if self._export(task.owner, batch):
+                task.gen.close()
+                task.gen = None
+                self.remote[batch[-1][0]] = task
+                task.owner._task = task
+                stolen.add(id(task))
+            else:
+                task.owner._task = task
+        if stolen:
+            keep = [entry for entry in ready if id(entry[0]) not in stolen]
+            ready.clear()
+            ready.extend(keep)
+        return batch
+
+    def _on_exit(self):
+        self.running = False
+
+    ### Channels
+
+    def _channel_ref(self, channel):
+        """Return a reference to C{channel} which any worker can load.
+        Channels referred to for the first time are kept here.
+        """
+        if channel._key is None:
+            channel._key = (self.index, channel.name)
+            channel._home = self.index
+        if channel._home == self.index:
+            self.exported[channel._key] = channel
+        return (channel._key, channel._home, type(channel), channel._init_args())
+
+    def _load_channel(self, ref):
+        """Return the channel referred to by C{ref}, creating a proxy
+        if it is kept by another worker.
+        """
+        key, home, cls, kwargs = ref
+        table = self.exported if home == self.index else self.proxies
+        channel = table.get(key)
+        if channel is None:
+            channel = cls(**kwargs)
+            channel._key = key
+            channel._home = home
+            channel._remote = home != self.index
+            table[key] = channel
+        return channel
+
+    def request(self, channel, msg):
+        """Send C{msg} to the home of C{channel}, with this worker and a
+        token to reply to, and return the token.
+        """
+        token = next(self.tokens)
+        self._send(channel._home, msg + (self.index, token))
+        return token
+
+    def fetch(self, channel, count):
+        """Ask the home of C{channel} for items until C{count} requests
+        are outstanding.
+        """
+        while channel._fetching < count:
+            channel._fetching += 1
+            self.waiting[self.request(channel, ('read', channel))] = channel
+
+    def _on_write(self, channel, obj, origin, token):
+        self.spawn(self._write_for(channel, obj, origin, token))
+
+    def _on_read(self, channel, origin, token):
+        self.spawn(self._read_for(channel, origin, token))
+
+    def _on_unread(self, channel, items):
+        channel._restore(items)
+
+    def _on_poison(self, channel):
+        channel.poison()
+
+    def _on_reply(self, token, ok, value):
+        waiter = self.waiting.pop(token)
+        if isinstance(waiter, _Mobile):
+            waiter._fetched(ok, value)
+        else:
+            self.wake(waiter, ok)
+
+    def _write_for(self, channel, obj, origin, token):
+        try:
+            yield from channel.write(obj)
+        except ChannelPoison:
+            self._send(origin, ('reply', token, False, None))
+        else:
+            self._send(origin, ('reply', token, True, None))
+
+    def _read_for(self, channel, origin, token):
+        try:
+            items = yield from channel.read_many()
+        except ChannelPoison:
+            self._send(origin, ('reply', token, False, None))
+        else:
+            self._send(origin, ('reply', token, True,
+                                [_out_of_band(item) for item in items]))
+
+
+def _install(index, inbox, outboxes, locks):
+    """Make a L{_HybridScheduler} the scheduler of this process.
+    """
+    scheduler = _HybridScheduler(index, outboxes, locks)
+    receiver = threading.Thread(target=scheduler._receive, args=(inbox,))
+    receiver.daemon = True
+    receiver.start()
+    _cooperative._scheduler = scheduler
+    return scheduler
+
+
+def _worker(index, inbox, outboxes, locks):
+    """Body of each worker but the main process.
+    """
+    scheduler = _install(index, inbox, outboxes, locks)
+    scheduler.run(scheduler.io_task)
+
+
+class Runtime(object):
+    """Worker processes which run CSP processes on every core.
+
+    A runtime is started and closed around the code which runs CSP
+    processes:
+
+>>> with Runtime(workers=4):
+...     Par(*procs).start()
+...
+>>>
+
+    C{workers} defaults to the number of CPUs and includes the main
+    process. Only one runtime may run at a time.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        assert self.workers > 0
+        self._procs = []
+        self._scheduler = None
+
+    def start(self):
+        """Start the workers and make the main process worker 0.
+        """
+        global _runtime
+        assert _runtime is None, 'A Runtime is already running.'
+        context = multiprocessing.get_context('fork')
+        pipes = [context.Pipe(duplex=False) for i in range(self.workers)]
+        locks = [context.Lock() for i in range(self.workers)]
+        outboxes = [writer for reader, writer in pipes]
+        for index in range(1, self.workers):
+            proc = context.Process(target=_worker,
+                                   args=(index, pipes[index][0], outboxes, locks))
+            proc.daemon = True
+            proc.start()
+            self._procs.append(proc)
+        for reader, writer in pipes[1:]:
+            reader.close()
+        self._scheduler = _install(0, pipes[0][0], outboxes, locks)
+        _runtime = self
+        _debug('Runtime started {0} workers'.format(self.workers))
+        return self
+
+    def close(self):
+        """Stop the workers. Processes still running in them are lost.
+        """
+        global _runtime
+        if _runtime is not self:
+            return
+        for index in range(1, self.workers):
+            self._scheduler._send(index, ('exit',))
+        for proc in self._procs:
+            proc.join()
+        self._scheduler.running = False
+        for conn in self._scheduler.outboxes:
+            conn.close()
+        _cooperative._scheduler = _cooperative._Scheduler()
+        _runtime = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _start_runtime():
+    """Start a default L{Runtime} if none is running here.
+    """
+    if not isinstance(_cooperative._scheduler, _HybridScheduler):
+        atexit.register(Runtime().start().close)
+
+
+### Processes and channels which can move between workers
+
+class Par(_cooperative.Par):
+    __doc__ = _cooperative.Par.__doc__
+
+    def start(self):
+        """Start a default L{Runtime} if none is running, then run
+        this Par to completion.
+        """
+        _start_runtime()
+        super(Par, self).start()
+
+
+class _Mobile(object):
+    """Mixin for channels which processes in other workers can use.
+
+    A channel is kept by the worker which first sends it elsewhere,
+    unless the main process has chosen a home for it. Copies of the
+    channel in other workers are proxies, whose operations are
+    performed by the home worker on their behalf.
+    """
+
+    _key = None      # Identifies the channel in every worker.
+    _home = None     # Index of the worker which keeps the channel.
+    _remote = False  # True in proxies.
+    _fetching = 0    # Reads asked of the home worker but not answered.
+    _alts = frozenset() # Tasks of Alts which have enabled a proxy.
+
+    def _init_args(self):
+        """Keyword arguments to create a proxy for this channel with.
+        """
+        return {}
+
+    def _is_idle(self):
+        return not (self._readers or self._writers or self._waiters or
+                    self._unread or self._poisoned)
+
+    def write(self, obj):
+        if self._remote:
+            return self._remote_write(obj)
+        return super(_Mobile, self).write(obj)
+
+    def read(self):
+        if self._remote:
+            return self._remote_read()
+        return super(_Mobile, self).read()
+
+    def _read(self):
+        if self._remote:
+            return self._remote_read()
+        return super(_Mobile, self)._read()
+
+    def enable(self):
+        """Enable a read for an Alt select.
+
+        A proxy asks its home worker for an item, which is given back
+        by L{disable} if the Alt selects another guard.
+        """
+        super(_Mobile, self).enable()
+        if self._remote:
+            task = _cooperative._scheduler.current
+            if task not in self._alts:
+                self._alts = self._alts | frozenset([task])
+            if not self._unread:
+                _cooperative._scheduler.fetch(self, len(self._readers) + 1)
+
+    def disable(self):
+        super(_Mobile, self).disable()
+        if self._remote:
+            self._alts = self._alts - frozenset([_cooperative._scheduler.current])
+            if self._unread and not (self._alts or self._readers):
+                items, self._unread = self._unread, None
+                self._give_back(items)
+
+    def select(self):
+        if self._remote:
+            self._alts = self._alts - frozenset([_cooperative._scheduler.current])
+        return super(_Mobile, self).select()
+
+    def poison(self):
+        if self._remote and not self._poisoned:
+            _cooperative._scheduler._send(self._home, ('poison', self))
+        super(_Mobile, self).poison()
+
+    @_cooperative._blocking
+    def _remote_write(self, obj):
+        """Generator which writes C{obj} through the home worker.
+        """
+        _cooperative._scheduler.op = None
+        self.checkpoison()
+        scheduler = _cooperative._scheduler
+        token = scheduler.request(self, ('write', self, _out_of_band(obj)))
+        scheduler.waiting[token] = scheduler.current
+        if not (yield _BLOCK):
+            super(_Mobile, self).poison()
+            raise ChannelPoison()
+
+    @_cooperative._blocking
+    def _remote_read(self):
+        """Generator which reads an item fetched from the home worker.
+        """
+        _cooperative._scheduler.op = None
+        if self._unread:
+            return self._unread.popleft()
+        self.checkpoison()
+        scheduler = _cooperative._scheduler
+        self._readers.append(scheduler.current)
+        scheduler.fetch(self, len(self._readers))
+        return (yield _BLOCK)
+
+    def _fetched(self, ok, items):
+        """Hand C{items} fetched from the home worker to waiting
+        readers, keeping the rest to be read later.
+        """
+        self._fetching -= 1
+        if not ok:
+            super(_Mobile, self).poison()
+            return
+        items = collections.deque(items)
+        woken = bool(self._readers)
+        while self._readers and items:
+            _cooperative._scheduler.wake(self._readers.pop(0), items.popleft())
+        if items and not (woken or self._alts):
+            # Fetched for an Alt which has since selected another guard.
+            self._give_back(items)
+            return
+        if items:
+            if self._unread:
+                self._unread.extend(items)
+            else:
+                self._unread = items
+        self._notify()
+
+    def _give_back(self, items):
+        """Send C{items}, fetched from the home worker but not read, back
+        to be read there before any others.
+        """
+        _cooperative._scheduler._send(
+            self._home, ('unread', self, [_out_of_band(item) for item in items]))
+
+    def _restore(self, items):
+        """Put back C{items}, which another worker fetched from this
+        channel but did not read, ahead of any items left unread here.
+        """
+        if self._poisoned:
+            return
+        items = collections.deque(items)
+        while self._readers and items:
+            _cooperative._scheduler.wake(self._readers.pop(0), items.popleft())
+        if items:
+            if self._unread:
+                items.extend(self._unread)
+            self._unread = items
+            self._notify()
+
+
+class Channel(_Mobile, _cooperative.Channel):
+    __doc__ = _cooperative.Channel.__doc__
+
+
+class FileChannel(Channel):
+    """Channel objects which hold no file descriptors.
+
+    The same as a L{Channel}, provided so that programs written for
+    the multiprocessing version of python-csp run unchanged.
+    """
+
+    def __init__(self, serializer=None):
+        super(FileChannel, self).__init__()
+
+    def __str__(self):
+        return 'Channel using files for IPC.'
+
+
+class BufferedChannel(_Mobile, _cooperative.BufferedChannel):
+    __doc__ = _cooperative.BufferedChannel.__doc__
+
+    def _init_args(self):
+        return {'capacity': self.capacity}
+
+    def _is_idle(self):
+        return not self._store and super(BufferedChannel, self)._is_idle()
+
+
+class ChannelFactory(_cooperative.ChannelFactory):
+    __doc__ = _cooperative.ChannelFactory.__doc__
+
+    def __init__(self, channel_type=Channel, **kwargs):
+        super(ChannelFactory, self).__init__(channel_type, **kwargs)
+
+    def release(self, *channels):
+        """Hand C{channels} back to the factory to be reused.
+
+        Channels which have been used by other workers are never
+        reused.
+        """
+        super(ChannelFactory, self).release(*[channel for channel in channels
+                                              if channel._key is None])
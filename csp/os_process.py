@@ -30,16 +30,29 @@ DEBUG = False
 
 from functools import wraps # Easy decorators
 
+import atexit
+import collections
 import copy
-import gc
+import array
+import importlib
 import inspect
+import io
+import itertools
 import logging
+import marshal
+import mmap
 import os
 import random
+import select
+import selectors
+import socket
+import struct
 import sys
 import tempfile
+import threading
 import time
-import uuid
+import types
+import weakref
 try:
     import cPickle as pickle    # Faster, only in Python 2.x
 except ImportError:
@@ -55,18 +68,30 @@ except ImportError:
 try:
     # Version 2.6 and above
     import multiprocessing as processing
-    if sys.platform == 'win32':
-        import multiprocessing.reduction
+    import multiprocessing.connection
+    import multiprocessing.reduction
 except ImportError:
     raise ImportError('No library available for multiprocessing.\n'+
                       'csp.os_process is only compatible with Python 2. 6 and above.')
 
+from .serializers import (get_default_serializer, _SHARED_DIR,
+                          _new_shared_file, _unlink_shared_file)
+from .referents import find_channels
+from .timers import get_timer_service, now
+
+try: # Shared memory segments -- Python 3.8 and above.
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:
+    shared_memory = None
+
 CSP_IMPLEMENTATION = 'os_process'
 
 ### Names exported by this module
 __all__ = ['set_debug', 'CSPProcess', 'CSPServer', 'Alt',
            'Par', 'Seq', 'Guard', 'Channel', 'FileChannel',
-           'process', 'forever', 'Skip', '_CSPTYPES', 'CSP_IMPLEMENTATION']
+           'BufferedChannel', 'DescriptorChannel',
+           'ChannelFactory', 'ProcessPool', 'process', 'forever', 'Skip', 'set_start_method',
+           'gc_collections_avoided', '_CSPTYPES', 'CSP_IMPLEMENTATION']
 
 ### Seeded random number generator (16 bytes)
 
@@ -75,7 +100,61 @@ _RANGEN = random.Random(os.urandom(16))
 
 ### CONSTANTS
 
-_BUFFSIZE = 1024
+_BUFFSIZE = 4096
+"""Initial size in bytes of the buffer a channel reads frames into."""
+
+_BUFFMAX = 1048576
+"""Largest read buffer a channel keeps for reuse between reads."""
+
+_FRAME = struct.Struct('qq')
+"""Frame header on a pipe: the length of the data which follows it, and
+the number of items in it if it carries a batch, or 0."""
+
+_POISON_FRAME = _FRAME.pack(-1, 0)
+"""Frame written to a pipe when its channel is poisoned."""
+
+_ITER_BATCH = 1024
+"""Most items read at once when iterating over a channel."""
+
+_ALT_POLL = 0.01
+"""Seconds an Alt waits before re-polling guards it cannot block on."""
+
+_FILE_REGION = 65536
+"""Bytes of a mapped file owned by each FileChannel."""
+
+_REGIONS_PER_FILE = 1024
+"""Number of FileChannel regions in each (sparse) mapped file."""
+
+_POOL_CHANNELS = 512
+"""Default number of channel slots created by a ProcessPool."""
+
+_POOL_TASK = struct.Struct('Q')
+"""Header of a task sent to a ProcessPool worker: the task ID."""
+
+_EMPTY_CELL = ';;;__EMPTY_CELL__;;;'
+"""Stands for an empty closure cell in a function sent to a worker."""
+
+_SHM_SIZE = 65536
+"""Default size in bytes of the ring buffer in a BufferedChannel."""
+
+_SHM_INDICES = struct.Struct('QQ')
+"""Head (written by writers) and tail (written by readers) of a ring."""
+
+_SHM_INDEX = struct.Struct('Q')
+
+_SHM_HEADER = struct.Struct('QQQ')
+"""Header of a ring: its indices, then a flag which writers set after
+writing a wake-up byte to the pipe of the channel."""
+
+_SHM_WOKEN = _SHM_INDICES.size
+"""Offset of the wake-up flag in the header of a ring."""
+
+_SHM_RECORD = struct.Struct('qq')
+"""Record header in a ring: the length of the data, negative if the data
+names an overflow segment, and the number of items in a batch, or 0."""
+
+_MAX_FDS = 253
+"""Most file descriptors passed with one item (SCM_MAX_FD on Linux)."""
 
 _debug = logging.debug
 
@@ -112,6 +191,7 @@ class ChannelPoison(Exception):
         return 'Posioned channel exception.'
 
 
+
 ### DEBUGGING
 
 def set_debug(status):
@@ -122,6 +202,113 @@ def set_debug(status):
     logging.info("Using multiprocessing version of python-csp.")
 
 
+### Starting OS processes
+
+if 'fork' in processing.get_all_start_methods():
+    _context = processing.get_context('fork')
+else:
+    _context = processing.get_context()
+"""Context which starts the OS processes of CSP processes."""
+
+
+def set_start_method(method, preload=()):
+    """Choose how the OS process of each CSP process is started.
+
+    C{method} is one of the multiprocessing start methods: 'fork'
+    (the default where it is available), 'forkserver' or 'spawn'.
+    With 'forkserver' and 'spawn' the child does not inherit the
+    memory of its parent, so each L{CSPProcess} is pickled: channels
+    are passed as duplicated file descriptors or the names of shared
+    memory, and functions which cannot be imported by name, such as
+    those wrapped by L{process}, are passed by value.
+
+    C{preload} lists modules which the fork server imports once,
+    along with the main module, before forking each child, so that a
+    L{Par} of many processes does not import them once per process:
+
+>>> set_start_method('forkserver', preload=['numpy'])
+>>>
+
+    'spawn' imports every module again in each child, so it is much
+    slower to start processes than 'forkserver'. Call this before
+    creating any channel: locks created for one start method cannot
+    be passed to processes started by another.
+    """
+    global _context, _channel_ids, _flag_slab, _flag_next
+    assert method in processing.get_all_start_methods()
+    _context = processing.get_context(method)
+    if method == 'forkserver':
+        # The main module imports python-csp and sets up sys.path, so
+        # preloading it lets the server find the other modules too.
+        _context.set_forkserver_preload(['__main__', __name__] + list(preload))
+    _channel_ids = _context.Value('Q', _channel_ids.value)
+    with _alloc_lock:
+        if _flag_slab is None:
+            # The type of a shared array can only be pickled by picklers
+            # created after the first such array, so allocate it now
+            # rather than while a child is being started.
+            _flag_slab = processing.RawArray('h', _FLAGS_PER_SLAB)
+            _flag_next = 0
+
+
+def _spawning():
+    """Return C{True} while a child which does not fork is being
+    started, and objects are pickled to be sent to it.
+    """
+    return processing.context.get_spawning_popen() is not None
+
+
+class _Process(processing.Process):
+    """Process which is started by the method chosen with
+    L{set_start_method}.
+    """
+
+    @staticmethod
+    def _Popen(process_obj):
+        return _context.Process._Popen(process_obj)
+
+
+class _FunctionByValue(object):
+    """Pickles as the function C{func}, by value.
+    """
+
+    def __init__(self, func):
+        self.func = func
+
+    def __reduce__(self):
+        return _reduce_function(self.func)
+
+
+### Process lifetimes
+
+_gc_avoided = 0
+"""Number of finished processes which did not force a collection."""
+
+_gc_lock = threading.Lock()
+
+
+def gc_collections_avoided():
+    """Return the number of garbage collections which finished
+    processes would once have forced.
+
+    Processes used to run the garbage collector when they were
+    deleted, to free process graphs kept alive by reference
+    cycles. L{Par} and L{Seq} now release their children when they
+    finish, and children refer to them only weakly, so there are no
+    cycles to collect.
+    """
+    return _gc_avoided
+
+
+### Poison propagation
+
+def _find_channels(referents):
+    """Return the channels in C{referents}, each once. See
+    L{csp.referents.find_channels}.
+    """
+    return find_channels(referents, Channel, Alt, (Par, Seq), CSPProcess)
+
+
 ### Fundamental CSP concepts -- Processes, Channels, Guards
 
 class _CSPOpMixin(object):
@@ -131,6 +318,52 @@ class _CSPOpMixin(object):
     def __init__(self):
         return
 
+    def __getstate__(self):
+        """Pickle a process for a child which does not fork.
+
+        The enclosing process is left behind, functions which cannot
+        be imported are pickled by value and the child is given the
+        channel IDs of this program.
+        """
+        state = self.__dict__.copy()
+        state.pop('_enclosing', None) # Weak references cannot be pickled.
+        if not _spawning():
+            return state
+        target = state.get('_target')
+        if target is not None and not _is_importable(target):
+            state['_target'] = _FunctionByValue(target)
+        state['_channel_ids'] = _channel_ids
+        return state
+
+    def __setstate__(self, state):
+        global _channel_ids
+        if '_channel_ids' in state:
+            _channel_ids = state.pop('_channel_ids')
+        self.__dict__.update(state)
+
+    @property
+    def enclosing(self):
+        """The L{Par} or L{Seq} which runs this process, or C{None}.
+
+        Only a weak reference is kept, so that a process graph has no
+        reference cycles and is freed as soon as it is dropped.
+        """
+        ref = self.__dict__.get('_enclosing')
+        return None if ref is None else ref()
+
+    @enclosing.setter
+    def enclosing(self, proc):
+        self._enclosing = None if proc is None else weakref.ref(proc)
+
+    def _release(self):
+        """Drop the function, arguments and OS resources held by this
+        finished process.
+        """
+        self._target, self._args, self._kwargs = None, (), {}
+        self._channels = ()
+        if self._popen is not None and self._popen.poll() is not None:
+            self._popen.close()
+
     def spawn(self):
         """Start only if self is not running."""
         if not self._popen:
@@ -150,19 +383,22 @@ class _CSPOpMixin(object):
         if self._popen:
             processing.Process.join(self)
 
+    # Channels given to this process, recorded when it is created.
+    _channels = ()
+
     def referent_visitor(self, referents):
-        for obj in referents:
-            if obj is self or obj is None:
-                continue
-            if isinstance(obj, Channel):
-                obj.poison()
-            elif ((hasattr(obj, '__getitem__') or hasattr(obj, '__iter__')) and
-                  not isinstance(obj, str)):
-                self.referent_visitor(obj)
-            elif isinstance(obj, CSPProcess):
-                self.referent_visitor(obj.args + tuple(obj.kwargs.values()))
-            elif hasattr(obj, '__dict__'):
-                self.referent_visitor(list(obj.__dict__.values()))
+        """Poison the channels found in C{referents} by
+        L{_find_channels}.
+        """
+        for channel in _find_channels(referents):
+            channel.poison()
+
+    def _poison_channels(self):
+        """Poison the channels this process was given, after it has
+        caught a L{ChannelPoison}.
+        """
+        for channel in self._channels:
+            channel.poison()
 
     def terminate(self):
         """Terminate only if self is running."""
@@ -191,7 +427,7 @@ class _CSPOpMixin(object):
         Seq(*procs).start()
 
 
-class CSPProcess(processing.Process, _CSPOpMixin):
+class CSPProcess(_Process, _CSPOpMixin):
     """Implementation of CSP processes.
     
     There are two ways to create a new CSP process. Firstly, you can
@@ -226,6 +462,9 @@ n: 20
 >>> 
     """
 
+    _pooled = False # True if run by a ProcessPool.
+    _released = False # True once released by its Par or Seq.
+
     def __init__(self, func, *args, **kwargs):
         processing.Process.__init__(self,
                                     target=func,
@@ -235,10 +474,12 @@ n: 20
         assert not inspect.ismethod(func) # Check we aren't using objects
 
         _CSPOpMixin.__init__(self)
-        for arg in list(self._args) + list(self._kwargs.values()):
+        referents = self._args + tuple(self._kwargs.values())
+        for arg in referents:
             if _is_csp_type(arg):
                 arg.enclosing = self
         self.enclosing = None
+        self._channels = _find_channels(referents)
 
     def getName(self):
         return self._name
@@ -263,7 +504,7 @@ n: 20
             self._target(*self._args, **self._kwargs)
         except ChannelPoison:
             _debug('{0}s got ChannelPoison exception in {1}'.format(str(self), self.getPid()))
-            self.referent_visitor(self._args + tuple(self._kwargs.values()))
+            self._poison_channels()
 #            if self._popen is not None: self.terminate()
         except KeyboardInterrupt:
             sys.exit()
@@ -271,20 +512,28 @@ n: 20
             typ, excn, tback = sys.exc_info()
             sys.excepthook(typ, excn, tback)
 
-    def __del__(self):
-        """Run the garbage collector automatically on deletion of this
-        object.
-
-        This prevents the "Winder Bug" found in tests/winder_bug of
-        the distribution, where successive process graphs are created
-        in memory and, when the "outer" CSPProcess object returns from
-        its .start() method the process graph is not garbage
-        collected. This accretion of garbage can cause degenerate
-        behaviour which is difficult to debug, such as a program
-        pausing indefinitely on Channel creation.
+    def _release(self):
+        """Release this finished process.
+
+        Once this ran the garbage collector on deletion of every
+        CSPProcess, to prevent the "Winder Bug" found in
+        tests/winder_bug of the distribution: when the "outer"
+        CSPProcess returned from its .start() method its process graph
+        was kept alive by reference cycles, and the accretion of
+        garbage could make a program pause indefinitely on Channel
+        creation. Releasing the graph here frees it without a
+        collection, which L{gc_collections_avoided} counts. Processes run by
+        a L{ProcessPool} are not OS processes, so they never forced
+        a collection and are not counted.
         """
-        if gc is not None:
-            gc.collect()
+        global _gc_avoided
+        if self._released:
+            return
+        self._released = True
+        if not self._pooled:
+            with _gc_lock:
+                _gc_avoided += 1
+        _CSPOpMixin._release(self)
 
 
 class CSPServer(CSPProcess):
@@ -313,7 +562,7 @@ class CSPServer(CSPProcess):
                 return None
         except ChannelPoison:
             _debug('{0}s in {1} got ChannelPoison exception'.format(str(self), self.getPid()))
-            self.referent_visitor(self._args + tuple(self._kwargs.values()))
+            self._poison_channels()
 #            if self._popen is not None: self.terminate()
         except KeyboardInterrupt:
             sys.exit()
@@ -414,6 +663,20 @@ no
             assert isinstance(arg, Guard)
         self.guards = list(args)
         self.last_selected = None
+        # Index of the guards, built by _index() when first needed.
+        self._indexed = None   # Copy of self.guards when last indexed.
+        self._selector = None  # Waits on the file descriptors of guards.
+        self._pid = None       # Process which created _selector.
+        self._position = None  # Position of each guard, by id().
+        self._polled = None    # Guards with no file descriptor.
+        self._timed = None     # Guards whose alarms the timer service keeps.
+        self._shared = None    # Guards which share a file descriptor.
+        self._rearm = None     # Guards to re-arm before waiting.
+
+    def __getstate__(self):
+        state = super(Alt, self).__getstate__()
+        state['_indexed'] = state['_selector'] = None
+        return state
 
     def poison(self):
         """Poison the last selected guard and unlink from the guard list.
@@ -431,88 +694,170 @@ no
         _debug('{0} guards'.format(len(self.guards)))
         self.last_selected = None
 
-    def _preselect(self):
-        """Check for special cases when any form of select() is called.
-
-        If no object can be returned from a channel read and no
-        exception is raised the return None. Any select() method
-        should work like a Channel.read() which must always return a
-        value if it does not throw an exception..
+    def _index(self):
+        """Index the guards of this Alt, if they have changed since
+        they were last indexed, and return a selector which waits on
+        their file descriptors.
+
+        The file descriptor of a guard becomes readable whenever the
+        guard may be selectable, once the guard has been armed (see
+        L{Guard._arm}), so these guards are registered with the
+        selector once rather than enabled on every select. Timer
+        guards are found through the timer service of the process,
+        and other guards with no file descriptor are polled.
+
+        Guards may share a file descriptor, as the channels of a
+        L{csp.mux.ChannelLink} do. Reading one of them may then take
+        the data another is waiting for, so these guards are armed
+        on every select.
+        """
+        if self._indexed == self.guards and self._pid == os.getpid():
+            return self._selector
+        if self._selector is not None and self._pid == os.getpid():
+            self._selector.close()
+        self._selector = selectors.DefaultSelector()
+        self._pid = os.getpid()
+        self._indexed = list(self.guards)
+        self._position, self._polled, self._rearm = {}, [], []
+        self._timed, self._shared = [], []
+        for position, guard in enumerate(self.guards):
+            if id(guard) in self._position:
+                continue
+            self._position[id(guard)] = position
+            fd = guard.fileno()
+            if guard._timed:
+                self._timed.append(guard)
+            elif fd is None:
+                self._polled.append(guard)
+            else:
+                try:
+                    sharers = self._selector.get_key(fd).data
+                except KeyError:
+                    self._selector.register(fd, selectors.EVENT_READ, [guard])
+                    self._rearm.append(guard)
+                    continue
+                if len(sharers) == 1:
+                    self._shared.append(sharers[0])
+                sharers.append(guard)
+                self._shared.append(guard)
+        return self._selector
+
+    def _ready(self, timeout):
+        """Return a list of guards which may be selectable, waiting up
+        to C{timeout} seconds (forever if C{None}) for there to be one.
+
+        Polled guards in the list have been enabled, other guards have
+        not. Only guards which were used or found ready by the last
+        select are re-armed, and the selector reports only those
+        guards which are ready, so the cost does not grow with the
+        number of guards waited on.
+        """
+        selector = self._index()
+        ready = [guard for guard in self._rearm if guard._arm()]
+        del self._rearm[:]
+        ready += [guard for guard in self._shared if guard._arm()]
+        ready += [channel for channel in list(_unread_channels)
+                  if id(channel) in self._position and
+                  channel._unread_items()]
+        ready += self._expired()
+        for guard in self._polled:
+            guard.enable()
+            if guard.is_selectable():
+                ready.append(guard)
+            else:
+                guard.disable()
+        if ready:
+            timeout = 0
+        elif self._polled and (timeout is None or timeout > _ALT_POLL):
+            timeout = _ALT_POLL
+        if self._timed and timeout != 0:
+            # Block no longer than the earliest alarm.
+            timeout = get_timer_service().timeout(timeout)
+        ready += [guard for key, events in selector.select(timeout)
+                  for guard in key.data]
+        if not ready:
+            ready = self._expired()
+        _debug('Alt got {0} items to choose from out of {1}'.format(len(ready), len(self.guards)))
+        return list(dict.fromkeys(ready))
+
+    def _expired(self):
+        """Return the timer guards of this Alt whose alarms have
+        expired, looking at whichever is fewer of those guards and the
+        expired timers of the process.
+        """
+        if not self._timed:
+            return []
+        service = get_timer_service()
+        service.poll()
+        if len(service.expired) < len(self._timed):
+            return [guard for guard in list(service.expired)
+                    if id(guard) in self._position]
+        return [guard for guard in self._timed if guard in service.expired]
+
+    def _select(self, choose, timeout):
+        """Select the guard which C{choose} picks from a list of ready
+        guards, blocking until there is one or until C{timeout}
+        seconds have passed, and return the result of selecting it,
+        or C{None} on a timeout.
         """
         if len(self.guards) == 0:
             raise NoGuardInAlt()
-        elif len(self.guards) == 1:
-            _debug('Alt Selecting unique guard: {0}s'.format(self.guards[0].name))
-            self.last_selected = self.guards[0]
-            while not self.guards[0].is_selectable():
-                self.guards[0].enable()
-            return self.guards[0].select()
-        return None
-
-    def select(self):
-        """Randomly select from ready guards."""
-        if len(self.guards) < 2:
-            return self._preselect()
-        ready = []
-        while len(ready) == 0:
-            for guard in self.guards:
-                guard.enable()
-                _debug('Alt enabled all guards')
-            time.sleep(0.01) # Not sure about this.
-            ready = [guard for guard in self.guards if guard.is_selectable()]
-            _debug('Alt got {0} items to choose from out of {1}'.format(len(ready), len(self.guards)))
-        selected = _RANGEN.choice(ready)
-        self.last_selected = selected
-        for guard in self.guards:
-            if guard is not selected:
+        if timeout is not None:
+            deadline = now() + timeout
+        wait = 0
+        while True:
+            ready = self._ready(wait)
+            while ready:
+                guard = choose(ready)
+                ready.remove(guard)
+                if guard not in self._polled:
+                    guard.enable()
+                    self._rearm.append(guard)
+                if guard.is_selectable():
+                    for other in ready:
+                        if other in self._polled:
+                            other.disable()
+                        else:
+                            # _arm() may have been the only sign that
+                            # this guard was ready, so ask again.
+                            self._rearm.append(other)
+                    self.last_selected = guard
+                    return guard.select()
                 guard.disable()
-        return selected.select()
+            wait = None
+            if timeout is not None:
+                wait = deadline - now()
+                if wait <= 0:
+                    return None
+
+    def select(self, timeout=None):
+        """Randomly select from ready guards.
+
+        If C{timeout} is given and no guard becomes ready within that
+        many seconds, return C{None} without selecting a guard.
+        """
+        return self._select(_RANGEN.choice, timeout)
 
-    def fair_select(self):
+    def fair_select(self, timeout=None):
         """Select a guard to synchronise with. Do not select the
         previously selected guard (unless it is the only guard
-        available).
-        """
-        if len(self.guards) < 2:
-            return self._preselect()
-        ready = []
-        while len(ready) == 0:
-            for guard in self.guards:
-                guard.enable()
-                _debug('Alt enabled all guards')
-            time.sleep(0.1) # Not sure about this.
-            ready = [guard for guard in self.guards if guard.is_selectable()]
-            _debug('Alt got {0} items to choose from, out of {1}'.format(len(ready), len(self.guards)))
-        selected = None
-        if self.last_selected in ready and len(ready) > 1:
-            ready.remove(self.last_selected)
-            _debug('Alt removed last selected from ready list')
-        selected = _RANGEN.choice(ready)
-        self.last_selected = selected
-        for guard in self.guards:
-            if guard is not selected:
-                guard.disable()
-        return selected.select()
+        available). C{timeout} is as for L{select}.
+        """
+        def choose(ready):
+            others = [guard for guard in ready
+                      if guard is not self.last_selected]
+            return _RANGEN.choice(others or ready)
+        return self._select(choose, timeout)
 
-    def pri_select(self):
+    def pri_select(self, timeout=None):
         """Select a guard to synchronise with, in order of
         "priority". The guard with the lowest index in the L{guards}
-        list has the highest priority.
-        """
-        if len(self.guards) < 2:
-            return self._preselect()
-        ready = []
-        while len(ready) == 0:
-            for guard in self.guards:
-                guard.enable()
-                _debug('Alt enabled all guards')
-            time.sleep(0.01) # Not sure about this.
-            ready = [guard for guard in self.guards if guard.is_selectable()]
-            _debug('Alt got {0} items to choose from, out of {1}'.format(len(ready), len(self.guards)))
-        self.last_selected = ready[0]
-        for guard in ready[1:]:
-            guard.disable()
-        return ready[0].select()
+        list has the highest priority. C{timeout} is as for
+        L{select}.
+        """
+        return self._select(lambda ready: min(
+            ready, key=lambda guard: self._position[id(guard)]),
+                            timeout)
 
     def __mul__(self, n):
         assert n > 0
@@ -525,7 +870,7 @@ no
             yield self.select()
 
 
-class Par(processing.Process, _CSPOpMixin):
+class Par(_Process, _CSPOpMixin):
     """Run CSP processes in parallel.
 
     There are two ways to run processes in parallel.  Firstly, given
@@ -609,13 +954,20 @@ n: 200
         Return when all parallel processes have returned.
         """
         try:
-            for proc in self.procs:
-                proc.spawn()
-            for proc in self.procs:
-                proc.join()
+            pool = _running_pool()
+            if pool is not None:
+                pool.run(self.procs)
+            elif _in_worker:
+                _run_on_threads(self.procs)
+            else:
+                for proc in self.procs:
+                    proc.spawn()
+                for proc in self.procs:
+                    proc.join()
+            self._release()
         except ChannelPoison:
             _debug('{0}s got ChannelPoison exception in {1}'.format(str(self), self.getPid()))
-            self.referent_visitor(self._args + tuple(self._kwargs.values()))
+            self._poison_channels()
 #            if self._popen is not None: self.terminate()
         except KeyboardInterrupt:
             sys.exit()
@@ -623,6 +975,14 @@ n: 200
             typ, excn, tback = sys.exc_info()
             sys.excepthook(typ, excn, tback)
 
+    def _release(self):
+        """Release the children of this finished Par, which refer
+        back to it only weakly.
+        """
+        for proc in self.procs:
+            proc._release()
+        _CSPOpMixin._release(self)
+
     def __len__(self):
         return len(self.procs)
 
@@ -640,7 +1000,7 @@ n: 200
         return proc in self.procs
 
 
-class Seq(processing.Process, _CSPOpMixin):
+class Seq(_Process, _CSPOpMixin):
     """Run CSP processes sequentially.
 
     There are two ways to run processes in sequence.  Firstly, given
@@ -688,12 +1048,19 @@ n: 300
         """Start this process running.
         """
         try:
+            pool = _running_pool()
             for proc in self.procs:
-                _CSPOpMixin.start(proc)
-                proc.join()
+                if pool is not None:
+                    pool.run([proc])
+                elif _in_worker:
+                    _run_here(proc)
+                else:
+                    _CSPOpMixin.start(proc)
+                    proc.join()
+                proc._release()
         except ChannelPoison:
             _debug('{0} got ChannelPoison exception in {1}'.format(str(self), self.getPid()))
-            self.referent_visitor(self._args + tuple(self._kwargs.values()))
+            self._poison_channels()
             if self._popen is not None: self.terminate()
         except KeyboardInterrupt:
             sys.exit()
@@ -701,9 +1068,189 @@ n: 300
             typ, excn, tback = sys.exc_info()
             sys.excepthook(typ, excn, tback)
 
+    def _release(self):
+        """Release the children of this finished Seq, which refer
+        back to it only weakly.
+        """
+        for proc in self.procs:
+            proc._release()
+        _CSPOpMixin._release(self)
+
 
 ### Guards and channels
 
+### Cheap construction of channels
+
+_FLAGS_PER_SLAB = 4096
+"""Number of channel flags allocated together in one shared array."""
+
+_alloc_lock = threading.Lock()
+_flag_slab = None
+_flag_next = _FLAGS_PER_SLAB
+_file_map = None
+_file_next = _REGIONS_PER_FILE
+
+_channel_ids = processing.Value('Q', 0)
+"""Last channel ID handed out by this program, shared by its processes."""
+
+_shared_files = weakref.WeakValueDictionary()
+"""Files mapped by L{_SharedFile}, by device and inode."""
+
+_unready_channels = weakref.WeakSet()
+"""Channels whose synchronisation has not been set up yet."""
+
+_live_channels = weakref.WeakValueDictionary()
+"""Channels which have been set up, by name."""
+
+_unread_channels = weakref.WeakSet()
+"""Channels which may have items of a batch left for this process."""
+
+_pool = None
+"""The running L{ProcessPool}, if any."""
+
+_in_worker = False
+"""True in the worker processes of a L{ProcessPool}."""
+
+_slots = []
+"""Pipes and synchronisation created by a L{ProcessPool} for channels."""
+
+
+class _Flag(object):
+    """A short integer in shared memory, read and set through C{value}.
+
+    Flags behave like C{multiprocessing.Value('h')} objects without a
+    lock, but many of them share one allocation. Channels only ever
+    read or overwrite their flags, so no lock is needed.
+    """
+
+    __slots__ = ('_slab', '_index')
+
+    def __init__(self, slab, index):
+        self._slab = slab
+        self._index = index
+
+    @property
+    def value(self):
+        return self._slab[self._index]
+
+    @value.setter
+    def value(self, value):
+        self._slab[self._index] = value
+
+
+def _new_flags(count):
+    """Return a list of C{count} new L{_Flag} objects, all zero.
+    """
+    global _flag_slab, _flag_next
+    with _alloc_lock:
+        if _flag_next + count > _FLAGS_PER_SLAB:
+            _flag_slab = processing.RawArray('h', _FLAGS_PER_SLAB)
+            _flag_next = 0
+        start, _flag_next = _flag_next, _flag_next + count
+    return [_Flag(_flag_slab, index) for index in range(start, start + count)]
+
+
+class _SharedFile(object):
+    """A sparse file of C{_REGIONS_PER_FILE} regions, mapped into
+    memory.
+
+    Files are created in L{_SHARED_DIR} (a tmpfs on most POSIX
+    systems) and unlinked straight away. Only the pages which have
+    been written to use memory. The file stays open, using one file
+    descriptor for all of its regions, so that children which are
+    not forked can map it too, and is closed once no channel uses it.
+    A child passes the file descriptor it was given as C{file_d}.
+    """
+
+    def __init__(self, file_d=None):
+        if file_d is None:
+            file_d, name = tempfile.mkstemp(prefix='csp-', dir=_SHARED_DIR)
+            os.unlink(name)
+            os.ftruncate(file_d, _FILE_REGION * _REGIONS_PER_FILE)
+        self.fileno = file_d
+        self.view = memoryview(mmap.mmap(file_d, _FILE_REGION * _REGIONS_PER_FILE))
+        stat = os.fstat(file_d)
+        _shared_files[(stat.st_dev, stat.st_ino)] = self
+
+    def __del__(self):
+        try:
+            os.close(self.fileno)
+        except Exception:
+            pass
+
+
+def _adopt_shared_file(file_d):
+    """Return the L{_SharedFile} for the file open on C{file_d}, which
+    this process takes over. Each file is only mapped once however
+    many channels in it are passed to a child.
+    """
+    stat = os.fstat(file_d)
+    shared = _shared_files.get((stat.st_dev, stat.st_ino))
+    if shared is None:
+        return _SharedFile(file_d)
+    os.close(file_d)
+    return shared
+
+
+def _new_file_region():
+    """Return a L{_SharedFile} and the offset in it of a new region of
+    C{_FILE_REGION} bytes.
+    """
+    global _file_map, _file_next
+    with _alloc_lock:
+        if _file_next == _REGIONS_PER_FILE:
+            _file_map = _SharedFile()
+            _file_next = 0
+        start, _file_next = _file_next * _FILE_REGION, _file_next + 1
+    return _file_map, start
+
+
+def _new_channel_id():
+    """Return an ID which no other channel in this program has.
+    """
+    with _channel_ids.get_lock():
+        _channel_ids.value += 1
+        return _channel_ids.value
+
+
+class _Batch(list):
+    """Items written by L{Channel.write_many}. A batch is never
+    serialized itself: its frame is marked with the number of items,
+    which are encoded by the serializer of the channel.
+    """
+    __slots__ = ()
+
+
+def _is_batch(obj):
+    """Return C{True} if C{obj} was written by L{Channel.write_many}.
+    """
+    return type(obj) is _Batch
+
+
+def _before_fork():
+    """Set up every channel a child process could inherit.
+
+    A channel which is first set up in a child is not shared with its
+    parent, and a child can reach a channel in many ways: through the
+    arguments of its process, closures, default arguments, or the
+    attributes of any object, so every channel is set up.
+    """
+    for channel in list(_unready_channels):
+        channel._setup()
+
+
+def _after_fork_in_child():
+    """Stop the child allocating from its parent's flags and files."""
+    global _flag_next, _file_next
+    _flag_next = _FLAGS_PER_SLAB
+    _file_next = _REGIONS_PER_FILE
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(before=_before_fork,
+                        after_in_child=_after_fork_in_child)
+
+
 class Guard(object):
     """Abstract class to represent CSP guards.
 
@@ -735,6 +1282,26 @@ class Guard(object):
         """
         pass
 
+    def fileno(self):
+        """Return a file descriptor which becomes readable when this
+        guard may be selectable, or C{None} if there is no such
+        descriptor. Used by L{Alt} to block rather than poll.
+        """
+        return None
+
+    # True for guards, such as timers, whose alarms are kept by the
+    # timer service of the process rather than polled by an Alt.
+    _timed = False
+
+    def _arm(self):
+        """Called by an L{Alt} before it waits on L{fileno}, when this
+        guard is first waited on and after it has been enabled.
+        Should make sure that the file descriptor will become readable
+        once this guard may be selectable, and return C{True} if it
+        may be selectable already.
+        """
+        return False
+
     def __str__(self):
         return 'CSP Guard: must be subclassed.'
 
@@ -756,11 +1323,10 @@ class Channel(Guard):
     number of channels a program can create is limited to the maximum
     number of files the operating system allows to be open at any one
     time. To avoid this bottleneck use L{FileChannel} objects, which
-    close the file descriptor used for IPC after every read or write
-    operations. Read and write operations are, however, over 20 time
-    slower when performed on L{FileChannel} objects.
+    pass items through memory-mapped files and hold no file
+    descriptors.
 
-    Subclasses of C{Channel} must call L{_setup()} in their
+    Subclasses of C{Channel} must call L{_defer_setup()} in their
     constructor and override L{put}, L{get}, L{__del__}.
 
     A CSP channel can be created with the Channel class:
@@ -768,10 +1334,17 @@ class Channel(Guard):
 >>> c = Channel()
 >>>
 
-    Each Channel object should have a unique name in the network:
+    Items are serialized by the default serializer from
+    L{csp.serializers}, unless another is given to the constructor:
+
+>>> from csp.serializers import MarshalSerializer
+>>> c = Channel(serializer=MarshalSerializer())
+>>>
+
+    Each Channel object has a unique name within the program:
 
 >>> print c.name
-1ca98e40-5558-11df-8e5b-002421449824
+1
 >>> 
 
     The Channel can then be passed as an argument to any CSP process
@@ -796,191 +1369,470 @@ Got: 100
     TRUE = 1
     FALSE = 0
 
-    def __init__(self):
-        self.name = uuid.uuid1()
-        self._wlock = None       # Write lock protects from races between writers.
-        self._rlock = None       # Read lock protects from races between readers.
-        self._plock = None
-        self._available = None     # Released if writer has made data available.
-        self._taken = None         # Released if reader has taken data.
-        self._is_alting = None     # True if engaged in an Alt synchronisation.
-        self._is_selectable = None # True if can be selected by an Alt.
-        self._has_selected = None  # True if already been committed to select.
-        self._itemr, self._itemw = os.pipe()
-        self._poisoned = None
-        self._setup()
+    # (pid, deque) of items of a batch which that process has still
+    # to read. See write_many().
+    _unread = None
+
+    # Can this type of channel be passed to ProcessPool workers?
+    _poolable = True
+
+    # Thread which holds the read lock for an Alt, see enable().
+    _claimer = None
+
+    # Attributes created by _setup(), when they are first needed.
+    _LAZY = frozenset(['_itemr', '_itemw', '_wlock', '_rlock',
+                       '_taken', '_poisoned'])
+
+    def __init__(self, serializer=None):
+        self.name = _new_channel_id()
+        # OS pipe (_itemr, _itemw) and synchronisation, see _setup():
+        # _wlock          protects from races between writers.
+        # _rlock          protects from races between readers.
+        # _taken          released if reader has taken data.
+        # _poisoned       true if this channel has been poisoned.
+        # Readers wait on the pipe itself, and writers on _taken.
+        self._buffer = None   # Reused by get(), allocated on first read.
+        self._serializer = serializer or get_default_serializer()
+        self._defer_setup()
         super(Channel, self).__init__()
         _debug('Channel created: {0}'.format(self.name))
 
-    def _setup(self):
-        """Set up synchronisation.
+    def _defer_setup(self):
+        """Arrange for L{_setup} to be called when it is needed.
 
         MUST be called in __init__ of this class and all subclasses.
         """
-        # Process-safe synchronisation.
-        self._wlock = processing.RLock()    # Write lock.
-        self._rlock = processing.RLock()    # Read lock.
-        self._plock = processing.Lock()  # Fix poisoning.
-        self._available = processing.Semaphore(0)
-        self._taken = processing.Semaphore(0)
-        # Process-safe synchronisation for CSP Select / Occam Alt.
-        self._is_alting = processing.Value('h', Channel.FALSE,
-                                           lock=processing.Lock())
-        self._is_selectable = processing.Value('h', Channel.FALSE,
-                                               lock=processing.Lock())
-        # Kludge to say a select has finished (to prevent the channel
-        # from being re-enabled). If values were really process safe
-        # we could just have writers set _is_selectable and read that.
-        self._has_selected = processing.Value('h', Channel.FALSE,
-                                              lock=processing.Lock())
-        # Is this channel poisoned?
-        self._poisoned = processing.Value('h', Channel.FALSE,
-                                          lock=processing.Lock())
+        _unready_channels.add(self)
+
+    def __getattr__(self, name):
+        # Only called for attributes which do not exist yet.
+        if name not in self._LAZY:
+            raise AttributeError(name)
+        self._setup()
+        return self.__dict__[name]
+
+    def _setup(self):
+        """Set up the OS pipe and synchronisation.
+
+        Locks and semaphores are expensive to create, and pipes use
+        up file descriptors, so this is called when the channel is
+        first used, or before a process which could inherit the
+        channel is forked, whichever is first.
+        """
+        _unready_channels.discard(self)
+        _live_channels[self.name] = self
+        if self._poolable and _pool is not None:
+            index = _pool._take_slot()
+            if index is not None:
+                self._use_slot(index)
+                return
+        self._open()
+        self._new_sync()
+
+    def _new_sync(self):
+        """Create the process-safe synchronisation of this channel.
+        Called by L{_setup} unless a L{ProcessPool} slot is used.
+        """
+        self._wlock = _context.RLock()    # Write lock.
+        self._rlock = _context.RLock()    # Read lock.
+        self._taken = _context.Semaphore(0)
+        self._poisoned, = _new_flags(1)
+
+    def _use_slot(self, index):
+        """Use the OS pipe and synchronisation held in slot C{index}
+        of the L{ProcessPool}, which its workers have inherited.
+        """
+        self._slot = index
+        self._slot_pool = _pool
+        slot = _slots[index]
+        (self._itemr, self._itemw, self._wlock, self._rlock) = slot[:4]
+        self._taken, self._poisoned = slot[5], slot[9]
+
+    def _pool_state(self):
+        """Return the attributes needed to rebuild this channel in a
+        L{ProcessPool} worker, other than those in its slot.
+        """
+        return dict((key, value) for key, value in self.__dict__.items()
+                    if key not in self._LAZY and
+                    key not in ('_slot', '_slot_pool', '_buffer', '_claimer',
+                                '_unread'))
+
+    def _pool_restore(self, state, index):
+        """Rebuild this channel from L{_pool_state} and a slot.
+        """
+        self.__dict__.update(state)
+        self._buffer = None
+        self._use_slot(index)
+
+    def __getstate__(self):
+        if not _spawning():
+            return self.__dict__
+        if '_poisoned' not in self.__dict__:
+            self._setup()
+        return self._spawn_state()
+
+    def __setstate__(self, state):
+        spawned = state.pop('_spawned', False)
+        self.__dict__.update(state)
+        if spawned:
+            self._spawn_restore()
+
+    def _spawn_state(self):
+        """Return the attributes needed to rebuild this channel in a
+        child which does not fork. The ends of the OS pipe are
+        duplicated for the child.
+        """
+        state = dict((key, value) for key, value in self.__dict__.items()
+                     if key not in ('_slot', '_slot_pool', '_buffer',
+                                    '_claimer', '_unread'))
+        for key in ('_itemr', '_itemw'):
+            if key in state:
+                state[key] = processing.reduction.DupFd(state[key])
+        state['_spawned'] = True
+        return state
+
+    def _spawn_restore(self):
+        """Finish rebuilding this channel from L{_spawn_state}.
+        """
+        for key in ('_itemr', '_itemw'):
+            if key in self.__dict__:
+                self.__dict__[key] = self.__dict__[key].detach()
+        self._buffer = None
+        _live_channels[self.name] = self
+
+    def _open(self):
+        """Create the OS pipe which carries items. Called by L{_setup}.
+        """
+        self._itemr, self._itemw = os.pipe()
+
+    def _writev(self, buffers):
+        """Write every buffer in C{buffers} to the pipe, in order.
+        """
+        count = os.writev(self._itemw, buffers)
+        for buff in buffers:
+            view = memoryview(buff).cast('B')
+            if count >= view.nbytes:
+                count -= view.nbytes
+                continue
+            view, count = view[count:], 0
+            while view:
+                view = view[os.write(self._itemw, view):]
+
+    def _readinto(self, buff, count, least):
+        """Read from the pipe into C{buff} after its first C{count}
+        bytes until it holds at least C{least} bytes. Return the
+        number of bytes in C{buff}, which is less than C{least} only
+        if the pipe has been closed.
+        """
+        view = memoryview(buff)
+        while count < least:
+            nbytes = os.readv(self._itemr, [view[count:]])
+            if not nbytes:
+                break
+            count += nbytes
+        return count
 
     def put(self, item):
         """Put C{item} on a process-safe store.
+
+        Items are sent as frames: the length of the serialized item
+        and its batch count, packed with L{_FRAME}, followed by the
+        item itself. A frame which does not fit in the pipe is written
+        as the reader reads it.
         """
         self.checkpoison()
-        os.write(self._itemw, pickle.dumps(item, protocol=1))
+        count, data = self._dumps(item)
+        self._writev([_FRAME.pack(memoryview(data).nbytes, count), data])
 
     def get(self):
         """Get a Python object from a process-safe store.
+
+        As much of the next frame as is on the pipe is read straight
+        into this channel's buffer, followed by the rest of the frame,
+        if any. Small items take a single read.
         """
         self.checkpoison()
-        data = []
-        while True:
-            sval = os.read(self._itemr, _BUFFSIZE)
-            _debug('Read from OS pipe')
-            if not sval:
-                break
-            data.append(sval)
-#            _debug('Pipe got data: {0}, {1}'.format(len(sval), sval))
-            if len(sval) < _BUFFSIZE:
-                break
-        _debug('Left read loop')
-        _debug('About to unmarshall this data: {0}'.format(b''.join(data)))
-        obj = None if data == [] else pickle.loads(b''.join(data))
-        _debug('pickle library has unmarshalled data.')
-        return obj
+        buff = self._buffer
+        if buff is None:
+            buff = self._buffer = bytearray(_BUFFSIZE)
+        count = self._readinto(buff, 0, _FRAME.size)
+        if count < _FRAME.size:
+            return None
+        length, items = _FRAME.unpack_from(buff)
+        if length < 0:
+            # Poisoned while this reader was waiting on the pipe.
+            self._repoison()
+            raise ChannelPoison()
+        end = _FRAME.size + length
+        if end > len(buff):
+            grown = bytearray(end)
+            grown[:count] = buff[:count]
+            buff = grown
+            if end <= _BUFFMAX:
+                self._buffer = buff
+        _debug('Reading frame of {0} bytes'.format(length))
+        self._readinto(memoryview(buff)[:end], count, end)
+        return self._loads(items, memoryview(buff)[_FRAME.size:end])
+
+    def _dumps(self, obj):
+        """Return the number of items in C{obj} if it is a batch, or 0,
+        and C{obj} serialized.
+        """
+        if type(obj) is _Batch:
+            return len(obj), self._serializer.dumps_many(obj)
+        return 0, self._serializer.dumps(obj)
+
+    def _loads(self, count, data):
+        """Return the object serialized in C{data} by L{_dumps}, where
+        C{count} is the number of items of a batch, or 0.
+        """
+        if count:
+            return _Batch(self._serializer.loads_many(data))
+        return self._serializer.loads(data)
 
     def __del__(self):
+        if '_itemr' not in self.__dict__:
+            return # Never set up.
+        if _pool is not None and self.__dict__.get('_slot_pool') is _pool:
+            # Owned by the pool, which may still be using it.
+            # Slots of a pool which has been closed are ours to close.
+            _pool._release_slot(self._slot)
+            return
         try:
             os.close(self._itemr)
             os.close(self._itemw)
         except:
             pass
 
+    def _recycle(self):
+        """Forget what this process holds of the last use of this
+        channel, so that a L{ChannelFactory} can hand it out again.
+
+        Return C{False}, leaving the channel as it is, if it cannot be
+        reused: it is poisoned, claimed by an L{Alt}, or an item is
+        still waiting on it.
+        """
+        if '_poisoned' in self.__dict__: # Synchronisation set up.
+            if (self._poisoned.value == Channel.TRUE or
+                self._claimer is not None or self._has_item()):
+                return False
+        self._unread = None
+        _unread_channels.discard(self)
+        self._buffer = None
+        return True
+
+    def _has_item(self):
+        """Return C{True} if a writer has put an item on this channel
+        which no reader has taken.
+        """
+        poller = select.poll()
+        poller.register(self._itemr, select.POLLIN)
+        return bool(poller.poll(0))
+
+    def fileno(self):
+        """Return the read end of the OS pipe used by this channel.
+
+        The pipe becomes readable as soon as a writer has put an item
+        on this channel, so an L{Alt} can wait on it with select(2).
+        """
+        return self._itemr
+
     def is_selectable(self):
         """Test whether Alt can select this channel.
         """
-        _debug('Alt THINKS _is_selectable IS: {0}'.format(str(self._is_selectable.value == Channel.TRUE)))
+        if self._poisoned.value == Channel.TRUE:
+            self.disable()
         self.checkpoison()
-        return self._is_selectable.value == Channel.TRUE
+        if self._unread_items():
+            return True
+        return self._claimer == threading.get_ident()
 
     def write(self, obj):
         """Write a Python object to this channel.
+
+        The frame of the item is written straight to the pipe, where
+        a reader is waiting, and the writer then waits until a reader
+        has taken it.
         """
         self.checkpoison()
         _debug('+++ Write on Channel {0} started.'.format(self.name))
         with self._wlock: # Protect from races between multiple writers.
-            # If this channel has already been selected by an Alt then
-            # _has_selected will be True, blocking other readers. If a
-            # new write is performed that flag needs to be reset for
-            # the new write transaction.
-            self._has_selected.value = Channel.FALSE
-            # Make the object available to the reader.
             self.put(obj)
-            # Announce the object has been released to the reader.
-            self._available.release()
-            _debug('++++ Writer on Channel {0}: _available: {1} _taken: {2}. '.format(self.name, repr(self._available), repr(self._taken)))
             # Block until the object has been read.
             self._taken.acquire()
-            # Remove the object from the channel.
+            if self._poisoned.value == Channel.TRUE:
+                self._taken.release() # Wake the next waiting writer.
+                raise ChannelPoison()
         _debug('+++ Write on Channel {0} finished.'.format(self.name))
 
-    def read(self):
-        """Read (and return) a Python object from this channel.
+    def write_many(self, items):
+        """Write every object in the iterable C{items} to this channel.
+
+        The objects are sent as a single batch, with one rendezvous,
+        so this is much faster than writing them one at a time. Each
+        is encoded by the serializer of the channel. Blocks until a reader has taken the batch.
+        The reader receives the objects in order, from any of
+        L{read}, L{read_many}, an L{Alt} or by iterating over the
+        channel. Objects of a batch which the reading process has not
+        yet asked for are kept by that process.
+        """
+        items = _Batch(items)
+        if items:
+            self.write(items)
+
+    def _read(self):
+        """Read (and return) the next item written to this channel.
+
+        The reader waits on the pipe for the next frame, so a read
+        which does not wait for a writer costs a single system call.
         """
-#        assert self._is_alting.value == Channel.FALSE
-#        assert self._is_selectable.value == Channel.FALSE
         self.checkpoison()
         _debug('+++ Read on Channel {0} started.'.format(self.name))
         with self._rlock: # Protect from races between multiple readers.
-            # Block until an item is in the Channel.
-            _debug('++++ Reader on Channel {0}: _available: {1} _taken: {2}. '.format(self.name, repr(self._available), repr(self._taken)))
-            self._available.acquire()
-            # Get the item.
             obj = self.get()
             # Announce the item has been read.
             self._taken.release()
         _debug('+++ Read on Channel {0} finished.'.format(self.name))
         return obj
 
+    def _unread_items(self):
+        """Return the deque of items left from a batch read by this
+        process, or C{None} if there are none.
+        """
+        if self._unread is None:
+            return None
+        pid, items = self._unread
+        if not items or pid != os.getpid():
+            # Items left in a parent process belong to the parent.
+            self._unread = None
+            _unread_channels.discard(self)
+            return None
+        return items
+
+    def _keep_unread(self, items, count):
+        """Return the first C{count} of C{items}, a batch which has just
+        been read, and keep the rest to be read later.
+        """
+        if len(items) > count:
+            self._unread = (os.getpid(), collections.deque(items[count:]))
+            _unread_channels.add(self)
+            return items[:count]
+        return items
+
+    def read(self):
+        """Read (and return) a Python object from this channel.
+        """
+        unread = self._unread_items()
+        if unread:
+            return unread.popleft()
+        obj = self._read()
+        if _is_batch(obj):
+            return self._keep_unread(obj, 1)[0]
+        return obj
+
+    def read_many(self, max_n):
+        """Read (and return) a list of at least one and at most
+        C{max_n} Python objects from this channel.
+
+        Blocks only until one object is available. Reading a batch
+        sent by L{write_many} takes a single rendezvous.
+        """
+        assert max_n > 0
+        unread = self._unread_items()
+        if unread:
+            return [unread.popleft() for i in range(min(max_n, len(unread)))]
+        obj = self._read()
+        if _is_batch(obj):
+            return self._keep_unread(obj, max_n)
+        return [obj]
+
+    def __iter__(self):
+        """Iterate over the objects read from this channel, forever.
+
+        Objects are read with L{read_many}. If the iteration stops
+        part way through a batch the rest of it is kept to be read
+        later.
+        """
+        while True:
+            items = collections.deque(self.read_many(_ITER_BATCH))
+            try:
+                while items:
+                    yield items.popleft()
+            finally:
+                if items:
+                    unread = self._unread_items()
+                    if unread:
+                        items.extend(unread)
+                    self._unread = (os.getpid(), items)
+                    _unread_channels.add(self)
+
     def enable(self):
         """Enable a read for an Alt select.
 
-        MUST be called before L{select()} or L{is_selectable()}.
+        If an item is waiting on the pipe, and no other reader holds
+        the read lock, the lock is kept for L{select} and this channel
+        is selectable by the calling thread. MUST be called before
+        L{select()} or L{is_selectable()}.
         """
         self.checkpoison()
-        # Prevent re-synchronization.
-        if (self._has_selected.value == Channel.TRUE or
-            self._is_selectable.value == Channel.TRUE):
-            # Be explicit.
+        if self._unread_items() or self._claimer == threading.get_ident():
+            # Selectable without a rendezvous.
             return None
-        self._is_alting.value = Channel.TRUE
-        with self._rlock:
-            # Attempt to acquire _available.
-            time.sleep(0.00001) # Won't work without this -- why?
-            if self._available.acquire(block=False):
-                self._is_selectable.value = Channel.TRUE
-            else:
-                self._is_selectable.value = Channel.FALSE
-        _debug('Enable on guard {0} _is_selectable: {1} _available: {2}'.format(self.name, str(self._is_selectable.value), repr(self._available)))
+        # A reader which holds the read lock is waiting for the next
+        # item, which is then not ours to take.
+        if not self._rlock.acquire(block=False):
+            return None
+        poller = select.poll()
+        poller.register(self._itemr, select.POLLIN)
+        if poller.poll(0):
+            self._claimer = threading.get_ident()
+        else:
+            self._rlock.release()
+        _debug('Enable on guard {0} claimed: {1}'.format(self.name, self._claimer is not None))
 
     def disable(self):
-        """Disable this channel for Alt selection.
+        """Disable this channel for Alt selection, releasing the read
+        lock if L{enable} kept it.
 
         MUST be called after L{enable} if this channel is not selected.
         """
+        if self._claimer == threading.get_ident():
+            self._claimer = None
+            self._rlock.release()
         self.checkpoison()
-        self._is_alting.value = Channel.FALSE
-        if self._is_selectable.value == Channel.TRUE:
-            with self._rlock:
-                self._available.release()
-            self._is_selectable.value = Channel.FALSE
 
     def select(self):
         """Complete a Channel read for an Alt select.
         """
-        self.checkpoison()
-        _debug('channel select starting')
-        assert self._is_selectable.value == Channel.TRUE
-        with self._rlock:
-            _debug('got read lock on channel {0} _available: {1}'.format(self.name, repr(self._available)))
-            # Obtain object on Channel.
+        claimed = self._claimer == threading.get_ident()
+        if claimed:
+            self._claimer = None
+        try:
+            self.checkpoison()
+            unread = self._unread_items()
+            if unread:
+                return unread.popleft()
+            assert claimed
             obj = self.get()
-            _debug('got obj')
             # Notify write() that object is taken.
             self._taken.release()
-            _debug('released _taken')
-            # Reset flags to ensure a future read / enable / select.
-            self._is_selectable.value = Channel.FALSE
-            self._is_alting.value = Channel.FALSE
-            self._has_selected.value = Channel.TRUE
-            _debug('reset bools')
+        finally:
+            if claimed:
+                self._rlock.release()
         if obj == _POISON:
             self.poison()
             raise ChannelPoison()
+        if _is_batch(obj):
+            return self._keep_unread(obj, 1)[0]
         return obj
 
     def __str__(self):
         return 'Channel using OS pipe for IPC.'
 
     def checkpoison(self):
-        with self._plock:
-            if self._poisoned.value == Channel.TRUE:
-                _debug('{0} is poisoned. Raising ChannelPoison()'.format(self.name))
-                raise ChannelPoison()
+        if self._poisoned.value == Channel.TRUE:
+            _debug('{0} is poisoned. Raising ChannelPoison()'.format(self.name))
+            raise ChannelPoison()
 
     def poison(self):
         """Poison a channel causing all processes using it to terminate.
@@ -1029,69 +1881,1220 @@ Poisoning channel: 5c906e38-5559-11df-8503-002421449824
 <Par(Par-5, initial)>
 >>> 
         """
-        with self._plock:
-            self._poisoned.value = Channel.TRUE
-            # Avoid race conditions on any waiting readers / writers.
-            self._available.release() 
+        was_poisoned = self._poisoned.value == Channel.TRUE
+        self._poisoned.value = Channel.TRUE
+        # Wake a waiting writer, which wakes the next one.
+        self._taken.release()
+        if not was_poisoned:
+            # Wake a waiting reader, and any Alt blocked in select(2)
+            # on this channel.
+            self._repoison()
+
+    def _repoison(self):
+        """Write a poison frame to the pipe, waking the next reader.
+        Called by L{poison}, and by each reader which reads one.
+        """
+        try:
+            os.write(self._itemw, _POISON_FRAME)
+        except OSError:
+            pass
+
+
+class _SemaphoreChannel(Channel):
+    """Channel whose readers wait on a semaphore, rather than on the
+    OS pipe, for channels which do not carry items on the pipe.
+
+    Writers release C{_available} once an item is available, and
+    L{Alt} synchronisation is kept in three flags:
+    C{_is_alting} is true if engaged in an Alt synchronisation,
+    C{_is_selectable} if the channel can be selected by an Alt and
+    C{_has_selected} if an Alt has already committed to select.
+    """
+
+    # Attributes created by _setup(), when they are first needed.
+    _LAZY = Channel._LAZY | frozenset(['_available', '_is_alting',
+                                       '_is_selectable', '_has_selected'])
+
+    def _new_sync(self):
+        super(_SemaphoreChannel, self)._new_sync()
+        self._available = _context.Semaphore(0)
+        # Process-safe synchronisation for CSP Select / Occam Alt.
+        # _has_selected is a kludge to say a select has finished (to
+        # prevent the channel from being re-enabled). If values were
+        # really process safe we could just have writers set
+        # _is_selectable and read that.
+        (self._is_alting, self._is_selectable,
+         self._has_selected) = _new_flags(3)
+
+    def _use_slot(self, index):
+        super(_SemaphoreChannel, self)._use_slot(index)
+        slot = _slots[index]
+        self._available = slot[4]
+        (self._is_alting, self._is_selectable,
+         self._has_selected) = slot[6:9]
+
+    def _notify(self):
+        """Called once a writer has made an item available. Does
+        nothing, subclasses may wake an L{Alt} here.
+        """
+        pass
+
+    def _recycle(self):
+        if not super(_SemaphoreChannel, self)._recycle():
+            return False
+        if '_is_alting' in self.__dict__:
+            self._is_alting.value = Channel.FALSE
+            self._has_selected.value = Channel.FALSE
+        return True
+
+    def _has_item(self):
+        # An item claimed by an Alt has been taken from _available.
+        if self._is_selectable.value == Channel.TRUE:
+            return True
+        if self._available.acquire(block=False):
+            self._available.release()
+            return True
+        return False
+
+    def is_selectable(self):
+        """Test whether Alt can select this channel.
+        """
+        _debug('Alt THINKS _is_selectable IS: {0}'.format(str(self._is_selectable.value == Channel.TRUE)))
+        if self._poisoned.value == Channel.TRUE:
+            self.disable()
+        self.checkpoison()
+        if self._unread_items():
+            return True
+        return self._is_selectable.value == Channel.TRUE
+
+    def write(self, obj):
+        """Write a Python object to this channel.
+        """
+        self.checkpoison()
+        _debug('+++ Write on Channel {0} started.'.format(self.name))
+        with self._wlock: # Protect from races between multiple writers.
+            # If this channel has already been selected by an Alt then
+            # _has_selected will be True, blocking other readers. If a
+            # new write is performed that flag needs to be reset for
+            # the new write transaction.
+            self._has_selected.value = Channel.FALSE
+            # Make the object available to the reader.
+            self.put(obj)
+            # Announce the object has been released to the reader.
+            self._available.release()
+            self._notify()
+            # Block until the object has been read.
+            self._taken.acquire()
+            if self._poisoned.value == Channel.TRUE:
+                self._taken.release() # Wake the next waiting writer.
+                raise ChannelPoison()
+        _debug('+++ Write on Channel {0} finished.'.format(self.name))
+
+    def _read(self):
+        """Read (and return) the next item written to this channel.
+        """
+#        assert self._is_alting.value == Channel.FALSE
+#        assert self._is_selectable.value == Channel.FALSE
+        self.checkpoison()
+        _debug('+++ Read on Channel {0} started.'.format(self.name))
+        with self._rlock: # Protect from races between multiple readers.
+            # Block until an item is in the Channel.
+            self._available.acquire()
+            if self._poisoned.value == Channel.TRUE:
+                self._available.release() # Wake the next waiting reader.
+                raise ChannelPoison()
+            # Get the item.
+            obj = self.get()
+            # Announce the item has been read.
+            self._taken.release()
+        _debug('+++ Read on Channel {0} finished.'.format(self.name))
+        return obj
+
+    def enable(self):
+        """Enable a read for an Alt select.
+
+        MUST be called before L{select()} or L{is_selectable()}.
+        """
+        self.checkpoison()
+        if self._unread_items():
+            # Selectable without a rendezvous.
+            return None
+        # Prevent re-synchronization.
+        if (self._has_selected.value == Channel.TRUE or
+            self._is_selectable.value == Channel.TRUE):
+            # Be explicit.
+            return None
+        self._is_alting.value = Channel.TRUE
+        # A reader which holds the read lock is waiting for the next
+        # item, which is then not ours to take.
+        if not self._rlock.acquire(block=False):
+            self._is_selectable.value = Channel.FALSE
+            return None
+        try:
+            if self._available.acquire(block=False):
+                self._is_selectable.value = Channel.TRUE
+            else:
+                self._is_selectable.value = Channel.FALSE
+        finally:
+            self._rlock.release()
+        _debug('Enable on guard {0} _is_selectable: {1}'.format(self.name, str(self._is_selectable.value)))
+
+    def disable(self):
+        """Disable this channel for Alt selection.
+
+        MUST be called after L{enable} if this channel is not selected.
+        """
+        self._is_alting.value = Channel.FALSE
+        if self._is_selectable.value == Channel.TRUE:
+            with self._rlock:
+                self._available.release()
+            self._is_selectable.value = Channel.FALSE
+        self.checkpoison()
+
+    def select(self):
+        """Complete a Channel read for an Alt select.
+        """
+        self.checkpoison()
+        _debug('channel select starting')
+        unread = self._unread_items()
+        if unread:
+            return unread.popleft()
+        assert self._is_selectable.value == Channel.TRUE
+        with self._rlock:
+            _debug('got read lock on channel {0}'.format(self.name))
+            # Obtain object on Channel.
+            obj = self.get()
+            _debug('got obj')
+            # Reset flags to ensure a future read / enable / select.
+            self._is_selectable.value = Channel.FALSE
+            self._is_alting.value = Channel.FALSE
+            self._has_selected.value = Channel.TRUE
+            _debug('reset bools')
+            # Notify write() that object is taken.
             self._taken.release()
+            _debug('released _taken')
+        if obj == _POISON:
+            self.poison()
+            raise ChannelPoison()
+        if _is_batch(obj):
+            return self._keep_unread(obj, 1)[0]
+        return obj
+
+    def poison(self):
+        """Poison a channel causing all processes using it to terminate.
+        """
+        was_poisoned = self._poisoned.value == Channel.TRUE
+        self._poisoned.value = Channel.TRUE
+        # Avoid race conditions on any waiting readers / writers.
+        self._available.release() 
+        self._taken.release()
+        # Wake any Alt blocked in select(2) on this channel.
+        if not was_poisoned and self.fileno() is not None:
+            try:
+                os.write(self._itemw, _POISON_FRAME)
+            except OSError:
+                pass
+
+
+class FileChannel(_SemaphoreChannel):
+    """Channel objects using memory-mapped files.
+
+    Each C{FileChannel} owns a region of a sparse file which is
+    mapped into memory, and holds no file descriptors of its own.
+    The advantage of this is that client code can create as many
+    C{FileChannel} objects as it wishes (unconstrained by the
+    operating system's maximum number of open files). Regions are
+    handed out when a channel is first used, so creating a channel
+    which is never used costs very little.
+
+    Items are copied into the region of the channel by the writer
+    and out of it by the reader. Items too large for the region are
+    written to a file of their own, whose name is passed through the
+    region instead. An L{Alt} cannot block on a C{FileChannel}, so it
+    polls these channels.
+    """
+
+    # Attributes created by _setup(), when they are first needed.
+    _LAZY = (_SemaphoreChannel._LAZY - frozenset(['_itemr', '_itemw']) |
+             frozenset(['_region', '_file', '_offset']))
+
+    # Regions mapped after a ProcessPool starts are not shared with it.
+    _poolable = False
 
+    def __init__(self, serializer=None):
+        self.name = _new_channel_id()
+        self._serializer = serializer or get_default_serializer()
+        self._defer_setup()
 
-class FileChannel(Channel):
-    """Channel objects using files on disk.
+    def _open(self):
+        """Map the region of a file which carries items.
+        """
+        self._file, self._offset = _new_file_region()
+        self._region = self._file.view[self._offset:self._offset + _FILE_REGION]
+
+    def _spawn_state(self):
+        """Return the attributes needed to rebuild this channel in a
+        child which does not fork. The file holding the region is
+        duplicated for the child.
+        """
+        state = super(FileChannel, self)._spawn_state()
+        del state['_region']
+        state['_file'] = processing.reduction.DupFd(self._file.fileno)
+        return state
+
+    def _spawn_restore(self):
+        self._file = _adopt_shared_file(self._file.detach())
+        self._region = self._file.view[self._offset:self._offset + _FILE_REGION]
+        super(FileChannel, self)._spawn_restore()
+
+    def put(self, item):
+        """Put C{item} on a process-safe store.
+
+        The region holds the length of the serialized item and its
+        batch count, packed with L{_FRAME}, followed by the item
+        itself. Large items are written to their own file and the
+        region holds the name of the file, with a negative length.
+        """
+        self.checkpoison()
+        count, data = self._dumps(item)
+        data = memoryview(data).cast('B')
+        if _FRAME.size + data.nbytes <= _FILE_REGION:
+            _FRAME.pack_into(self._region, 0, data.nbytes, count)
+            self._region[_FRAME.size:_FRAME.size + data.nbytes] = data
+            return
+        file_d, name = _new_shared_file()
+        with os.fdopen(file_d, 'wb') as fobj:
+            fobj.write(data)
+        name = name.encode()
+        _FRAME.pack_into(self._region, 0, -len(name), count)
+        self._region[_FRAME.size:_FRAME.size + len(name)] = name
+
+    def get(self):
+        """Get a Python object from a process-safe store.
+        """
+        self.checkpoison()
+        length, count = _FRAME.unpack_from(self._region)
+        if length >= 0:
+            return self._loads(
+                count, self._region[_FRAME.size:_FRAME.size + length])
+        name = self._region[_FRAME.size:_FRAME.size - length].tobytes()
+        with open(name, 'rb') as fobj:
+            _unlink_shared_file(name.decode())
+            return self._loads(count, fobj.read())
+
+    def __del__(self):
+        pass
+
+    def fileno(self):
+        """FileChannel objects hold no open file descriptor."""
+        return None
+
+    def __str__(self):
+        return 'Channel using memory-mapped files for IPC.'
+
+
+class _DescriptorPickler(pickle.Pickler):
+    """Pickler which leaves out sockets and files, and collects their
+    file descriptors to be passed alongside the pickle.
+    """
+
+    def __init__(self, buff, fds):
+        pickle.Pickler.__init__(self, buff, pickle.HIGHEST_PROTOCOL)
+        self.fds = fds
+
+    def persistent_id(self, obj):
+        if isinstance(obj, socket.socket):
+            self.fds.append(obj.fileno())
+            return ('socket', len(self.fds) - 1)
+        if not isinstance(obj, io.IOBase):
+            return None
+        try:
+            fd = obj.fileno()
+        except (OSError, ValueError): # In-memory or closed.
+            return None
+        if obj.writable():
+            obj.flush()
+        self.fds.append(fd)
+        return ('file', len(self.fds) - 1, obj.mode,
+                getattr(obj, 'encoding', None))
+
+
+class _DescriptorUnpickler(pickle.Unpickler):
+    """Unpickler which rebuilds the sockets and files left out by
+    L{_DescriptorPickler} from the file descriptors received.
+    """
+
+    def __init__(self, buff, fds):
+        pickle.Unpickler.__init__(self, buff)
+        self.fds = fds
+        self.used = set()
+
+    def persistent_load(self, pid):
+        kind, index = pid[:2]
+        self.used.add(index)
+        if kind == 'socket':
+            return socket.socket(fileno=self.fds[index])
+        mode, encoding = pid[2:]
+        return os.fdopen(self.fds[index], mode, encoding=encoding)
+
+
+class DescriptorChannel(Channel):
+    """Channel which can carry open sockets and files between OS
+    processes.
+
+    Items are pickled, except that sockets and file objects in them
+    are replaced by their file descriptors, which the OS duplicates
+    into the reading process (SCM_RIGHTS over a Unix socketpair).
+    The reader gets a new socket or file object for the same open
+    connection or file, so a process can hand a connection to
+    another without copying any of the bytes on it:
+
+>>> @process
+... def acceptor(listener, cout):
+...     while True:
+...         conn, address = listener.accept()
+...         cout.write(conn)
+...         conn.close()
+... 
+>>> @process
+... def worker(cin):
+...     for conn in cin:
+...         conn.sendall(b'Hello')
+...         conn.close()
+... 
+>>> c = DescriptorChannel()
+>>> acceptor(listener, c) // (worker(c),)
 
-    C{FileChannel} objects close their files after each read or write
-    operation. The advantage of this is that client code can create as
-    many C{FileChannel} objects as it wishes (unconstrained by the
-    operating system's maximum number of open files). In return there
-    is a performance hit -- reads and writes are around 10 x slower on
-    C{FileChannel} objects compared to L{Channel} objects.
+    The writer keeps its own copy of each descriptor, which it should
+    close once the item has been written if it no longer needs it.
+    Data already read into the buffer of a file object is not passed
+    on, but data buffered for writing is flushed first.
     """
 
+    # ProcessPool slots hold OS pipes, which cannot pass descriptors.
+    _poolable = False
+
     def __init__(self):
-        self.name = uuid.uuid1()
-        self._wlock = None	# Write lock.
-        self._rlock = None	# Read lock.
-        self._available = None
-        self._taken = None
-        self._is_alting = None
-        self._is_selectable = None
-        self._has_selected = None
-        # Process-safe store.
-        file_d, self._fname = tempfile.mkstemp()
-        os.close(file_d)
-        self._setup()
+        super(DescriptorChannel, self).__init__()
+        self._fds = [] # Descriptors to send with the next frame.
+
+    def _recycle(self):
+        if not super(DescriptorChannel, self)._recycle():
+            return False
+        self._fds = []
+        return True
+
+    def _open(self):
+        """Create the Unix socketpair which carries items.
+        """
+        reader, writer = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._itemr, self._itemw = reader.detach(), writer.detach()
+
+    def _writev(self, buffers):
+        """Write every buffer in C{buffers} to the socket, in order,
+        passing the descriptors of the item with the first byte.
+        """
+        fds, self._fds = self._fds, []
+        sock = socket.socket(fileno=self._itemw)
+        try:
+            ancdata = []
+            if fds:
+                ancdata = [(socket.SOL_SOCKET, socket.SCM_RIGHTS,
+                            array.array('i', fds))]
+            count = sock.sendmsg(buffers, ancdata)
+        finally:
+            sock.detach()
+        for buff in buffers:
+            view = memoryview(buff).cast('B')
+            if count >= view.nbytes:
+                count -= view.nbytes
+                continue
+            view, count = view[count:], 0
+            while view:
+                view = view[os.write(self._itemw, view):]
+
+    def _recv_header(self, fds):
+        """Read a frame header from the socket, adding any descriptors
+        which arrive with it to C{fds}. Return the header, which is
+        short only if the socket has been closed.
+        """
+        header = bytearray(_FRAME.size)
+        space = socket.CMSG_SPACE(_MAX_FDS * fds.itemsize)
+        flags = getattr(socket, 'MSG_CMSG_CLOEXEC', 0)
+        sock = socket.socket(fileno=self._itemr)
+        try:
+            count = 0
+            while count < _FRAME.size:
+                nbytes, ancdata, msg_flags, address = sock.recvmsg_into(
+                    [memoryview(header)[count:]], space, flags)
+                if not nbytes:
+                    return header[:count]
+                count += nbytes
+                for level, kind, data in ancdata:
+                    if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+                        fds.frombytes(data[:len(data) - len(data) % fds.itemsize])
+        finally:
+            sock.detach()
+        return header
 
     def put(self, item):
         """Put C{item} on a process-safe store.
+
+        Frames are written as by L{Channel.put}, with the descriptors
+        of the sockets and files in the item.
         """
-        file_d = file(self._fname, 'w')
-        file_d.write(pickle.dumps(item, protocol=1))
-        file_d.flush()
-        file_d.close()
+        self.checkpoison()
+        count = len(item) if type(item) is _Batch else 0
+        buff, fds = io.BytesIO(), []
+        _DescriptorPickler(buff, fds).dump(list(item) if count else item)
+        if len(fds) > _MAX_FDS:
+            raise ValueError('Cannot pass more than {0} file descriptors '
+                             'in one item.'.format(_MAX_FDS))
+        data = buff.getbuffer()
+        self._fds = fds
+        self._writev([_FRAME.pack(data.nbytes, count), data])
 
     def get(self):
         """Get a Python object from a process-safe store.
+
+        Descriptors received which the item does not use are closed.
+        """
+        self.checkpoison()
+        fds = array.array('i')
+        header = self._recv_header(fds)
+        unpickler = None
+        try:
+            if len(header) < _FRAME.size:
+                return None
+            length, count = _FRAME.unpack(header)
+            if length < 0:
+                raise ChannelPoison()
+            data = bytearray(length)
+            self._readinto(data, 0, length)
+            unpickler = _DescriptorUnpickler(io.BytesIO(data), fds)
+            obj = unpickler.load()
+            return _Batch(obj) if count else obj
+        finally:
+            used = unpickler.used if unpickler is not None else ()
+            for index, fd in enumerate(fds):
+                if index not in used:
+                    os.close(fd)
+
+    def __str__(self):
+        return 'Channel using a Unix socketpair to pass descriptors.'
+
+
+class _RingChannel(_SemaphoreChannel):
+    """Base class of L{BufferedChannel}, which keeps serialized items
+    in a ring buffer in a shared memory segment rather than in an OS
+    pipe, so copying an item in or out makes no system calls. Items
+    too large for the ring are passed in a shared memory segment of
+    their own, which the reader unlinks.
+
+    The ring buffer is C{size} bytes long and is preceded by a header
+    holding the head and tail indices of the ring. Each record in
+    the ring is a length followed by that many bytes of serialized
+    data.
+
+    The OS pipe created by L{Channel} carries no data. It is only
+    written to when an L{Alt} has enabled this channel, to wake the
+    process performing the select, and a flag in the header tells
+    the Alt whether there are wake-up bytes to read from it.
+
+    Requires Python 3.8 or above.
+    """
+
+    def __init__(self, size=_SHM_SIZE, serializer=None):
+        if shared_memory is None:
+            raise ImportError('BufferedChannel requires ' +
+                              'multiprocessing.shared_memory (Python 3.8+).')
+        super(_RingChannel, self).__init__(serializer)
+        self._shm = shared_memory.SharedMemory(create=True,
+                                               size=_SHM_HEADER.size + size)
+        self._owner = os.getpid()
+        self._size = size
+        self._header = self._shm.buf[:_SHM_HEADER.size]
+        self._ring = self._shm.buf[_SHM_HEADER.size:]
+        _SHM_HEADER.pack_into(self._header, 0, 0, 0, 0)
+
+    def _setup(self):
+        """Set up synchronisation. The OS pipe is non-blocking, as it
+        only carries wake-up bytes.
+        """
+        super(_RingChannel, self)._setup()
+        os.set_blocking(self._itemr, False)
+        os.set_blocking(self._itemw, False)
+
+    def _pool_state(self):
+        """Return the attributes needed to rebuild this channel in a
+        L{ProcessPool} worker. The segment is passed by name.
+        """
+        state = super(_RingChannel, self)._pool_state()
+        del state['_header'], state['_ring']
+        return state
+
+    def _pool_restore(self, state, index):
+        """Rebuild this channel from L{_pool_state} and a slot.
+        """
+        super(_RingChannel, self)._pool_restore(state, index)
+        self._header = self._shm.buf[:_SHM_HEADER.size]
+        self._ring = self._shm.buf[_SHM_HEADER.size:]
+
+    def _spawn_state(self):
+        """As L{_pool_state}, for a child which does not fork.
+        """
+        state = super(_RingChannel, self)._spawn_state()
+        del state['_header'], state['_ring']
+        return state
+
+    def _spawn_restore(self):
+        super(_RingChannel, self)._spawn_restore()
+        self._header = self._shm.buf[:_SHM_HEADER.size]
+        self._ring = self._shm.buf[_SHM_HEADER.size:]
+
+    def _copy_in(self, index, data):
+        """Copy C{data} into the ring, starting at C{index}."""
+        start = index % self._size
+        first = min(len(data), self._size - start)
+        data = memoryview(data)
+        self._ring[start:start + first] = data[:first]
+        self._ring[:len(data) - first] = data[first:]
+
+    def _copy_out(self, index, length):
+        """Return C{length} bytes from the ring, starting at C{index}."""
+        start = index % self._size
+        first = min(length, self._size - start)
+        if first == length:
+            return self._ring[start:start + length]
+        return (self._ring[start:start + first].tobytes() +
+                self._ring[:length - first].tobytes())
+
+    def _write_record(self, head, length, count, data):
+        """Write a record at C{head} and return the new head."""
+        start = head % self._size
+        end = start + _SHM_RECORD.size + len(data)
+        if end <= self._size:
+            # Common case, the record does not wrap around the ring.
+            _SHM_RECORD.pack_into(self._ring, start, length, count)
+            self._ring[start + _SHM_RECORD.size:end] = data
+        else:
+            self._copy_in(head, _SHM_RECORD.pack(length, count))
+            self._copy_in(head + _SHM_RECORD.size, data)
+        return head + _SHM_RECORD.size + len(data)
+
+    def _notify(self):
+        """Wake an L{Alt} which has enabled this channel."""
+        if self._is_alting.value == Channel.TRUE:
+            try:
+                os.write(self._itemw, b'\0')
+            except OSError:
+                pass
+            _SHM_INDEX.pack_into(self._header, _SHM_WOKEN, 1)
+
+    def _arm(self):
+        """Ask writers to wake an L{Alt} through the pipe, and return
+        C{True} if an item may already be in the ring.
+        """
+        self._is_alting.value = Channel.TRUE
+        head, tail = _SHM_INDICES.unpack_from(self._header)
+        return head != tail
+
+    def _drain(self):
+        """Discard any wake-up bytes left on the pipe."""
+        try:
+            while os.read(self._itemr, _BUFFSIZE):
+                pass
+        except OSError:
+            pass
+
+    def put(self, item):
+        """Put C{item} in the shared memory ring.
+        """
+        self.checkpoison()
+        count, data = self._dumps(item)
+        head, tail = _SHM_INDICES.unpack_from(self._header)
+        if len(data) <= self._size - (head - tail) - _SHM_RECORD.size:
+            head = self._write_record(head, len(data), count, data)
+        else:
+            # Too large for the ring, pass the item in a new segment.
+            segment = shared_memory.SharedMemory(create=True, size=len(data))
+            segment.buf[:len(data)] = data
+            segment.close()
+            name = segment.name.encode()
+            head = self._write_record(head, -len(name), count, name)
+        _SHM_INDEX.pack_into(self._header, 0, head)
+
+    def get(self):
+        """Get a Python object from the shared memory ring.
         """
-        stored = ''
-        while stored == '':
-            file_d = file(self._fname, 'r')
-            stored = file_d.read()
-            file_d.close()
-        # Unlinking here ensures that FileChannel objects exhibit the
-        # same semantics as Channel objects.
-        os.unlink(self._fname)
-        obj = pickle.loads(stored)
+        self.checkpoison()
+        head, tail = _SHM_INDICES.unpack_from(self._header)
+        if head == tail:
+            return None
+        length, count = _SHM_RECORD.unpack(self._copy_out(tail, _SHM_RECORD.size))
+        tail += _SHM_RECORD.size
+        if length >= 0:
+            obj = self._loads(count, self._copy_out(tail, length))
+            tail += length
+        else:
+            name = bytes(self._copy_out(tail, -length)).decode()
+            tail -= length
+            segment = shared_memory.SharedMemory(name=name)
+            try:
+                obj = self._loads(count, segment.buf)
+            finally:
+                segment.close()
+                segment.unlink()
+        _SHM_INDEX.pack_into(self._header, _SHM_INDEX.size, tail)
         return obj
 
+    def enable(self):
+        """Enable a read for an Alt select.
+
+        MUST be called before L{select()} or L{is_selectable()}.
+        """
+        self.checkpoison()
+        # Writers only wake an Alt which is known to be waiting, so
+        # announce this before testing whether an item is available.
+        self._is_alting.value = Channel.TRUE
+        # Only read the pipe if a writer has woken it since last time.
+        if _SHM_INDEX.unpack_from(self._header, _SHM_WOKEN)[0]:
+            _SHM_INDEX.pack_into(self._header, _SHM_WOKEN, 0)
+            self._drain()
+        super(_RingChannel, self).enable()
+
+    def _unlink_segments(self):
+        """Unlink the segments of large items left unread in the ring.
+        """
+        head, tail = _SHM_INDICES.unpack_from(self._header)
+        while tail != head:
+            length = _SHM_RECORD.unpack(self._copy_out(tail, _SHM_RECORD.size))[0]
+            tail += _SHM_RECORD.size + abs(length)
+            if length >= 0:
+                continue
+            name = bytes(self._copy_out(tail + length, -length)).decode()
+            try:
+                segment = shared_memory.SharedMemory(name=name)
+            except FileNotFoundError:
+                continue
+            segment.close()
+            segment.unlink()
+
     def __del__(self):
+        super(_RingChannel, self).__del__()
         try:
-            # Necessary if the Channel has been deleted by poisoning.
-            os.unlink(self._fname)
-        except:
+            if os.getpid() == self._owner:
+                self._unlink_segments()
+            self._header.release()
+            self._ring.release()
+            self._shm.close()
+            if os.getpid() == self._owner:
+                self._shm.unlink()
+        except Exception:
             pass
 
+
+class BufferedChannel(_RingChannel):
+    """Asynchronous channel objects with a fixed capacity.
+
+    Writes on a C{BufferedChannel} only block when C{capacity} items
+    are already waiting to be read, so a writer can run ahead of its
+    reader. Reads block until an item is available, as on any other
+    channel, and C{BufferedChannel} objects can be used in an L{Alt}
+    and poisoned in the same way as L{Channel} objects.
+
+>>> c = BufferedChannel(2)
+>>> c.write('a')
+>>> c.write('b')
+>>> c.read(), c.read()
+('a', 'b')
+>>> 
+
+    Items are stored in a ring buffer in shared memory, which holds up
+    to C{size} bytes of serialized data before items spill into
+    segments of their own.
+    """
+
+    def __init__(self, capacity, size=_SHM_SIZE, serializer=None):
+        assert capacity > 0
+        self.capacity = capacity
+        super(BufferedChannel, self).__init__(size, serializer)
+
+    def _setup(self):
+        """Set up synchronisation.
+
+        C{_taken} counts the free slots in the buffer, rather than
+        announcing that a reader has taken a single item.
+        """
+        super(BufferedChannel, self)._setup()
+        for i in range(self.capacity):
+            self._taken.release()
+
+    def write(self, obj):
+        """Write a Python object to this channel.
+
+        Blocks only if the buffer is full.
+        """
+        self.checkpoison()
+        _debug('+++ Write on Channel {0} started.'.format(self.name))
+        with self._wlock: # Protect from races between multiple writers.
+            # Block until there is a free slot in the buffer.
+            self._taken.acquire()
+            if self._poisoned.value == Channel.TRUE:
+                self._taken.release() # Wake the next waiting writer.
+                raise ChannelPoison()
+            self._has_selected.value = Channel.FALSE
+            self.put(obj)
+            # Announce the object has been released to a reader.
+            self._available.release()
+            self._notify()
+        _debug('+++ Write on Channel {0} finished.'.format(self.name))
+
+    def select(self):
+        """Complete a Channel read for an Alt select.
+        """
+        obj = super(BufferedChannel, self).select()
+        # Further items may already be buffered, so allow this
+        # channel to be enabled again before the next write.
+        self._has_selected.value = Channel.FALSE
+        return obj
+
     def __str__(self):
-        return 'Channel using files for IPC.'
+        return 'Buffered channel using shared memory for IPC.'
+
+
+class ChannelFactory(object):
+    """Create channels of one type, reusing channels which have been
+    released.
+
+    Programs which create many short-lived channels, one per cell of
+    a matrix for example, can release the channels they have finished
+    with and have the factory hand them out again, rather than pay
+    for a new OS pipe and new semaphores each time:
+
+>>> factory = ChannelFactory()
+>>> channels = [factory.create() for i in range(10000)]
+>>> # ... run processes using the channels ...
+>>> factory.release(*channels)
+>>>
+
+    Keyword arguments given to the factory are passed on to
+    C{channel_type} when new channels are created:
+
+>>> buffered = ChannelFactory(BufferedChannel, capacity=16)
+>>>
+    """
+
+    def __init__(self, channel_type=Channel, **kwargs):
+        assert issubclass(channel_type, Channel)
+        self.channel_type = channel_type
+        self.kwargs = kwargs
+        self._free = []
+        self._pid = os.getpid()
+
+    def create(self):
+        """Return a new channel, or a released one if there is one.
+        """
+        if self._pid != os.getpid():
+            # Released channels are shared with the parent process.
+            self._free, self._pid = [], os.getpid()
+        if self._free:
+            channel = self._free.pop()
+            channel.name = _new_channel_id()
+            return channel
+        return self.channel_type(**self.kwargs)
+
+    def release(self, *channels):
+        """Hand C{channels} back to the factory to be reused.
+
+        No process may use a channel once it has been released.
+        Channels which are poisoned, or which still have an item
+        waiting to be read, are never reused. Items left from a batch
+        which this process has not read are dropped.
+        """
+        for channel in channels:
+            assert type(channel) is self.channel_type
+            if channel._recycle():
+                self._free.append(channel)
+
+    def __len__(self):
+        """Number of released channels waiting to be reused."""
+        return len(self._free)
+
+
+### Process pools
+
+def _new_slot():
+    """Return an OS pipe and synchronisation for one channel, in the
+    order used by L{Channel._use_slot}.
+    """
+    itemr, itemw = os.pipe()
+    return ((itemr, itemw, processing.RLock(), processing.RLock(),
+             processing.Semaphore(0), processing.Semaphore(0)) +
+            tuple(_new_flags(4)))
+
+
+def _running_pool():
+    """Return the L{ProcessPool} started by this process, if any.
+    """
+    if _pool is not None and _pool._pid == os.getpid():
+        return _pool
+    return None
+
+
+def _run_here(proc):
+    """Run C{proc} to completion in this thread of a L{ProcessPool}
+    worker.
+    """
+    proc._pooled = True
+    if isinstance(proc, CSPProcess):
+        proc.run()
+    else:
+        proc.start()
+
+
+def _run_on_threads(procs):
+    """Run C{procs} in parallel on threads of this L{ProcessPool}
+    worker, and return when all have finished.
+
+    Workers run other processes on threads of their own, so a L{Par}
+    or L{Seq} nested in a pooled process must not fork.
+    """
+    threads = [threading.Thread(target=_run_here, args=(proc,))
+               for proc in procs]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def _is_importable(func):
+    """Return C{True} if C{func} can be pickled by name.
+    """
+    obj = sys.modules.get(func.__module__)
+    for name in func.__qualname__.split('.'):
+        obj = getattr(obj, name, None)
+    return obj is func
+
+
+def _rebuild_function(module, code, name, defaults, kwdefaults, closure):
+    """Rebuild a function pickled by value by L{_PoolPickler}.
+    """
+    if closure is not None:
+        closure = tuple(types.CellType() if (type(value) is str and
+                                             value == _EMPTY_CELL)
+                        else types.CellType(value) for value in closure)
+    func = types.FunctionType(marshal.loads(code),
+                              importlib.import_module(module).__dict__,
+                              name, defaults, closure)
+    func.__kwdefaults__ = kwdefaults
+    return func
+
+
+def _reduce_function(func):
+    """Return a reduction of C{func} which pickles it by value.
+    """
+    closure = None
+    if func.__closure__ is not None:
+        closure = []
+        for cell in func.__closure__:
+            try:
+                closure.append(cell.cell_contents)
+            except ValueError: # Empty cell.
+                closure.append(_EMPTY_CELL)
+    return (_rebuild_function,
+            (func.__module__, marshal.dumps(func.__code__), func.__name__,
+             func.__defaults__, func.__kwdefaults__, closure))
+
+
+def _load_channel(ref):
+    """Return the channel referred to by C{ref}, made by
+    L{ProcessPool._channel_ref} in the parent process.
+    """
+    channel = _live_channels.get(ref[1])
+    if channel is None:
+        cls, state, index = ref[2:]
+        channel = cls.__new__(cls)
+        channel._pool_restore(state, index)
+        _live_channels[channel.name] = channel
+    return channel
+
+
+class _PoolPickler(pickle.Pickler):
+    """Pickle tasks for L{ProcessPool} workers.
+
+    Functions which cannot be pickled by name, such as functions
+    wrapped by L{process} or defined inside other functions, are
+    pickled by value. Channels are pickled as references to channels
+    or slots which the workers have inherited.
+    """
+
+    def persistent_id(self, obj):
+        if isinstance(obj, Channel):
+            return _pool._channel_ref(obj)
+        return None
+
+    def reducer_override(self, obj):
+        if type(obj) is not types.FunctionType or _is_importable(obj):
+            return NotImplemented
+        return _reduce_function(obj)
+
+
+class _PoolUnpickler(pickle.Unpickler):
+    """Unpickle tasks pickled by L{_PoolPickler}.
+    """
+
+    def persistent_load(self, ref):
+        return _load_channel(ref)
+
+
+def _pool_worker(pool, tasks, results):
+    """Run the tasks sent to a L{ProcessPool} worker.
+
+    Each task runs in a thread of its own, so that processes which
+    block on channels do not stop other processes in the same worker.
+    """
+    global _pool, _in_worker
+    # Channels deleted here must leave their slots open, and the
+    # pool's methods do nothing outside the process which started it.
+    _pool = pool
+    _in_worker = True
+    lock = threading.Lock()
+
+    def _run(task_id, proc):
+        try:
+            if proc is not None:
+                proc.run()
+        finally:
+            with lock:
+                results.send(task_id)
+
+    while True:
+        try:
+            data = tasks.recv_bytes()
+        except (EOFError, KeyboardInterrupt):
+            break
+        if not data:
+            break
+        task_id, = _POOL_TASK.unpack_from(data)
+        try:
+            cls, func, args, kwargs = _PoolUnpickler(
+                io.BytesIO(data[_POOL_TASK.size:])).load()
+            proc = cls(func, *args, **kwargs)
+            proc._pooled = True
+        except Exception:
+            typ, excn, tback = sys.exc_info()
+            sys.excepthook(typ, excn, tback)
+            proc = None
+        thread = threading.Thread(target=_run, args=(task_id, proc))
+        thread.daemon = True
+        thread.start()
+
+
+class ProcessPool(object):
+    """Run the processes of L{Par} and L{Seq} objects on a fixed pool
+    of worker processes.
+
+    Starting an OS process for every L{CSPProcess} takes
+    milliseconds. While a pool is running, L{Par} and L{Seq} send
+    each CSPProcess to a warm worker instead, which runs it in a new
+    thread. Workers are reused from one run to the next and keep the
+    modules they have imported. By default there is one worker per
+    core:
+
+>>> with ProcessPool():
+...     Par(*[worker(chan) for chan in channels]).start()
+...
+>>>
+
+    Workers are forked when the pool starts, whichever start method
+    has been chosen with L{set_start_method}, so they share every
+    channel which exists at that point, and see global variables as
+    they were then. Channels created later take their OS pipe and
+    synchronisation from one of C{channels} slots which the pool
+    creates in advance, and hand it back when they are deleted. A
+    process which cannot be sent to a worker, because it uses a
+    channel created once every slot was taken, a L{FileChannel}
+    created after the pool started, or an argument which cannot be
+    pickled, runs in a new OS process as it would without a pool.
+
+    A L{Par} or L{Seq} inside a pooled process runs its processes on
+    threads of the same worker, as forking a process with other
+    threads running could deadlock the child.
+    """
+
+    def __init__(self, workers=None, channels=_POOL_CHANNELS):
+        self.workers = workers or os.cpu_count() or 1
+        self.channels = channels
+        self._pid = None
+        self._procs = []   # Worker processes.
+        self._tasks = []   # Connections to send tasks to each worker.
+        self._results = [] # Connections to receive finished task IDs.
+        self._free = []    # Indices of free slots in _slots.
+        self._inherited = frozenset()
+        self._task_ids = itertools.count(1)
+        self._next_worker = 0
+        self._done = set()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Create the channel slots and start the worker processes.
+        """
+        global _pool
+        assert _pool is None, 'Only one ProcessPool can run at a time.'
+        if shared_memory is not None:
+            # Workers must share the tracker of shared memory segments.
+            resource_tracker.ensure_running()
+        _slots[:] = [_new_slot() for i in range(self.channels)]
+        self._free = list(range(self.channels))
+        for i in range(self.workers):
+            tasks_r, tasks_w = processing.Pipe(duplex=False)
+            results_r, results_w = processing.Pipe(duplex=False)
+            worker = processing.get_context('fork').Process(
+                target=_pool_worker, args=(self, tasks_r, results_w))
+            worker.start()
+            tasks_r.close()
+            results_w.close()
+            self._procs.append(worker)
+            self._tasks.append(tasks_w)
+            self._results.append(results_r)
+        self._inherited = frozenset(_live_channels.keys())
+        self._pid = os.getpid()
+        _pool = self
+        atexit.register(self.close)
+        _debug('ProcessPool started {0} workers'.format(self.workers))
+        return self
+
+    def close(self):
+        """Stop the worker processes once they are idle.
+        """
+        global _pool
+        if _pool is not self or self._pid != os.getpid():
+            return
+        _pool = None
+        atexit.unregister(self.close)
+        for conn in self._tasks:
+            conn.send_bytes(b'')
+        for worker in self._procs:
+            worker.join()
+        for conn in self._tasks + self._results:
+            conn.close()
+        # Slots still used by channels are closed by their channels.
+        for index in self._free:
+            os.close(_slots[index][0])
+            os.close(_slots[index][1])
+            _slots[index] = None
+        self._procs, self._tasks, self._results, self._free = [], [], [], []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, typ, value, tback):
+        self.close()
+
+    def _take_slot(self):
+        """Return the index of a free slot, or C{None}.
+        """
+        if self._pid != os.getpid():
+            return None
+        try:
+            return self._free.pop()
+        except IndexError:
+            return None
+
+    def _release_slot(self, index):
+        """Reset slot C{index}, whose channel has been deleted, so it
+        can be used by a new channel.
+        """
+        if self._pid != os.getpid():
+            return
+        slot = _slots[index]
+        itemr, itemw, wlock, rlock, available, taken = slot[:6]
+        while available.acquire(False):
+            pass
+        while taken.acquire(False):
+            pass
+        for flag in slot[6:]:
+            flag.value = Channel.FALSE
+        os.set_blocking(itemr, False)
+        try:
+            while os.read(itemr, _BUFFSIZE):
+                pass
+        except OSError:
+            pass
+        os.set_blocking(itemr, True)
+        os.set_blocking(itemw, True)
+        self._free.append(index)
+
+    def _channel_ref(self, channel):
+        """Return a picklable reference to C{channel} for the workers.
+        """
+        if channel.name in self._inherited:
+            return ('inherited', channel.name)
+        if '_poisoned' not in channel.__dict__:
+            channel._setup()
+        if channel.__dict__.get('_slot_pool') is not self:
+            raise ValueError('Channel {0} cannot be passed to the workers '
+                             'of a ProcessPool.'.format(channel.name))
+        return ('slot', channel.name, type(channel), channel._pool_state(),
+                channel._slot)
+
+    def _submit(self, proc):
+        """Send C{proc} to a worker and return its task ID, or C{None}
+        if it cannot be sent.
+        """
+        task_id = next(self._task_ids)
+        data = io.BytesIO()
+        data.write(_POOL_TASK.pack(task_id))
+        try:
+            _PoolPickler(data, pickle.HIGHEST_PROTOCOL).dump(
+                (type(proc), proc._target, proc._args, proc._kwargs))
+        except Exception as excn:
+            _debug('Cannot send {0} to a worker: {1}'.format(proc, excn))
+            return None
+        proc._pooled = True
+        with self._lock:
+            worker = self._next_worker
+            self._next_worker = (worker + 1) % len(self._tasks)
+            self._tasks[worker].send_bytes(data.getbuffer())
+        return task_id
+
+    def _wait(self, pending):
+        """Block until every task in the set C{pending} has finished.
+        """
+        while True:
+            with self._lock:
+                finished = pending & self._done
+                pending -= finished
+                self._done -= finished
+                if not pending:
+                    return
+                # Time out so that other threads can collect their tasks.
+                for conn in processing.connection.wait(self._results,
+                                                       _ALT_POLL):
+                    self._done.add(conn.recv())
+
+    def run(self, procs):
+        """Run C{procs} in parallel and return when all have finished.
+
+        L{CSPProcess} objects are sent to the workers, other
+        processes are started as usual.
+        """
+        pending = set()
+        spawned = []
+        for proc in procs:
+            task_id = None
+            if isinstance(proc, CSPProcess):
+                task_id = self._submit(proc)
+            if task_id is None:
+                proc.spawn()
+                spawned.append(proc)
+            else:
+                pending.add(task_id)
+        self._wait(pending)
+        for proc in spawned:
+            proc.join()
 
 
 ### Function decorators
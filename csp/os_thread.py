@@ -30,17 +30,17 @@ DEBUG = False
 
 from functools import wraps # Easy decorators
 
+import collections
 import copy
-import gc
 import inspect
+import itertools
 import logging
 import os
 import random
 import sys
-import tempfile
 import threading
 import time
-import uuid
+import weakref
 try:
     import cPickle as pickle    # Faster, only in Python 2.x
 except ImportError:
@@ -52,12 +52,17 @@ try: # Python optimisation compiler
 except ImportError:
     print ( 'No available optimisation' )
 
+from .referents import find_channels
+from .timers import get_timer_service, now
+
 CSP_IMPLEMENTATION = 'os_thread'
 
 ### Names exported by this module
 __all__ = ['set_debug', 'CSPProcess', 'CSPServer', 'Alt',
            'Par', 'Seq', 'Guard', 'Channel', 'FileChannel',
-           'process', 'forever', 'Skip', '_CSPTYPES', 'CSP_IMPLEMENTATION']
+           'BufferedChannel', 'ChannelFactory',
+           'process', 'forever', 'Skip', 'gc_collections_avoided', '_CSPTYPES',
+           'CSP_IMPLEMENTATION']
 
 ### Seeded random number generator (16 bytes)
 
@@ -68,6 +73,15 @@ _RANGEN = random.Random(os.urandom(16))
 
 _BUFFSIZE = 1024
 
+_ITER_BATCH = 1024
+"""Most items read at once when iterating over a channel."""
+
+_ALT_POLL = 0.01
+"""Seconds an Alt waits before re-polling guards it cannot block on."""
+
+_channel_ids = itertools.count(1)
+"""Channel IDs. Taking the next ID is atomic under the GIL."""
+
 _debug = logging.debug
 
 
@@ -94,6 +108,9 @@ class NoGuardInAlt(Exception):
 _POISON = ';;;__POISON__;;;'
 """Used as special data sent down a channel to invoke termination."""
 
+_BATCH = ';;;__BATCH__;;;'
+"""Marks a list of items sent down a channel by write_many()."""
+
 
 class ChannelPoison(Exception):
     """Used to poison a processes and propagate to all known channels.
@@ -113,6 +130,30 @@ def set_debug(status):
     logging.info("Using threading version of python-csp.")
 
 
+### Process lifetimes
+
+_gc_avoided = 0
+"""Number of finished processes which did not force a collection."""
+
+_gc_lock = threading.Lock()
+
+
+def gc_collections_avoided():
+    """Return the number of garbage collections which finished
+    processes would once have forced.
+    """
+    return _gc_avoided
+
+
+### Poison propagation
+
+def _find_channels(referents):
+    """Return the channels in C{referents}, each once. See
+    L{csp.referents.find_channels}.
+    """
+    return find_channels(referents, Channel, Alt, (Par, Seq), CSPProcess)
+
+
 ### Fundamental CSP concepts -- Processes, Channels, Guards
 
 class _CSPOpMixin(object):
@@ -122,6 +163,28 @@ class _CSPOpMixin(object):
     def __init__(self):
         return
 
+    @property
+    def enclosing(self):
+        """The L{Par} or L{Seq} which runs this process, or C{None}.
+
+        Only a weak reference is kept, so that a process graph has no
+        reference cycles and is freed as soon as it is dropped.
+        """
+        ref = self.__dict__.get('_enclosing')
+        return None if ref is None else ref()
+
+    @enclosing.setter
+    def enclosing(self, proc):
+        self._enclosing = None if proc is None else weakref.ref(proc)
+
+    def _release(self):
+        """Drop the function and arguments held by this finished
+        process.
+        """
+        self._Thread__target = None
+        self._Thread__args, self._Thread__kwargs = (), {}
+        self._channels = ()
+
     def spawn(self):
         """Start only if self is not running."""
         if not self._Thread__started.is_set():
@@ -141,19 +204,22 @@ class _CSPOpMixin(object):
         if self._Thread__started.is_set():
             threading.Thread.join(self)
 
+    # Channels given to this process, recorded when it is created.
+    _channels = ()
+
     def referent_visitor(self, referents):
-        for obj in referents:
-            if obj is self or obj is None:
-                continue
-            if isinstance(obj, Channel):
-                obj.poison()
-            elif ((hasattr(obj, '__getitem__') or hasattr(obj, '__iter__')) and
-                  not isinstance(obj, str)):
-                self.referent_visitor(obj)
-            elif isinstance(obj, CSPProcess):
-                self.referent_visitor(obj.args + tuple(obj.kwargs.values()))
-            elif hasattr(obj, '__dict__'):
-                self.referent_visitor(list(obj.__dict__.values()))
+        """Poison the channels found in C{referents} by
+        L{_find_channels}.
+        """
+        for channel in _find_channels(referents):
+            channel.poison()
+
+    def _poison_channels(self):
+        """Poison the channels this process was given, after it has
+        caught a L{ChannelPoison}.
+        """
+        for channel in self._channels:
+            channel.poison()
 
     def terminate(self):
         """Terminate only if self is running.
@@ -221,6 +287,8 @@ n: 20
 >>> 
     """
 
+    _released = False # True once released by its Par or Seq.
+
     def __init__(self, func, *args, **kwargs):
         threading.Thread.__init__(self,
                                   target=func,
@@ -230,10 +298,12 @@ n: 20
         assert not inspect.ismethod(func) # Check we aren't using objects
 
         _CSPOpMixin.__init__(self)
-        for arg in list(self._Thread__args) + list(self._Thread__kwargs.values()):
+        referents = self._Thread__args + tuple(self._Thread__kwargs.values())
+        for arg in referents:
             if _is_csp_type(arg):
                 arg.enclosing = self
         self.enclosing = None
+        self._channels = _find_channels(referents)
 
     def getName(self):
         return self.ident
@@ -264,28 +334,32 @@ n: 20
             self._Thread__target(*self._Thread__args, **self._Thread__kwargs)
         except ChannelPoison:
             _debug('{0} in {1} got ChannelPoison exception'.format(str(self), self.getPid()))
-            self.referent_visitor(self._Thread__args +
-                                  tuple(self._Thread__kwargs.values()))
+            self._poison_channels()
         except KeyboardInterrupt:
             sys.exit()
         except Exception:
             typ, excn, tback = sys.exc_info()
             sys.excepthook(typ, excn, tback)
 
-    def __del__(self):
-        """Run the garbage collector automatically on deletion of this
-        object.
-
-        This prevents the "Winder Bug" found in tests/winder_bug of
-        the distribution, where successive process graphs are created
-        in memory and, when the "outer" CSPProcess object returns from
-        its .start() method the process graph is not garbage
-        collected. This accretion of garbage can cause degenerate
-        behaviour which is difficult to debug, such as a program
-        pausing indefinitely on Channel creation.
+    def _release(self):
+        """Release this finished process.
+
+        Once this ran the garbage collector on deletion of every
+        CSPProcess, to prevent the "Winder Bug" found in
+        tests/winder_bug of the distribution: when the "outer"
+        CSPProcess returned from its .start() method its process graph
+        was kept alive by reference cycles, and the accretion of
+        garbage could make a program pause indefinitely on Channel
+        creation. Releasing the graph here frees it without a
+        collection, which L{gc_collections_avoided} counts.
         """
-        if gc is not None:
-            gc.collect()
+        global _gc_avoided
+        if self._released:
+            return
+        self._released = True
+        with _gc_lock:
+            _gc_avoided += 1
+        _CSPOpMixin._release(self)
 
 
 class CSPServer(CSPProcess):
@@ -314,7 +388,7 @@ class CSPServer(CSPProcess):
                 return None
         except ChannelPoison:
             _debug('{0} in {1} got ChannelPoison exception'.format(str(self), self.getPid()))
-            self.referent_visitor(self._Thread__args + tuple(self._Thread__kwargs.values()))
+            self._poison_channels()
 #            if self._popen is not None: self.terminate()
         except KeyboardInterrupt:
             sys.exit()
@@ -415,6 +489,8 @@ no
             assert isinstance(arg, Guard)
         self.guards = list(args)
         self.last_selected = None
+        # Set by any guard which may have become ready.
+        self._wakeup = threading.Event()
 
     def poison(self):
         """Poison the last selected guard and unlink from the guard list.
@@ -432,7 +508,7 @@ no
         _debug('{0} guards'.format(len(self.guards)))
         self.last_selected = None
 
-    def _preselect(self):
+    def _preselect(self, timeout):
         """Check for special cases when any form of select() is called.
 
         If no object can be returned from a channel read and no
@@ -444,24 +520,70 @@ no
             raise NoGuardInAlt()
         elif len(self.guards) == 1:
             _debug('Alt Selecting unique guard: {0}'.format(self.guards[0].name))
+            if not self._ready(timeout):
+                return None
             self.last_selected = self.guards[0]
-            while not self.guards[0].is_selectable():
-                self.guards[0].enable()
             return self.guards[0].select()
         return None
 
-    def select(self):
-        """Randomly select from ready guards."""
-        if len(self.guards) < 2:
-            return self._preselect()
-        ready = []
-        while len(ready) == 0:
-            for guard in self.guards:
-                guard.enable()
+    def _ready(self, timeout=None):
+        """Enable every guard and return the list of selectable guards,
+        blocking until there is at least one, or until C{timeout}
+        seconds have passed, when the list is empty.
+
+        Every guard is handed this Alt's wakeup event, which channels
+        set when a writer arrives, so a waiting Alt wakes as soon as
+        any guard may have become ready. Timer guards wake the Alt
+        through the timer service, which knows when the earliest
+        alarm is due. Other guards which cannot set the event are
+        polled every _ALT_POLL seconds.
+        """
+        limit = None
+        timed = False
+        self._wakeup.clear()
+        for guard in self.guards:
+            if guard._timed:
+                timed = True
+            elif not guard.add_waiter(self._wakeup):
+                limit = _ALT_POLL
+        if timeout is not None:
+            deadline = now() + timeout
+        try:
+            while True:
+                for guard in self.guards:
+                    guard.enable()
                 _debug('Alt enabled all guards')
-            time.sleep(0.01) # Not sure about this.
-            ready = [guard for guard in self.guards if guard.is_selectable()]
-            _debug('Alt got {0} items to choose from out of {1}'.format(len(ready), len(self.guards)))
+                ready = [guard for guard in self.guards if guard.is_selectable()]
+                _debug('Alt got {0} items to choose from out of {1}'.format(len(ready), len(self.guards)))
+                if ready:
+                    return ready
+                for guard in self.guards:
+                    guard.disable()
+                wait = limit
+                if timeout is not None:
+                    remaining = deadline - now()
+                    if remaining <= 0:
+                        return ready
+                    wait = remaining if wait is None else min(wait, remaining)
+                if timed:
+                    wait = get_timer_service().timeout(wait)
+                self._wakeup.wait(wait)
+                self._wakeup.clear()
+        finally:
+            for guard in self.guards:
+                guard.remove_waiter(self._wakeup)
+
+    def select(self, timeout=None):
+        """Randomly select from ready guards.
+
+        If C{timeout} is given and no guard becomes ready within that
+        many seconds, return C{None} without selecting a guard.
+        """
+        if len(self.guards) < 2:
+            return self._preselect(timeout)
+        ready = self._ready(timeout)
+        if not ready:
+            return None
         selected = _RANGEN.choice(ready)
         self.last_selected = selected
         for guard in self.guards:
@@ -469,21 +591,16 @@ no
                 guard.disable()
         return selected.select()
 
-    def fair_select(self):
+    def fair_select(self, timeout=None):
         """Select a guard to synchronise with. Do not select the
         previously selected guard (unless it is the only guard
-        available).
+        available). C{timeout} is as for L{select}.
         """
         if len(self.guards) < 2:
-            return self._preselect()
-        ready = []
-        while len(ready) == 0:
-            for guard in self.guards:
-                guard.enable()
-                _debug('Alt enabled all guards')
-            time.sleep(0.1) # Not sure about this.
-            ready = [guard for guard in self.guards if guard.is_selectable()]
-            _debug('Alt got {0} items to choose from, out of {1}'.format(len(ready), len(self.guards)))
+            return self._preselect(timeout)
+        ready = self._ready(timeout)
+        if not ready:
+            return None
         selected = None
         if self.last_selected in ready and len(ready) > 1:
             ready.remove(self.last_selected)
@@ -495,24 +612,21 @@ no
                 guard.disable()
         return selected.select()
 
-    def pri_select(self):
+    def pri_select(self, timeout=None):
         """Select a guard to synchronise with, in order of
         "priority". The guard with the lowest index in the L{guards}
-        list has the highest priority.
+        list has the highest priority. C{timeout} is as for
+        L{select}.
         """
         if len(self.guards) < 2:
-            return self._preselect()
-        ready = []
-        while len(ready) == 0:
-            for guard in self.guards:
-                guard.enable()
-                _debug('Alt enabled all guards')
-            time.sleep(0.01) # Not sure about this.
-            ready = [guard for guard in self.guards if guard.is_selectable()]
-            _debug('Alt got {0} items to choose from, out of {1}'.format(len(ready), len(self.guards)))
+            return self._preselect(timeout)
+        ready = self._ready(timeout)
+        if not ready:
+            return None
         self.last_selected = ready[0]
-        for guard in ready[1:]:
-            guard.disable()
+        for guard in self.guards:
+            if guard is not ready[0]:
+                guard.disable()
         return ready[0].select()
 
     def __mul__(self, n):
@@ -622,15 +736,24 @@ n: 200
                 proc.spawn()
             for proc in self.procs:
                 proc.join()
+            self._release()
         except ChannelPoison:
             _debug('{0} got ChannelPoison exception in {1}'.format(str(self), self.getPid()))
-            self.referent_visitor(self._Thread__args + tuple(self._Thread__kwargs.values()))
+            self._poison_channels()
         except KeyboardInterrupt:
             sys.exit()
         except Exception:
             typ, excn, tback = sys.exc_info()
             sys.excepthook(typ, excn, tback)
 
+    def _release(self):
+        """Release the children of this finished Par, which refer
+        back to it only weakly.
+        """
+        for proc in self.procs:
+            proc._release()
+        _CSPOpMixin._release(self)
+
     def __len__(self):
         return len(self.procs)
 
@@ -699,9 +822,10 @@ n: 300
             for proc in self.procs:
                 _CSPOpMixin.start(proc)
                 proc.join()
+                proc._release()
         except ChannelPoison:
             _debug('{0} got ChannelPoison exception in {1}'.format(str(self), self.getPid()))
-            self.referent_visitor(self._Thread__args + tuple(self._Thread__kwargs.values()))
+            self._poison_channels()
             if self._popen is not None: self.terminate()
         except KeyboardInterrupt:
             sys.exit()
@@ -709,6 +833,14 @@ n: 300
             typ, excn, tback = sys.exc_info()
             sys.excepthook(typ, excn, tback)
 
+    def _release(self):
+        """Release the children of this finished Seq, which refer
+        back to it only weakly.
+        """
+        for proc in self.procs:
+            proc._release()
+        _CSPOpMixin._release(self)
+
 
 ### Guards and channels
 
@@ -743,6 +875,22 @@ class Guard(object):
         """
         pass
 
+    # True for guards, such as timers, whose alarms are kept by the
+    # timer service of the process rather than polled by an Alt.
+    _timed = False
+
+    def add_waiter(self, event):
+        """Arrange for C{event} to be set whenever this guard may have
+        become selectable. Return C{False} if this guard cannot do so,
+        in which case an L{Alt} will poll it instead.
+        """
+        return False
+
+    def remove_waiter(self, event):
+        """Roll back from an L{add_waiter} call.
+        """
+        pass
+
     def __str__(self):
         return 'CSP Guard: must be subclassed.'
 
@@ -764,9 +912,8 @@ class Channel(Guard):
     number of channels a program can create is limited to the maximum
     number of files the operating system allows to be open at any one
     time. To avoid this bottleneck use L{FileChannel} objects, which
-    close the file descriptor used for IPC after every read or write
-    operations. Read and write operations are, however, over 20 time
-    slower when performed on L{FileChannel} objects.
+    pass items through memory-mapped files and hold no file
+    descriptors.
 
     Subclasses of C{Channel} must call L{_setup()} in their
     constructor and override L{put}, L{get}, L{__del__}.
@@ -776,10 +923,14 @@ class Channel(Guard):
 >>> c = Channel()
 >>>
 
-    Each Channel object should have a unique name in the network:
+    Threads share objects rather than copying them, so the
+    C{serializer} argument accepted by channels in the
+    multiprocessing version of python-csp is ignored here.
+
+    Each Channel object has a unique name within the program:
 
 >>> print c.name
-1ca98e40-5558-11df-8e5b-002421449824
+1
 >>> 
 
     The Channel can then be passed as an argument to any CSP process
@@ -804,8 +955,8 @@ Got: 100
     TRUE = 1
     FALSE = 0
 
-    def __init__(self):
-        self.name = uuid.uuid1()
+    def __init__(self, serializer=None):
+        self.name = next(_channel_ids)
         self._wlock = None       # Write lock protects from races between writers.
         self._rlock = None       # Read lock protects from races between readers.
         self._plock = None
@@ -816,6 +967,8 @@ Got: 100
         self._has_selected = None  # True if already been committed to select.
         self._store = None # Holds value transferred by channel
         self._poisoned = None
+        self._waiters = None # Events set when a writer arrives.
+        self._unread = collections.deque() # Rest of a batch being read.
         self._setup()
         super(Channel, self).__init__()
         _debug('Channel created: {0}'.format(self.name))
@@ -838,6 +991,20 @@ Got: 100
         # from being re-enabled). If values were really process safe
         # we could just have writers set _is_selectable and read that.
         self._has_selected = False
+        self._waiters = set()
+
+    def _notify(self):
+        """Wake every Alt waiting on this channel.
+        """
+        for event in list(self._waiters):
+            event.set()
+
+    def add_waiter(self, event):
+        self._waiters.add(event)
+        return True
+
+    def remove_waiter(self, event):
+        self._waiters.discard(event)
 
     def put(self, item):
         """Put C{item} on a process-safe store.
@@ -860,7 +1027,7 @@ Got: 100
         """
         _debug('Alt THINKS _is_selectable IS: {0}'.format(str(self._is_selectable)))
         self.checkpoison()
-        return self._is_selectable
+        return self._is_selectable or bool(self._unread)
 
     def write(self, obj):
         """Write a Python object to this channel.
@@ -877,14 +1044,28 @@ Got: 100
             self.put(obj)
             # Announce the object has been released to the reader.
             self._available.release()
+            self._notify()
             _debug('++++ Writer on Channel {0}: _available: {1} _taken: {2}.'.format(self.name, self._available._Semaphore__value, self._taken._Semaphore__value))
             # Block until the object has been read.
             self._taken.acquire()
             # Remove the object from the channel.
         _debug('+++ Write on Channel {0} finished.'.format(self.name))
 
-    def read(self):
-        """Read (and return) a Python object from this channel.
+    def write_many(self, items):
+        """Write every object in the iterable C{items} to this channel.
+
+        The objects are sent as a single batch, with one rendezvous,
+        so this is much faster than writing them one at a time. Blocks
+        until a reader has taken the batch. Readers receive the
+        objects in order, from any of L{read}, L{read_many}, an
+        L{Alt} or by iterating over the channel.
+        """
+        items = list(items)
+        if items:
+            self.write((_BATCH, items))
+
+    def _read(self):
+        """Read (and return) the next item written to this channel.
         """
         self.checkpoison()
         _debug('+++ Read on Channel {0} started.'.format(self.name))
@@ -899,6 +1080,55 @@ Got: 100
         _debug('+++ Read on Channel {0} finished.'.format(self.name))
         return obj
 
+    def _keep_unread(self, obj, count):
+        """Return a list of the first C{count} items of C{obj} if it is
+        a batch, keeping the rest to be read later, or else C{[obj]}.
+        """
+        if not (type(obj) is tuple and len(obj) == 2 and obj[0] is _BATCH):
+            return [obj]
+        items = obj[1]
+        self._unread.extend(items[count:])
+        return items[:count]
+
+    def read(self):
+        """Read (and return) a Python object from this channel.
+        """
+        with self._rlock:
+            if self._unread:
+                return self._unread.popleft()
+            return self._keep_unread(self._read(), 1)[0]
+
+    def read_many(self, max_n):
+        """Read (and return) a list of at least one and at most
+        C{max_n} Python objects from this channel.
+
+        Blocks only until one object is available. Reading a batch
+        sent by L{write_many} takes a single rendezvous.
+        """
+        assert max_n > 0
+        with self._rlock:
+            if self._unread:
+                return [self._unread.popleft()
+                        for i in range(min(max_n, len(self._unread)))]
+            return self._keep_unread(self._read(), max_n)
+
+    def __iter__(self):
+        """Iterate over the objects read from this channel, forever.
+
+        Objects are read with L{read_many}. If the iteration stops
+        part way through a batch the rest of it is kept to be read
+        later.
+        """
+        while True:
+            items = collections.deque(self.read_many(_ITER_BATCH))
+            try:
+                while items:
+                    yield items.popleft()
+            finally:
+                if items:
+                    with self._rlock:
+                        self._unread.extendleft(reversed(items))
+
     def enable(self):
         """Enable a read for an Alt select.
 
@@ -906,7 +1136,7 @@ Got: 100
         """
         self.checkpoison()
         # Prevent re-synchronization.
-        if (self._has_selected or self._is_selectable):
+        if self._has_selected or self._is_selectable or self._unread:
             # Be explicit.
             return None
         self._is_alting = True
@@ -936,24 +1166,28 @@ Got: 100
         """
         self.checkpoison()
         _debug('channel select starting')
+        with self._rlock:
+            if self._unread and not self._is_selectable:
+                return self._unread.popleft()
         assert self._is_selectable == True
         with self._rlock:
             _debug('got read lock on channel {0} _available: {1}'.format(self.name, str(self._available._Semaphore__value)))
             # Obtain object on Channel.
             obj = self.get()
             _debug('Writer got obj')
-            # Notify write() that object is taken.
-            self._taken.release()
-            _debug('Writer released _taken')
             # Reset flags to ensure a future read / enable / select.
             self._is_selectable = False
             self._is_alting = False
             self._has_selected = True
             _debug('reset bools')
+            # Notify write() that object is taken.
+            self._taken.release()
+            _debug('Writer released _taken')
         if obj == _POISON:
             self.poison()
             raise ChannelPoison()
-        return obj
+        with self._rlock:
+            return self._keep_unread(obj, 1)[0]
 
     def __str__(self):
         return 'Channel using OS pipe for IPC.'
@@ -1016,64 +1250,149 @@ Poisoning channel: 5c906e38-5559-11df-8503-002421449824
             # Avoid race conditions on any waiting readers / writers.
             self._available.release() 
             self._taken.release()
+        self._notify()
 
 
 class FileChannel(Channel):
-    """Channel objects using files on disk.
-
-    C{FileChannel} objects close their files after each read or write
-    operation. The advantage of this is that client code can create as
-    many C{FileChannel} objects as it wishes (unconstrained by the
-    operating system's maximum number of open files). In return there
-    is a performance hit -- reads and writes are around 10 x slower on
-    C{FileChannel} objects compared to L{Channel} objects.
+    """Channel objects which hold no file descriptors.
+
+    Channels shared between threads never use file descriptors, so
+    this is the same as a L{Channel}. It is provided so that programs
+    written for the multiprocessing version of python-csp run
+    unchanged.
     """
 
-    def __init__(self):
-        self.name = uuid.uuid1()
-        self._wlock = None	# Write lock.
-        self._rlock = None	# Read lock.
-        self._available = None
-        self._taken = None
-        self._is_alting = None
-        self._is_selectable = None
-        self._has_selected = None
-        # Process-safe store.
-        file_d, self._fname = tempfile.mkstemp()
-        os.close(file_d)
-        self._setup()
+    def __init__(self, serializer=None):
+        super(FileChannel, self).__init__()
+
+    def __str__(self):
+        return 'Channel using files for IPC.'
+
+
+class BufferedChannel(Channel):
+    """Asynchronous channel objects with a fixed capacity.
+
+    Writes on a C{BufferedChannel} only block when C{capacity} items
+    are already waiting to be read, so a writer can run ahead of its
+    reader. Reads block until an item is available, as on any other
+    channel, and C{BufferedChannel} objects can be used in an L{Alt}
+    and poisoned in the same way as L{Channel} objects.
+
+>>> c = BufferedChannel(2)
+>>> c.write('a')
+>>> c.write('b')
+>>> c.read(), c.read()
+('a', 'b')
+>>> 
+    """
+
+    def __init__(self, capacity, serializer=None):
+        assert capacity > 0
+        self.capacity = capacity
+        super(BufferedChannel, self).__init__()
+
+    def _setup(self):
+        """Set up synchronisation.
+
+        C{_taken} counts the free slots in the buffer, rather than
+        announcing that a reader has taken a single item.
+        """
+        super(BufferedChannel, self)._setup()
+        self._taken = threading.Semaphore(self.capacity)
+        self._store = collections.deque()
 
     def put(self, item):
-        """Put C{item} on a process-safe store.
+        """Append C{item} to the buffer.
         """
-        file_d = file(self._fname, 'w')
-        file_d.write(pickle.dumps(item, protocol=1))
-        file_d.flush()
-        file_d.close()
+        self.checkpoison()
+        self._store.append(item)
 
     def get(self):
-        """Get a Python object from a process-safe store.
+        """Remove and return the oldest item in the buffer.
         """
-        stored = ''
-        while stored == '':
-            file_d = file(self._fname, 'r')
-            stored = file_d.read()
-            file_d.close()
-        # Unlinking here ensures that FileChannel objects exhibit the
-        # same semantics as Channel objects.
-        os.unlink(self._fname)
-        obj = pickle.loads(stored)
-        return obj
+        self.checkpoison()
+        if not self._store:
+            return None
+        return self._store.popleft()
 
-    def __del__(self):
-        try:
-            # Necessary if the Channel has been deleted by poisoning.
-            os.unlink(self._fname)
-        except:
-            pass
+    def write(self, obj):
+        """Write a Python object to this channel.
+
+        Blocks only if the buffer is full.
+        """
+        self.checkpoison()
+        _debug('+++ Write on Channel {0} started.'.format(self.name))
+        with self._wlock: # Protect from races between multiple writers.
+            # Block until there is a free slot in the buffer.
+            self._taken.acquire()
+            self._has_selected = False
+            self.put(obj)
+            # Announce the object has been released to a reader.
+            self._available.release()
+            self._notify()
+        _debug('+++ Write on Channel {0} finished.'.format(self.name))
+
+    def select(self):
+        """Complete a Channel read for an Alt select.
+        """
+        obj = super(BufferedChannel, self).select()
+        # Further items may already be buffered, so allow this
+        # channel to be enabled again before the next write.
+        self._has_selected = False
+        return obj
 
     def __str__(self):
-        return 'Channel using files for IPC.'
+        return 'Buffered channel.'
+
+
+class ChannelFactory(object):
+    """Create channels of one type, reusing channels which have been
+    released.
+
+    Channels are cheap to create in the threaded version of
+    python-csp, but this class is provided so that programs can use
+    the same interface as with the multiprocessing version:
+
+>>> factory = ChannelFactory()
+>>> channels = [factory.create() for i in range(10000)]
+>>> # ... run processes using the channels ...
+>>> factory.release(*channels)
+>>>
+    """
+
+    def __init__(self, channel_type=Channel, **kwargs):
+        assert issubclass(channel_type, Channel)
+        self.channel_type = channel_type
+        self.kwargs = kwargs
+        self._free = []
+
+    def create(self):
+        """Return a new channel, or a released one if there is one.
+        """
+        if self._free:
+            channel = self._free.pop()
+            channel.name = next(_channel_ids)
+            return channel
+        return self.channel_type(**self.kwargs)
+
+    def release(self, *channels):
+        """Hand C{channels} back to the factory to be reused.
+
+        No process may use a channel once it has been released.
+        Poisoned channels are never reused.
+        """
+        for channel in channels:
+            assert type(channel) is self.channel_type
+            if channel._poisoned:
+                continue
+            channel._is_alting = False
+            channel._is_selectable = False
+            channel._has_selected = False
+            self._free.append(channel)
+
+    def __len__(self):
+        """Number of released channels waiting to be reused."""
+        return len(self._free)
 
 
 ### Function decorators
@@ -22,14 +22,17 @@ Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA
 
 from __future__ import absolute_import
 
+import collections
+
 from .csp import *
+from . import os_process as _os_process
 
 
 __author__ = 'Sarah Mount <s.mount@wlv.ac.uk>'
 __date__ = 'May 2010'
 
 
-__all__ = ['TokenRing']
+__all__ = ['TokenRing', 'PreforkServer']
 
 
 class TokenRing(Par):
@@ -41,5 +44,115 @@ class TokenRing(Par):
                            numnodes=size,
                            inchan=self.chans[i-1],
                            outchan=self.chans[i]) for i in range(size)]
-        super(TokenRing, self).__init__(*self.procs) 
-
+        super(TokenRing, self).__init__(*self.procs)
+
+
+class _Accept(_os_process.Guard):
+    """Guard which is selectable when a connection is waiting on a
+    listening socket, and which accepts it when selected.
+
+    The connection is accepted when the guard is enabled, so that an
+    L{Alt} never commits to a connection which another process has
+    taken. A connection accepted by a guard which is then disabled is
+    kept for its next select.
+    """
+
+    def __init__(self, listener):
+        self.listener = listener
+        self.listener.setblocking(False)
+        self.accepted = None
+
+    def fileno(self):
+        return self.listener.fileno()
+
+    def _arm(self):
+        # The listener is not readable for a connection already taken.
+        return self.accepted is not None
+
+    def enable(self):
+        if self.accepted is None:
+            try:
+                self.accepted = self.listener.accept()
+            except (BlockingIOError, InterruptedError):
+                pass
+
+    def is_selectable(self):
+        return self.accepted is not None
+
+    def disable(self):
+        pass
+
+    def select(self):
+        (conn, address), self.accepted = self.accepted, None
+        conn.setblocking(True)
+        return conn, address
+
+    def __str__(self):
+        return 'Guard accepting connections on {0}.'.format(self.listener)
+
+
+@_os_process.process
+def _prefork_acceptor(listener, idle, conns):
+    """Accept connections on C{listener} while a worker is idle, and
+    hand each to the next idle worker.
+    """
+    accept = _Accept(listener)
+    alt = _os_process.Alt(accept, idle)
+    free = collections.deque()
+    while True:
+        if not free:
+            free.append(idle.read())
+            continue
+        got = alt.select()
+        if alt.last_selected is idle:
+            free.append(got)
+            continue
+        conn, address = got
+        conns[free.popleft()].write((conn, address))
+        conn.close()
+
+
+@_os_process.process
+def _prefork_worker(handler, index, idle, conn_in):
+    """Serve one connection at a time with C{handler}, telling the
+    acceptor through C{idle} whenever this worker is ready for
+    another.
+    """
+    while True:
+        idle.write(index)
+        conn, address = conn_in.read()
+        try:
+            handler(conn, address)
+        finally:
+            conn.close()
+
+
+class PreforkServer(_os_process.Par):
+    """Pre-forked server: an acceptor process and a fixed number of
+    worker OS processes.
+
+    The acceptor ALTs on the listening socket and on the workers
+    announcing that they are idle, and passes each connection it
+    accepts to an idle worker over a L{DescriptorChannel}. The bytes
+    of requests and responses pass only between the client and the
+    worker, never through the acceptor. C{handler(conn, address)} is
+    called in a worker for each connection, which is closed when the
+    handler returns.
+
+>>> def echo(conn, address):
+...     conn.sendall(conn.recv(1024))
+... 
+>>> listener = socket.create_server(('127.0.0.1', 8080))
+>>> PreforkServer(listener, echo, workers=8).start()
+
+    Requires the os_process implementation of python-csp, whatever
+    implementation the rest of the program uses.
+    """
+
+    def __init__(self, listener, handler, workers=4):
+        self.idle = _os_process.Channel()
+        self.conns = [_os_process.DescriptorChannel() for i in range(workers)]
+        procs = [_prefork_acceptor(listener, self.idle, self.conns)]
+        procs += [_prefork_worker(handler, i, self.idle, self.conns[i])
+                  for i in range(workers)]
+        super(PreforkServer, self).__init__(*procs)
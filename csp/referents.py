@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+"""Search the arguments of a process for the channels it was given.
+
+Every version of python-csp records the channels a process was given
+when the process is created, so that a process which catches
+ChannelPoison can poison them without searching its arguments again.
+L{find_channels} is the search they share.
+
+Only the process-to-channel direction is recorded. Poisoning a
+channel already wakes every process blocked on it, and every other
+process attached to it sees the poison at its next read or write, so
+channels do not need to record their processes.
+
+Copyright (C) python-csp developers, 2026.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have rceeived a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import collections
+import inspect
+
+
+__author__ = 'python-csp developers'
+__date__ = 'October 2026'
+
+
+### Names exported by this module
+__all__ = ['find_channels']
+
+
+### CONSTANTS
+
+_SCALARS = (bool, int, float, complex, str, bytes, type(None))
+"""Types of items which cannot hold channels."""
+
+_CONTAINERS = (list, tuple, set, frozenset, collections.deque)
+"""Types of containers whose items are searched."""
+
+
+def find_channels(referents, channel, alt, groups, proc):
+    """Return the instances of C{channel} in C{referents}, each once.
+
+    Channels are found in lists, tuples, sets, frozensets and deques,
+    in the values of dicts, in the guards of instances of C{alt}, in
+    the processes of instances of C{groups} (the Par and Seq classes),
+    in the channels recorded by instances of C{proc} and in the
+    attributes of other objects. Each object is visited once.
+    Containers whose items are all scalars are skipped without
+    visiting their items.
+
+    No other iterable is iterated, since that could consume a
+    generator or never finish, so channels in arrays, iterators and
+    the like are not found.
+    """
+    channels, seen, stack = [], set(), list(referents)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, channel):
+            channels.append(obj)
+        elif isinstance(obj, _CONTAINERS):
+            if not all(issubclass(typ, _SCALARS)
+                       for typ in set(map(type, obj))):
+                stack.extend(obj)
+        elif isinstance(obj, dict):
+            stack.extend(obj.values())
+        elif isinstance(obj, alt):
+            stack.extend(obj.guards)
+        elif isinstance(obj, groups):
+            stack.extend(obj.procs)
+        elif isinstance(obj, proc):
+            stack.extend(obj._channels)
+        elif not (isinstance(obj, _SCALARS) or
+                  inspect.ismodule(obj) or inspect.isclass(obj)):
+            stack.extend(_attributes(obj))
+    return channels
+
+
+def _attributes(obj):
+    """Return the values of the attributes of C{obj} which are not
+    scalars.
+    """
+    try:
+        return [value for value in vars(obj).values()
+                if not isinstance(value, _SCALARS)]
+    except TypeError: # No __dict__.
+        return []
@@ -0,0 +1,354 @@
+#!/usr/bin/env python
+
+"""Serializers used by channels to copy items between OS processes.
+
+Every channel which crosses a process boundary has a serializer with
+two methods: dumps(), which turns an item into bytes, and loads(),
+which turns those bytes back into an item. By default channels use
+L{PickleSerializer}, which can send any picklable object. Where the
+items on a channel are known in advance a cheaper encoding can be
+chosen when the channel is created:
+
+>>> c = Channel(serializer=MarshalSerializer())
+>>> points = Channel(serializer=StructSerializer('dd'))
+>>> raw = Channel(serializer=BytesSerializer())
+>>>
+
+The default serializer for new channels can be changed for the whole
+program with L{set_default_serializer}. Both ends of a channel must
+use the same serializer, so the default is read when a channel is
+created, not when it is used.
+
+Copyright (C) python-csp developers, 2026.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have rceeived a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import marshal
+import mmap
+import os
+import struct
+import tempfile
+try:
+    import cPickle as pickle    # Faster, only in Python 2.x
+except ImportError:
+    import pickle
+try: # Python 3.8 and above.
+    from multiprocessing import resource_tracker
+except ImportError:
+    resource_tracker = None
+
+
+__author__ = 'python-csp developers'
+__date__ = 'October 2026'
+
+
+### Names exported by this module
+__all__ = ['Serializer', 'PickleSerializer', 'MarshalSerializer',
+           'StructSerializer', 'BytesSerializer',
+           'get_default_serializer', 'set_default_serializer']
+
+
+### CONSTANTS
+
+_ZEROCOPY_MIN = 65536
+"""Buffers of at least this many bytes are passed out-of-band."""
+
+_SHARED_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+"""Directory for out-of-band buffers. None means the temp directory."""
+
+_BUFFERS = ';;;__BUFFERS__;;;'
+"""Marks a pickle whose large buffers have been passed out-of-band."""
+
+_ITEM_LENGTH = struct.Struct('q')
+"""Length of each item in a batch encoded by L{Serializer.dumps_many}."""
+
+_TRACKED = resource_tracker is not None and _SHARED_DIR == '/dev/shm'
+"""True if files in L{_SHARED_DIR} are POSIX shared memory objects,
+which the resource tracker of multiprocessing can unlink."""
+
+
+### Files passed between processes
+
+def _new_shared_file():
+    """Create a file in L{_SHARED_DIR} for one reader to unlink with
+    L{_unlink_shared_file}, and return its descriptor and name.
+
+    The file is registered with the resource tracker of
+    multiprocessing, which unlinks it when the program exits if it
+    has not been read, after a process is killed or a channel is
+    poisoned for example.
+    """
+    file_d, name = tempfile.mkstemp(prefix='csp-', dir=_SHARED_DIR)
+    if _TRACKED:
+        resource_tracker.register('/' + os.path.basename(name), 'shared_memory')
+    return file_d, name
+
+
+def _unlink_shared_file(name):
+    """Unlink a file created by L{_new_shared_file}.
+    """
+    os.unlink(name)
+    if _TRACKED:
+        resource_tracker.unregister('/' + os.path.basename(name),
+                                    'shared_memory')
+
+
+if _TRACKED and hasattr(os, 'register_at_fork'):
+    # A file registered by one process is unregistered by another, so
+    # the processes of a program must share a tracker.
+    os.register_at_fork(before=resource_tracker.ensure_running)
+
+
+class Serializer(object):
+    """Abstract class to represent channel serializers.
+
+    All methods must be overridden in subclasses.
+    """
+
+    def dumps(self, obj):
+        """Return C{obj} encoded as a bytes-like object.
+        """
+        raise NotImplementedError('Must be implemented in subclass')
+
+    def loads(self, data):
+        """Return the object encoded in the bytes-like object C{data}.
+
+        C{data} may be a view on a buffer which the channel reuses, so
+        the object returned must not refer to it.
+        """
+        raise NotImplementedError('Must be implemented in subclass')
+
+    def dumps_many(self, items):
+        """Return the list C{items} encoded as a bytes-like object.
+
+        Used for the batches of L{write_many}. Each item is encoded by
+        L{dumps} and preceded by its length, so subclasses need only
+        override this if they can encode a whole list at once.
+        """
+        buffers = []
+        for item in items:
+            data = self.dumps(item)
+            buffers.append(_ITEM_LENGTH.pack(memoryview(data).nbytes))
+            buffers.append(data)
+        return b''.join(buffers)
+
+    def loads_many(self, data):
+        """Return the list of objects encoded in C{data} by
+        L{dumps_many}.
+        """
+        view, items, start = memoryview(data).cast('B'), [], 0
+        while start < view.nbytes:
+            length, = _ITEM_LENGTH.unpack_from(view, start)
+            start += _ITEM_LENGTH.size
+            items.append(self.loads(view[start:start + length]))
+            start += length
+        return items
+
+    def __str__(self):
+        return 'CSP Serializer: must be subclassed.'
+
+
+### Pickle with out-of-band buffers
+
+def _share_buffer(buf, names):
+    """Pickle buffer callback. Copy large buffers to shared memory.
+
+    Each buffer is written to its own file in L{_SHARED_DIR} (a tmpfs
+    on most POSIX systems) and the file name is appended to
+    C{names}. Return C{True} if the buffer should be pickled in-band.
+    """
+    try:
+        view = buf.raw()
+    except BufferError: # Not contiguous.
+        return True
+    if view.nbytes < _ZEROCOPY_MIN:
+        return True
+    file_d, name = _new_shared_file()
+    with os.fdopen(file_d, 'wb') as fobj:
+        fobj.write(view)
+    names.append(name)
+    return False
+
+
+def _map_buffer(name):
+    """Map and unlink a buffer written by L{_share_buffer}.
+
+    The mapping is copy-on-write, so the buffer can be modified by
+    the reader without copying the whole of it, and lasts for as long
+    as any view on it.
+    """
+    with open(name, 'rb') as fobj:
+        _unlink_shared_file(name)
+        size = os.fstat(fobj.fileno()).st_size
+        if size == 0:
+            return memoryview(bytearray())
+        return memoryview(mmap.mmap(fobj.fileno(), size,
+                                    access=mmap.ACCESS_COPY))
+
+
+class PickleSerializer(Serializer):
+    """Serialize any picklable object.
+
+    With pickle protocol 5 (Python 3.8 and above), large buffers
+    inside an item, such as the data of NumPy arrays, are not
+    pickled. Instead they are copied once into shared memory and only
+    their names are sent. Large C{bytes}, C{bytearray} and
+    C{memoryview} objects are passed in the same way and arrive as
+    (writable) memoryview objects. Set C{out_of_band} to C{False} to
+    pickle everything in-band.
+
+    Buffers which are never loaded are removed when the program
+    exits, by the resource tracker which its processes share. Programs
+    started separately do not share a tracker, so items passed
+    between them should be pickled in-band.
+    """
+
+    def __init__(self, protocol=pickle.HIGHEST_PROTOCOL, out_of_band=True):
+        self.protocol = protocol
+        self.out_of_band = out_of_band and protocol >= 5
+
+    def dumps(self, obj):
+        if not self.out_of_band:
+            return pickle.dumps(obj, protocol=self.protocol)
+        if (isinstance(obj, (bytes, bytearray, memoryview)) and
+            memoryview(obj).nbytes >= _ZEROCOPY_MIN):
+            obj = pickle.PickleBuffer(obj)
+        names = []
+        data = pickle.dumps(obj, protocol=self.protocol,
+                            buffer_callback=lambda buf: _share_buffer(buf, names))
+        if names:
+            return pickle.dumps((_BUFFERS, names, data), protocol=self.protocol)
+        return data
+
+    def loads(self, data):
+        obj = pickle.loads(data)
+        if type(obj) is tuple and len(obj) == 3 and obj[0] == _BUFFERS:
+            obj = pickle.loads(obj[2],
+                               buffers=[_map_buffer(name) for name in obj[1]])
+        return obj
+
+    def dumps_many(self, items):
+        return self.dumps(list(items))
+
+    def loads_many(self, data):
+        return self.loads(data)
+
+    def __str__(self):
+        return 'Pickle serializer using protocol {0}.'.format(self.protocol)
+
+
+class MarshalSerializer(Serializer):
+    """Serialize plain builtin values with the marshal module.
+
+    Only None, booleans, numbers, strings, bytes and tuples, lists,
+    sets and dicts of these can be sent. Marshal is faster than
+    pickle for such values, but its format may change between
+    versions of Python, so both ends of the channel must be running
+    the same interpreter.
+    """
+
+    def dumps(self, obj):
+        return marshal.dumps(obj)
+
+    def loads(self, data):
+        return marshal.loads(data)
+
+    def dumps_many(self, items):
+        return marshal.dumps(list(items))
+
+    def loads_many(self, data):
+        return marshal.loads(data)
+
+    def __str__(self):
+        return 'Marshal serializer.'
+
+
+class StructSerializer(Serializer):
+    """Serialize fixed size records with the struct module.
+
+    Items are tuples whose fields match the struct format C{fmt}, or
+    single values if the format has one field. For example, points in
+    the plane could be sent with:
+
+>>> points = Channel(serializer=StructSerializer('dd'))
+>>>
+    """
+
+    def __init__(self, fmt):
+        self._struct = struct.Struct(fmt)
+        self._single = len(self._struct.unpack(b'\0' * self._struct.size)) == 1
+
+    def dumps(self, obj):
+        if self._single:
+            return self._struct.pack(obj)
+        return self._struct.pack(*obj)
+
+    def loads(self, data):
+        record = self._struct.unpack(data)
+        if self._single:
+            return record[0]
+        return record
+
+    def dumps_many(self, items):
+        # Records have a fixed size, so need no lengths.
+        pack = self._struct.pack
+        if self._single:
+            return b''.join([pack(item) for item in items])
+        return b''.join([pack(*item) for item in items])
+
+    def loads_many(self, data):
+        records = self._struct.iter_unpack(data)
+        if self._single:
+            return [record[0] for record in records]
+        return list(records)
+
+    def __str__(self):
+        return 'Struct serializer for records {0}.'.format(self._struct.format)
+
+
+class BytesSerializer(Serializer):
+    """Pass bytes through unchanged.
+
+    Only bytes-like objects can be sent and they always arrive as
+    C{bytes}.
+    """
+
+    def dumps(self, obj):
+        return obj
+
+    def loads(self, data):
+        return bytes(data)
+
+    def __str__(self):
+        return 'Bytes serializer.'
+
+
+### Process-wide default
+
+_default_serializer = PickleSerializer()
+
+
+def get_default_serializer():
+    """Return the serializer used by new channels.
+    """
+    return _default_serializer
+
+
+def set_default_serializer(serializer):
+    """Set the serializer used by channels created from now on.
+    """
+    global _default_serializer
+    assert isinstance(serializer, Serializer)
+    _default_serializer = serializer
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+
+"""Timer service used by L{Alt} to wait for timer guards.
+
+Each OS process has one L{TimerService}, which keeps the alarms of
+its L{csp.guards.Timer} guards in a min-heap. An L{Alt} asks the
+service how long it may block before the earliest alarm is due, and
+which timers have expired, rather than polling each of its timers.
+Waiting on thousands of timers therefore costs no CPU, and setting
+or expiring an alarm costs O(log n).
+
+Every time is read from the monotonic clock returned by L{now}, so
+timers are not affected by changes to the system clock.
+
+Copyright (C) python-csp developers, 2026.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have rceeived a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+import weakref
+
+
+__author__ = 'python-csp developers'
+__date__ = 'October 2026'
+
+
+### Names exported by this module
+__all__ = ['TimerService', 'get_timer_service', 'now']
+
+
+now = time.monotonic
+"""Return the current time, in seconds, on the clock used by timers."""
+
+
+class TimerService(object):
+    """Alarms of the timer guards in one OS process.
+
+    A guard is scheduled with L{schedule}, which replaces any alarm
+    it already had. Guards whose alarm has passed are moved to
+    L{expired} by L{poll}, and stay there until they are scheduled
+    again or cancelled. Entries of the heap which have been replaced
+    are discarded lazily, when they reach the top.
+
+    Guards are held weakly, so a timer which is dropped while its
+    alarm is pending is freed.
+    """
+
+    def __init__(self):
+        self._heap = []        # (deadline, sequence number, guard ref).
+        self._pending = weakref.WeakKeyDictionary() # Guard -> entry.
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.expired = weakref.WeakSet()
+
+    def schedule(self, guard, deadline):
+        """Make C{guard} expire at C{deadline}, a time read from
+        L{now}, or straight away if C{deadline} is C{None}.
+        """
+        with self._lock:
+            self.expired.discard(guard)
+            if deadline is None:
+                self._pending.pop(guard, None)
+                self.expired.add(guard)
+                return
+            entry = (deadline, next(self._seq), weakref.ref(guard))
+            self._pending[guard] = entry
+            heapq.heappush(self._heap, entry)
+
+    def cancel(self, guard):
+        """Forget the alarm of C{guard}, which is then never expired.
+        """
+        with self._lock:
+            self.expired.discard(guard)
+            self._pending.pop(guard, None)
+
+    def poll(self):
+        """Move every guard whose alarm has passed to L{expired}, and
+        return the time of the earliest alarm still to come, or
+        C{None} if there is none.
+        """
+        heap = self._heap
+        with self._lock:
+            while heap:
+                deadline, seq, ref = heap[0]
+                guard = ref()
+                if guard is None or self._pending.get(guard) is not heap[0]:
+                    heapq.heappop(heap) # Replaced, cancelled or freed.
+                    continue
+                if deadline > now():
+                    return deadline
+                heapq.heappop(heap)
+                del self._pending[guard]
+                self.expired.add(guard)
+        return None
+
+    def timeout(self, limit=None):
+        """Return the number of seconds an L{Alt} may block before the
+        next alarm is due, at most C{limit} (which is C{None} for no
+        limit). Expired guards are moved to L{expired} first.
+        """
+        deadline = self.poll()
+        if deadline is None:
+            return limit
+        delay = max(0.0, deadline - now())
+        if limit is None:
+            return delay
+        return min(limit, delay)
+
+    def __len__(self):
+        """Number of alarms still to come."""
+        return len(self._pending)
+
+
+_service = TimerService()
+
+
+def get_timer_service():
+    """Return the L{TimerService} of this OS process.
+
+    A forked child inherits a copy of the service of its parent,
+    which holds the alarms of the copies of its timers.
+    """
+    return _service
+
+
+def _after_fork_in_child():
+    """Replace a lock which another thread may have held in the parent."""
+    _service._lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,201 @@
+"""
+Tests for Alt selection over channels (processes).
+
+Writers on every guard should wake the selecting process directly,
+so these tests also check that an Alt does not stall when channels
+become ready, or are poisoned, after it has started waiting.
+"""
+
+import os
+import sys
+import time
+import unittest
+
+try:
+    import resource
+except ImportError: # Not on Windows.
+    resource = None
+
+sys.path.insert(0, "..")
+
+import csp.os_process
+from csp.guards import Timer
+
+
+class TestAltWithProcesses(unittest.TestCase):
+    csp_process = csp.os_process
+    channel_type = csp.os_process.Channel
+
+    def setUp(self):
+        self.spare_channels = [self.channel_type() for i in range(4)]
+
+    def tearDown(self):
+        [channel.poison() for channel in self.spare_channels]
+        self.spare_channels[:] = []
+
+    def writer(self):
+        @self.csp_process.process
+        def _writer(channel, values, delay):
+            time.sleep(delay)
+            for value in values:
+                channel.write(value)
+        return _writer
+
+    def selector(self):
+        @self.csp_process.process
+        def _selector(guards, method, reads, result_channel):
+            alt = self.csp_process.Alt(*guards)
+            result = [getattr(alt, method)() for i in range(reads)]
+            result_channel.write(result)
+        return _selector
+
+    def spawnPar(self, factory):
+        """Run the processes returned by `factory` in parallel in the
+        background. Processes must be created by the process which
+        starts them, so `factory` is called from the coordinator.
+        """
+        @self.csp_process.process
+        def _coordinator(factory):
+            self.csp_process.Par(*factory()).start()
+        _coordinator(factory).spawn()
+
+    def altAll(self, method, delay=0.0):
+        """Write two values on each of two channels and select all four
+        with `method`. Return the values read, in order.
+        """
+        chan1, chan2, result_channel = self.spare_channels[:3]
+        self.spawnPar(lambda: [
+            self.writer()(chan1, [1, 2], delay),
+            self.writer()(chan2, [3, 4], delay),
+            self.selector()([chan1, chan2], method, 4, result_channel)])
+        return result_channel.read()
+
+    def testSelect(self):
+        self.assertEqual(sorted(self.altAll('select')), [1, 2, 3, 4])
+
+    def testFairSelect(self):
+        self.assertEqual(sorted(self.altAll('fair_select')), [1, 2, 3, 4])
+
+    def testPriSelect(self):
+        self.assertEqual(sorted(self.altAll('pri_select')), [1, 2, 3, 4])
+
+    def testLateWriters(self):
+        start = time.time()
+        self.assertEqual(sorted(self.altAll('select', delay=0.2)),
+                         [1, 2, 3, 4])
+        self.assertTrue(time.time() - start < 1.0)
+
+    def testBatchedWriters(self):
+        @self.csp_process.process
+        def _batcher(channel, values):
+            channel.write_many(values)
+
+        chan1, chan2, result_channel = self.spare_channels[:3]
+        self.spawnPar(lambda: [
+            _batcher(chan1, [1, 2, 3]),
+            _batcher(chan2, [4, 5]),
+            self.selector()([chan1, chan2], 'select', 5, result_channel)])
+        result = result_channel.read()
+        self.assertEqual(sorted(result), [1, 2, 3, 4, 5])
+        # Each batch is read in order.
+        self.assertEqual([value for value in result if value < 4], [1, 2, 3])
+
+    def testManyGuards(self):
+        channels = [self.channel_type() for i in range(64)]
+        self.spare_channels.extend(channels)
+        result_channel = self.spare_channels[0]
+        self.spawnPar(lambda: [self.writer()(channel, [i], 0.0)
+                               for i, channel in enumerate(channels)] +
+                      [self.selector()(channels, 'fair_select', 64,
+                                       result_channel)])
+        self.assertEqual(sorted(result_channel.read()), list(range(64)))
+
+    @unittest.skipUnless(resource is not None and
+                         resource.getrlimit(resource.RLIMIT_NOFILE)[0] > 1200,
+                         'needs more than 1200 open files')
+    def testHighFileDescriptors(self):
+        # select(2) cannot wait on descriptors from FD_SETSIZE (1024) up.
+        fillers = []
+        try:
+            while len(fillers) < 1024:
+                fillers.append(os.open(os.devnull, os.O_RDONLY))
+            channels = [self.channel_type() for i in range(2)]
+            for channel in channels:
+                channel._setup()
+                self.assertTrue(channel.fileno() is None or
+                                channel.fileno() >= 1024)
+        finally:
+            for fd in fillers:
+                os.close(fd)
+        self.spare_channels[:2] = channels
+        self.assertEqual(sorted(self.altAll('select')), [1, 2, 3, 4])
+
+    def testPoisonWakesAlt(self):
+        @self.csp_process.process
+        def _waiter(chan1, chan2, result_channel):
+            try:
+                self.csp_process.Alt(chan1, chan2).select()
+            except self.csp_process.ChannelPoison:
+                result_channel.write('poisoned')
+
+        @self.csp_process.process
+        def _poisoner(channel):
+            time.sleep(0.2)
+            channel.poison()
+
+        chan1, chan2, result_channel = self.spare_channels[:3]
+        self.spawnPar(lambda: [_waiter(chan1, chan2, result_channel),
+                               _poisoner(chan1)])
+        self.assertEqual(result_channel.read(), 'poisoned')
+
+
+class TestAltWithTimers(unittest.TestCase):
+
+    def setUp(self):
+        self.channel = csp.os_process.Channel()
+
+    def tearDown(self):
+        self.channel.poison()
+
+    def testTimerWakesAlt(self):
+        timer = Timer()
+        timer.set_alarm(0.2)
+        alt = csp.os_process.Alt(self.channel, timer)
+        start = time.monotonic()
+        alt.select()
+        self.assertIs(alt.last_selected, timer)
+        self.assertTrue(0.19 < time.monotonic() - start < 1.0)
+
+    def testSelectTimeout(self):
+        alt = csp.os_process.Alt(self.channel)
+        start = time.monotonic()
+        self.assertEqual(alt.select(timeout=0.1), None)
+        self.assertEqual(alt.pri_select(timeout=0.0), None)
+        self.assertEqual(alt.last_selected, None)
+        self.assertTrue(time.monotonic() - start < 1.0)
+
+    def testManyTimers(self):
+        timers = [Timer() for i in range(2000)]
+        for timer in timers:
+            timer.set_alarm(60)
+        timers[1000].set_alarm(0.3)
+        alt = csp.os_process.Alt(*timers)
+        start = time.process_time()
+        alt.pri_select()
+        self.assertIs(alt.last_selected, timers[1000])
+        # Waiting for the alarm should not use the CPU.
+        self.assertTrue(time.process_time() - start < 0.2)
+
+
+class TestAltWithFiles(TestAltWithProcesses):
+    channel_type = csp.os_process.FileChannel
+
+
+class TestAltWithBuffering(TestAltWithProcesses):
+
+    def channel_type(self):
+        return csp.os_process.BufferedChannel(2)
+
+
+if __name__ == '__main__':
+    unittest.main()
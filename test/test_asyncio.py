@@ -0,0 +1,253 @@
+"""
+Tests for the asyncio version of python-csp, csp.os_asyncio.
+
+Processes here are tasks on one event loop, so these tests also check
+that CSP networks can be awaited from other asyncio code, that
+channel operations can be cancelled without losing items, and that
+timers wake a waiting Alt through the event loop.
+"""
+
+import asyncio
+import sys
+import time
+import unittest
+
+sys.path.insert(0, "..")
+
+import csp.os_asyncio
+from csp.os_asyncio import *
+
+
+@process
+async def _send(channel, values):
+    for value in values:
+        await channel.write(value)
+
+
+@process
+async def _recv(channel, count, result):
+    for i in range(count):
+        result.append(await channel.read())
+
+
+@process
+async def _select(guards, method, count, result):
+    alt = Alt(*guards)
+    for i in range(count):
+        result.append(await getattr(alt, method)())
+
+
+@process
+async def _relay(cin, cout):
+    while True:
+        await cout.write(await cin.read() + 1)
+
+
+class TestAsyncioChannels(unittest.TestCase):
+
+    def testReadWrite(self):
+        for channel in [Channel(), BufferedChannel(2), FileChannel()]:
+            result = []
+            Par(_send(channel, range(10)), _recv(channel, 10, result)).start()
+            self.assertEqual(result, list(range(10)))
+
+    def testBufferedWriterRunsAhead(self):
+        channel, result = BufferedChannel(3), []
+        _send(channel, [1, 2, 3]).start()
+        _recv(channel, 3, result).start()
+        self.assertEqual(result, [1, 2, 3])
+
+    def testWriteMany(self):
+        channel, result = Channel(), []
+
+        @process
+        async def _send_many(channel):
+            await channel.write_many(range(5))
+            await channel.write(5)
+            channel.poison()
+
+        @process
+        async def _recv_many(channel):
+            result.append(await channel.read())
+            result.extend(await channel.read_many(3))
+            async for item in channel:
+                result.append(item)
+
+        Par(_send_many(channel), _recv_many(channel)).start()
+        self.assertEqual(result, list(range(6)))
+
+    def testPoisonWakesBlockedProcesses(self):
+        channel, result = Channel(), []
+
+        @process
+        async def _poisoner(channel):
+            await asyncio.sleep(0)
+            channel.poison()
+
+        Par(_recv(channel, 1, result), _recv(channel, 1, result),
+            _poisoner(channel)).start()
+        self.assertEqual(result, [])
+        self.assertRaises(csp.os_asyncio.ChannelPoison,
+                          asyncio.run, channel.read())
+
+    def testCancelledReadKeepsItem(self):
+        channel = Channel()
+
+        async def main():
+            reader = asyncio.ensure_future(channel.read())
+            await asyncio.sleep(0)
+            await channel.write('item')
+            reader.cancel() # Too late: the item has been handed over.
+            try:
+                await reader
+            except asyncio.CancelledError:
+                pass
+            return await channel.read()
+
+        self.assertEqual(asyncio.run(main()), 'item')
+
+    def testCancelledWriteIsWithdrawn(self):
+        channel = BufferedChannel(1)
+
+        async def main():
+            await channel.write(1)
+            try:
+                await asyncio.wait_for(channel.write(2), 0.01)
+            except asyncio.TimeoutError:
+                pass
+            return [await channel.read(), channel.is_selectable()]
+
+        self.assertEqual(asyncio.run(main()), [1, False])
+
+    def testTokenRing(self):
+        size = 1000
+        channels = [Channel() for i in range(size)]
+        result = []
+
+        @process
+        async def _first(cin, cout):
+            await cout.write(0)
+            result.append(await cin.read())
+            cout.poison()
+
+        Par(_first(channels[-1], channels[0]),
+            *[_relay(channels[i - 1], channels[i])
+              for i in range(1, size)]).start()
+        self.assertEqual(result, [size - 1])
+
+
+class TestAsyncioAlt(unittest.TestCase):
+
+    def testSelect(self):
+        for method in ['select', 'fair_select', 'pri_select']:
+            chan1, chan2, result = Channel(), Channel(), []
+            Par(_send(chan1, [1, 2]), _send(chan2, [3, 4]),
+                _select([chan1, chan2], method, 4, result)).start()
+            self.assertEqual(sorted(result), [1, 2, 3, 4])
+
+    def testPriSelect(self):
+        chan1, chan2, result = BufferedChannel(2), BufferedChannel(2), []
+        Seq(_send(chan2, [3, 4]), _send(chan1, [1, 2]),
+            _select([chan1, chan2], 'pri_select', 4, result)).start()
+        self.assertEqual(result, [1, 2, 3, 4])
+
+    def testSkip(self):
+        result = []
+        _select([Channel(), Skip()], 'select', 3, result).start()
+        self.assertEqual(result, ['Skip'] * 3)
+
+    def testTimeout(self):
+        for method in ['select', 'fair_select', 'pri_select']:
+
+            async def main():
+                start = asyncio.get_running_loop().time()
+                selected = await getattr(Alt(Channel()), method)(timeout=0.05)
+                return selected, asyncio.get_running_loop().time() - start
+
+            selected, elapsed = asyncio.run(main())
+            self.assertEqual(selected, None)
+            self.assertTrue(0.05 <= elapsed < 1.0)
+
+    def testSelectBeforeTimeout(self):
+        channel, result = Channel(), []
+
+        @process
+        async def _wait(channel):
+            result.append(await Alt(channel).select(timeout=5))
+
+        start = time.time()
+        Par(_wait(channel), _send(channel, [1])).start()
+        self.assertEqual(result, [1])
+        self.assertTrue(time.time() - start < 1.0)
+
+    def testTimer(self):
+        timer, channel = csp.os_asyncio.Timer(), Channel()
+
+        async def main():
+            timer.set_alarm(0.05)
+            start = asyncio.get_running_loop().time()
+            selected = await Alt(channel, timer).select()
+            return selected, asyncio.get_running_loop().time() - start
+
+        selected, elapsed = asyncio.run(main())
+        self.assertEqual(selected, None)
+        self.assertTrue(0.05 <= elapsed < 1.0)
+
+    def testChoice(self):
+        chan1, chan2, result = Channel(), Channel(), []
+
+        @process
+        async def _choose(chan1, chan2):
+            result.append(await (chan1 | chan2))
+
+        Par(_send(chan2, ['b']), _choose(chan1, chan2)).start()
+        self.assertEqual(result, ['b'])
+
+
+class TestAsyncioProcesses(unittest.TestCase):
+
+    def testPlainFunctions(self):
+        result = []
+
+        @process
+        def _append(value):
+            result.append(value)
+
+        Seq(_append(1), Par(_append(2), _append(3)), _append(4)).start()
+        self.assertEqual(result, [1, 2, 3, 4])
+
+    def testAwaitFromAsyncio(self):
+        channel, result = Channel(), []
+
+        async def main():
+            proc = _recv(channel, 2, result)
+            proc.spawn()
+            await Par(_send(channel, [1, 2]))
+            await proc.join()
+
+        asyncio.run(main())
+        self.assertEqual(result, [1, 2])
+
+    def testForever(self):
+        result = []
+
+        @forever
+        async def _count(cout):
+            n = 0
+            while True:
+                await cout.write(n)
+                n += 1
+                yield
+
+        @process
+        async def _recv_and_poison(cin):
+            await _recv(cin, 10, result)
+            cin.poison()
+
+        channel = Channel()
+        Par(_count(channel), _recv_and_poison(channel)).start()
+        self.assertEqual(result, list(range(10)))
+
+
+if __name__ == '__main__':
+    unittest.main()
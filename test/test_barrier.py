@@ -0,0 +1,112 @@
+"""
+Tests for barriers shared by threads and by OS processes.
+
+Every participant records the phase it has reached before each
+synchronisation, and checks afterwards that no participant is still
+behind it, so these tests fail if a barrier ever releases a phase
+before every participant has arrived.
+"""
+
+import multiprocessing
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, "..")
+
+from csp.guards import BarrierProcessing, BarrierThreading
+
+
+def _lock_step(barrier, reached, index, phases, errors):
+    for phase in range(1, phases + 1):
+        reached[index] = phase
+        barrier.synchronise()
+        if min(reached[i] for i in range(len(reached))) < phase:
+            errors[0] += 1
+        barrier.synchronise()
+
+
+class TestBarrierThreading(unittest.TestCase):
+
+    def run_threads(self, targets):
+        threads = [threading.Thread(target=target) for target in targets]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+            self.assertFalse(thread.is_alive())
+
+    def testLockStep(self):
+        barrier = BarrierThreading(8)
+        reached, errors = [0] * 8, [0]
+        self.run_threads([lambda i=i: _lock_step(barrier, reached, i, 20,
+                                                  errors)
+                          for i in range(8)])
+        self.assertEqual(errors[0], 0)
+        self.assertEqual(len(barrier.statistics()), 40)
+
+    def testEnrolAndRetire(self):
+        barrier = BarrierThreading(2, capacity=16)
+        log = []
+
+        def leaver():
+            for i in range(3):
+                barrier.synchronise()
+            barrier.retire()
+
+        def stayer():
+            for i in range(6):
+                barrier.synchronise()
+                log.append(barrier.participants)
+
+        def joiner():
+            barrier.enrol()
+            for i in range(3):
+                barrier.synchronise()
+            barrier.retire()
+
+        self.run_threads([leaver, stayer, joiner])
+        self.assertEqual(barrier.participants, 1)
+        self.assertEqual(len(log), 6)
+
+    def testSynchroniseWithN(self):
+        barrier = BarrierThreading(1)
+        done = []
+
+        def waiter():
+            barrier.synchronise_withN(2)
+            done.append(barrier.participants)
+
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        thread.join(0.2)
+        self.assertTrue(thread.is_alive())
+        barrier.enrol()
+        barrier.synchronise()
+        thread.join(10)
+        self.assertEqual(done, [2])
+
+
+class TestBarrierProcessing(unittest.TestCase):
+
+    def testLockStep(self):
+        count = 16
+        barrier = BarrierProcessing(count, capacity=64)
+        reached = multiprocessing.RawArray('q', count)
+        errors = multiprocessing.RawArray('q', 1)
+        procs = [multiprocessing.Process(
+            target=_lock_step, args=(barrier, reached, i, 20, errors))
+                 for i in range(count)]
+        for proc in procs:
+            proc.start()
+        for proc in procs:
+            proc.join(30)
+            self.assertEqual(proc.exitcode, 0)
+        self.assertEqual(errors[0], 0)
+        phase, period, latency = barrier.statistics()[-1]
+        self.assertEqual(phase, 40)
+        self.assertTrue(0 <= latency <= period)
+
+
+if __name__ == '__main__':
+    unittest.main()
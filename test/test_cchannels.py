@@ -0,0 +1,151 @@
+"""
+Tests for channels implemented in C (csp.cchannels), which are
+skipped unless the extension has been built.
+"""
+
+import gc
+import os
+import subprocess
+import sys
+import unittest
+
+sys.path.insert(0, "..")
+
+from csp.os_process import Alt, ChannelPoison, process
+from csp.serializers import StructSerializer
+
+try:
+    from csp.cchannels.CChannel import CChannel
+except ImportError:
+    CChannel = None
+
+
+@process
+def _write_each(channel, items):
+    for item in items:
+        channel.write(item)
+
+
+@process
+def _write_then_poison(channel, item):
+    channel.write(item)
+    channel.poison()
+
+
+def _channel_module(**env):
+    """Return the module of the Channel of csp.csp in a new program
+    run with the environment variables C{env}.
+    """
+    environ = dict((key, value) for key, value in os.environ.items()
+                   if key not in ('CSP', 'CSP_CCHANNELS'))
+    environ.update(env)
+    script = ('import sys; sys.path.insert(0, {0!r}); import csp.csp; '
+              'print(csp.csp.Channel.__module__)'
+              ).format(os.path.abspath('..'))
+    return subprocess.run([sys.executable, '-c', script], env=environ,
+                          stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                          check=True).stdout.decode().split()[-1]
+
+
+def _segments():
+    if not os.path.isdir('/dev/shm'):
+        return set()
+    return set(name for name in os.listdir('/dev/shm')
+               if name.startswith('csp-{0}-'.format(os.getpid())))
+
+
+@unittest.skipIf(CChannel is None, 'csp.cchannels has not been built')
+class TestCChannel(unittest.TestCase):
+
+    def tearDown(self):
+        gc.collect() # Close the pipes of channels left in cycles.
+
+    def testReadWrite(self):
+        channel = CChannel()
+        writer = _write_each(channel, list(range(100)))
+        writer.spawn()
+        self.assertEqual([channel.read() for i in range(100)],
+                         list(range(100)))
+        writer.join()
+
+    def testItemsGrowTheSegment(self):
+        channel = CChannel()
+        items = ['x' * size for size in (10, 100000, 10, 5000000, 70000)]
+        writer = _write_each(channel, items)
+        writer.spawn()
+        self.assertEqual([channel.read() for item in items], items)
+        writer.join()
+
+    def testBatch(self):
+        channel = CChannel()
+        writer = process(lambda: channel.write_many(range(10)))()
+        writer.spawn()
+        self.assertEqual(channel.read(), 0)
+        self.assertEqual(channel.read_many(20), list(range(1, 10)))
+        writer.join()
+
+    def testPutAndGet(self):
+        channel = CChannel()
+        writer = process(lambda: channel.put('item'))()
+        writer.spawn()
+        self.assertEqual(channel.get(), 'item')
+        writer.join()
+
+    def testBatchWithStructSerializer(self):
+        channel = CChannel(serializer=StructSerializer('hh'))
+        writer = process(lambda: channel.write_many([(1, 2), (3, 4)]))()
+        writer.spawn()
+        self.assertEqual(channel.read_many(5), [(1, 2), (3, 4)])
+        writer.join()
+
+    def testAlt(self):
+        channels = [CChannel() for i in range(4)]
+        writers = [_write_each(channel, [i] * 3)
+                   for i, channel in enumerate(channels)]
+        for writer in writers:
+            writer.spawn()
+        alt = Alt(*channels)
+        self.assertEqual(sorted(alt.select() for i in range(12)),
+                         sorted(list(range(4)) * 3))
+        self.assertIsNone(alt.select(timeout=0.05))
+        for writer in writers:
+            writer.join()
+
+    def testPoison(self):
+        channel = CChannel()
+        poisoner = _write_then_poison(channel, 'last')
+        poisoner.spawn()
+        self.assertEqual(channel.read(), 'last')
+        self.assertRaises(ChannelPoison, channel.read)
+        self.assertRaises(ChannelPoison, channel.write, 'more')
+        poisoner.join()
+
+    def testSegmentsRemoved(self):
+        before = _segments()
+        channel = CChannel()
+        writer = _write_each(channel, [b'x' * 100000])
+        writer.spawn()
+        channel.read()
+        writer.join()
+        self.assertTrue(_segments() - before)
+        del channel, writer
+        self.assertEqual(_segments(), before)
+
+
+class TestChannelSelection(unittest.TestCase):
+
+    def testOsProcessChannelByDefault(self):
+        self.assertEqual(_channel_module(), 'csp.os_process')
+
+    @unittest.skipIf(CChannel is None, 'csp.cchannels has not been built')
+    def testCChannelIfAskedFor(self):
+        self.assertEqual(_channel_module(CSP_CCHANNELS='1'),
+                         'csp.cchannels.CChannel')
+
+    def testOnlyForProcesses(self):
+        self.assertEqual(_channel_module(CSP='THREADS', CSP_CCHANNELS='1'),
+                         'csp.os_thread')
+
+
+if __name__ == '__main__':
+    unittest.main()
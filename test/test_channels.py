@@ -0,0 +1,291 @@
+"""
+Tests for the channel types provided by csp.os_process.
+
+Each test writes a sequence of values from one process and reads
+them back in another, so data must survive the trip through the
+channel's process-safe store.
+"""
+
+import os
+import sys
+import time
+import types
+import unittest
+
+sys.path.insert(0, "..")
+
+import csp.os_process
+
+
+class _Hub(object):
+    """Holds a channel in a class attribute."""
+    channel = None
+
+
+_hub = types.ModuleType('_hub')
+"""Holds a channel in a module attribute."""
+
+
+class TestChannel(unittest.TestCase):
+    csp_process = csp.os_process
+    channel_type = csp.os_process.Channel
+
+    def setUp(self):
+        self.channel = self.channel_type()
+
+    def tearDown(self):
+        self.channel.poison()
+
+    def roundTrip(self, values):
+        """Write `values` to the channel from a new process, read them
+        back in this one and return the values read.
+        """
+        @self.csp_process.process
+        def _writer(channel, values):
+            for value in values:
+                channel.write(value)
+        _writer(self.channel, values).spawn()
+        return [self.channel.read() for value in values]
+
+    def writeMany(self, batches):
+        """Write each list in `batches` to the channel with write_many()
+        from a new process.
+        """
+        @self.csp_process.process
+        def _writer(channel, batches):
+            for batch in batches:
+                channel.write_many(batch)
+        _writer(self.channel, batches).spawn()
+
+    def testScalars(self):
+        values = [0, -1, 2.5, None, True, 'abc', u'é', b'xyz']
+        self.assertEqual(self.roundTrip(values), values)
+
+    def testContainers(self):
+        values = [(), [1, [2, 3]], {'a': (1, 2)}, set([1, 2])]
+        self.assertEqual(self.roundTrip(values), values)
+
+    def testWriteMany(self):
+        self.writeMany([[1, 2, 3], [4], [5, 6]])
+        self.assertEqual(self.channel.read(), 1)
+        self.assertEqual(self.channel.read_many(10), [2, 3])
+        self.assertEqual(self.channel.read_many(10), [4])
+        self.assertEqual(self.channel.read_many(1), [5])
+        self.assertEqual(self.channel.read(), 6)
+
+    def testIterateOverBatches(self):
+        self.writeMany([list(range(10)), list(range(10, 20))])
+        items = iter(self.channel)
+        self.assertEqual([next(items) for i in range(5)], list(range(5)))
+        items.close()
+        # Items of a batch left by the iterator are not lost.
+        self.assertEqual([self.channel.read() for i in range(15)],
+                         list(range(5, 20)))
+
+    def testLargeItem(self):
+        values = [list(range(50000)), b'x' * 200000]
+        self.assertEqual(self.roundTrip(values), values)
+
+    def testItemSizes(self):
+        # Items either side of the read buffer and pipe sizes.
+        values = ['x' * size for size in
+                  [0, 1000, 1024, 4096, 65520, 65536, 70000, 1]]
+        self.assertEqual(self.roundTrip(values), values)
+
+    def testLargeBuffers(self):
+        values = [b'x' * 200000, bytearray(range(256)) * 1000]
+        received = self.roundTrip(values)
+        for value, item in zip(values, received):
+            # Passed through shared memory, not pickled.
+            self.assertTrue(isinstance(item, memoryview))
+            self.assertEqual(bytes(item), bytes(value))
+
+    def testChannelInClosure(self):
+        channel = self.channel_type()
+
+        @self.csp_process.process
+        def _writer():
+            channel.write('closure')
+        _writer().spawn()
+        self.assertEqual(channel.read(), 'closure')
+        channel.poison()
+
+    def testChannelInDefaultArgument(self):
+        channel = self.channel_type()
+
+        @self.csp_process.process
+        def _writer(channel=channel):
+            channel.write('default')
+        _writer().spawn()
+        self.assertEqual(channel.read(), 'default')
+        channel.poison()
+
+    def testChannelInKeywordOnlyDefault(self):
+        channel = self.channel_type()
+
+        @self.csp_process.process
+        def _writer(*, channel=channel):
+            channel.write('keyword')
+        _writer().spawn()
+        self.assertEqual(channel.read(), 'keyword')
+        channel.poison()
+
+    def testChannelInClassAttribute(self):
+        _Hub.channel = self.channel_type()
+
+        @self.csp_process.process
+        def _writer():
+            _Hub.channel.write('class')
+        _writer().spawn()
+        self.assertEqual(_Hub.channel.read(), 'class')
+        _Hub.channel.poison()
+        _Hub.channel = None
+
+    def testChannelInModuleAttribute(self):
+        _hub.channel = self.channel_type()
+
+        @self.csp_process.process
+        def _writer():
+            _hub.channel.write('module')
+        _writer().spawn()
+        self.assertEqual(_hub.channel.read(), 'module')
+        _hub.channel.poison()
+        del _hub.channel
+
+    def testPoisonWakesEveryReader(self):
+        @self.csp_process.process
+        def _reader(channel, results):
+            try:
+                channel.read()
+            except self.csp_process.ChannelPoison:
+                results.write('poisoned')
+        results = self.csp_process.Channel()
+        for i in range(3):
+            _reader(self.channel, results).spawn()
+        time.sleep(0.1) # Let the readers block.
+        self.channel.poison()
+        self.assertEqual([results.read() for i in range(3)],
+                         ['poisoned'] * 3)
+
+    def testPoisonWakesWriter(self):
+        @self.csp_process.process
+        def _writer(channel, results):
+            try:
+                while True:
+                    channel.write('unread')
+            except self.csp_process.ChannelPoison:
+                results.write('poisoned')
+        results = self.csp_process.Channel()
+        _writer(self.channel, results).spawn()
+        time.sleep(0.1) # Let the writer block.
+        self.channel.poison()
+        self.assertEqual(results.read(), 'poisoned')
+
+    def testDisableLeavesItem(self):
+        @self.csp_process.process
+        def _writer(channel, value):
+            channel.write(value)
+        _writer(self.channel, 'item').spawn()
+        time.sleep(0.1) # Let the item arrive.
+        self.channel.enable()
+        self.assertTrue(self.channel.is_selectable())
+        self.channel.disable()
+        self.assertEqual(self.channel.read(), 'item')
+
+
+class TestFileChannel(TestChannel):
+    channel_type = csp.os_process.FileChannel
+
+    @unittest.skipUnless(os.path.isdir('/proc/self/fd'), 'needs /proc')
+    def testNoFileDescriptors(self):
+        before = len(os.listdir('/proc/self/fd'))
+        channels = [self.channel_type() for i in range(100)]
+        for channel in channels:
+            channel._setup()
+        self.assertEqual(len(os.listdir('/proc/self/fd')), before)
+
+
+class TestBufferedChannel(TestChannel):
+
+    def channel_type(self):
+        return csp.os_process.BufferedChannel(4)
+
+    def testWritesDoNotBlock(self):
+        values = list(range(4))
+        for value in values:
+            self.channel.write(value)
+        self.assertEqual([self.channel.read() for value in values], values)
+
+    def testWriterRunsAhead(self):
+        @self.csp_process.process
+        def _writer(channel, values, done):
+            for value in values:
+                channel.write(value)
+            done.write(True)
+        done = self.csp_process.Channel()
+        _writer(self.channel, [1, 2, 3], done).spawn()
+        self.assertTrue(done.read())
+        self.assertEqual([self.channel.read() for i in range(3)], [1, 2, 3])
+
+    def testRingWrapsAround(self):
+        self.channel = csp.os_process.BufferedChannel(4, size=64)
+        values = ['%d' % i * (i % 7) for i in range(40)]
+        self.assertEqual(self.roundTrip(values), values)
+
+
+class TestChannelFactory(TestChannel):
+
+    def setUp(self):
+        self.factory = self.csp_process.ChannelFactory(self.channel_type)
+        self.channel = self.factory.create()
+
+    def testNamesAreUnique(self):
+        channels = [self.factory.create() for i in range(100)]
+        names = set(channel.name for channel in channels + [self.channel])
+        self.assertEqual(len(names), 101)
+
+    def testReleasedChannelsAreReused(self):
+        self.assertEqual(self.roundTrip([1, 2]), [1, 2])
+        name = self.channel.name
+        self.factory.release(self.channel)
+        self.assertEqual(len(self.factory), 1)
+        self.assertTrue(self.factory.create() is self.channel)
+        self.assertNotEqual(self.channel.name, name)
+        self.assertEqual(self.roundTrip([3, 4]), [3, 4])
+
+    def testPoisonedChannelsAreNotReused(self):
+        self.channel.poison()
+        self.factory.release(self.channel)
+        self.assertEqual(len(self.factory), 0)
+        self.assertFalse(self.factory.create() is self.channel)
+
+    def testUnreadItemsAreDropped(self):
+        self.writeMany([[1, 2, 3]])
+        self.assertEqual(self.channel.read(), 1)
+        self.factory.release(self.channel)
+        self.assertTrue(self.factory.create() is self.channel)
+        self.assertEqual(self.roundTrip([4]), [4])
+
+    def testChannelsWithWaitingItemsAreNotReused(self):
+        @self.csp_process.process
+        def _writer(channel):
+            channel.write('waiting')
+        _writer(self.channel).spawn()
+        deadline = time.time() + 5
+        while not self.channel._has_item() and time.time() < deadline:
+            time.sleep(0.01)
+        self.factory.release(self.channel)
+        self.assertEqual(len(self.factory), 0)
+        self.assertEqual(self.channel.read(), 'waiting')
+
+
+class TestBufferedChannelFactory(TestChannelFactory):
+
+    def setUp(self):
+        self.factory = self.csp_process.ChannelFactory(
+            self.csp_process.BufferedChannel, capacity=4)
+        self.channel = self.factory.create()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,262 @@
+"""
+Tests for the cooperative version of python-csp, csp.os_cooperative.
+
+Every process here is a generator run by a scheduler on one thread,
+so these tests also check that networks far larger than the OS could
+run as threads or processes complete, and that a network in which
+every process is blocked raises Deadlock rather than hanging.
+"""
+
+import sys
+import time
+import unittest
+
+sys.path.insert(0, "..")
+
+import csp.os_cooperative
+from csp.os_cooperative import *
+
+
+@process
+def _send(channel, values):
+    for value in values:
+        yield from channel.write(value)
+
+
+@process
+def _recv(channel, count, result):
+    for i in range(count):
+        result.append((yield from channel.read()))
+
+
+@process
+def _select(guards, method, count, result):
+    alt = Alt(*guards)
+    for i in range(count):
+        result.append((yield from getattr(alt, method)()))
+
+
+@process
+def _relay(cin, cout):
+    while True:
+        yield from cout.write((yield from cin.read()) + 1)
+
+
+class TestCooperativeChannels(unittest.TestCase):
+
+    def testReadWrite(self):
+        for channel in [Channel(), BufferedChannel(2), FileChannel()]:
+            result = []
+            Par(_send(channel, range(10)), _recv(channel, 10, result)).start()
+            self.assertEqual(result, list(range(10)))
+
+    def testBufferedWriterRunsAhead(self):
+        channel, result = BufferedChannel(3), []
+        _send(channel, [1, 2, 3]).start()
+        _recv(channel, 3, result).start()
+        self.assertEqual(result, [1, 2, 3])
+
+    def testWriteMany(self):
+        channel, result = Channel(), []
+
+        @process
+        def _send_many(channel):
+            yield from channel.write_many(range(5))
+            yield from channel.write(5)
+
+        @process
+        def _recv_many(channel):
+            result.append((yield from channel.read()))
+            result.extend((yield from channel.read_many(3)))
+            result.extend((yield from channel.read_many(3)))
+            result.append((yield from channel.read()))
+
+        Par(_send_many(channel), _recv_many(channel)).start()
+        self.assertEqual(result, list(range(6)))
+
+    def testPoisonWakesBlockedProcesses(self):
+        channel, result = Channel(), []
+
+        @process
+        def _poisoner(channel):
+            yield
+            channel.poison()
+
+        Par(_recv(channel, 1, result), _recv(channel, 1, result),
+            _poisoner(channel)).start()
+        self.assertEqual(result, [])
+        self.assertRaises(csp.os_cooperative.ChannelPoison,
+                          next, channel.read())
+
+    def testDeadlock(self):
+        self.assertRaises(csp.os_cooperative.Deadlock,
+                          _recv(Channel(), 1, []).start)
+
+    def testTokenRing(self):
+        size = 10000
+        channels = [Channel() for i in range(size)]
+        result = []
+
+        @process
+        def _first(cin, cout):
+            yield from cout.write(0)
+            result.append((yield from cin.read()))
+            cout.poison()
+
+        Par(_first(channels[-1], channels[0]),
+            *[_relay(channels[i - 1], channels[i])
+              for i in range(1, size)]).start()
+        self.assertEqual(result, [size - 1])
+
+
+class TestCooperativeAlt(unittest.TestCase):
+
+    def testSelect(self):
+        for method in ['select', 'fair_select', 'pri_select']:
+            chan1, chan2, result = Channel(), Channel(), []
+            Par(_send(chan1, [1, 2]), _send(chan2, [3, 4]),
+                _select([chan1, chan2], method, 4, result)).start()
+            self.assertEqual(sorted(result), [1, 2, 3, 4])
+
+    def testPriSelect(self):
+        chan1, chan2, result = BufferedChannel(2), BufferedChannel(2), []
+        Seq(_send(chan2, [3, 4]), _send(chan1, [1, 2]),
+            _select([chan1, chan2], 'pri_select', 4, result)).start()
+        self.assertEqual(result, [1, 2, 3, 4])
+
+    def testSkip(self):
+        result = []
+        _select([Channel(), Skip()], 'select', 3, result).start()
+        self.assertEqual(result, ['Skip'] * 3)
+
+    def testTimeout(self):
+        for method in ['select', 'fair_select', 'pri_select']:
+            result = []
+
+            @process
+            def _wait(channel):
+                start = time.time()
+                result.append((yield from getattr(Alt(channel), method)(timeout=0.05)))
+                result.append(time.time() - start)
+
+            _wait(Channel()).start()
+            self.assertEqual(result[0], None)
+            self.assertTrue(0.05 <= result[1] < 1.0)
+
+    def testSelectBeforeTimeout(self):
+        channel, result = Channel(), []
+
+        @process
+        def _wait(channel):
+            result.append((yield from Alt(channel).select(timeout=5)))
+
+        start = time.time()
+        Par(_wait(channel), _send(channel, [1])).start()
+        self.assertEqual(result, [1])
+        self.assertTrue(time.time() - start < 1.0)
+
+    def testOtherProcessesRunDuringTimeout(self):
+        channel, result = Channel(), []
+
+        @process
+        def _wait(channel):
+            result.append((yield from Alt(channel).select(timeout=0.05)))
+            yield from channel.write('late')
+
+        @process
+        def _count(channel):
+            for i in range(3):
+                result.append(i)
+                yield
+            result.append((yield from channel.read()))
+
+        Par(_wait(channel), _count(channel)).start()
+        self.assertEqual(result, [0, 1, 2, None, 'late'])
+
+    def testChoice(self):
+        chan1, chan2, result = Channel(), Channel(), []
+
+        @process
+        def _choose(chan1, chan2):
+            result.append((yield from chan1 | chan2))
+
+        Par(_send(chan2, ['b']), _choose(chan1, chan2)).start()
+        self.assertEqual(result, ['b'])
+
+
+class TestCooperativeProcesses(unittest.TestCase):
+
+    def testPlainFunctions(self):
+        result = []
+
+        @process
+        def _append(value):
+            result.append(value)
+
+        Seq(_append(1), Par(_append(2), _append(3)), _append(4)).start()
+        self.assertEqual(result, [1, 2, 3, 4])
+
+    def testNestedPar(self):
+        channel, result = Channel(), []
+
+        @process
+        def _outer(channel):
+            yield from Par(_send(channel, [1]), _recv(channel, 1, result)).run()
+            result.append(2)
+
+        _outer(channel).start()
+        self.assertEqual(result, [1, 2])
+
+    def testForever(self):
+        result = []
+
+        @forever
+        def _count(cout):
+            n = 0
+            while True:
+                yield from cout.write(n)
+                n += 1
+                yield
+
+        @process
+        def _recv_and_poison(cin):
+            yield from _recv(cin, 10, result).run()
+            cin.poison()
+
+        channel = Channel()
+        Par(_count(channel), _recv_and_poison(channel)).start()
+        self.assertEqual(result, list(range(10)))
+
+    def testOperationsNotRun(self):
+        # Channel operations called without yield from do nothing, so
+        # raise an error in the process which called them.
+        errors = []
+
+        @process
+        def _plain(cout):
+            cout.write(1)
+
+        @forever
+        def _bare(cout):
+            while True:
+                cout.write(1)
+                yield
+
+        @process
+        def _dropped(cin, cout):
+            cout.write(1)
+            yield from cin.read()
+
+        hook = sys.excepthook
+        sys.excepthook = lambda typ, exc, tback: errors.append(exc)
+        try:
+            for proc in [_plain(Channel()), _bare(Channel()),
+                         _dropped(Channel(), Channel())]:
+                proc.start()
+        finally:
+            sys.excepthook = hook
+        self.assertEqual([type(error) for error in errors], [RuntimeError] * 3)
+        self.assertTrue('Channel.write' in str(errors[0]))
+
+if __name__ == '__main__':
+    unittest.main()
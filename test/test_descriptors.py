@@ -0,0 +1,110 @@
+"""
+Tests for passing sockets and files between OS processes over
+DescriptorChannels, and for the pre-fork server built on them.
+"""
+
+import os
+import socket
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, "..")
+
+from csp.os_process import Alt, Channel, DescriptorChannel, process
+from csp.patterns import PreforkServer
+
+
+@process
+def _greet(cin):
+    conn = cin.read()
+    conn.sendall(b'hello from ' + str(os.getpid()).encode())
+    conn.close()
+
+
+@process
+def _append(cin, cout):
+    fobj, text = cin.read()
+    fobj.write(text)
+    fobj.close()
+    cout.write('done')
+
+
+def _echo_pid(conn, address):
+    conn.sendall(conn.recv(1024) + b' ' + str(os.getpid()).encode())
+
+
+class TestDescriptorChannel(unittest.TestCase):
+
+    def testSocket(self):
+        channel = DescriptorChannel()
+        greeter = _greet(channel)
+        greeter.spawn()
+        ours, theirs = socket.socketpair()
+        channel.write(theirs)
+        theirs.close()
+        self.assertEqual(ours.recv(1024),
+                         b'hello from ' + str(greeter.pid).encode())
+        ours.close()
+        greeter.join()
+
+    def testFileInItem(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            channel, done = DescriptorChannel(), Channel()
+            appender = _append(channel, done)
+            appender.spawn()
+            with open(path, 'w') as fobj:
+                fobj.write('first ')
+                channel.write((fobj, 'second'))
+                self.assertEqual(done.read(), 'done')
+            appender.join()
+            with open(path) as fobj:
+                self.assertEqual(fobj.read(), 'first second')
+        finally:
+            os.unlink(path)
+
+    def testLargeItemAndAlt(self):
+        channel = DescriptorChannel()
+        ours, theirs = socket.socketpair()
+        writer = process(lambda: channel.write((b'x' * 1000000, theirs)))()
+        writer.spawn()
+        theirs.close()
+        data, sock = Alt(channel).select()
+        self.assertEqual(len(data), 1000000)
+        sock.sendall(b'ping')
+        self.assertEqual(ours.recv(4), b'ping')
+        sock.close()
+        ours.close()
+        writer.join()
+
+
+class TestPreforkServer(unittest.TestCase):
+
+    def testConnectionsServedByWorkers(self):
+        listener = socket.create_server(('127.0.0.1', 0))
+        address = listener.getsockname()
+        server = PreforkServer(listener, _echo_pid, workers=3)
+        for proc in server.procs:
+            proc.spawn()
+        listener.close()
+        pids = set()
+        try:
+            for i in range(12):
+                with socket.create_connection(address) as conn:
+                    conn.sendall(b'ping')
+                    reply = conn.recv(1024).split()
+                    self.assertEqual(reply[0], b'ping')
+                    pids.add(int(reply[1]))
+        finally:
+            for proc in server.procs:
+                proc.terminate()
+                proc.join()
+        workers = set(proc.pid for proc in server.procs[1:])
+        self.assertTrue(pids)
+        self.assertTrue(pids <= workers)
+
+
+if __name__ == '__main__':
+    unittest.main()
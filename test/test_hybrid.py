@@ -0,0 +1,175 @@
+"""
+Tests for the hybrid version of python-csp, csp.os_hybrid.
+
+Processes here are shared out between several worker processes, so
+these tests check that channels work between workers as well as
+within them, that poison reaches processes in other workers, and
+that idle workers steal processes from busy ones.
+"""
+
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, "..")
+
+import csp.os_hybrid
+from csp.os_hybrid import *
+
+
+@process
+def _send(channel, values):
+    for value in values:
+        yield from channel.write(value)
+
+
+@process
+def _send_pid(channel, value):
+    yield from channel.write((value, os.getpid()))
+
+
+@process
+def _relay(cin, cout):
+    while True:
+        yield from cout.write((yield from cin.read()) + 1)
+
+
+@process
+def _busy(cout, value):
+    # Long enough that an idle worker has time to steal the others.
+    sum(range(200000))
+    yield from cout.write((value, os.getpid()))
+
+
+@process
+def _spawner(cout, count):
+    # Give the idle workers time to ask for processes.
+    time.sleep(0.3)
+    yield from Par(*[_busy(cout, i) for i in range(count)]).run()
+
+
+class TestHybrid(unittest.TestCase):
+
+    def setUp(self):
+        self.runtime = Runtime(workers=3).start()
+
+    def tearDown(self):
+        self.runtime.close()
+
+    def collect(self, channel, count, *procs):
+        """Run C{procs} with a process in this one which reads C{count}
+        items from C{channel}. Return the items.
+        """
+        result = []
+
+        @process
+        def _recv(channel):
+            for i in range(count):
+                result.append((yield from channel.read()))
+
+        Par(_recv(channel), *procs).start()
+        return result
+
+    def testChannelsBetweenWorkers(self):
+        channel = Channel()
+        result = self.collect(channel, 10,
+                              *[_send_pid(channel, i) for i in range(10)])
+        self.assertEqual(sorted(value for value, pid in result), list(range(10)))
+        self.assertTrue(len(set(pid for value, pid in result)) > 1)
+
+    def testBufferedChannel(self):
+        channel = BufferedChannel(4)
+        result = self.collect(channel, 20, _send(channel, range(10)),
+                              _send(channel, range(10, 20)))
+        self.assertEqual(sorted(result), list(range(20)))
+
+    def testLargeItems(self):
+        channel, data = Channel(), os.urandom(100000)
+        result = self.collect(channel, 2, _send(channel, [data]),
+                              _send(channel, [data]))
+        self.assertEqual([bytes(item) for item in result], [data, data])
+
+    def testTokenRing(self):
+        size = 300
+        channels = [Channel() for i in range(size)]
+        result = []
+
+        @process
+        def _first(cin, cout):
+            yield from cout.write(0)
+            result.append((yield from cin.read()))
+            cout.poison()
+
+        Par(_first(channels[-1], channels[0]),
+            *[_relay(channels[i - 1], channels[i])
+              for i in range(1, size)]).start()
+        self.assertEqual(result, [size - 1])
+
+    def testAltOnRemoteChannels(self):
+        chan1, chan2, result = Channel(), Channel(), []
+
+        @process
+        def _select(chan1, chan2):
+            alt = Alt(chan1, chan2)
+            for i in range(4):
+                result.append((yield from alt.select()))
+
+        Par(_select(chan1, chan2), _send(chan1, [1, 2]),
+            _send(chan2, [3, 4])).start()
+        self.assertEqual(sorted(result), [1, 2, 3, 4])
+
+    def testAltTimeout(self):
+        result = []
+
+        @process
+        def _wait(channel):
+            start = time.time()
+            result.append((yield from Alt(channel).select(timeout=0.05)))
+            result.append(time.time() - start)
+
+        _wait(Channel()).start()
+        self.assertEqual(result[0], None)
+        self.assertTrue(0.05 <= result[1] < 1.0)
+
+    def testAltOnRemoteChannelBeforeTimeout(self):
+        channel, result = Channel(), []
+
+        @process
+        def _wait(channel):
+            result.append((yield from Alt(channel).select(timeout=5)))
+
+        start = time.time()
+        Par(_wait(channel), _send(channel, [1])).start()
+        self.assertEqual(result, [1])
+        self.assertTrue(time.time() - start < 1.0)
+
+    def testAltLeavesOtherItems(self):
+        chan1, chan2, done, result = Channel(), Channel(), Channel(), []
+
+        @process
+        def _select_once(chan1, chan2, done):
+            yield from done.write((yield from Alt(chan1, chan2).select()))
+
+        @process
+        def _read_other(chan1, chan2, done):
+            first = yield from done.read()
+            other = chan2 if first == 1 else chan1
+            result.extend([first, (yield from other.read())])
+
+        # The Alt runs in another worker, where both channels are
+        # proxies: the item it does not select must go back home.
+        Par(_read_other(chan1, chan2, done), _send(chan1, [1]),
+            _select_once(chan1, chan2, done), _send(chan2, [2])).start()
+        self.assertEqual(sorted(result), [1, 2])
+
+    def testWorkStealing(self):
+        channel = Channel()
+        # The spawner runs in another worker, where its Par starts.
+        result = self.collect(channel, 12, _spawner(channel, 12))
+        self.assertEqual(sorted(value for value, pid in result), list(range(12)))
+        self.assertTrue(len(set(pid for value, pid in result)) > 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+"""
+Tests for the lifetimes of csp.os_process process graphs.
+
+Par and Seq release their children when they finish, and children
+refer to them only weakly, so these tests check that a finished
+process graph and its channels are freed without the garbage
+collector, and that the collections avoided are counted.
+"""
+
+import gc
+import sys
+import unittest
+import weakref
+
+sys.path.insert(0, "..")
+
+import csp.os_process
+from csp.os_process import *
+
+
+@process
+def _send(channel, values):
+    for value in values:
+        channel.write(value)
+
+
+@process
+def _sum(channel, count, results):
+    results.write(sum(channel.read() for i in range(count)))
+
+
+class TestLifetimes(unittest.TestCase):
+
+    def setUp(self):
+        gc.disable()
+
+    def tearDown(self):
+        gc.enable()
+
+    def testEnclosingIsWeak(self):
+        proc = _send(Channel(), [])
+        par = Par(proc)
+        self.assertTrue(proc.enclosing is par)
+        del par
+        self.assertEqual(proc.enclosing, None)
+
+    def testGraphsAreFreedWithoutCollection(self):
+        for compose in [Par, Seq]:
+            channel, results = BufferedChannel(5), BufferedChannel(1)
+            graph = compose(_send(channel, range(5)),
+                            _sum(channel, 5, results))
+            graph.start()
+            self.assertEqual(results.read(), 10)
+            refs = [weakref.ref(graph), weakref.ref(channel)]
+            refs += [weakref.ref(proc) for proc in graph.procs]
+            del graph, channel
+            self.assertEqual([ref() for ref in refs], [None] * len(refs))
+
+    def testCollectionsAvoidedAreCounted(self):
+        before = gc_collections_avoided()
+        Par(*[_send(Channel(), []) for i in range(3)]).start()
+        self.assertEqual(gc_collections_avoided() - before, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+"""
+Tests for channels multiplexed over a ChannelLink (processes).
+
+The test process holds one end of each link, and a forked CSP
+process the other.
+"""
+
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, "..")
+
+import csp.os_process
+from csp.mux import ChannelLink
+from csp.os_process import Alt, ChannelPoison, process
+
+
+@process
+def _write_each(channels):
+    for i, channel in enumerate(channels):
+        channel.write(i)
+
+
+@process
+def _echo(cin, cout, count):
+    for i in range(count):
+        cout.write(cin.read())
+
+
+def _read_while_writing(cout, cin, item):
+    """Write C{item} to C{cout} while another thread reads C{cin}, and
+    return the length of the item read.
+    """
+    got = []
+    reader = threading.Thread(target=lambda: got.append(len(cin.read())))
+    reader.start()
+    cout.write(item)
+    reader.join()
+    return got[0]
+
+
+@process
+def _exchange(cout, cin, item):
+    assert _read_while_writing(cout, cin, item) == len(item)
+
+
+@process
+def _poison(channel):
+    channel.write('last')
+    channel.poison()
+
+
+class TestChannelLink(unittest.TestCase):
+
+    def testManyChannelsOneSocket(self):
+        fds = len(os.listdir('/proc/self/fd')) if os.path.isdir('/proc/self/fd') else None
+        link = ChannelLink()
+        channels = [link.channel() for i in range(5000)]
+        if fds is not None:
+            self.assertLessEqual(len(os.listdir('/proc/self/fd')), fds + 2)
+        writer = _write_each(channels)
+        writer.spawn()
+        self.assertEqual([channel.read() for channel in channels],
+                         list(range(5000)))
+        writer.join()
+
+    def testBothDirections(self):
+        link = ChannelLink()
+        there, back = link.channel(), link.channel()
+        echo = _echo(there, back, 100)
+        echo.spawn()
+        for i in range(100):
+            there.write(i)
+            self.assertEqual(back.read(), i)
+        echo.join()
+
+    def testLargeItemsBothWays(self):
+        # Each item is larger than the socket buffers, and both
+        # processes write before either reads.
+        link = ChannelLink()
+        there, back = link.channel(), link.channel()
+        item = b'x' * (8 * 1024 * 1024)
+        other = _exchange(back, there, item)
+        other.spawn()
+        self.assertEqual(_read_while_writing(there, back, item), len(item))
+        other.join()
+        self.assertEqual(other.exitcode, 0)
+
+    def testAlt(self):
+        link = ChannelLink()
+        channels = [link.channel() for i in range(50)]
+        writer = _write_each(channels[::-1])
+        writer.spawn()
+        alt = Alt(*channels)
+        self.assertEqual(sorted(alt.select() for i in range(50)),
+                         list(range(50)))
+        writer.join()
+
+    def testPoison(self):
+        link = ChannelLink()
+        channel = link.channel()
+        poisoner = _poison(channel)
+        poisoner.spawn()
+        self.assertEqual(channel.read(), 'last')
+        self.assertRaises(ChannelPoison, channel.read)
+        poisoner.join()
+
+    def testThirdProcess(self):
+        link = ChannelLink()
+        channel = link.channel()
+        link._claims[0], link._claims[1] = 1, 2 # Two other processes.
+        self.assertRaises(ValueError, channel.read)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,262 @@
+"""
+Tests for channels carried over TCP and Unix domain sockets.
+
+Readers listen on the loopback interface or in a temporary directory,
+and writers run in forked OS processes, as they would in separately
+started programs.
+"""
+
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, "..")
+
+import csp.os_process
+from csp.net import (NetChannel, ChannelPoison, NameServer, lookup,
+                     publish, unpublish)
+from csp.serializers import PickleSerializer
+
+
+@csp.os_process.process
+def _writer(channel, values):
+    for value in values:
+        channel.write(value)
+
+
+@csp.os_process.process
+def _poisoner(channel):
+    channel.write('last')
+    channel.poison()
+
+
+@csp.os_process.process
+def _late_writer(channel, result):
+    # result: 1 if the write raised ChannelPoison, 2 if it was refused.
+    try:
+        channel.write('late')
+    except ChannelPoison:
+        result.value = 1
+    except OSError:
+        result.value = 2
+
+
+class _Unmarshallable(object):
+    pass
+
+
+class TestNetChannelTCP(unittest.TestCase):
+
+    def make_channel(self, **kwargs):
+        channel = NetChannel(('127.0.0.1', 0), **kwargs)
+        channel.listen()
+        return channel
+
+    def testReadWrite(self):
+        channel = self.make_channel()
+        writer = _writer(channel, list(range(10)))
+        writer.spawn()
+        self.assertEqual([channel.read() for i in range(10)], list(range(10)))
+        writer.join()
+        channel.close()
+
+    def testManyWriters(self):
+        channel = self.make_channel()
+        writers = [_writer(channel, [(i, j) for j in range(5)])
+                   for i in range(4)]
+        for writer in writers:
+            writer.spawn()
+        items = [channel.read() for i in range(20)]
+        for writer in writers:
+            writer.join()
+        self.assertEqual(sorted(items), [(i, j) for i in range(4)
+                                         for j in range(5)])
+        for i in range(4): # Each writer's items arrive in order.
+            self.assertEqual([item for item in items if item[0] == i],
+                             [(i, j) for j in range(5)])
+        channel.close()
+
+    def testLargeItem(self):
+        # Larger than the window, so the writer must wait for credit.
+        channel = self.make_channel(window=4096)
+        item = bytes(range(256)) * 1000
+        writer = _writer(channel, [item, 'next'])
+        writer.spawn()
+        self.assertEqual(channel.read(), item)
+        self.assertEqual(channel.read(), 'next')
+        writer.join()
+        channel.close()
+
+    def testAlt(self):
+        chan1, chan2 = self.make_channel(), self.make_channel()
+        writers = [_writer(chan1, ['one']), _writer(chan2, ['two'])]
+        for writer in writers:
+            writer.spawn()
+        alt = csp.os_process.Alt(chan1, chan2)
+        self.assertEqual(sorted([alt.select(), alt.select()]), ['one', 'two'])
+        self.assertIsNone(alt.select(timeout=0.05))
+        for writer in writers:
+            writer.join()
+        chan1.close()
+        chan2.close()
+
+    def testPoisonFromWriter(self):
+        channel = self.make_channel()
+        writer = _poisoner(channel)
+        writer.spawn()
+        self.assertEqual(channel.read(), 'last')
+        self.assertRaises(ChannelPoison, channel.read)
+        writer.join()
+        channel.close()
+
+    def testPoisonFromReader(self):
+        channel = self.make_channel()
+        writer = _writer(channel, ['first', 'second'])
+        writer.spawn()
+        self.assertEqual(channel.read(), 'first')
+        channel.poison()
+        writer.join()
+        self.assertNotEqual(writer.exitcode, None)
+        channel.close()
+
+    def testWaitingWriterIsPoisoned(self):
+        channel = self.make_channel()
+        result = multiprocessing.Value('i', 0)
+        writer = _late_writer(channel, result)
+        writer.spawn()
+        time.sleep(0.2) # Connected, but not yet accepted.
+        channel.poison()
+        writer.join()
+        self.assertEqual(result.value, 1)
+
+    def testPoisonedReaderRefusesWriters(self):
+        channel = self.make_channel()
+        # As a writer in another program would, which is not poisoned.
+        out = NetChannel(channel.address, connect_timeout=0.1)
+        channel.poison()
+        result = multiprocessing.Value('i', 0)
+        writer = _late_writer(out, result)
+        writer.spawn()
+        writer.join()
+        self.assertEqual(result.value, 2)
+
+    def testDefaultSerializerDoesNotPickle(self):
+        channel = self.make_channel()
+        self.assertRaises(ValueError, channel.write, _Unmarshallable())
+        channel.close()
+
+    def testPickleSerializer(self):
+        channel = self.make_channel(serializer=PickleSerializer(out_of_band=False))
+        writer = _writer(channel, [set([1]), frozenset([2])])
+        writer.spawn()
+        self.assertEqual([channel.read(), channel.read()],
+                         [set([1]), frozenset([2])])
+        writer.join()
+        channel.close()
+
+
+class TestNetChannelUnix(TestNetChannelTCP):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.count = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def make_channel(self, **kwargs):
+        self.count += 1
+        path = os.path.join(self.directory, 'chan{0}'.format(self.count))
+        channel = NetChannel(path, **kwargs)
+        channel.listen()
+        return channel
+
+    def testStaleSocket(self):
+        path = os.path.join(self.directory, 'stale')
+        channel = NetChannel(path)
+        channel.listen()
+        channel._listener.close() # As if its program had died.
+        channel._listener = None
+        again = NetChannel(path)
+        again.listen()
+        writer = _writer(again, ['hello'])
+        writer.spawn()
+        self.assertEqual(again.read(), 'hello')
+        writer.join()
+        again.close()
+
+
+@csp.os_process.process
+def _named_writer(server, name, values):
+    channel = lookup(name, server=server)
+    for value in values:
+        channel.write(value)
+
+
+class TestNameServer(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'names')
+        self.server = NameServer(self.path).start()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.directory)
+
+    def testPublishAndLookup(self):
+        channel = NetChannel(os.path.join(self.directory, 'chan'))
+        publish('results', channel, server=self.path)
+        writer = _named_writer(self.path, 'results', [1, 2, 3])
+        writer.spawn()
+        self.assertEqual([channel.read() for i in range(3)], [1, 2, 3])
+        writer.join()
+        self.assertEqual(self.server.answer({'op': 'names'}),
+                         {'names': ['results']})
+        unpublish('results', server=self.path)
+        self.assertRaises(KeyError, lookup, 'results', server=self.path,
+                          timeout=0.05)
+        channel.close()
+
+    def testLookupWaitsForPublish(self):
+        writer = _named_writer(self.path, 'late', ['hello'])
+        writer.spawn()
+        channel = NetChannel(('127.0.0.1', 0))
+        publish('late', channel, server=self.path)
+        self.assertEqual(channel.read(), 'hello')
+        writer.join()
+        channel.close()
+
+    def testLookupIsCached(self):
+        channel = NetChannel(('127.0.0.1', 0))
+        publish('cached', channel, server=self.path)
+        self.assertIs(lookup('cached', server=self.path),
+                      lookup('cached', server=self.path))
+        channel.close()
+
+    def testReaderRestarts(self):
+        first = NetChannel(('127.0.0.1', 0))
+        publish('restart', first, server=self.path)
+        writer = _named_writer(self.path, 'restart', ['before'])
+        writer.spawn()
+        self.assertEqual(first.read(), 'before')
+        writer.join()
+        # The writer's cached channel follows the reader to a new port.
+        out = lookup('restart', server=self.path)
+        self.assertEqual(out.address, first.address)
+        first.close()
+        second = NetChannel(('127.0.0.1', 0))
+        publish('restart', second, server=self.path)
+        writer = csp.os_process.process(lambda: out.write('after'))()
+        writer.spawn()
+        self.assertEqual(second.read(), 'after')
+        writer.join()
+        second.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
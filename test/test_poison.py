@@ -0,0 +1,74 @@
+"""
+Tests for poison propagation in csp.os_process.
+
+Each process records the channels it was given when it is created,
+so these tests check which arguments channels are found in, and that
+a process which catches ChannelPoison poisons exactly those channels.
+"""
+
+import array
+import collections
+import itertools
+import sys
+import unittest
+
+sys.path.insert(0, "..")
+
+import csp.os_process
+from csp.os_process import *
+
+
+@process
+def _forward(cin, couts, data):
+    for item in data:
+        cin.read()
+
+
+def _is_poisoned(channel):
+    return channel._poisoned.value == Channel.TRUE
+
+
+class TestPoison(unittest.TestCase):
+
+    def testChannelsAreRecorded(self):
+        cin, couts = Channel(), [Channel(), BufferedChannel(1)]
+        guard = Channel()
+        proc = _forward(cin, {'outs': couts}, [0.5] * 100000,
+                        alt=Alt(guard, Skip()))
+        self.assertEqual(set(proc._channels), set([cin, guard] + couts))
+        # Channels given to a process argument are found through it.
+        outer = _forward(Channel(), [proc], [])
+        self.assertTrue(set(proc._channels) < set(outer._channels))
+
+    def testChannelsInIterablesAndAttributes(self):
+        class Holder(object):
+            def __init__(self, channel):
+                self.channel = channel
+        queued, held = Channel(), Channel()
+        items = iter([Channel()])
+        proc = _forward(Channel(), collections.deque([queued]),
+                        [Holder(held), array.array('d', range(1000)), items])
+        self.assertTrue(set([queued, held]) < set(proc._channels))
+        # Iterators are not consumed.
+        self.assertEqual(len(list(items)), 1)
+
+    def testOtherIterablesAreNotIterated(self):
+        class Forever(object):
+            def __iter__(self):
+                return itertools.repeat(Channel())
+        generator = (channel for channel in [Channel()])
+        proc = _forward(Channel(), [Forever(), generator], [])
+        self.assertEqual(len(proc._channels), 1)
+        # The generator was not consumed.
+        self.assertEqual(len(list(generator)), 1)
+
+    def testPoisonReachesRecordedChannels(self):
+        cin, couts, other = Channel(), (Channel(), Channel()), Channel()
+        cin.poison()
+        Par(_forward(cin, {'outs': couts}, range(3))).start()
+        self.assertTrue(all(_is_poisoned(channel) for channel in couts))
+        self.assertFalse(_is_poisoned(other))
+
+
+if __name__ == '__main__':
+    unittest.main()
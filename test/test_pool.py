@@ -0,0 +1,107 @@
+"""
+Tests for running Par and Seq on a csp.os_process.ProcessPool.
+
+Processes are sent to the pool's workers rather than forked, so these
+tests check that channels created before and after the pool started
+can be used by pooled processes, and by processes which still run in
+OS processes of their own.
+"""
+
+import gc
+import os
+import sys
+import unittest
+
+sys.path.insert(0, "..")
+
+import csp.os_process
+from csp.os_process import Channel, Par, ProcessPool, Seq, process
+
+
+@process
+def _send(channel, values):
+    for value in values:
+        channel.write(value)
+
+
+@process
+def _sum(channel, count, result_channel):
+    result_channel.write(sum(channel.read() for i in range(count)))
+
+
+@process
+def _pid(result_channel):
+    result_channel.write(os.getpid())
+
+
+@process
+def _nested(result_channel):
+    # Runs in a worker, which must not fork.
+    channel, pids = Channel(), csp.os_process.BufferedChannel(4)
+    Par(_send(channel, [1, 2, 3]), _sum(channel, 3, result_channel),
+        _pid(pids)).start()
+    Seq(_pid(pids), _pid(pids)).start()
+    result_channel.write(set([os.getpid()] +
+                             [pids.read() for i in range(3)]))
+
+
+class TestProcessPool(unittest.TestCase):
+
+    def setUp(self):
+        # Exists before the workers are forked.
+        self.inherited = Channel()
+        self.pool = ProcessPool(workers=2, channels=8).start()
+
+    def tearDown(self):
+        self.pool.close()
+
+    def sumThrough(self, channel):
+        """Send ten integers through `channel` between two pooled
+        processes, and return their sum.
+        """
+        result_channel = csp.os_process.BufferedChannel(1)
+        Par(_send(channel, list(range(10))),
+            _sum(channel, 10, result_channel)).start()
+        return result_channel.read()
+
+    def testInheritedChannel(self):
+        self.assertEqual(self.sumThrough(self.inherited), 45)
+
+    def testNewChannels(self):
+        for channel in [Channel(), csp.os_process.BufferedChannel(2)]:
+            self.assertEqual(self.sumThrough(channel), 45)
+
+    def testWorkersAreReused(self):
+        pids = csp.os_process.BufferedChannel(20)
+        for i in range(5):
+            Par(*[_pid(pids) for j in range(4)]).start()
+        found = set(pids.read() for i in range(20))
+        self.assertTrue(found <= set(worker.pid for worker in self.pool._procs))
+
+    def testSeq(self):
+        channel = csp.os_process.BufferedChannel(3)
+        Seq(_send(channel, [1, 2, 3]), _sum(channel, 3, channel)).start()
+        self.assertEqual(channel.read(), 6)
+
+    def testNestedParAndSeqDoNotFork(self):
+        result_channel = csp.os_process.BufferedChannel(2)
+        Par(_nested(result_channel)).start()
+        self.assertEqual(result_channel.read(), 6)
+        pids = result_channel.read()
+        self.assertEqual(len(pids), 1)
+        self.assertTrue(pids <= set(worker.pid for worker in self.pool._procs))
+
+    def testSlotsAreReused(self):
+        for i in range(20):
+            self.assertEqual(self.sumThrough(Channel()), 45)
+        gc.collect()
+        self.assertEqual(len(self.pool._free), 8)
+
+    def testUnsendableChannel(self):
+        # FileChannel regions mapped after the pool started are not
+        # shared with the workers, so these processes are forked.
+        self.assertEqual(self.sumThrough(csp.os_process.FileChannel()), 45)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+"""
+Tests for the channel serializers in csp.serializers.
+"""
+
+import gc
+import os
+import subprocess
+import sys
+import time
+import unittest
+
+sys.path.insert(0, "..")
+
+import csp.os_process
+import csp.serializers
+from csp.serializers import *
+
+
+def _shared_files():
+    if not os.path.isdir('/dev/shm'):
+        return set()
+    return set(name for name in os.listdir('/dev/shm')
+               if name.startswith(('csp-', 'psm_')))
+
+
+class TestSerializers(unittest.TestCase):
+
+    def roundTrip(self, serializer, values):
+        return [serializer.loads(serializer.dumps(value)) for value in values]
+
+    def testPickle(self):
+        values = [None, 1, 'abc', (1, [2, {3: 4}]), set([5])]
+        self.assertEqual(self.roundTrip(PickleSerializer(), values), values)
+        self.assertEqual(self.roundTrip(PickleSerializer(protocol=1), values),
+                         values)
+
+    def testPickleOutOfBand(self):
+        value = bytearray(range(256)) * 1000
+        item, = self.roundTrip(PickleSerializer(), [value])
+        self.assertTrue(isinstance(item, memoryview))
+        self.assertEqual(bytes(item), bytes(value))
+        item, = self.roundTrip(PickleSerializer(out_of_band=False), [value])
+        self.assertEqual(item, value)
+
+    @unittest.skipUnless(csp.serializers._TRACKED,
+                         'shared files are not tracked on this system')
+    def testUnreadBuffersRemoved(self):
+        # A buffer which is never loaded is unlinked once the program
+        # which dumped it exits.
+        before = _shared_files()
+        script = ('import sys; sys.path.insert(0, {0!r}); '
+                  'from csp.serializers import PickleSerializer; '
+                  'PickleSerializer().dumps(bytearray(1000000))'
+                  ).format(os.path.abspath('..'))
+        subprocess.run([sys.executable, '-c', script],
+                       stderr=subprocess.DEVNULL, check=True)
+        # The tracker cleans up just after the program exits.
+        deadline = time.time() + 5
+        while _shared_files() - before and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(_shared_files() - before, set())
+
+    def testMarshal(self):
+        values = [None, True, 1, 2.5, 'abc', b'xyz', (1, 2), [3], {4: 5}]
+        self.assertEqual(self.roundTrip(MarshalSerializer(), values), values)
+
+    def testStruct(self):
+        values = [(1.0, 2.0), (-3.5, 4.25)]
+        self.assertEqual(self.roundTrip(StructSerializer('dd'), values),
+                         values)
+        self.assertEqual(self.roundTrip(StructSerializer('!i'), [7, -8]),
+                         [7, -8])
+
+    def testBytes(self):
+        values = [b'', b'abc', bytearray(b'def')]
+        self.assertEqual(self.roundTrip(BytesSerializer(), values),
+                         [b'', b'abc', b'def'])
+
+    def testMany(self):
+        cases = [(PickleSerializer(), [None, (1, [2]), 'abc']),
+                 (MarshalSerializer(), [1, 2.5, b'xyz']),
+                 (StructSerializer('dd'), [(1.0, 2.0), (-3.5, 4.25)]),
+                 (BytesSerializer(), [b'', b'abc', b'def'])]
+        for serializer, values in cases:
+            data = serializer.dumps_many(values)
+            self.assertEqual(serializer.loads_many(data), values)
+            self.assertEqual(serializer.loads_many(serializer.dumps_many([])),
+                             [])
+
+    def testDefault(self):
+        default = get_default_serializer()
+        marshaller = MarshalSerializer()
+        try:
+            set_default_serializer(marshaller)
+            self.assertTrue(get_default_serializer() is marshaller)
+            channel = csp.os_process.Channel()
+            self.assertTrue(channel._serializer is marshaller)
+            channel.poison()
+        finally:
+            set_default_serializer(default)
+
+
+class TestChannelSerializers(unittest.TestCase):
+
+    def roundTrip(self, channel, values):
+        """Write `values` to `channel` from a new process and return
+        the values read back in this one.
+        """
+        @csp.os_process.process
+        def _writer(channel, values):
+            for value in values:
+                channel.write(value)
+        _writer(channel, values).spawn()
+        values = [channel.read() for value in values]
+        channel.poison()
+        return values
+
+    def testMarshalChannel(self):
+        channel = csp.os_process.Channel(serializer=MarshalSerializer())
+        self.assertEqual(self.roundTrip(channel, [1, 'a', (2, 3)]),
+                         [1, 'a', (2, 3)])
+
+    def testStructChannel(self):
+        channel = csp.os_process.FileChannel(
+            serializer=StructSerializer('hh'))
+        self.assertEqual(self.roundTrip(channel, [(1, 2), (3, 4)]),
+                         [(1, 2), (3, 4)])
+
+    def testBytesChannel(self):
+        channel = csp.os_process.BufferedChannel(
+            2, serializer=BytesSerializer())
+        self.assertEqual(self.roundTrip(channel, [b'abc', b'', b'xyz']),
+                         [b'abc', b'', b'xyz'])
+
+    def testWriteManyWithEachSerializer(self):
+        cases = [(PickleSerializer(), [None, (1, [2]), 'abc']),
+                 (MarshalSerializer(), [1, 2.5, b'xyz']),
+                 (StructSerializer('hh'), [(1, 2), (3, 4), (5, 6)]),
+                 (BytesSerializer(), [b'abc', b'', b'x' * 100000])]
+        channel_types = [csp.os_process.Channel, csp.os_process.FileChannel,
+                         lambda serializer: csp.os_process.BufferedChannel(
+                             2, serializer=serializer)]
+
+        @csp.os_process.process
+        def _writer(channel, values):
+            channel.write_many(values)
+            channel.write_many(values)
+        for serializer, values in cases:
+            for channel_type in channel_types:
+                channel = channel_type(serializer=serializer)
+                _writer(channel, values).spawn()
+                self.assertEqual(channel.read(), values[0])
+                self.assertEqual(channel.read_many(10), values[1:])
+                self.assertEqual(channel.read_many(10), values)
+                channel.poison()
+
+    def testUnreadSegmentsRemoved(self):
+        before = _shared_files()
+        channel = csp.os_process.BufferedChannel(
+            2, serializer=BytesSerializer())
+        channel.write(b'x' * 10000000)
+        self.assertTrue(_shared_files() - before)
+        del channel
+        gc.collect()
+        self.assertEqual(_shared_files() - before, set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+Tests for starting csp.os_process processes by 'forkserver' and
+'spawn', rather than 'fork'.
+
+Children started this way do not inherit their parent's memory, so
+these tests check that every type of channel can be passed to them,
+that functions wrapped by @process reach them by value, and that the
+fork server imports the modules it is asked to preload.
+"""
+
+import multiprocessing
+import os
+import sys
+import unittest
+
+sys.path.insert(0, "..")
+
+import csp.os_process
+from csp.os_process import *
+
+
+@process
+def _send(channel, values):
+    for value in values:
+        channel.write(value)
+
+
+@process
+def _sum(channel, count, results):
+    results.write(sum(channel.read() for i in range(count)))
+
+
+@process
+def _report(results):
+    results.write((os.getpid(), 'xml.dom.minidom' in sys.modules,
+                   Channel().name))
+
+
+class StartMethodTest(object):
+
+    method = None
+
+    def setUp(self):
+        if self.method not in multiprocessing.get_all_start_methods():
+            self.skipTest('{0} is not available'.format(self.method))
+        set_start_method(self.method, preload=['xml.dom.minidom'])
+
+    def tearDown(self):
+        set_start_method('fork')
+
+    def testChannels(self):
+        for channel in [Channel(), FileChannel(), BufferedChannel(2)]:
+            results = BufferedChannel(1)
+            Par(_send(channel, range(5)), _sum(channel, 5, results)).start()
+            self.assertEqual(results.read(), 10)
+
+    def testChildrenShareChannelIDs(self):
+        results = BufferedChannel(2)
+        Par(_report(results), _report(results)).start()
+        names = [results.read()[2], results.read()[2]]
+        self.assertEqual(len(set(names)), 2)
+        self.assertTrue(Channel().name > max(names))
+
+
+class TestForkServer(StartMethodTest, unittest.TestCase):
+
+    method = 'forkserver'
+
+    def testPreload(self):
+        results = BufferedChannel(1)
+        _report(results).start()
+        pid, preloaded, name = results.read()
+        self.assertNotEqual(pid, os.getpid())
+        self.assertTrue(preloaded)
+
+
+class TestSpawn(StartMethodTest, unittest.TestCase):
+
+    method = 'spawn'
+
+
+if __name__ == '__main__':
+    unittest.main()